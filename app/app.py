@@ -3,7 +3,6 @@ import os
 import json
 import sys
 import pkgutil
-import importlib
 import click
 from flask_sqlalchemy import SQLAlchemy
 from werkzeug.security import generate_password_hash, check_password_hash
@@ -19,6 +18,7 @@ from modules.clients import clients_bp
 from modules.public_calculator import public_calculator_bp
 from modules.analytics.routers import analytics_bp
 from modules.quotes.routers import quotes_bp
+from modules.quotes.client_cache import ClientQuoteCache
 from modules.baselinker import baselinker_bp
 from modules.preview3d_ar import preview3d_ar_bp
 from modules.logging import AppLogger, get_logger, logging_bp, get_structured_logger
@@ -30,6 +30,8 @@ from modules.production.routers import register_production_routers
 from modules.dashboard.services.user_activity_service import UserActivityService
 from modules.partner_academy import partner_academy_bp
 from modules.partner_academy.models import PartnerApplication, PartnerLearningSession
+from modules.mail_queue.service import MailQueueService
+from modules.identity import IdentityService
 
 from flask_login import login_user, logout_user  # DODANE importy
 from sqlalchemy.exc import ResourceClosedError, OperationalError
@@ -58,9 +60,10 @@ def discover_module_metadata(app):
     for finder, name, ispkg in pkgutil.iter_modules([modules_path]):
         if not ispkg:
             continue
-        try:
-            module = importlib.import_module(f'modules.{name}')
-        except Exception:
+        # Tylko pakiety już zaimportowane przez aplikację - bez importowania
+        # pozostałych (np. narzędzi CLI) przy każdym starcie workera
+        module = sys.modules.get(f'modules.{name}')
+        if module is None:
             continue
 
         for attr in module.__dict__.values():
@@ -100,6 +103,335 @@ def register_cli_commands(app):
         create_admin()
         click.echo("[setup-db] Gotowe.")
 
+    @app.cli.command("analytics-refresh")
+    @click.option("--force", is_flag=True, help="Przelicz wszystkie zestawy niezależnie od zmian w tabelach.")
+    @with_appcontext
+    def analytics_refresh_command(force):
+        """Przelicza snapshoty analityczne (do uruchamiania z crona)."""
+        from modules.analytics.models import AnalyticsSnapshotService
+        result = AnalyticsSnapshotService.refresh(force=force)
+        click.echo(f"[analytics-refresh] Generacja: {result['generation_id'] or '-'}")
+        click.echo(f"[analytics-refresh] Przeliczone: {', '.join(result['refreshed']) or '-'}")
+        click.echo(f"[analytics-refresh] Bez zmian: {', '.join(result['skipped']) or '-'}")
+
+    @app.cli.command("public-sessions-backfill")
+    @with_appcontext
+    def public_sessions_backfill_command():
+        """Uzupełnia kolumny wymiarów w public_sessions (jednorazowo po migracji 001)."""
+        from modules.public_calculator.models import PublicSession
+        updated = PublicSession.backfill_dimensions()
+        click.echo(f"[public-sessions-backfill] Zaktualizowano sesji: {updated}")
+
+    @app.cli.command("reports-voivodeship-backfill")
+    @with_appcontext
+    def reports_voivodeship_backfill_command():
+        """Uzupełnia kolumnę voivodeship w raportach (jednorazowo po migracji 004)."""
+        from modules.reports.models import BaselinkerReportOrder
+        updated = BaselinkerReportOrder.backfill_voivodeship()
+        click.echo(f"[reports-voivodeship-backfill] Zaktualizowano rekordów: {updated}")
+
+    @app.cli.command("reports-address-backfill")
+    @with_appcontext
+    def reports_address_backfill_command():
+        """Uzupełnia kolumny adresu dostawy w raportach (jednorazowo po migracji 010)."""
+        from modules.reports.models import BaselinkerReportOrder
+        updated = BaselinkerReportOrder.backfill_delivery_address()
+        click.echo(f"[reports-address-backfill] Zaktualizowano rekordów: {updated}")
+
+    @app.cli.command("reports-address-benchmark")
+    @click.option("--count", default=50000, show_default=True, help="Liczba adresów.")
+    @click.option("--distinct", default=10000, show_default=True, help="Liczba różnych adresów.")
+    def reports_address_benchmark_command(count, distinct):
+        """Mierzy parser adresów dostawy (eksport Routimo) bez cache i z cache."""
+        from modules.reports.utils import DeliveryAddressParser
+        for key, value in DeliveryAddressParser.benchmark(count=count, distinct=distinct).items():
+            click.echo(f"[reports-address-benchmark] {key}: {value}")
+
+    @app.cli.command("reports-explain")
+    @click.option("--email", default=None, help="Użytkownik wywołujący endpointy (domyślnie pierwszy admin).")
+    @click.option("--days", default=90, show_default=True, help="Zakres dat filtrów (ostatnie N dni).")
+    @click.option("--output", default=None, help="Plik JSON z pełnymi planami.")
+    @with_appcontext
+    def reports_explain_command(email, days, output):
+        """Przechwytuje zapytania endpointów raportów i ich plany EXPLAIN."""
+        from modules.calculator.models import User
+        from modules.reports.query_plans import capture_query_plans
+
+        query = User.query.filter_by(email=email) if email else User.query.filter_by(role='admin', active=True)
+        user = query.order_by(User.id).first()
+        if not user:
+            raise click.ClickException("Nie znaleziono użytkownika")
+
+        result = capture_query_plans(app, user.email, user.id, days=days)
+        for case in result:
+            click.echo(f"[reports-explain] {case['name']} HTTP {case['status']} {case['duration_ms']} ms, "
+                       f"zapytań: {len(case['queries'])}")
+            for query_info in case['queries']:
+                if query_info['full_scans']:
+                    click.echo(f"    pełny skan {', '.join(map(str, query_info['full_scans']))} "
+                               f"({query_info['duration_ms']} ms): {query_info['statement'][:160]}")
+
+        if output:
+            with open(output, 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False, indent=2, default=str)
+            click.echo(f"[reports-explain] Zapisano plany: {output}")
+
+    @app.cli.command("quotes-totals-backfill")
+    @with_appcontext
+    def quotes_totals_backfill_command():
+        """Uzupełnia zdenormalizowane sumy wycen (jednorazowo po migracji 006)."""
+        from modules.quotes.aggregate import QuoteAggregate
+        updated = QuoteAggregate.backfill_totals()
+        click.echo(f"[quotes-totals-backfill] Zaktualizowano {updated} wycen")
+
+    @app.cli.command("quotes-query-count")
+    @click.option("--quote-id", default=None, type=int, help="Wycena do sprawdzenia (domyślnie ta z największą liczbą pozycji).")
+    @click.option("--email", default=None, help="Użytkownik wywołujący endpointy (domyślnie pierwszy admin).")
+    @click.option("--verbose", is_flag=True, help="Wypisz wykonane zapytania.")
+    @with_appcontext
+    def quotes_query_count_command(quote_id, email, verbose):
+        """Sprawdza, czy endpointy wyceny mieszczą się w limicie zapytań SQL."""
+        from sqlalchemy import func
+        from modules.calculator.models import Quote, QuoteItem, User
+        from modules.quotes.query_count import count_quote_queries
+
+        query = User.query.filter_by(email=email) if email else User.query.filter_by(role='admin', active=True)
+        user = query.order_by(User.id).first()
+        if not user:
+            raise click.ClickException("Nie znaleziono użytkownika")
+
+        if quote_id is None:
+            row = db.session.query(QuoteItem.quote_id).group_by(QuoteItem.quote_id) \
+                .order_by(func.count(QuoteItem.id).desc()).first()
+            quote_id = row.quote_id if row else None
+        quote = db.session.get(Quote, quote_id) if quote_id else None
+        if not quote:
+            raise click.ClickException("Nie znaleziono wyceny")
+
+        results = count_quote_queries(app, quote, user.email, user.id)
+        for case in results:
+            click.echo(f"[quotes-query-count] {case['name']} HTTP {case['status']}: {case['queries']} zapytań "
+                       f"(limit {case['budget']}, pozycji: {case['items']}) {'OK' if case['ok'] else 'PRZEKROCZONO'}")
+            if verbose or not case['ok']:
+                for statement in case['statements']:
+                    click.echo(f"    {statement}")
+
+        if not all(case['ok'] for case in results):
+            raise click.ClickException("Endpointy wyceny przekroczyły limit zapytań")
+
+    @app.cli.command("quotes-client-loadtest")
+    @click.option("--quote-id", default=None, type=int, help="Wycena do testu (domyślnie ostatnia z tokenem publicznym).")
+    @click.option("--requests", "requests_count", default=1000, show_default=True, help="Liczba zapytań na przypadek.")
+    @with_appcontext
+    def quotes_client_loadtest_command(quote_id, requests_count):
+        """Mierzy przepustowość strony klienta wyceny na rozgrzanym cache."""
+        from modules.calculator.models import Quote
+        from modules.quotes.client_cache import run_load_test
+
+        query = Quote.query.filter(Quote.public_token.isnot(None))
+        quote = query.filter(Quote.id == quote_id).first() if quote_id else query.order_by(Quote.id.desc()).first()
+        if not quote:
+            raise click.ClickException("Nie znaleziono wyceny z tokenem publicznym")
+
+        ClientQuoteCache.clear()
+        for case in run_load_test(app, quote.public_token, requests_count=requests_count):
+            click.echo(f"[quotes-client-loadtest] {case['name']}: {case['requests']} zapytań w {case['seconds']} s "
+                       f"= {case['requests_per_sec']} req/s (HTTP: {case['statuses']})")
+        stats = ClientQuoteCache.stats()
+        click.echo(f"[quotes-client-loadtest] cache: trafienia {stats['hits']}, chybienia {stats['misses']}")
+
+    @app.cli.command("public-sessions-loadtest")
+    @click.option("--events", default=10000, show_default=True, help="Liczba syntetycznych zdarzeń.")
+    @click.option("--force", is_flag=True, help="Pomiń sprawdzenie, czy baza jest testowa.")
+    @with_appcontext
+    def public_sessions_loadtest_command(events, force):
+        """Mierzy przepustowość buforowanego zapisu sesji kalkulatora publicznego (zapisuje do public_sessions)."""
+        from modules.benchmarks import BenchmarkSuite
+        from modules.public_calculator.services import session_buffer
+        if not force:
+            BenchmarkSuite.check_database(current_app.config['SQLALCHEMY_DATABASE_URI'])
+        result = session_buffer.run_load_test(events=events)
+        click.echo(f"[public-sessions-loadtest] {result['events']} zdarzeń w {result['seconds']} s "
+                   f"= {result['events_per_sec']} zdarzeń/s (backpressure: {result['backpressure_hits']})")
+
+    @app.cli.command("partner-progress-loadtest")
+    @click.option("--sessions", default=50, show_default=True, help="Liczba syntetycznych sesji szkoleniowych.")
+    @click.option("--syncs", default=100, show_default=True, help="Liczba synchronizacji na sesję.")
+    def partner_progress_loadtest_command(sessions, syncs):
+        """Mierzy buforowany zapis postępu i czasu sesji Partner Academy."""
+        from modules.partner_academy.services import progress_store
+        result = progress_store.run_load_test(sessions=sessions, syncs=syncs)
+        click.echo(f"[partner-progress-loadtest] {result['calls']} wywołań w {result['seconds']} s "
+                   f"= {result['calls_per_sec']} wywołań/s (wiersze: {result['rows_written']}, "
+                   f"transakcje: {result['transactions']})")
+
+    @app.cli.command("rate-limit-benchmark")
+    @click.option("--checks", default=100000, show_default=True, help="Liczba sprawdzeń (baza: 1/100).")
+    @click.option("--keys", default=1000, show_default=True, help="Liczba różnych kluczy (IP).")
+    @click.option("--backend", "backends", multiple=True, type=click.Choice(["memory", "database"]),
+                  help="Backend do pomiaru (domyślnie oba).")
+    @with_appcontext
+    def rate_limit_benchmark_command(checks, keys, backends):
+        """Mierzy koszt pojedynczego sprawdzenia rate limitera."""
+        from modules.rate_limit import limiter
+        for result in limiter.benchmark(checks=checks, keys=keys, backends=backends or ("memory", "database")):
+            click.echo(f"[rate-limit-benchmark] {result['backend']}: {result['checks']} sprawdzeń w "
+                       f"{result['seconds']} s = {result['us_per_check']} µs/sprawdzenie "
+                       f"(przepuszczone: {result['allowed']}, odrzucone: {result['rejected']})")
+
+    @app.cli.command("globkurier-loadtest")
+    @click.option("--requests", "requests_count", default=200, show_default=True, help="Liczba wycen pojedynczych.")
+    @click.option("--packages", default=10, show_default=True, help="Liczba różnych paczek.")
+    @click.option("--stub/--live", default=True, show_default=True, help="Lokalny stub API zamiast GlobKurier.")
+    @click.option("--latency", default=0.05, show_default=True, help="Opóźnienie odpowiedzi stuba (s).")
+    @with_appcontext
+    def globkurier_loadtest_command(requests_count, packages, stub, latency):
+        """Mierzy klienta GlobKurier (cache tokenu i wycen, wycena wsadowa)."""
+        from modules.calculator.globkurier import GlobKurierClient, run_load_test, run_stub_server
+        server = None
+        if stub:
+            server, endpoint = run_stub_server(latency=latency)
+            client = GlobKurierClient(endpoint, "stub@example.com", "stub")
+        else:
+            client = GlobKurierClient.for_app(app)
+        try:
+            result = run_load_test(client, requests_count=requests_count, distinct_packages=packages)
+        finally:
+            if server:
+                server.shutdown()
+        for key, value in result.items():
+            click.echo(f"[globkurier-loadtest] {key}: {value}")
+
+    @app.cli.command("partner-nda-benchmark")
+    @click.option("--renders", default=20, show_default=True, help="Liczba generowań na przypadek.")
+    @click.option("--distinct", default=5, show_default=True, help="Różne dane w przypadku 'cached'.")
+    @click.option("--concurrency", default=4, show_default=True, help="Wątki w przypadku 'concurrent'.")
+    def partner_nda_benchmark_command(renders, distinct, concurrency):
+        """Mierzy przepustowość generowania PDF NDA (renders/s)."""
+        from modules.partner_academy.nda_renderer import NdaRenderer, run_benchmark
+        for result in run_benchmark(app, renders=renders, distinct=distinct, concurrency=concurrency):
+            click.echo(f"[partner-nda-benchmark] {result['name']}: {result['renders']} PDF w "
+                       f"{result['seconds']} s = {result['renders_per_sec']} renders/s")
+        click.echo(f"[partner-nda-benchmark] stats: {NdaRenderer.get_stats()}")
+
+    @app.cli.command("logs-benchmark")
+    @click.option("--size-mb", default=500, show_default=True, help="Rozmiar syntetycznego pliku logu.")
+    @click.option("--directory", default=None, help="Katalog na plik tymczasowy (domyślnie systemowy).")
+    def logs_benchmark_command(size_mb, directory):
+        """Mierzy tail/follow/search przeglądarki logów na dużym pliku."""
+        from modules.logging.reader import LogReader
+        result = LogReader.benchmark(size_mb=size_mb, directory=directory)
+        for key, value in result.items():
+            click.echo(f"[logs-benchmark] {key}: {value}")
+
+    @app.cli.command("production-products-benchmark")
+    @click.option("--rows", default=100000, show_default=True, help="Liczba syntetycznych produktów.")
+    @click.option("--pages", default=20, show_default=True, help="Głębokość stronicowania do pomiaru.")
+    @click.option("--keep", is_flag=True, help="Nie usuwaj rekordów testowych po pomiarze.")
+    @click.option("--force", is_flag=True, help="Pomiń sprawdzenie, czy baza jest testowa.")
+    @with_appcontext
+    def production_products_benchmark_command(rows, pages, keep, force):
+        """Mierzy zapytania listy produktów produkcji (zapisuje rekordy do prod_items - tylko baza testowa)."""
+        from modules.benchmarks import BenchmarkSuite
+        from modules.production.services.products_query_service import ProductsQueryService
+        if not force:
+            BenchmarkSuite.check_database(current_app.config['SQLALCHEMY_DATABASE_URI'])
+        result = ProductsQueryService.benchmark(rows=rows, pages=pages, keep=keep)
+        for key, value in result.items():
+            click.echo(f"[production-products-benchmark] {key}: {value}")
+
+    @app.cli.command("perf-suite")
+    @click.option("--sizes", default="1000,10000", show_default=True, help="Rozmiary danych (przecinki).")
+    @click.option("--repeat", default=3, show_default=True, help="Powtórzenia każdego przypadku.")
+    @click.option("--only", default=None, help="Tylko przypadki zawierające frazy (przecinki).")
+    @click.option("--output", default=None, help="Plik JSON z wynikami (domyślnie stdout).")
+    @click.option("--compare", "compare_path", default=None, help="Plik JSON z poprzedniego przebiegu.")
+    @click.option("--force", is_flag=True, help="Pomiń sprawdzenie, czy baza jest testowa.")
+    @with_appcontext
+    def perf_suite_command(sizes, repeat, only, output, compare_path, force):
+        """Benchmark ścieżek krytycznych na syntetycznych danych (kasuje schemat bazy!)."""
+        from modules.benchmarks import BenchmarkSuite
+        if not force:
+            BenchmarkSuite.check_database(current_app.config['SQLALCHEMY_DATABASE_URI'])
+
+        result = BenchmarkSuite.run(
+            sizes=[int(size) for size in sizes.split(',') if size.strip()],
+            repeat=repeat,
+            only=[fragment.strip() for fragment in only.split(',')] if only else None
+        )
+
+        if output:
+            with open(output, 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False, indent=2)
+            click.echo(f"[perf-suite] Zapisano wyniki: {output}")
+        else:
+            click.echo(json.dumps(result, ensure_ascii=False, indent=2))
+
+        if compare_path:
+            with open(compare_path, encoding='utf-8') as f:
+                baseline = json.load(f)
+            regressions = 0
+            for row in BenchmarkSuite.compare_results(baseline, result):
+                regressions += row['regression']
+                click.echo(f"[perf-suite] {'REGRESJA ' if row['regression'] else ''}{row['size']} {row['case']}: "
+                           f"{row['baseline_ms']} -> {row['current_ms']} ms ({row['change_pct']:+}%), "
+                           f"zapytania {row['queries_before']} -> {row['queries_after']}")
+            if regressions:
+                raise SystemExit(1)
+
+    @app.cli.command("startup-profile")
+    @click.option("--top", default=25, show_default=True, help="Liczba najdroższych importów.")
+    @click.option("--max-seconds", default=None, type=float, help="Cel: maks. czas importu aplikacji (s).")
+    @click.option("--max-rss-mb", default=None, type=float, help="Cel: maks. RSS po starcie (MB).")
+    @click.option("--json", "as_json", is_flag=True, help="Wynik w formacie JSON.")
+    def startup_profile_command(top, max_seconds, max_rss_mb, as_json):
+        """Mierzy czas startu workera, RSS i rozkład czasu importów."""
+        from modules.benchmarks.startup import profile_startup
+        result = profile_startup(top=top)
+        max_seconds = max_seconds or app.config.get('STARTUP_TARGET_SECONDS')
+        max_rss_mb = max_rss_mb or app.config.get('STARTUP_TARGET_RSS_MB')
+
+        if as_json:
+            click.echo(json.dumps(result, ensure_ascii=False, indent=2))
+        else:
+            click.echo(f"[startup-profile] import app: {result['seconds']} s, RSS: {result['rss_mb']} MB")
+            click.echo(f"[startup-profile] ciężkie biblioteki przy starcie: {', '.join(result['heavy_loaded']) or 'brak'}")
+            for entry in result['top_imports']:
+                click.echo(f"[startup-profile] {entry['cumulative_ms']:>9.1f} ms  {entry['module']}")
+
+        failed = []
+        if max_seconds and result['seconds'] > max_seconds:
+            failed.append(f"czas {result['seconds']} s > {max_seconds} s")
+        if max_rss_mb and result['rss_mb'] > max_rss_mb:
+            failed.append(f"RSS {result['rss_mb']} MB > {max_rss_mb} MB")
+        if failed:
+            click.echo(f"[startup-profile] Przekroczony cel: {'; '.join(failed)}", err=True)
+            raise SystemExit(1)
+
+    @app.cli.command("mail-queue-worker")
+    @click.option("--once", is_flag=True, help="Wyślij gotowe wiadomości i zakończ.")
+    @click.option("--interval", default=15, show_default=True, help="Odstęp między przebiegami (s).")
+    @with_appcontext
+    def mail_queue_worker_command(once, interval):
+        """Wysyła wiadomości z kolejki mail_outbox (osobny proces / cron)."""
+        import time
+        while True:
+            result = MailQueueService.process_all()
+            if any(result.values()):
+                click.echo(f"[mail-queue-worker] wysłane: {result['sent']}, "
+                           f"ponowienia: {result['retried']}, dead: {result['dead']}")
+            db.session.remove()
+            if once:
+                break
+            time.sleep(interval)
+
+    @app.cli.command("mail-queue-requeue")
+    @with_appcontext
+    def mail_queue_requeue_command():
+        """Przywraca wiadomości ze statusem 'dead' do kolejki."""
+        count = MailQueueService.requeue_dead()
+        click.echo(f"[mail-queue-requeue] Przywrócono wiadomości: {count}")
+
 # Funkcje do generowania i weryfikacji tokena resetującego hasło
 def generate_reset_token(email, secret_key, salt='password-reset-salt'):
     serializer = URLSafeTimedSerializer(secret_key)
@@ -138,6 +470,13 @@ def create_app():
         print("Nie znaleziono app/config/core.json – użyto wartości domyślnych", file=sys.stderr)
 
     app.config.setdefault('RUN_DB_SETUP', False)
+    # Cele dla `flask startup-profile` (czas importu aplikacji i RSS workera po starcie)
+    app.config.setdefault('STARTUP_TARGET_SECONDS', 4.0)
+    app.config.setdefault('STARTUP_TARGET_RSS_MB', 160)
+
+    # Nadpisanie bazy ze zmiennej środowiskowej (np. baza benchmarków: flask perf-suite)
+    if os.environ.get('CRM_DATABASE_URI'):
+        app.config['DATABASE_URI'] = os.environ['CRM_DATABASE_URI']
 
     # Dodajemy ustawienia utrzymujące połączenie z bazą:
     app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
@@ -146,6 +485,9 @@ def create_app():
         'pool_size': 5,
         'max_overflow': 10
     }
+    if app.config["DATABASE_URI"].startswith('sqlite'):
+        # SQLite nie używa puli połączeń z pool_size/max_overflow
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'pool_pre_ping': True}
     app.config['SQLALCHEMY_DATABASE_URI'] = app.config["DATABASE_URI"]
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
@@ -426,6 +768,7 @@ def create_app():
             current_app.logger.error(f"[Logout] Błąd kończenia sesji tracking: {e}")
     
         # Oryginalne czyszczenie sesji
+        IdentityService.invalidate_session(session.get('user_session_token'))
         session.clear()
         return render_template("logged_out.html")
 
@@ -532,8 +875,8 @@ def create_app():
                 current_app.logger.info(f"Liczba załączników: {len(attachments) if attachments else 0}")
                 current_app.logger.info(f"Łączny rozmiar załączników: {total_attached_size} bytes")
 
-                 # Wysłanie maila
-                mail.send(msg)
+                # Wysłanie maila (przez kolejkę - bez czekania na SMTP)
+                MailQueueService.enqueue(msg, category='issue_report')
                 
                 # ✅ PRAWIDŁOWE Flash – komunikat o sukcesie
                 if attachments:
@@ -552,8 +895,7 @@ def create_app():
     @app.route("/settings")
     @login_required
     def settings():
-        user_email = session.get('user_email')
-        user = User.query.filter_by(email=user_email).first()
+        user = IdentityService.current()
         if not user:
             return redirect(url_for('login'))
 
@@ -579,7 +921,7 @@ def create_app():
         # 1. Sprawdź, czy zalogowany jest admin
         current_email = session.get('user_email')
         prices_logger.debug("Sprawdzanie uprawnień użytkownika", user_email=current_email)
-        current_user = User.query.filter_by(email=current_email).first()
+        current_user = IdentityService.current()
         prices_logger.debug("Pobrano użytkownika z bazy", 
                         user_found=bool(current_user), 
                         user_role=current_user.role if current_user else None)
@@ -803,8 +1145,7 @@ def create_app():
     @app.route('/settings/logs')
     @login_required
     def settings_logs():
-        user_email = session.get('user_email')
-        user = User.query.filter_by(email=user_email).first()
+        user = IdentityService.current()
         if not user or user.role != 'admin':
             flash('Brak uprawnień. Tylko administrator ma dostęp do logów.', 'error')
             return redirect(url_for('settings'))
@@ -871,7 +1212,7 @@ def create_app():
 
         msg.html = render_template("new_account_register_mail.html",
                                    invitation_link=invitation_link)
-        mail.send(msg)
+        MailQueueService.enqueue(msg, category='invitation')
 
         flash("Zaproszenie wysłane do " + invite_email, "success")
         return redirect(url_for("settings"))
@@ -926,41 +1267,25 @@ def create_app():
 
     @app.context_processor
     def inject_user():
-        user_email = session.get('user_email')
-        if user_email:
-            user = User.query.filter_by(email=user_email).first()
-            if user:
-                # Jeśli imię i nazwisko są uzupełnione, łączymy je. W przeciwnym razie używamy emaila.
-                user_name = f"{user.first_name} {user.last_name}".strip() if user.first_name or user.last_name else user.email
-                # Jeśli brak avatara, ustawiamy domyślną ścieżkę.
-                user_avatar = user.avatar_path if user.avatar_path else url_for('static', filename='images/avatars/default_avatars/avatar1.svg')
-            
-                # DODAJ informacje o sesji
-                session_info = {}
-                try:
-                    session_token = session.get('user_session_token')
-                    if session_token:
-                        user_session = UserSession.query.filter_by(
-                            session_token=session_token,
-                            is_active=True
-                        ).first()
-                    
-                        if user_session:
-                            session_info = {
-                                'session_duration': user_session.get_session_duration(),
-                                'last_activity': user_session.get_relative_time(),
-                                'current_page': user_session.get_page_display_name()
-                            }
-                except Exception as e:
-                    current_app.logger.debug(f"[Context] Błąd pobierania info sesji: {e}")
-            
-                return dict(
-                    user_name=user_name, 
-                    user_avatar=user_avatar, 
-                    user_email=user.email,
-                    user=user,  # Dodaj cały obiekt user
-                    user_session=session_info
-                )
+        # Tożsamość rozwiązana raz na żądanie (cache procesu) - bez zapytań User/UserSession
+        user = IdentityService.current()
+        if user:
+            # Jeśli brak avatara, ustawiamy domyślną ścieżkę.
+            user_avatar = user.avatar_path if user.avatar_path else url_for('static', filename='images/avatars/default_avatars/avatar1.svg')
+
+            session_info = {}
+            try:
+                session_info = user.get_session_info()
+            except Exception as e:
+                current_app.logger.debug(f"[Context] Błąd pobierania info sesji: {e}")
+
+            return dict(
+                user_name=user.display_name,
+                user_avatar=user_avatar,
+                user_email=user.email,
+                user=user,
+                user_session=session_info
+            )
     
         # Domyślne wartości, gdy nie ma zalogowanego użytkownika.
         return dict(
@@ -997,6 +1322,9 @@ def create_app():
                 if user_session:
                     session_data['user_session'] = user_session.to_dict()
         
+            identity = IdentityService.current()
+            session_data['identity'] = repr(identity) if identity else None
+            session_data['identity_cache'] = IdentityService.get_stats()
             return jsonify(session_data)
         
         except Exception as e:
@@ -1005,8 +1333,8 @@ def create_app():
     @app.route('/update_password', methods=['POST'])
     @login_required
     def update_password():
-        user_email = session.get('user_email')
-        user = User.query.filter_by(email=user_email).first()
+        identity = IdentityService.current()
+        user = identity.get_user() if identity else None
         if not user:
             flash("Błąd: użytkownik nie znaleziony.", "error")
             return redirect(url_for('settings'))
@@ -1035,8 +1363,8 @@ def create_app():
     @app.route('/update_avatar', methods=['POST'])
     @login_required
     def update_avatar():
-        user_email = session.get('user_email')
-        user = User.query.filter_by(email=user_email).first()
+        identity = IdentityService.current()
+        user = identity.get_user() if identity else None
         if not user:
             flash("Błąd: użytkownik nie znaleziony.", "error")
             return redirect(url_for('settings'))
@@ -1059,7 +1387,9 @@ def create_app():
             flash("Nie wybrano żadnego avatara.", "error")
             return redirect(url_for('settings'))
     
+        ClientQuoteCache.invalidate_for_user(user.id)
         db.session.commit()
+        IdentityService.invalidate_user(user.id)
         flash("Avatar został zaktualizowany.", "success")
         return redirect(url_for('settings'))
 
@@ -1067,9 +1397,8 @@ def create_app():
     @login_required
     def edit_user(user_id):
         # 1. Sprawdź, czy zalogowany jest admin
-        current_email = session.get('user_email')
-        current_user = User.query.filter_by(email=current_email).first()
-        if current_user.role != 'admin':
+        current_user = IdentityService.current()
+        if not current_user or current_user.role != 'admin':
             flash("Brak uprawnień.", "error")
             return redirect(url_for('dashboard'))
     
@@ -1084,6 +1413,7 @@ def create_app():
             new_role = request.form.get('role')
             user_to_edit.role = new_role
             db.session.commit()
+            IdentityService.invalidate_user(user_to_edit.id)
             flash("Zaktualizowano dane użytkownika.", "success")
             return redirect(url_for('settings'))
 
@@ -1091,15 +1421,15 @@ def create_app():
     @app.route("/deactivate_user/<int:user_id>", methods=["POST"])
     @login_required
     def deactivate_user(user_id):
-        current_email = session.get('user_email')
-        current_user = User.query.filter_by(email=current_email).first()
-        if current_user.role != 'admin':
+        current_user = IdentityService.current()
+        if not current_user or current_user.role != 'admin':
             flash("Brak uprawnień.", "error")
             return redirect(url_for('dashboard'))
 
         user_to_edit = User.query.get_or_404(user_id)
         user_to_edit.active = False
         db.session.commit()
+        IdentityService.invalidate_user(user_to_edit.id)
         flash("Użytkownik został dezaktywowany.", "info")
         return redirect(url_for('settings'))
 
@@ -1107,24 +1437,23 @@ def create_app():
     @app.route("/activate_user/<int:user_id>", methods=["POST"])
     @login_required
     def activate_user(user_id):
-        current_email = session.get('user_email')
-        current_user = User.query.filter_by(email=current_email).first()
-        if current_user.role != 'admin':
+        current_user = IdentityService.current()
+        if not current_user or current_user.role != 'admin':
             flash("Brak uprawnień.", "error")
             return redirect(url_for('dashboard'))
 
         user_to_edit = User.query.get_or_404(user_id)
         user_to_edit.active = True
         db.session.commit()
+        IdentityService.invalidate_user(user_to_edit.id)
         flash("Użytkownik został aktywowany.", "success")
         return redirect(url_for('settings'))
 
     @app.route("/edit_user_modal", methods=["POST"])
     @login_required
     def edit_user_modal():
-        current_email = session.get('user_email')
-        current_user = User.query.filter_by(email=current_email).first()
-        if current_user.role != 'admin':
+        current_user = IdentityService.current()
+        if not current_user or current_user.role != 'admin':
             flash("Brak uprawnień.", "error")
             return redirect(url_for("dashboard"))
 
@@ -1139,7 +1468,9 @@ def create_app():
         user_to_edit.last_name = last_name
         user_to_edit.role = role
         user_to_edit.email = email  # pamiętaj o obsłudze unikalności, jeśli konieczne
+        ClientQuoteCache.invalidate_for_user(user_to_edit.id)
         db.session.commit()
+        IdentityService.invalidate_user(user_to_edit.id)
 
         flash("Zaktualizowano dane użytkownika.", "success")
         return redirect(url_for('settings'))
@@ -1147,9 +1478,8 @@ def create_app():
     @app.route('/delete_user/<int:user_id>', methods=["POST"])
     @login_required
     def delete_user(user_id):
-        current_email = session.get('user_email')
-        current_user = User.query.filter_by(email=current_email).first()
-        if current_user.role != 'admin':
+        current_user = IdentityService.current()
+        if not current_user or current_user.role != 'admin':
             flash("Brak uprawnień.", "error")
             return redirect(url_for('dashboard'))
     
@@ -1158,8 +1488,10 @@ def create_app():
         # Usuwamy powiązane zaproszenia, jeśli istnieją
         Invitation.query.filter_by(email=user_to_delete.email).delete()
     
+        deleted_user_id = user_to_delete.id
         db.session.delete(user_to_delete)
         db.session.commit()
+        IdentityService.invalidate_user(deleted_user_id)
     
         flash("Użytkownik został usunięty.", "success")
         return redirect(url_for('settings'))
@@ -1184,7 +1516,7 @@ def create_app():
                               sender=app.config.get("MAIL_USERNAME"),
                               recipients=[email])
                 msg.html = html_body
-                mail.send(msg)
+                MailQueueService.enqueue(msg, category='password_reset')
             
                 flash("Sprawdź swój email – link do resetowania hasła został wysłany.", "info")
                 return redirect(url_for('reset_password_success'))
@@ -10,6 +10,9 @@ Rozszerzenia:
 - SQLAlchemy (db)
 - Flask-Mail (mail) 
 - Flask-Login (login_manager)
+- Kolejka maili wychodzących (modules.mail_queue)
+- Tożsamość żądania (modules.identity)
+- Pomiar czasu żądań i zapytań SQL per endpoint (modules.logging.performance)
 
 Autor: Konrad Kmiecik
 Data: 2025-09-10
@@ -53,6 +56,15 @@ def load_user(user_id):
     try:
         # Import lokalny aby uniknąć circular imports
         from modules.calculator.models import User
+        from modules.identity import IdentityService
+
+        # Ten sam obiekt co IdentityService.current() - bez drugiego zapytania w żądaniu
+        identity = IdentityService.current()
+        if identity and identity.id == int(user_id):
+            if not identity.is_active():
+                return None
+            return identity.get_user()
+
         user = User.query.get(int(user_id))
         
         # Dodatkowa walidacja - sprawdź czy konto jest aktywne
@@ -76,6 +88,18 @@ def init_extensions(app):
     mail.init_app(app)
     login_manager.init_app(app)
     
+    # Worker kolejki maili (import lokalny - moduł importuje extensions)
+    from modules.mail_queue.service import mail_queue_worker
+    mail_queue_worker.init_app(app)
+    
+    # Cache tożsamości użytkownika w żądaniu
+    from modules.identity import IdentityService
+    IdentityService.init_app(app)
+    
+    # Histogramy czasu odpowiedzi, liczniki zapytań SQL, wolne żądania
+    from modules.logging.performance import performance_monitor
+    performance_monitor.init_app(app)
+    
     # Dodatkowa konfiguracja dla developmentu
     if app.config.get('DEBUG'):
         app.logger.info("Extensions zainicjalizowane w trybie DEBUG")
@@ -0,0 +1,12 @@
+-- Migracja: kolumny wymiarów w public_sessions
+-- Wymiary wyciągane są z JSON 'inputs' przy zapisie sesji (log_session_public),
+-- dzięki czemu statystyki kalkulatora publicznego liczone są jednym GROUP BY.
+-- Po wykonaniu migracji uzupełnij istniejące sesje: flask public-sessions-backfill
+
+ALTER TABLE public_sessions
+    ADD COLUMN dim_length VARCHAR(20) NULL,
+    ADD COLUMN dim_width VARCHAR(20) NULL,
+    ADD COLUMN dim_thickness VARCHAR(20) NULL,
+    ADD COLUMN dims_key VARCHAR(64) NULL;
+
+CREATE INDEX ix_public_sessions_dims_key ON public_sessions (dims_key);
@@ -0,0 +1,10 @@
+-- Migracja: indeksy listy produktów (tab "Produkty" w module production)
+-- Lista jest stronicowana kursorem (keyset) w obrębie partycji statusów
+-- (aktywne / archiwum), sortowana po priority_rank, deadline_date lub created_at.
+-- Wyszukiwanie po prefiksie korzysta z istniejących indeksów
+-- short_product_id, internal_order_number i client_name.
+-- Pomiar na danych syntetycznych: flask production-products-benchmark --rows 100000
+
+CREATE INDEX idx_prod_items_status_rank ON prod_items (current_status, priority_rank, id);
+CREATE INDEX idx_prod_items_status_deadline ON prod_items (current_status, deadline_date, id);
+CREATE INDEX idx_prod_items_status_created ON prod_items (current_status, created_at, id);
@@ -0,0 +1,16 @@
+-- Migracja: kalendarz dni wolnych produkcji
+-- Deadline produktów liczony jest w dniach roboczych (BusinessCalendar).
+-- Ustawowe święta w Polsce liczone są w kodzie; tabela przechowuje dodatkowe
+-- święta oraz przestoje zakładu edytowane w API: /production/api/days-off
+
+CREATE TABLE prod_days_off (
+    id INT NOT NULL AUTO_INCREMENT,
+    day_date DATE NOT NULL,
+    day_type ENUM('holiday', 'closure') NOT NULL DEFAULT 'closure',
+    name VARCHAR(255) NULL,
+    created_by INT NULL,
+    created_at DATETIME NULL,
+    PRIMARY KEY (id),
+    UNIQUE KEY ix_prod_days_off_day_date (day_date),
+    CONSTRAINT fk_prod_days_off_created_by FOREIGN KEY (created_by) REFERENCES users (id)
+);
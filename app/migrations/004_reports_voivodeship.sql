@@ -0,0 +1,10 @@
+-- Migracja: znormalizowane województwo w baselinker_reports_orders
+-- Kolumna voivodeship (klucz województwa, np. 'dolnośląskie') ustawiana jest przy
+-- każdym przypisaniu delivery_state; mapa województw (/reports/api/map-statistics)
+-- liczona jest jednym GROUP BY voivodeship, status_bucket.
+-- Po wykonaniu migracji uzupełnij istniejące rekordy: flask reports-voivodeship-backfill
+
+ALTER TABLE baselinker_reports_orders
+    ADD COLUMN voivodeship VARCHAR(30) NULL COMMENT 'Klucz województwa (znormalizowany delivery_state) - mapa i agregaty';
+
+CREATE INDEX idx_voivodeship_date ON baselinker_reports_orders (voivodeship, date_created);
@@ -0,0 +1,23 @@
+-- Migracja: indeksy ścieżek filtrowania tabeli raportów + wartości dropdownów
+-- Tabela raportów filtruje po zakresie dat (date_created) i listach IN dla
+-- kolumn (filter_<kolumna>). Indeksy złożone obejmują najczęstsze ścieżki;
+-- idx_date_created jest prefiksem idx_reports_date_status, więc jest usuwany.
+-- Plany zapytań endpointów: flask reports-explain
+-- Pomiar przed/po: flask perf-suite --only reports --output before.json, potem --compare before.json
+
+CREATE INDEX idx_reports_date_status ON baselinker_reports_orders (date_created, current_status);
+CREATE INDEX idx_reports_status_date ON baselinker_reports_orders (current_status, date_created);
+CREATE INDEX idx_reports_group_date ON baselinker_reports_orders (group_type, date_created);
+CREATE INDEX idx_reports_species_date ON baselinker_reports_orders (wood_species, date_created);
+DROP INDEX idx_date_created ON baselinker_reports_orders;
+
+-- Wartości dropdownów filtrów, przeliczane po synchronizacji z Baselinker
+CREATE TABLE reports_dropdown_values (
+    id INT NOT NULL AUTO_INCREMENT,
+    field_name VARCHAR(50) NOT NULL,
+    value VARCHAR(255) NOT NULL,
+    rows_count INT NOT NULL DEFAULT 0,
+    refreshed_at DATETIME NULL,
+    PRIMARY KEY (id),
+    UNIQUE KEY idx_dropdown_field_value (field_name, value)
+);
@@ -0,0 +1,14 @@
+-- Migracja: zdenormalizowane sumy wycen
+-- Sumy wybranych pozycji (produkty, rabat, wykończenie) zapisywane są przy każdej
+-- zmianie pozycji, rabatu lub ilości (QuoteAggregate.refresh_totals).
+-- Po migracji: flask quotes-totals-backfill
+-- Kontrola liczby zapytań endpointów wyceny: flask quotes-query-count
+
+ALTER TABLE quotes
+    ADD COLUMN total_products_netto DECIMAL(10, 2) NULL,
+    ADD COLUMN total_products_brutto DECIMAL(10, 2) NULL,
+    ADD COLUMN total_discount_netto DECIMAL(10, 2) NULL,
+    ADD COLUMN total_discount_brutto DECIMAL(10, 2) NULL,
+    ADD COLUMN total_finishing_netto DECIMAL(10, 2) NULL,
+    ADD COLUMN total_finishing_brutto DECIMAL(10, 2) NULL,
+    ADD COLUMN totals_updated_at DATETIME NULL;
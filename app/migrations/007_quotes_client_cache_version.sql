@@ -0,0 +1,8 @@
+-- Migracja: wersja publicznej strony wyceny
+-- Strona /quotes/c/<token> i /quotes/api/client/quote/<token> są cache'owane per token
+-- (ClientQuoteCache). ETag = ID wyceny + client_cache_version + status_id, wersja
+-- podbijana jest przez endpointy zmieniające pozycje, rabaty, ilości i akceptację.
+-- Test obciążeniowy: flask quotes-client-loadtest
+
+ALTER TABLE quotes
+    ADD COLUMN client_cache_version INT NOT NULL DEFAULT 0;
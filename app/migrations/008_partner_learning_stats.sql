@@ -0,0 +1,18 @@
+-- Migracja: statystyki sesji szkoleniowych Partner Academy
+-- Liczba ukończonych kroków jako kolumna liczbowa (aktualizowana przez
+-- LearningService.update_progress) - statystyki panelu admina liczone są jednym
+-- zapytaniem z agregacją warunkową, bez parsowania JSON completed_steps.
+
+ALTER TABLE partner_learning_sessions
+    ADD COLUMN completed_steps_count INT NOT NULL DEFAULT 0;
+
+UPDATE partner_learning_sessions
+SET completed_steps_count = COALESCE(JSON_LENGTH(completed_steps), 0);
+
+CREATE INDEX ix_partner_learning_sessions_completed_steps_count
+    ON partner_learning_sessions (completed_steps_count);
+CREATE INDEX ix_partner_learning_sessions_total_time_spent
+    ON partner_learning_sessions (total_time_spent);
+CREATE INDEX idx_learning_completed_activity
+    ON partner_learning_sessions (completed_at, last_activity_at);
+
@@ -0,0 +1,14 @@
+-- Migracja: wspólne liczniki rate limitingu
+-- Backend 'database' (RATE_LIMIT_BACKEND) trzyma liczniki okien w tej tabeli,
+-- więc limit obowiązuje łącznie dla wszystkich procesów Passengera.
+-- Wiersze po expires_at usuwane są okresowo przez DatabaseBackend.
+-- Pomiar kosztu sprawdzenia: flask rate-limit-benchmark
+
+CREATE TABLE rate_limit_counters (
+    limit_key VARCHAR(191) NOT NULL,
+    window_id BIGINT NOT NULL,
+    hits INT NOT NULL DEFAULT 0,
+    expires_at BIGINT NOT NULL,
+    PRIMARY KEY (limit_key, window_id),
+    KEY ix_rate_limit_counters_expires_at (expires_at)
+);
@@ -0,0 +1,11 @@
+-- Migracja: adres dostawy rozbity na części w baselinker_reports_orders
+-- Ulica, numer domu i mieszkania (DeliveryAddressParser) oraz kod pocztowy
+-- NN-NNN ustawiane są przy każdym przypisaniu delivery_address / delivery_postcode;
+-- eksport Routimo (/reports/api/export-routimo) czyta gotowe kolumny.
+-- Po wykonaniu migracji uzupełnij istniejące rekordy: flask reports-address-backfill
+
+ALTER TABLE baselinker_reports_orders
+    ADD COLUMN delivery_street VARCHAR(250) NULL COMMENT 'Ulica z delivery_address (DeliveryAddressParser) - eksport Routimo',
+    ADD COLUMN delivery_house_number VARCHAR(20) NULL COMMENT 'Numer domu z delivery_address',
+    ADD COLUMN delivery_apartment_number VARCHAR(20) NULL COMMENT 'Numer mieszkania z delivery_address',
+    ADD COLUMN delivery_postcode_normalized VARCHAR(20) NULL COMMENT 'Kod pocztowy w formacie NN-NNN';
@@ -0,0 +1,17 @@
+-- Migracja: snapshoty modułu analytics
+-- Zestawy KPI / zespół / klienci / geografia / Baselinker liczone są w jednym
+-- przebiegu i zapisywane jako JSON; endpointy czytają najnowszy snapshot zestawu.
+-- Po migracji: flask analytics-refresh (i cyklicznie z crona)
+
+CREATE TABLE analytics_snapshots (
+    id INT NOT NULL AUTO_INCREMENT,
+    generation_id VARCHAR(36) NOT NULL,
+    dataset VARCHAR(50) NOT NULL,
+    payload MEDIUMTEXT NOT NULL,
+    source_signature VARCHAR(500) NULL,
+    duration_ms INT NULL,
+    created_at DATETIME NOT NULL,
+    PRIMARY KEY (id),
+    KEY ix_analytics_snapshots_generation_id (generation_id),
+    KEY idx_analytics_snapshot_dataset_id (dataset, id)
+);
@@ -0,0 +1,29 @@
+-- Migracja: kolejka wiadomości wychodzących
+-- Endpointy zapisują wiadomości do mail_outbox (MailQueueService.enqueue),
+-- a worker w tle wysyła je z ponowieniami (backoff) i oznacza jako sent / dead.
+-- Ręczna wysyłka: flask mail-queue-worker --once, ponowienie martwych: flask mail-queue-requeue
+
+CREATE TABLE mail_outbox (
+    id INT NOT NULL AUTO_INCREMENT,
+    category VARCHAR(50) NULL,
+    subject VARCHAR(255) NOT NULL,
+    sender VARCHAR(255) NULL,
+    recipients TEXT NOT NULL,
+    cc TEXT NULL,
+    bcc TEXT NULL,
+    reply_to VARCHAR(255) NULL,
+    body TEXT NULL,
+    html MEDIUMTEXT NULL,
+    attachments LONGTEXT NULL,
+    status ENUM('pending', 'sending', 'sent', 'dead') NOT NULL DEFAULT 'pending',
+    attempts INT NOT NULL DEFAULT 0,
+    next_attempt_at DATETIME NOT NULL,
+    claimed_by VARCHAR(32) NULL,
+    claimed_at DATETIME NULL,
+    last_error TEXT NULL,
+    created_at DATETIME NOT NULL,
+    sent_at DATETIME NULL,
+    PRIMARY KEY (id),
+    KEY idx_mail_outbox_status_next (status, next_attempt_at),
+    KEY idx_mail_outbox_claimed_by (claimed_by)
+);
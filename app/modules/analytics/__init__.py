@@ -14,4 +14,4 @@ analytics_bp = Blueprint(
 from . import routers
 
 # Import models for other modules to use
-from .models import AnalyticsQueries, AnalyticsExportHelper
\ No newline at end of file
+from .models import AnalyticsQueries, AnalyticsExportHelper, AnalyticsSnapshot, AnalyticsSnapshotService
\ No newline at end of file
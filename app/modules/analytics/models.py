@@ -1,9 +1,14 @@
 # modules/analytics/models.py
 
+from flask import current_app
 from sqlalchemy import func, text, and_, or_
 from extensions import db
-from datetime import datetime, timedelta
+from datetime import datetime, date, timedelta
+from decimal import Decimal
+import copy
 import json
+import time
+import uuid
 from typing import Dict, List, Any, Optional
 
 # Import modeli z innych modułów
@@ -25,14 +30,22 @@ class AnalyticsQueries:
         twelve_months_ago = datetime.now() - timedelta(days=365)
         current_month_start = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
         
-        # Podstawowe metryki
-        total_quotes = db.session.query(func.count(Quote.id)).scalar()
+        # Podstawowe metryki - jedno zapytanie agregujące zamiast osobnych skanów tabeli
+        totals = db.session.query(
+            func.count(Quote.id).label('total_quotes'),
+            func.sum(Quote.total_price).label('total_value'),
+            func.avg(Quote.total_price).label('avg_deal_value'),
+            func.count(Quote.acceptance_date).label('accepted_quotes'),
+            func.count(Quote.base_linker_order_id).label('baselinker_orders')
+        ).one()
         
-        # Wartość ofert
-        total_value = db.session.query(func.sum(Quote.total_price)).filter(
-            Quote.total_price.isnot(None)
-        ).scalar() or 0
+        total_quotes = totals.total_quotes or 0
+        total_value = totals.total_value or 0
+        avg_deal_value = totals.avg_deal_value or 0
+        accepted_quotes = totals.accepted_quotes or 0
+        baselinker_orders = totals.baselinker_orders or 0
         
+        # Wartość ofert z bieżącego miesiąca
         monthly_value = db.session.query(func.sum(Quote.total_price)).filter(
             and_(
                 Quote.created_at >= current_month_start,
@@ -40,19 +53,6 @@ class AnalyticsQueries:
             )
         ).scalar() or 0
         
-        avg_deal_value = db.session.query(func.avg(Quote.total_price)).filter(
-            Quote.total_price.isnot(None)
-        ).scalar() or 0
-        
-        # Konwersje
-        accepted_quotes = db.session.query(func.count(Quote.id)).filter(
-            Quote.acceptance_date.isnot(None)
-        ).scalar()
-        
-        baselinker_orders = db.session.query(func.count(Quote.id)).filter(
-            Quote.base_linker_order_id.isnot(None)
-        ).scalar()
-        
         # Wskaźniki konwersji
         conversion_accepted = round((accepted_quotes / total_quotes * 100), 2) if total_quotes > 0 else 0
         conversion_baselinker = round((baselinker_orders / total_quotes * 100), 2) if total_quotes > 0 else 0
@@ -374,6 +374,280 @@ class AnalyticsQueries:
         return products_data
 
 
+# =====================================
+# SNAPSHOTY ANALITYCZNE (materializowane zestawy danych)
+# =====================================
+
+class AnalyticsSnapshot(db.Model):
+    """
+    Zmaterializowany wynik jednego zestawu danych analitycznych.
+    Każde przeliczenie zapisuje nowy wiersz z identyfikatorem generacji;
+    endpointy i eksporty czytają najnowszy snapshot danego zestawu.
+    """
+    __tablename__ = 'analytics_snapshots'
+
+    id = db.Column(db.Integer, primary_key=True)
+    generation_id = db.Column(db.String(36), nullable=False, index=True)
+    dataset = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text(length=16777215), nullable=False)  # JSON jako string (MEDIUMTEXT)
+    source_signature = db.Column(db.String(500), nullable=True)
+    duration_ms = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        db.Index('idx_analytics_snapshot_dataset_id', 'dataset', 'id'),
+    )
+
+    def get_payload(self):
+        try:
+            return json.loads(self.payload)
+        except (json.JSONDecodeError, TypeError):
+            return None
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'generation_id': self.generation_id,
+            'dataset': self.dataset,
+            'duration_ms': self.duration_ms,
+            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S') if self.created_at else None
+        }
+
+    def __repr__(self):
+        return f"<AnalyticsSnapshot {self.dataset} gen={self.generation_id}>"
+
+
+def _snapshot_json_default(value):
+    """Serializacja typów zwracanych przez zapytania (Decimal, daty)"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+class AnalyticsSnapshotService:
+    """
+    Warstwa snapshotów dla modułu analytics.
+
+    Wszystkie zestawy KPI/zespół/klienci/geografia/Baselinker liczone są w jednym
+    przebiegu (``refresh``) - uruchamianym cyklicznie komendą CLI
+    ``flask analytics-refresh`` lub na żądanie z API. Przy odświeżaniu na żądanie
+    przeliczane są tylko zestawy, których tabele źródłowe się zmieniły (porównanie
+    sygnatur tabel) lub których okno czasowe się zdezaktualizowało.
+    """
+
+    # Limity zapisywane w snapshocie - endpointy przycinają wyniki do własnego limitu
+    CLIENTS_LIMIT = 100
+    PRODUCTS_LIMIT = 50
+    TRENDS_MONTHS = 12
+
+    # Zestawy zależne od bieżącej daty (bieżący miesiąc, ostatnie 30 dni)
+    # są przeliczane również po upływie tego czasu
+    TIME_WINDOW_MAX_AGE = timedelta(hours=1)
+
+    # nazwa zestawu -> (funkcja licząca, tabele źródłowe, czy zależy od okna czasowego)
+    DATASETS = {
+        'sales_kpi': (lambda: AnalyticsQueries.get_sales_kpi_data(),
+                      ('quotes',), True),
+        'sales_trends': (lambda: AnalyticsQueries.get_sales_trends_data(AnalyticsSnapshotService.TRENDS_MONTHS),
+                         ('quotes',), True),
+        'popular_products': (lambda: AnalyticsQueries.get_popular_products_data(AnalyticsSnapshotService.PRODUCTS_LIMIT),
+                             ('quote_items',), False),
+        'team_performance': (lambda: AnalyticsQueries.get_team_performance_data(),
+                             ('quotes', 'users'), False),
+        'top_clients': (lambda: AnalyticsQueries.get_clients_analytics_data(AnalyticsSnapshotService.CLIENTS_LIMIT),
+                        ('quotes', 'clients'), False),
+        'geography': (lambda: AnalyticsQueries.get_geography_stats(),
+                      ('quotes', 'clients'), False),
+        'baselinker': (lambda: AnalyticsQueries.get_baselinker_analytics_data(),
+                       ('quotes', 'quote_statuses', 'baselinker_order_logs'), True),
+    }
+
+    @staticmethod
+    def _row_checksum(*columns):
+        """
+        Suma CRC32 wartości kolumn każdego wiersza - zmienia się przy edycji
+        dowolnej z kolumn (np. przepisaniu wyceny na innego handlowca),
+        której nie wykrywają COUNT / MAX / SUM.
+        """
+        return func.sum(func.crc32(func.concat_ws('|', *columns)))
+
+    @classmethod
+    def _table_signatures(cls, tables) -> Dict[str, str]:
+        """
+        Tania sygnatura każdej tabeli źródłowej (jedno zapytanie agregujące na tabelę).
+        Zmiana sygnatury oznacza, że zestawy zależne od tabeli wymagają przeliczenia.
+        """
+        columns_by_table = {
+            'quotes': (
+                func.count(Quote.id), func.max(Quote.id),
+                func.max(Quote.totals_updated_at), func.sum(Quote.client_cache_version),
+                cls._row_checksum(Quote.id, Quote.user_id, Quote.client_id, Quote.status_id,
+                                  Quote.total_price, Quote.acceptance_date, Quote.base_linker_order_id,
+                                  Quote.created_at)
+            ),
+            'quote_items': (
+                func.count(QuoteItem.id), func.max(QuoteItem.id),
+                cls._row_checksum(QuoteItem.id, QuoteItem.quote_id, QuoteItem.is_selected,
+                                  QuoteItem.variant_code, QuoteItem.price_per_m3, QuoteItem.volume_m3,
+                                  QuoteItem.length_cm, QuoteItem.width_cm, QuoteItem.thickness_cm)
+            ),
+            'users': (
+                func.count(User.id), func.max(User.id),
+                cls._row_checksum(User.id, User.first_name, User.last_name, User.email, User.role)
+            ),
+            'clients': (
+                func.count(Client.id), func.max(Client.id),
+                cls._row_checksum(Client.id, Client.client_name, Client.delivery_city, Client.source)
+            ),
+            'quote_statuses': (
+                func.count(QuoteStatus.id), func.max(QuoteStatus.id),
+                cls._row_checksum(QuoteStatus.id, QuoteStatus.name)
+            ),
+            'baselinker_order_logs': (func.count(BaselinkerOrderLog.id), func.max(BaselinkerOrderLog.id)),
+        }
+
+        signatures = {}
+        for table in tables:
+            row = db.session.query(*columns_by_table[table]).one()
+            signatures[table] = ':'.join('' if value is None else str(value) for value in row)
+        return signatures
+
+    @classmethod
+    def _dataset_signature(cls, dataset: str, table_signatures: Dict[str, str]) -> str:
+        _, tables, _ = cls.DATASETS[dataset]
+        return '|'.join(f"{table}={table_signatures[table]}" for table in tables)
+
+    @staticmethod
+    def _latest_snapshot(dataset: str) -> Optional[AnalyticsSnapshot]:
+        return AnalyticsSnapshot.query.filter_by(dataset=dataset).order_by(
+            AnalyticsSnapshot.id.desc()
+        ).first()
+
+    @classmethod
+    def _is_stale(cls, dataset: str, snapshot: Optional[AnalyticsSnapshot], signature: str) -> bool:
+        if snapshot is None:
+            return True
+        if snapshot.source_signature != signature:
+            return True
+        _, _, time_windowed = cls.DATASETS[dataset]
+        if time_windowed and snapshot.created_at < datetime.utcnow() - cls.TIME_WINDOW_MAX_AGE:
+            return True
+        return False
+
+    @classmethod
+    def refresh(cls, datasets: Optional[List[str]] = None, force: bool = False,
+                keep_generations: int = 5) -> Dict[str, Any]:
+        """
+        Przelicza snapshoty w jednym przebiegu.
+
+        Args:
+            datasets: lista zestawów do przeliczenia (domyślnie wszystkie)
+            force: przelicz niezależnie od sygnatur tabel źródłowych
+            keep_generations: ile ostatnich snapshotów każdego zestawu zachować
+
+        Returns:
+            dict: identyfikator generacji oraz listy przeliczonych i pominiętych zestawów
+        """
+        names = [name for name in (datasets or cls.DATASETS.keys()) if name in cls.DATASETS]
+        needed_tables = sorted({table for name in names for table in cls.DATASETS[name][1]})
+        table_signatures = cls._table_signatures(needed_tables)
+
+        generation_id = uuid.uuid4().hex
+        refreshed, skipped = [], []
+
+        for name in names:
+            signature = cls._dataset_signature(name, table_signatures)
+            latest = cls._latest_snapshot(name)
+
+            if not force and not cls._is_stale(name, latest, signature):
+                skipped.append(name)
+                continue
+
+            builder = cls.DATASETS[name][0]
+            started = time.perf_counter()
+            data = builder()
+            duration_ms = int((time.perf_counter() - started) * 1000)
+
+            db.session.add(AnalyticsSnapshot(
+                generation_id=generation_id,
+                dataset=name,
+                payload=json.dumps(data, default=_snapshot_json_default, ensure_ascii=False),
+                source_signature=signature,
+                duration_ms=duration_ms
+            ))
+            refreshed.append(name)
+
+        db.session.flush()
+        for name in refreshed:
+            cls._prune(name, keep_generations)
+        db.session.commit()
+
+        return {
+            'generation_id': generation_id if refreshed else None,
+            'refreshed': refreshed,
+            'skipped': skipped
+        }
+
+    @staticmethod
+    def _prune(dataset: str, keep_generations: int):
+        """Usuwa starsze snapshoty zestawu, zostawiając ``keep_generations`` najnowszych"""
+        keep_ids = [row.id for row in db.session.query(AnalyticsSnapshot.id).filter_by(
+            dataset=dataset
+        ).order_by(AnalyticsSnapshot.id.desc()).limit(keep_generations).all()]
+
+        if keep_ids:
+            AnalyticsSnapshot.query.filter(
+                AnalyticsSnapshot.dataset == dataset,
+                AnalyticsSnapshot.id.notin_(keep_ids)
+            ).delete(synchronize_session=False)
+
+    # Puste dane zestawów (ten sam kształt co wynik zapytań) - zwracane,
+    # dopóki flask analytics-refresh nie zapisze pierwszego snapshotu
+    EMPTY_PAYLOADS = {
+        'sales_kpi': {'total_quotes': 0, 'total_value': 0, 'monthly_value': 0, 'avg_deal_value': 0,
+                      'accepted_quotes': 0, 'baselinker_orders': 0,
+                      'conversion_accepted': 0, 'conversion_baselinker': 0},
+        'sales_trends': [],
+        'popular_products': [],
+        'team_performance': [],
+        'top_clients': [],
+        'geography': {'cities': [], 'sources': []},
+        'baselinker': {'total_orders': 0, 'total_quotes': 0, 'conversion_rate': 0,
+                       'logs_stats': {'total_attempts': 0, 'successful': 0, 'errors': 0, 'success_rate': 0},
+                       'status_conversion': [], 'recent_logs': []},
+    }
+
+    @classmethod
+    def get(cls, dataset: str):
+        """
+        Zwraca dane z najnowszego snapshotu. Ścieżka odczytu niczego nie przelicza -
+        jeśli snapshot jeszcze nie istnieje (np. świeża instalacja), zwracane są
+        puste dane, a zestaw uzupełni zaplanowane flask analytics-refresh.
+        """
+        snapshot = cls._latest_snapshot(dataset)
+        if snapshot is not None:
+            payload = snapshot.get_payload()
+            if payload is not None:
+                return payload
+
+        current_app.logger.warning(
+            f"[Analytics] Brak snapshotu zestawu '{dataset}' - zwracam puste dane "
+            f"(uruchom flask analytics-refresh)"
+        )
+        return copy.deepcopy(cls.EMPTY_PAYLOADS[dataset])
+
+    @classmethod
+    def get_status(cls) -> List[Dict[str, Any]]:
+        """Informacje o najnowszych snapshotach wszystkich zestawów"""
+        status = []
+        for name in cls.DATASETS:
+            snapshot = cls._latest_snapshot(name)
+            status.append(snapshot.to_dict() if snapshot else {'dataset': name, 'generation_id': None})
+        return status
+
+
 class AnalyticsExportHelper:
     """Pomocnicze funkcje do exportu danych"""
     
@@ -381,8 +655,8 @@ class AnalyticsExportHelper:
     def prepare_sales_export_data() -> Dict[str, List[Dict]]:
         """Przygotowuje dane sprzedażowe do exportu"""
         
-        kpi_data = AnalyticsQueries.get_sales_kpi_data()
-        trends_data = AnalyticsQueries.get_sales_trends_data()
+        kpi_data = AnalyticsSnapshotService.get('sales_kpi')
+        trends_data = AnalyticsSnapshotService.get('sales_trends')
         
         # Format danych dla Excel/CSV
         kpi_export = [
@@ -404,14 +678,14 @@ class AnalyticsExportHelper:
     @staticmethod
     def prepare_team_export_data() -> List[Dict]:
         """Przygotowuje dane zespołu do exportu"""
-        return AnalyticsQueries.get_team_performance_data()
+        return AnalyticsSnapshotService.get('team_performance')
     
     @staticmethod
     def prepare_clients_export_data() -> Dict[str, List[Dict]]:
         """Przygotowuje dane klientów do exportu"""
         
-        clients_data = AnalyticsQueries.get_clients_analytics_data(50)  # więcej dla exportu
-        geography_data = AnalyticsQueries.get_geography_stats()
+        clients_data = AnalyticsSnapshotService.get('top_clients')[:50]  # więcej dla exportu
+        geography_data = AnalyticsSnapshotService.get('geography')
         
         return {
             'top_clients': clients_data,
@@ -423,7 +697,7 @@ class AnalyticsExportHelper:
     def prepare_baselinker_export_data() -> Dict[str, List[Dict]]:
         """Przygotowuje dane Baselinker do exportu"""
         
-        bl_data = AnalyticsQueries.get_baselinker_analytics_data()
+        bl_data = AnalyticsSnapshotService.get('baselinker')
         
         # Przekształć logs_stats na format exportu
         logs_export = [
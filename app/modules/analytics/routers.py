@@ -7,7 +7,6 @@ from extensions import db
 import os
 import json
 os.environ['OPENBLAS_NUM_THREADS'] = '1'
-import pandas as pd
 from io import BytesIO
 import zipfile
 from datetime import datetime
@@ -15,7 +14,8 @@ from datetime import datetime
 # Import nowych funkcji analitycznych
 from .models import (
     AnalyticsQueries, 
-    AnalyticsExportHelper
+    AnalyticsExportHelper,
+    AnalyticsSnapshotService
 )
 
 analytics_bp = Blueprint("analytics", __name__,
@@ -34,10 +34,11 @@ def analytics_dashboard():
     variant_sessions = db.session.query(func.count()).filter(PublicSession.variant.isnot(None)).scalar()
     
     # Podstawowe dane dla innych zakładek (do szybkiego ładowania)
-    sales_kpi = AnalyticsQueries.get_sales_kpi_data()
-    team_count = len(AnalyticsQueries.get_team_performance_data())
-    top_clients_count = len(AnalyticsQueries.get_clients_analytics_data(5))  # tylko top 5 dla preview
-    baselinker_basic = AnalyticsQueries.get_baselinker_analytics_data()
+    # (czytane z najnowszych snapshotów - bez przeliczania przy każdym wejściu)
+    sales_kpi = AnalyticsSnapshotService.get('sales_kpi')
+    team_count = len(AnalyticsSnapshotService.get('team_performance'))
+    top_clients_count = len(AnalyticsSnapshotService.get('top_clients')[:5])  # tylko top 5 dla preview
+    baselinker_basic = AnalyticsSnapshotService.get('baselinker')
     
     user_email = session.get("user_email")
 
@@ -69,16 +70,17 @@ def public_calc_data():
     finishings_query = db.session.query(PublicSession.finishing, func.count()).group_by(PublicSession.finishing).all()
     colors_query = db.session.query(PublicSession.color, func.count()).group_by(PublicSession.color).all()
 
-    # Parsowanie wymiarów z JSON w kolumnie 'inputs'
-    dims_raw = db.session.query(PublicSession.inputs).all()
-    dims_counter = {}
-    for row in dims_raw:
-        try:
-            data = json.loads(row[0])
-            key = f"{data.get('length', '?')}x{data.get('width', '?')}x{data.get('thickness', '?')}"
-            dims_counter[key] = dims_counter.get(key, 0) + 1
-        except (json.JSONDecodeError, TypeError, AttributeError):
-            continue
+    # Top 10 kombinacji wymiarów - agregacja po kolumnie wypełnianej przy zapisie sesji
+    dims_query = db.session.query(
+        PublicSession.dims_key,
+        func.count(PublicSession.id).label('sessions_count')
+    ).filter(
+        PublicSession.dims_key.isnot(None)
+    ).group_by(
+        PublicSession.dims_key
+    ).order_by(
+        func.count(PublicSession.id).desc()
+    ).limit(10).all()
 
     # Format danych dla Chart.js
     def format_chart_data(query_result, label):
@@ -86,8 +88,8 @@ def public_calc_data():
         values = [item[1] for item in query_result]
         return {"label": label, "labels": labels, "values": values}
 
-    dims_labels = list(dims_counter.keys())[:10]  # Top 10
-    dims_values = [dims_counter[key] for key in dims_labels]
+    dims_labels = [row.dims_key for row in dims_query]
+    dims_values = [row.sessions_count for row in dims_query]
 
     return jsonify({
         "variants": format_chart_data(variants_query, "Warianty"),
@@ -102,13 +104,13 @@ def sales_data():
     
     try:
         # KPI
-        kpi_data = AnalyticsQueries.get_sales_kpi_data()
+        kpi_data = AnalyticsSnapshotService.get('sales_kpi')
         
         # Trendy
-        trends_data = AnalyticsQueries.get_sales_trends_data()
+        trends_data = AnalyticsSnapshotService.get('sales_trends')
         
         # Popularne produkty
-        products_data = AnalyticsQueries.get_popular_products_data()
+        products_data = AnalyticsSnapshotService.get('popular_products')[:10]
         
         return jsonify({
             'success': True,
@@ -126,7 +128,7 @@ def team_data():
     """Dane dla zakładki zespołu"""
     
     try:
-        team_performance = AnalyticsQueries.get_team_performance_data()
+        team_performance = AnalyticsSnapshotService.get('team_performance')
         
         return jsonify({
             'success': True,
@@ -143,10 +145,10 @@ def clients_data():
     
     try:
         # Top klienci
-        top_clients = AnalyticsQueries.get_clients_analytics_data()
+        top_clients = AnalyticsSnapshotService.get('top_clients')[:20]
         
         # Geografia i źródła
-        geography_stats = AnalyticsQueries.get_geography_stats()
+        geography_stats = AnalyticsSnapshotService.get('geography')
         
         return jsonify({
             'success': True,
@@ -163,7 +165,7 @@ def baselinker_data():
     """Dane dla zakładki Baselinker"""
     
     try:
-        baselinker_analytics = AnalyticsQueries.get_baselinker_analytics_data()
+        baselinker_analytics = AnalyticsSnapshotService.get('baselinker')
         
         return jsonify({
             'success': True,
@@ -231,6 +233,8 @@ def export_data(export_type, format):
 
 def export_to_excel(data: dict, filename: str, export_type: str):
     """Eksportuje dane do pliku Excel"""
+    import pandas as pd
+
     
     try:
         output = BytesIO()
@@ -306,6 +310,8 @@ def export_to_excel(data: dict, filename: str, export_type: str):
 
 def export_to_csv(data: dict, filename: str, export_type: str):
     """Eksportuje dane do pliku CSV (ZIP jeśli wiele arkuszy)"""
+    import pandas as pd
+
     
     # Jeśli tylko jeden arkusz danych, zwróć pojedynczy CSV
     if len(data) == 1:
@@ -370,18 +376,19 @@ def prepare_public_calc_export_data():
     colors_raw = db.session.query(PublicSession.color, func.count()).group_by(PublicSession.color).all()
     colors_data = [{'Kolor': col[0] or 'Brak danych', 'Liczba_użyć': col[1]} for col in colors_raw]
     
-    # Wymiary (parsowanie JSON)
-    dims_raw = db.session.query(PublicSession.inputs).all()
-    dims_counter = {}
-    for row in dims_raw:
-        try:
-            data = json.loads(row[0])
-            key = f"{data.get('length', '?')}x{data.get('width', '?')}x{data.get('thickness', '?')}"
-            dims_counter[key] = dims_counter.get(key, 0) + 1
-        except (json.JSONDecodeError, TypeError, AttributeError):
-            continue
+    # Wymiary (kolumna dims_key wypełniana przy zapisie sesji)
+    dims_raw = db.session.query(
+        PublicSession.dims_key,
+        func.count(PublicSession.id)
+    ).filter(
+        PublicSession.dims_key.isnot(None)
+    ).group_by(
+        PublicSession.dims_key
+    ).order_by(
+        func.count(PublicSession.id).desc()
+    ).all()
     
-    dimensions_data = [{'Wymiary': dim, 'Liczba_użyć': count} for dim, count in sorted(dims_counter.items(), key=lambda x: x[1], reverse=True)]
+    dimensions_data = [{'Wymiary': dim, 'Liczba_użyć': count} for dim, count in dims_raw]
     
     # Szczegółowe dane sesji (ostatnie 100)
     recent_sessions = db.session.query(PublicSession).order_by(PublicSession.timestamp.desc()).limit(100).all()
@@ -448,7 +455,10 @@ def api_sales_trends():
         return jsonify({'error': 'Parametr months musi być między 1 a 36'}), 400
     
     try:
-        trends_data = AnalyticsQueries.get_sales_trends_data(months)
+        if months == AnalyticsSnapshotService.TRENDS_MONTHS:
+            trends_data = AnalyticsSnapshotService.get('sales_trends')
+        else:
+            trends_data = AnalyticsQueries.get_sales_trends_data(months)
         return jsonify({
             'success': True,
             'trends': trends_data,
@@ -467,7 +477,7 @@ def api_top_clients():
         return jsonify({'error': 'Parametr limit musi być między 1 a 100'}), 400
     
     try:
-        clients_data = AnalyticsQueries.get_clients_analytics_data(limit)
+        clients_data = AnalyticsSnapshotService.get('top_clients')[:limit]
         return jsonify({
             'success': True,
             'clients': clients_data,
@@ -486,11 +496,46 @@ def api_popular_products():
         return jsonify({'error': 'Parametr limit musi być między 1 a 50'}), 400
     
     try:
-        products_data = AnalyticsQueries.get_popular_products_data(limit)
+        products_data = AnalyticsSnapshotService.get('popular_products')[:limit]
         return jsonify({
             'success': True,
             'products': products_data,
             'limit': limit
         })
     except Exception as e:
-        return jsonify({'success': False, 'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+# =====================================
+# ENDPOINTY SNAPSHOTÓW ANALITYCZNYCH
+# =====================================
+
+@analytics_bp.route("/api/snapshots/status")
+def api_snapshots_status():
+    """Informacje o najnowszych snapshotach (generacja, czas liczenia, data)"""
+    try:
+        return jsonify({
+            'success': True,
+            'snapshots': AnalyticsSnapshotService.get_status()
+        })
+    except Exception as e:
+        current_app.logger.error(f"Błąd w api_snapshots_status: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@analytics_bp.route("/api/snapshots/refresh", methods=["POST"])
+def api_snapshots_refresh():
+    """
+    Odświeżenie snapshotów na żądanie.
+    Domyślnie przeliczane są tylko zestawy, których tabele źródłowe się zmieniły;
+    parametr force=1 wymusza pełne przeliczenie.
+    """
+    force = request.args.get('force', '0') in ('1', 'true', 'yes')
+    datasets = request.args.getlist('dataset') or None
+
+    try:
+        result = AnalyticsSnapshotService.refresh(datasets=datasets, force=force)
+        return jsonify({'success': True, **result})
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Błąd w api_snapshots_refresh: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
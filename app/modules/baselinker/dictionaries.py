@@ -0,0 +1,280 @@
+# modules/baselinker/dictionaries.py
+"""
+Słowniki Baselinker współdzielone przez moduły (quotes, reports, production)
+
+Źródła zamówień, statusy i pola dodatkowe ładowane są jednym zapytaniem
+z tabeli baselinker_config do pamięci procesu i odświeżane co SNAPSHOT_TTL
+sekund. Każdy snapshot ma wersję (skrót zawartości) - identyczną we wszystkich
+procesach Passengera dla tych samych danych, więc może służyć jako ETag i klucz
+cache listy rozwijanej po stronie przeglądarki.
+
+Synchronizacja z API (sync_order_sources / sync_order_statuses /
+sync_order_extra_fields) uruchamiana jest w tle, gdy ostatnia była dawniej
+niż SYNC_INTERVAL sekund temu - jeden proces na serwer (plik blokady w tmp).
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+from flask import current_app
+
+from extensions import db
+from modules.logging import get_structured_logger
+from .models import BaselinkerConfig
+
+dictionaries_logger = get_structured_logger('baselinker.dictionaries')
+
+SNAPSHOT_TTL = 60             # sekundy - ponowne wczytanie z bazy
+SYNC_INTERVAL = 24 * 3600     # sekundy - synchronizacja z API w tle
+SYNC_RETRY = 900              # sekundy - odstęp między nieudanymi próbami w procesie
+SYNC_LOCK_STALE = 600         # sekundy - blokada starsza niż to jest ignorowana
+
+SOURCE = 'order_source'
+STATUS = 'order_status'
+EXTRA_FIELD = 'extra_field'
+
+# Nazwy statusów używane, gdy statusu nie ma jeszcze w bazie
+STATUS_NAMES = {
+    155824: "Nowe - opłacone",
+    105112: "Nowe - nieopłacone",
+    138619: "W produkcji - surowe",
+    148830: "W produkcji - lakierowanie",
+    148831: "W produkcji - bejcowanie",
+    148832: "W produkcji - olejowanie",
+    332355: "W produkcji - suszenie usługowe",
+    138620: "Produkcja zakończona",
+    138623: "Zamówienie spakowane",
+    105113: "Paczka zgłoszona do wysyłki",
+    105114: "Wysłane - kurier",
+    138624: "Dostarczona - kurier",
+    149763: "Wysłane - transport WoodPower",
+    149777: "Czeka na odbiór osobisty",
+    149778: "Dostarczona - trans. WoodPower",
+    149779: "Odebrane",
+    316636: "Reklamacja",
+    138625: "Zamówienie anulowane"
+}
+
+
+class BaselinkerDictionaries:
+    """Snapshot słowników Baselinker w pamięci procesu"""
+
+    _snapshot = None
+    _loaded_at = 0.0
+    _lock = threading.Lock()
+    _sync_thread = None
+    _sync_attempted_at = None
+
+    # ------------------------------------------------------------------
+    # Odczyt
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def snapshot(cls):
+        """
+        Returns:
+            dict: version, sources, statuses, extra_fields (aktywne, do list rozwijanych),
+                  status_names (wszystkie znane), synced_at (czas ostatniej synchronizacji z API)
+        """
+        if cls._snapshot is None or time.monotonic() - cls._loaded_at > SNAPSHOT_TTL:
+            cls.reload()
+        return cls._snapshot
+
+    @classmethod
+    def version(cls):
+        return cls.snapshot()['version']
+
+    @classmethod
+    def sources(cls):
+        return cls.snapshot()['sources']
+
+    @classmethod
+    def statuses(cls):
+        return cls.snapshot()['statuses']
+
+    @classmethod
+    def extra_fields(cls):
+        return cls.snapshot()['extra_fields']
+
+    @classmethod
+    def status_names(cls):
+        """Słownik {status_id: nazwa} (baza + nazwy domyślne)"""
+        return cls.snapshot()['status_names']
+
+    @classmethod
+    def status_name(cls, status_id, default=None):
+        try:
+            status_id = int(status_id)
+        except (TypeError, ValueError):
+            return default if default is not None else f'Status {status_id}'
+        name = cls.status_names().get(status_id)
+        if name is None:
+            return default if default is not None else f'Status {status_id}'
+        return name
+
+    @classmethod
+    def source_name(cls, source_id):
+        """Nazwa aktywnego źródła lub None, jeśli źródła nie ma"""
+        return cls.snapshot()['source_names'].get(int(source_id))
+
+    @classmethod
+    def has_status(cls, status_id):
+        return int(status_id) in cls.snapshot()['active_status_ids']
+
+    @classmethod
+    def to_dict(cls):
+        """Dane dla list rozwijanych (API)"""
+        snapshot = cls.snapshot()
+        return {key: snapshot[key] for key in ('version', 'sources', 'statuses', 'extra_fields', 'synced_at')}
+
+    # ------------------------------------------------------------------
+    # Ładowanie
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def reload(cls):
+        """Wczytuje snapshot z bazy (jedno zapytanie) i w razie potrzeby planuje synchronizację"""
+        with cls._lock:
+            try:
+                rows = db.session.query(
+                    BaselinkerConfig.config_type,
+                    BaselinkerConfig.baselinker_id,
+                    BaselinkerConfig.name,
+                    BaselinkerConfig.is_active,
+                    BaselinkerConfig.is_default
+                ).filter(
+                    BaselinkerConfig.config_type.in_((SOURCE, STATUS, EXTRA_FIELD))
+                ).order_by(BaselinkerConfig.config_type, BaselinkerConfig.name, BaselinkerConfig.baselinker_id).all()
+            except Exception as e:
+                dictionaries_logger.error("Błąd wczytywania słowników Baselinker", error=str(e))
+                if cls._snapshot is None:
+                    cls._snapshot = cls._build([])
+                cls._loaded_at = time.monotonic()
+                return cls._snapshot
+
+            cls._snapshot = cls._build(rows)
+            cls._loaded_at = time.monotonic()
+
+        cls._schedule_sync()
+        return cls._snapshot
+
+    @classmethod
+    def _build(cls, rows):
+        entries = {SOURCE: [], STATUS: [], EXTRA_FIELD: []}
+        status_names = dict(STATUS_NAMES)
+        for row in rows:
+            if row.config_type == STATUS:
+                status_names[row.baselinker_id] = row.name
+            if row.is_active:
+                entries[row.config_type].append({
+                    'id': row.baselinker_id,
+                    'name': row.name,
+                    'is_default': bool(row.is_default)
+                })
+
+        content = json.dumps(entries, sort_keys=True, ensure_ascii=False)
+        return {
+            'version': hashlib.sha1(content.encode('utf-8')).hexdigest()[:12],
+            'sources': entries[SOURCE],
+            'statuses': entries[STATUS],
+            'extra_fields': entries[EXTRA_FIELD],
+            'status_names': status_names,
+            'source_names': {entry['id']: entry['name'] for entry in entries[SOURCE]},
+            'active_status_ids': {entry['id'] for entry in entries[STATUS]},
+            'synced_at': cls._synced_at()
+        }
+
+    # ------------------------------------------------------------------
+    # Synchronizacja z API w tle
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _marker_path(suffix):
+        return os.path.join(current_app.root_path, 'tmp', f'baselinker_dictionaries.{suffix}')
+
+    @classmethod
+    def _synced_at(cls):
+        try:
+            return os.path.getmtime(cls._marker_path('synced'))
+        except (OSError, RuntimeError):
+            return None
+
+    @classmethod
+    def _schedule_sync(cls):
+        synced_at = cls._snapshot.get('synced_at')
+        if synced_at and time.time() - synced_at < SYNC_INTERVAL:
+            return
+        if cls._sync_thread and cls._sync_thread.is_alive():
+            return
+        if cls._sync_attempted_at and time.monotonic() - cls._sync_attempted_at < SYNC_RETRY:
+            return
+        if not current_app.config.get('API_BASELINKER', {}).get('api_key'):
+            return
+
+        cls._sync_attempted_at = time.monotonic()
+        app = current_app._get_current_object()
+        cls._sync_thread = threading.Thread(target=cls._sync_in_background, args=(app,),
+                                            name='baselinker-dictionaries-sync', daemon=True)
+        cls._sync_thread.start()
+
+    @classmethod
+    def _acquire_sync_lock(cls):
+        lock_path = cls._marker_path('lock')
+        try:
+            if time.time() - os.path.getmtime(lock_path) > SYNC_LOCK_STALE:
+                os.remove(lock_path)
+        except OSError:
+            pass
+        try:
+            os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return lock_path
+        except OSError:
+            return None
+
+    @classmethod
+    def _sync_in_background(cls, app):
+        with app.app_context():
+            lock_path = cls._acquire_sync_lock()
+            if not lock_path:
+                return
+            try:
+                cls.sync()
+            finally:
+                db.session.remove()
+                try:
+                    os.remove(lock_path)
+                except OSError:
+                    pass
+
+    @classmethod
+    def sync(cls):
+        """
+        Synchronizuje słowniki z API i przeładowuje snapshot (wymaga kontekstu aplikacji)
+
+        Returns:
+            dict: sources, statuses, extra_fields - wynik poszczególnych synchronizacji
+        """
+        from .service import BaselinkerService
+
+        started = time.perf_counter()
+        service = BaselinkerService()
+        result = {
+            'sources': service.sync_order_sources(reload_dictionaries=False),
+            'statuses': service.sync_order_statuses(reload_dictionaries=False),
+            'extra_fields': service.sync_order_extra_fields(reload_dictionaries=False)
+        }
+
+        if any(result.values()):
+            marker = cls._marker_path('synced')
+            with open(marker, 'a'):
+                os.utime(marker, None)
+        cls.reload()
+
+        dictionaries_logger.info("Zsynchronizowano słowniki Baselinker",
+                                 duration_ms=round((time.perf_counter() - started) * 1000, 1),
+                                 version=cls._snapshot['version'],
+                                 **result)
+        return result
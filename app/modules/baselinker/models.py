@@ -38,7 +38,7 @@ class BaselinkerConfig(db.Model):
     __tablename__ = 'baselinker_config'
     
     id = db.Column(db.Integer, primary_key=True)
-    config_type = db.Column(db.String(50), nullable=False)  # 'order_source', 'order_status', 'payment_method'
+    config_type = db.Column(db.String(50), nullable=False)  # 'order_source', 'order_status', 'extra_field', 'payment_method'
     baselinker_id = db.Column(db.Integer, nullable=False)  # ID w systemie Baselinker
     name = db.Column(db.String(255), nullable=False)
     is_default = db.Column(db.Boolean, default=False)
@@ -1,9 +1,11 @@
 # app/modules/baselinker/routers.py
-from flask import render_template, jsonify, request, session, redirect, url_for, flash
+from flask import render_template, jsonify, request, session, redirect, url_for, flash, make_response
 from . import baselinker_bp
 from .service import BaselinkerService
+from .dictionaries import BaselinkerDictionaries
 from .models import BaselinkerOrderLog, BaselinkerConfig
-from modules.calculator.models import Quote, User, QuoteItemDetails
+from modules.calculator.models import Quote, User
+from modules.quotes.aggregate import QuoteAggregate
 from modules.clients.models import Client
 from extensions import db
 import sys
@@ -35,8 +37,11 @@ def create_order(quote_id):
                           endpoint='create_order')
     
     try:
-        # Pobierz wycenę z eager loading
-        quote = Quote.query.get_or_404(quote_id)
+        # Wycena z klientem, opiekunem, pozycjami i detalami (stała liczba zapytań)
+        aggregate = QuoteAggregate.load(quote_id=quote_id)
+        if not aggregate:
+            return jsonify({'error': 'Nie znaleziono wyceny'}), 404
+        quote = aggregate.quote
         
         baselinker_logger.debug("Pobrano wycenę do przetworzenia",
                                quote_id=quote_id,
@@ -45,7 +50,7 @@ def create_order(quote_id):
                                status_id=quote.status_id)
         
         # Sprawdź czy wycena ma wybrane produkty
-        selected_items = [item for item in quote.items if item.is_selected]
+        selected_items = aggregate.selected_items
         if not selected_items:
             baselinker_logger.warning("Próba utworzenia zamówienia bez wybranych produktów",
                                      quote_id=quote_id,
@@ -94,18 +99,11 @@ def create_order(quote_id):
                                    })
             return jsonify({'error': 'Niepełna konfiguracja zamówienia'}), 400
         
-        # Sprawdź czy źródło i status istnieją w bazie
-        source_exists = BaselinkerConfig.query.filter_by(
-            config_type='order_source',
-            baselinker_id=config['order_source_id']
-        ).first()
+        # Sprawdź czy źródło i status istnieją (słowniki w pamięci)
+        source_name = BaselinkerDictionaries.source_name(config['order_source_id'])
+        status_exists = BaselinkerDictionaries.has_status(config['order_status_id'])
         
-        status_exists = BaselinkerConfig.query.filter_by(
-            config_type='order_status',
-            baselinker_id=config['order_status_id']
-        ).first()
-        
-        if not source_exists:
+        if not source_name:
             baselinker_logger.error("Źródło zamówienia nie istnieje w bazie",
                                    quote_id=quote_id,
                                    order_source_id=config['order_source_id'])
@@ -119,12 +117,12 @@ def create_order(quote_id):
         
         baselinker_logger.info("Walidacja konfiguracji przeszła pomyślnie",
                               quote_id=quote_id,
-                              source_name=source_exists.name,
-                              status_name=status_exists.name)
+                              source_name=source_name,
+                              status_name=BaselinkerDictionaries.status_name(config['order_status_id']))
         
-        # Utwórz zamówienie
+        # Utwórz zamówienie (log, numer zamówienia i status "Złożone" w jednej transakcji)
         service = BaselinkerService()
-        result = service.create_order_from_quote(quote, user.id, config)
+        result = service.create_order_from_quote(quote, user.id, config, aggregate)
         
         baselinker_logger.info("Otrzymano wynik z serwisu Baselinker",
                               quote_id=quote_id,
@@ -133,30 +131,6 @@ def create_order(quote_id):
                               error=result.get('error'))
         
         if result['success']:
-            # Zaktualizuj status wyceny na "Złożone" (ID: 4)
-            try:
-                from modules.quotes.models import QuoteStatus
-                ordered_status = QuoteStatus.query.filter_by(id=4).first()
-                if ordered_status:
-                    old_status_id = quote.status_id
-                    quote.status_id = ordered_status.id
-                    db.session.commit()
-                    
-                    baselinker_logger.info("Status wyceny został zaktualizowany",
-                                          quote_id=quote_id,
-                                          old_status_id=old_status_id,
-                                          new_status_id=ordered_status.id,
-                                          new_status_name=ordered_status.name)
-                else:
-                    baselinker_logger.warning("Nie znaleziono statusu 'Złożone' w bazie",
-                                             expected_status_id=4,
-                                             quote_id=quote_id)
-            except Exception as status_error:
-                baselinker_logger.error("Błąd podczas zmiany statusu wyceny",
-                                       quote_id=quote_id,
-                                       error=str(status_error),
-                                       error_type=type(status_error).__name__)
-            
             baselinker_logger.info("Zamówienie zostało pomyślnie utworzone",
                                   quote_id=quote_id,
                                   quote_number=quote.quote_number,
@@ -193,6 +167,42 @@ def create_order(quote_id):
             'error': f'Błąd serwera: {str(e)}'
         }), 500
 
+@baselinker_bp.route('/api/quotes/create-orders', methods=['POST'])
+@login_required
+def create_orders_batch():
+    """
+    Tworzy zamówienia w Baselinker dla wielu zaakceptowanych wycen (akcja administratora).
+    Body: quote_ids + konfiguracja zamówienia jak w create_order (bez client_data).
+    """
+    try:
+        user = User.query.filter_by(email=session.get('user_email')).first()
+        if not user:
+            return jsonify({'error': 'Błąd autoryzacji'}), 401
+        if (user.role or '').lower() not in ('admin', 'administrator'):
+            baselinker_logger.warning("Odmowa dostępu do masowego tworzenia zamówień", user_id=user.id)
+            return jsonify({'error': 'Brak uprawnień administratora'}), 403
+
+        config = request.get_json() or {}
+        quote_ids = config.pop('quote_ids', None) or []
+        if not isinstance(quote_ids, list) or not quote_ids:
+            return jsonify({'error': 'Brak listy wycen (quote_ids)'}), 400
+        if not config.get('order_source_id') or not config.get('order_status_id'):
+            return jsonify({'error': 'Niepełna konfiguracja zamówienia'}), 400
+
+        if not BaselinkerDictionaries.source_name(config['order_source_id']):
+            return jsonify({'error': f'Źródło zamówienia o ID {config["order_source_id"]} nie istnieje'}), 400
+        if not BaselinkerDictionaries.has_status(config['order_status_id']):
+            return jsonify({'error': f'Status zamówienia o ID {config["order_status_id"]} nie istnieje'}), 400
+
+        result = BaselinkerService().create_orders_for_quotes(quote_ids, user.id, config)
+        return jsonify(dict(result, success=True))
+
+    except Exception as e:
+        baselinker_logger.error("Błąd masowego tworzenia zamówień",
+                               error=str(e),
+                               error_type=type(e).__name__)
+        return jsonify({'success': False, 'error': f'Błąd serwera: {str(e)}'}), 500
+
 @baselinker_bp.route('/api/sync-config')
 @login_required  
 def sync_config():
@@ -209,17 +219,22 @@ def sync_config():
         baselinker_logger.debug("Rozpoczęcie synchronizacji statusów zamówień")
         statuses_synced = service.sync_order_statuses()
         
+        # Pola dodatkowe - nie blokują wyniku synchronizacji
+        extra_fields_synced = service.sync_order_extra_fields()
+        
         sync_success = sources_synced and statuses_synced
         
         baselinker_logger.info("Synchronizacja konfiguracji zakończona",
                               sources_synced=sources_synced,
                               statuses_synced=statuses_synced,
+                              extra_fields_synced=extra_fields_synced,
                               overall_success=sync_success)
         
         if sync_success:
             return jsonify({
                 'success': True,
-                'message': 'Konfiguracja została zsynchronizowana'
+                'message': 'Konfiguracja została zsynchronizowana',
+                'dictionaries_version': BaselinkerDictionaries.version()
             })
         else:
             return jsonify({
@@ -289,28 +304,8 @@ def get_order_status(order_id):
                                    baselinker_order_id=order_data.get('order_id'),
                                    status_id=order_data.get('order_status_id'))
             
-            # Mapuj ID statusu na nazwę (można rozszerzyć)
-            status_map = {
-                105112: 'Nowe - nieopłacone',
-                155824: 'Nowe - opłacone',
-                138619: 'W produkcji - surowe',
-                148832: 'W produkcji - olejowanie',
-                148831: 'W produkcji - bejcowanie',
-                148830: 'W produkcji - lakierowanie',
-                138620: 'Produkcja zakończona',
-                138623: 'Zamówienie spakowane',
-                105113: 'Paczka zgłoszona do wysyłki',
-                105114: 'Wysłane - kurier',
-                149763: 'Wysłane - transport WoodPower',
-                149777: 'Czeka na odbiór osobisty',
-                138624: 'Dostarczona - kurier',
-                149778: 'Dostarczona - transport WoodPower',
-                149779: 'Odebrane',
-                138625: 'Zamówienie anulowane'
-            }
-            
             order_status_id = order_data.get('order_status_id')
-            status_name = status_map.get(order_status_id, f'Status {order_status_id}')
+            status_name = BaselinkerDictionaries.status_name(order_status_id)
             
             baselinker_logger.info("Pomyślnie zmapowano status zamówienia",
                                   order_id=order_id,
@@ -355,25 +350,18 @@ def get_order_sources():
                           endpoint='get_order_sources')
     
     try:
-        sources = BaselinkerConfig.query.filter_by(
-            config_type='order_source',
-            is_active=True
-        ).order_by(BaselinkerConfig.name).all()
-        
         sources_data = [
-            {
-                'id': source.baselinker_id,
-                'name': source.name
-            }
-            for source in sources
+            {'id': source['id'], 'name': source['name']}
+            for source in BaselinkerDictionaries.sources()
         ]
         
-        baselinker_logger.debug("Pobrano źródła zamówień z bazy",
+        baselinker_logger.debug("Pobrano źródła zamówień ze słowników",
                                sources_count=len(sources_data))
         
         return jsonify({
             'success': True,
-            'sources': sources_data
+            'sources': sources_data,
+            'version': BaselinkerDictionaries.version()
         })
         
     except Exception as e:
@@ -390,25 +378,18 @@ def get_order_statuses():
                           endpoint='get_order_statuses')
     
     try:
-        statuses = BaselinkerConfig.query.filter_by(
-            config_type='order_status',
-            is_active=True
-        ).order_by(BaselinkerConfig.name).all()
-        
         statuses_data = [
-            {
-                'id': status.baselinker_id,
-                'name': status.name
-            }
-            for status in statuses
+            {'id': status['id'], 'name': status['name']}
+            for status in BaselinkerDictionaries.statuses()
         ]
         
-        baselinker_logger.debug("Pobrano statusy zamówień z bazy",
+        baselinker_logger.debug("Pobrano statusy zamówień ze słowników",
                                statuses_count=len(statuses_data))
         
         return jsonify({
             'success': True,
-            'statuses': statuses_data
+            'statuses': statuses_data,
+            'version': BaselinkerDictionaries.version()
         })
         
     except Exception as e:
@@ -417,6 +398,26 @@ def get_order_statuses():
                                error_type=type(e).__name__)
         return jsonify({'error': 'Błąd pobierania statusów'}), 500
 
+@baselinker_bp.route('/api/config/dictionaries')
+@login_required
+def get_dictionaries():
+    """Źródła, statusy i pola dodatkowe z wersją (ETag) - do cache list po stronie przeglądarki"""
+    try:
+        data = BaselinkerDictionaries.to_dict()
+        if data['version'] in request.if_none_match:
+            response = make_response('', 304)
+        else:
+            response = make_response(jsonify(dict(data, success=True)))
+        response.set_etag(data['version'])
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+        
+    except Exception as e:
+        baselinker_logger.error("Błąd podczas pobierania słowników Baselinker",
+                               error=str(e),
+                               error_type=type(e).__name__)
+        return jsonify({'error': 'Błąd pobierania słowników'}), 500
+
 @baselinker_bp.route('/api/quote/<int:quote_id>/order-modal-data')
 @login_required
 def get_order_modal_data(quote_id):
@@ -426,18 +427,18 @@ def get_order_modal_data(quote_id):
                           endpoint='get_order_modal_data')
     
     try:
-        quote = Quote.query.get_or_404(quote_id)
+        aggregate = QuoteAggregate.load(quote_id=quote_id)
+        if not aggregate:
+            return jsonify({'error': 'Nie znaleziono wyceny'}), 404
+        quote = aggregate.quote
         
         # Pobierz wybrane produkty
-        selected_items = [item for item in quote.items if item.is_selected]
+        selected_items = aggregate.selected_items
         if not selected_items:
             baselinker_logger.warning("Wycena nie ma wybranych produktów",
                                      quote_id=quote_id)
             return jsonify({'error': 'Wycena nie ma wybranych produktów'}), 400
         
-        # Pobierz wszystkie szczegóły wykończenia dla tej wyceny
-        finishing_details_list = QuoteItemDetails.query.filter_by(quote_id=quote.id).all()
-        
         products = []
         
         # POPRAWKA 1: Osobno oblicz koszty produktów surowych i wykończenia
@@ -447,14 +448,9 @@ def get_order_modal_data(quote_id):
         total_finishing_value_netto = 0  # Tylko wykończenie
         
         for item in selected_items:
-            # Pobierz szczegóły wykończenia dla tego produktu
-            finishing_details = QuoteItemDetails.query.filter_by(
-                quote_id=quote.id, 
-                product_index=item.product_index
-            ).first()
-            
-            # Oblicz quantity
-            quantity = finishing_details.quantity if finishing_details and finishing_details.quantity else 1
+            # Szczegóły wykończenia i quantity z agregatu (bez zapytania per produkt)
+            finishing_details = aggregate.details_by_index.get(item.product_index)
+            quantity = aggregate.quantity(item.product_index)
             
             # CENY SUROWEGO PRODUKTU (bez wykończenia)
             unit_price_netto = float(item.price_netto or 0)
@@ -537,28 +533,20 @@ def get_order_modal_data(quote_id):
                 'want_invoice': bool(quote.client.invoice_nip)
             }
         
-        # Pobierz konfigurację Baselinker
-        try:
-            order_sources = BaselinkerConfig.query.filter_by(
-                config_type='order_source',
-                is_active=True
-            ).order_by(BaselinkerConfig.name).all()
-            
-            sources_data = [{'id': source.baselinker_id, 'name': source.name} for source in order_sources]
-            
-            order_statuses = BaselinkerConfig.query.filter_by(
-                config_type='order_status',
-                is_active=True
-            ).order_by(BaselinkerConfig.name).all()
-            
-            statuses_data = [{'id': status.baselinker_id, 'name': status.name} for status in order_statuses]
-            
-        except Exception as config_error:
-            baselinker_logger.error("Błąd podczas pobierania konfiguracji Baselinker", error=str(config_error))
-            sources_data = []
-            statuses_data = []
+        # Konfiguracja Baselinker ze słowników w pamięci. Gdy przeglądarka ma już
+        # listy w tej wersji (dictionaries_version), nie są wysyłane ponownie.
+        dictionaries_version = BaselinkerDictionaries.version()
+        dictionaries_unchanged = request.args.get('dictionaries_version') == dictionaries_version
+        if dictionaries_unchanged:
+            sources_data = None
+            statuses_data = None
+        else:
+            sources_data = [{'id': source['id'], 'name': source['name']} for source in BaselinkerDictionaries.sources()]
+            statuses_data = [{'id': status['id'], 'name': status['name']} for status in BaselinkerDictionaries.statuses()]
         
         config_data = {
+            'dictionaries_version': dictionaries_version,
+            'dictionaries_unchanged': dictionaries_unchanged,
             'order_sources': sources_data,
             'order_statuses': statuses_data,
             'payment_methods': ['Przelew bankowy', 'Płatność przy odbiorze', 'Karta płatnicza'],
@@ -615,8 +603,8 @@ def get_order_modal_data(quote_id):
                               finishing_value_brutto=total_finishing_value_brutto,
                               total_value_brutto=total_value_brutto,
                               has_client=bool(quote.client),
-                              sources_count=len(config_data['order_sources']),
-                              statuses_count=len(config_data['order_statuses']))
+                              dictionaries_version=dictionaries_version,
+                              dictionaries_unchanged=dictionaries_unchanged)
         
         return jsonify(response_data)
         
@@ -7,6 +7,7 @@ from typing import Dict, List, Optional
 from flask import current_app, session, request
 from extensions import db
 from .models import BaselinkerOrderLog, BaselinkerConfig
+from .dictionaries import BaselinkerDictionaries
 from modules.logging import get_structured_logger
 
 class BaselinkerService:
@@ -16,6 +17,8 @@ class BaselinkerService:
         self.api_key = current_app.config.get('API_BASELINKER', {}).get('api_key')
         self.endpoint = current_app.config.get('API_BASELINKER', {}).get('endpoint')
         self.logger = get_structured_logger('baselinker.service')
+        # Sesja HTTP współdzielona między zapytaniami (ustawiana przy operacjach masowych)
+        self.http_session = None
     
     def _make_request(self, method: str, parameters: Dict) -> Dict:
         """Wykonuje żądanie do API Baselinker"""
@@ -42,7 +45,7 @@ class BaselinkerService:
                         params_keys=list(parameters.keys()))
         
         try:
-            response = requests.post(self.endpoint, headers=headers, data=data, timeout=30)
+            response = (self.http_session or requests).post(self.endpoint, headers=headers, data=data, timeout=30)
             
             self.logger.debug("Otrzymano odpowiedź API", 
                             method=method,
@@ -161,8 +164,8 @@ class BaselinkerService:
                             error_type=type(e).__name__)
             raise
     
-    def sync_order_sources(self) -> bool:
-        """Synchronizuje źródła zamówień z Baselinker"""
+    def sync_order_sources(self, reload_dictionaries: bool = True) -> bool:
+        """Synchronizuje źródła zamówień z Baselinker (i przeładowuje BaselinkerDictionaries)"""
         self.logger.info("Rozpoczęcie synchronizacji źródeł zamówień")
         
         try:
@@ -218,6 +221,8 @@ class BaselinkerService:
                            updated_count=updated_count,
                            total_in_db=saved_count)
         
+            if reload_dictionaries:
+                BaselinkerDictionaries.reload()
             return True
         
         except Exception as e:
@@ -227,8 +232,8 @@ class BaselinkerService:
                             error_type=type(e).__name__)
             return False
     
-    def sync_order_statuses(self) -> bool:
-        """Synchronizuje statusy zamówień z Baselinker"""
+    def sync_order_statuses(self, reload_dictionaries: bool = True) -> bool:
+        """Synchronizuje statusy zamówień z Baselinker (i przeładowuje BaselinkerDictionaries)"""
         self.logger.info("Rozpoczęcie synchronizacji statusów zamówień")
         
         try:
@@ -275,6 +280,8 @@ class BaselinkerService:
                            updated_count=updated_count,
                            total_in_db=saved_count)
             
+            if reload_dictionaries:
+                BaselinkerDictionaries.reload()
             return True
             
         except Exception as e:
@@ -284,6 +291,60 @@ class BaselinkerService:
                             error_type=type(e).__name__)
             return False
 
+    def get_order_extra_fields(self) -> List[Dict]:
+        """Pobiera pola dodatkowe zamówień (custom_extra_fields)"""
+        response = self._make_request('getOrderExtraFields', {})
+        if response.get('status') != 'SUCCESS':
+            error_msg = response.get('error_message', 'Unknown error')
+            self.logger.error("API zwróciło błąd w getOrderExtraFields", error_message=error_msg)
+            raise Exception(f"API Error: {error_msg}")
+
+        fields = [
+            {'id': int(field['extra_field_id']), 'name': field.get('name') or f"Pole {field['extra_field_id']}"}
+            for field in response.get('extra_fields', [])
+            if str(field.get('extra_field_id', '')).isdigit()
+        ]
+        self.logger.info("Pomyślnie pobrano pola dodatkowe", fields_count=len(fields))
+        return fields
+
+    def sync_order_extra_fields(self, reload_dictionaries: bool = True) -> bool:
+        """Synchronizuje pola dodatkowe zamówień z Baselinker (config_type='extra_field')"""
+        try:
+            fields = self.get_order_extra_fields()
+            existing = {
+                config.baselinker_id: config
+                for config in BaselinkerConfig.query.filter_by(config_type='extra_field').all()
+            }
+
+            for field in fields:
+                config = existing.pop(field['id'], None)
+                if config is None:
+                    db.session.add(BaselinkerConfig(config_type='extra_field',
+                                                    baselinker_id=field['id'], name=field['name']))
+                else:
+                    config.name = field['name']
+                    config.is_active = True
+
+            # Pola usunięte w Baselinker
+            for config in existing.values():
+                config.is_active = False
+
+            db.session.commit()
+            self.logger.info("Synchronizacja pól dodatkowych zakończona pomyślnie",
+                           fields_count=len(fields),
+                           deactivated_count=len(existing))
+
+            if reload_dictionaries:
+                BaselinkerDictionaries.reload()
+            return True
+
+        except Exception as e:
+            db.session.rollback()
+            self.logger.error("Błąd synchronizacji pól dodatkowych",
+                            error=str(e),
+                            error_type=type(e).__name__)
+            return False
+
     def get_order_details(self, order_id: int) -> Dict:
         """Pobiera szczegóły zamówienia z Baselinker"""
         self.logger.info("Pobieranie szczegółów zamówienia", order_id=order_id)
@@ -340,8 +401,17 @@ class BaselinkerService:
             self.logger.debug("Stack trace błędu", traceback=traceback.format_exc())
             return {'success': False, 'error': str(e)}
 
-    def create_order_from_quote(self, quote, user_id: int, config: Dict) -> Dict:
-        """Tworzy zamówienie w Baselinker na podstawie wyceny"""
+    def create_order_from_quote(self, quote, user_id: int, config: Dict, aggregate=None) -> Dict:
+        """
+        Tworzy zamówienie w Baselinker na podstawie wyceny.
+
+        Dane zamówienia budowane są z agregatu wyceny (pozycje i detale w pamięci).
+        Log zamówienia, numer zamówienia Baselinker i status wyceny zapisywane są
+        jednym commitem po odpowiedzi API - transakcja nie jest otwarta na czas HTTP.
+
+        Args:
+            aggregate: QuoteAggregate wyceny (np. z QuoteAggregate.load_many) - gdy brak, ładowany tutaj
+        """
         self.logger.info("Rozpoczęcie tworzenia zamówienia z wyceny",
                         quote_id=quote.id,
                         quote_number=quote.quote_number,
@@ -354,9 +424,10 @@ class BaselinkerService:
                              email=client_override.get('email'),
                              want_invoice=client_override.get('want_invoice'))
         
+        log_entry = None
         try:
             # Przygotuj dane zamówienia
-            order_data = self._prepare_order_data(quote, config)
+            order_data = self._prepare_order_data(quote, config, aggregate)
             
             self.logger.debug("Przygotowano dane zamówienia",
                             quote_id=quote.id,
@@ -364,7 +435,7 @@ class BaselinkerService:
                             order_source_id=order_data.get('custom_source_id'),
                             order_status_id=order_data.get('order_status_id'))
             
-            # Loguj żądanie
+            # Log żądania - dodawany do sesji dopiero razem z wynikiem
             log_entry = BaselinkerOrderLog(
                 quote_id=quote.id,
                 action='create_order',
@@ -372,28 +443,20 @@ class BaselinkerService:
                 request_data=json.dumps(order_data),
                 created_by=user_id
             )
-            db.session.add(log_entry)
-            db.session.flush()
-            
-            self.logger.debug("Utworzono log entry", log_id=log_entry.id)
             
             # Wyślij żądanie do API
             response = self._make_request('addOrder', order_data)
+            log_entry.response_data = json.dumps(response)
             
             if response.get('status') == 'SUCCESS':
                 baselinker_order_id = response.get('order_id')
                 
-                # Aktualizuj log
+                # Log, numer zamówienia i status "Złożone" (ID=4) w jednej transakcji
                 log_entry.status = 'success'
                 log_entry.baselinker_order_id = baselinker_order_id
-                log_entry.response_data = json.dumps(response)
-                
-                # Zaktualizuj wycenę
                 quote.base_linker_order_id = baselinker_order_id
-                
-                # NOWE: Zmień status wyceny na "Złożone" (ID=4)
                 quote.status_id = 4
-                
+                db.session.add(log_entry)
                 db.session.commit()
                 
                 self.logger.info("Pomyślnie utworzono zamówienie",
@@ -410,7 +473,7 @@ class BaselinkerService:
                 error_msg = response.get('error_message', 'Nieznany blad API')
                 log_entry.status = 'error'
                 log_entry.error_message = error_msg
-                log_entry.response_data = json.dumps(response)
+                db.session.add(log_entry)
                 db.session.commit()
                 
                 self.logger.error("Błąd tworzenia zamówienia w API",
@@ -424,11 +487,9 @@ class BaselinkerService:
                 }
                 
         except Exception as e:
-            if 'log_entry' in locals():
-                log_entry.status = 'error'
-                log_entry.error_message = str(e)
-                db.session.commit()
-                self.logger.debug("Zaktualizowano log entry z błędem", log_id=log_entry.id)
+            db.session.rollback()
+            if log_entry is not None:
+                self._save_error_log(log_entry, str(e))
             
             self.logger.error("Wyjątek podczas tworzenia zamówienia", 
                             quote_id=quote.id,
@@ -438,11 +499,116 @@ class BaselinkerService:
                 'success': False,
                 'error': str(e)
             }
+
+    def _save_error_log(self, log_entry, error: str):
+        """Zapisuje log nieudanego zamówienia po wycofaniu transakcji"""
+        try:
+            error_log = BaselinkerOrderLog(
+                quote_id=log_entry.quote_id,
+                action=log_entry.action,
+                status='error',
+                request_data=log_entry.request_data,
+                response_data=log_entry.response_data,
+                baselinker_order_id=log_entry.baselinker_order_id,
+                error_message=error,
+                created_by=log_entry.created_by
+            )
+            db.session.add(error_log)
+            db.session.commit()
+            self.logger.debug("Zapisano log zamówienia z błędem", log_id=error_log.id)
+        except Exception as log_error:
+            db.session.rollback()
+            self.logger.error("Nie udało się zapisać logu zamówienia",
+                            quote_id=log_entry.quote_id,
+                            error=str(log_error))
+
+    def create_orders_for_quotes(self, quote_ids: List[int], user_id: int, config: Dict) -> Dict:
+        """
+        Tworzy zamówienia Baselinker dla wielu wycen (akcja administratora).
+        Pomijane są wyceny, które nie spełniają Quote.is_eligible_for_order().
+
+        Wszystkie wyceny z pozycjami i detalami ładowane są naraz
+        (QuoteAggregate.load_many), zapytania addOrder idą jedną sesją HTTP.
+        Każde zamówienie zapisywane jest własną transakcją zaraz po odpowiedzi
+        API, więc przerwanie akcji nie gubi już utworzonych zamówień. Na czas
+        akcji sesja nie wygasza obiektów przy commicie (expire_on_commit), więc
+        agregaty załadowane na początku pozostają w pamięci.
+
+        Args:
+            config: Konfiguracja zamówienia wspólna dla wszystkich wycen
+                    (client_data jest pomijane - dane klienta zawsze z wyceny)
+
+        Returns:
+            Dict: created, failed, skipped (listy z quote_id) oraz liczniki
+        """
+        from modules.quotes.aggregate import QuoteAggregate
+
+        config = {key: value for key, value in config.items() if key != 'client_data'}
+        unique_ids = list(dict.fromkeys(int(quote_id) for quote_id in quote_ids))
+        aggregates = QuoteAggregate.load_many(unique_ids)
+
+        result = {'created': [], 'failed': [], 'skipped': []}
+        self.logger.info("Rozpoczęcie masowego tworzenia zamówień",
+                        quotes_count=len(unique_ids),
+                        loaded_count=len(aggregates),
+                        user_id=user_id)
+
+        # Commit po każdym zamówieniu nie może wygaszać pozostałych agregatów -
+        # inaczej każdy atrybut kolejnych wycen i pozycji byłby doczytywany osobnym SELECT
+        session = db.session()
+        expire_on_commit = session.expire_on_commit
+        session.expire_on_commit = False
+        self.http_session = requests.Session()
+        try:
+            for quote_id in unique_ids:
+                aggregate = aggregates.get(quote_id)
+                if aggregate is None:
+                    result['skipped'].append({'quote_id': quote_id, 'reason': 'Nie znaleziono wyceny'})
+                    continue
+                quote = aggregate.quote
+                if quote.base_linker_order_id:
+                    result['skipped'].append({'quote_id': quote_id, 'quote_number': quote.quote_number,
+                                              'reason': f'Zamówienie już istnieje ({quote.base_linker_order_id})'})
+                    continue
+                if not aggregate.selected_items:
+                    result['skipped'].append({'quote_id': quote_id, 'quote_number': quote.quote_number,
+                                              'reason': 'Wycena nie ma wybranych produktów'})
+                    continue
+                if not quote.is_eligible_for_order():
+                    reason = ('Wycena nie jest zaakceptowana' if quote.status_id != 3
+                              else 'Brak klienta lub jego danych kontaktowych')
+                    result['skipped'].append({'quote_id': quote_id, 'quote_number': quote.quote_number,
+                                              'reason': reason})
+                    continue
+
+                outcome = self.create_order_from_quote(quote, user_id, config, aggregate)
+                if outcome['success']:
+                    result['created'].append({'quote_id': quote_id, 'quote_number': quote.quote_number,
+                                              'order_id': outcome['order_id']})
+                else:
+                    result['failed'].append({'quote_id': quote_id, 'quote_number': quote.quote_number,
+                                             'error': outcome.get('error')})
+        finally:
+            self.http_session.close()
+            self.http_session = None
+            session.expire_on_commit = expire_on_commit
+
+        result.update({
+            'created_count': len(result['created']),
+            'failed_count': len(result['failed']),
+            'skipped_count': len(result['skipped'])
+        })
+        self.logger.info("Zakończono masowe tworzenie zamówień",
+                        created_count=result['created_count'],
+                        failed_count=result['failed_count'],
+                        skipped_count=result['skipped_count'],
+                        user_id=user_id)
+        return result
     
-    def _prepare_order_data(self, quote, config: Dict) -> Dict:
-        """Przygotowuje dane zamówienia dla API Baselinker"""
+    def _prepare_order_data(self, quote, config: Dict, aggregate=None) -> Dict:
+        """Przygotowuje dane zamówienia dla API Baselinker (z agregatu wyceny, bez zapytań per produkt)"""
         import time
-        from modules.calculator.models import QuoteItemDetails
+        from modules.quotes.aggregate import QuoteAggregate
 
         self.logger.debug("Rozpoczęcie przygotowania danych zamówienia",
                         quote_id=quote.id,
@@ -452,27 +618,14 @@ class BaselinkerService:
         creator = getattr(quote, 'user', None)
         creator_name = f"{creator.first_name} {creator.last_name}" if creator else ''
 
-        # 🔧 POPRAWKA: Zabezpieczenie przed błędem AppenderQuery
-        try:
-            # Konwertuj AppenderQuery na listę przed użyciem len()
-            all_items = list(quote.items)
-            selected_items = [item for item in all_items if item.is_selected]
-    
-            self.logger.debug("Wybrane produkty do zamówienia", 
-                            selected_items_count=len(selected_items),
-                            total_items_count=len(all_items))
-        except Exception as e:
-            # Fallback gdyby był problem z konwersją
-            self.logger.warning("Problem z konwersją quote.items na listę",
-                              quote_id=quote.id,
-                              error=str(e))
-            selected_items = []
-            for item in quote.items:
-                if item.is_selected:
-                    selected_items.append(item)
-    
-            self.logger.debug("Wybrane produkty do zamówienia (fallback)", 
-                            selected_items_count=len(selected_items))
+        # Pozycje i detale wykończenia z agregatu - bez zapytań w pętli po produktach
+        if aggregate is None:
+            aggregate = QuoteAggregate.from_quote(quote)
+        selected_items = aggregate.selected_items
+
+        self.logger.debug("Wybrane produkty do zamówienia", 
+                        selected_items_count=len(selected_items),
+                        total_items_count=len(aggregate.items))
 
         # Sprawdź czy są wybrane produkty
         if not selected_items:
@@ -482,14 +635,9 @@ class BaselinkerService:
         # Przygotuj produkty
         products = []
         for i, item in enumerate(selected_items):
-            # Pobierz szczegóły wykończenia
-            finishing_details = QuoteItemDetails.query.filter_by(
-                quote_id=quote.id, 
-                product_index=item.product_index
-            ).first()
-
-            # Pobierz quantity z QuoteItemDetails
-            quantity = finishing_details.quantity if finishing_details else 1
+            # Szczegóły wykończenia i quantity z QuoteItemDetails (już w pamięci)
+            finishing_details = aggregate.details_by_index.get(item.product_index)
+            quantity = aggregate.quantity(item.product_index)
             self.logger.debug("Przetwarzanie produktu",
                             product_index=item.product_index,
                             variant_code=item.variant_code,
@@ -194,7 +194,12 @@ class BaselinkerModal {
             this.isSubmitting = false;
             this.originalShippingCost = null; // Reset poprzednich wartości
 
-            const response = await fetch(`/baselinker/api/quote/${quoteId}/order-modal-data`);
+            // Listy źródeł i statusów z localStorage - serwer nie wysyła ich ponownie, jeśli wersja się zgadza
+            const cachedDictionaries = this.loadCachedDictionaries();
+            const versionParam = cachedDictionaries
+                ? `?dictionaries_version=${encodeURIComponent(cachedDictionaries.version)}`
+                : '';
+            const response = await fetch(`/baselinker/api/quote/${quoteId}/order-modal-data${versionParam}`);
 
             if (!response.ok) {
                 const errorData = await response.json();
@@ -202,6 +207,7 @@ class BaselinkerModal {
             }
 
             this.modalData = await response.json();
+            this.applyCachedDictionaries(this.modalData.config, cachedDictionaries);
             console.log('[Baselinker] Modal data loaded:', this.modalData);
             console.log('[Baselinker] 🔍 DEBUG - Struktura klienta:', {
                 client: this.modalData.client,
@@ -231,6 +237,32 @@ class BaselinkerModal {
         }
     }
 
+    loadCachedDictionaries() {
+        try {
+            const cached = JSON.parse(localStorage.getItem('baselinker_dictionaries') || 'null');
+            return cached && cached.version ? cached : null;
+        } catch (error) {
+            return null;
+        }
+    }
+
+    applyCachedDictionaries(config, cachedDictionaries) {
+        if (config.dictionaries_unchanged && cachedDictionaries) {
+            config.order_sources = cachedDictionaries.order_sources;
+            config.order_statuses = cachedDictionaries.order_statuses;
+            return;
+        }
+        try {
+            localStorage.setItem('baselinker_dictionaries', JSON.stringify({
+                version: config.dictionaries_version,
+                order_sources: config.order_sources || [],
+                order_statuses: config.order_statuses || []
+            }));
+        } catch (error) {
+            console.warn('[Baselinker] Nie udało się zapisać słowników w localStorage:', error);
+        }
+    }
+
     // NOWA FUNKCJA: Klonuje dane klienta
     cloneClientData(clientData) {
         return {
@@ -0,0 +1,17 @@
+# modules/benchmarks/__init__.py
+"""
+Benchmarki wydajności
+=====================
+
+Offline'owy zestaw pomiarów ścieżek krytycznych (priorytety produkcji,
+statystyki i eksport raportów, lista wycen, stanowiska, parsery nazw,
+generowanie ID) na syntetycznych danych w kilku rozmiarach. Uruchamiany
+komendą ``flask perf-suite`` na osobnej bazie (SQLite lub lokalny MySQL).
+
+``flask startup-profile`` mierzy czas startu workera, RSS i rozkład czasu
+importów (``python -X importtime``).
+"""
+
+from .suite import BenchmarkSuite
+
+__all__ = ['BenchmarkSuite']
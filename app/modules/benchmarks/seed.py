@@ -0,0 +1,257 @@
+# modules/benchmarks/seed.py
+"""
+Generowanie syntetycznych danych do benchmarków
+
+Dane są deterministyczne (stałe ziarno generatora), więc kolejne przebiegi
+na tym samym rozmiarze mierzą dokładnie to samo. Wiersze wstawiane są
+partiami przez bulk_insert_mappings.
+"""
+
+import json
+import random
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from werkzeug.security import generate_password_hash
+
+from extensions import db
+
+SEED = 20250915
+CHUNK_SIZE = 2000
+
+BENCHMARK_USER_EMAIL = 'benchmark@woodpower.local'
+
+SPECIES = [('dębowa', 'dąb'), ('bukowa', 'buk'), ('jesionowa', 'jesion')]
+TECHNOLOGIES = ['lita', 'mikrowczep']
+CLASSES = ['A/B', 'B/B', 'A/A']
+FINISHES = ['surowa', 'lakierowana', 'olejowana']
+STATUSES_ACTIVE = ['czeka_na_wyciecie', 'czeka_na_skladanie', 'czeka_na_pakowanie']
+VOIVODESHIPS = ['mazowieckie', 'małopolskie', 'śląskie', 'wielkopolskie', 'pomorskie', 'dolnośląskie']
+CITIES = ['Warszawa', 'Kraków', 'Katowice', 'Poznań', 'Gdańsk', 'Wrocław']
+STREETS = ['ul. Długa', 'Aleja Niepodległości', 'os. Kwiatowe', 'ulica Polna', 'pl. Wolności', 'Krótka']
+QUOTE_STATUSES = [('Nowa', '#3498db'), ('Zaakceptowana', '#2ecc71'), ('Odrzucona', '#e74c3c')]
+
+
+def product_name(rng):
+    """Nazwa produktu w formacie Baselinker, np. 'Klejonka dębowa lita A/B 120x40x4 cm surowa'"""
+    species = rng.choice(SPECIES)[0]
+    length = rng.choice([60, 80, 100, 120, 150, 200, 250])
+    width = rng.choice([20, 30, 40, 60, 80])
+    thickness = rng.choice([2, 3, 4])
+    separator = rng.choice(['x', '×'])
+    return (f"Klejonka {species} {rng.choice(TECHNOLOGIES)} {rng.choice(CLASSES)} "
+            f"{length}{separator}{width}{separator}{thickness} cm {rng.choice(FINISHES)}")
+
+
+def product_names(count, seed=SEED):
+    rng = random.Random(seed)
+    return [product_name(rng) for _ in range(count)]
+
+
+def delivery_address(index):
+    """Adres dostawy w jednym z formatów spotykanych w Baselinker"""
+    street = STREETS[index % len(STREETS)]
+    house, apartment = index % 97 + 1, index % 23 + 1
+    formats = (f'{street} {house}', f'{street} {house}/{apartment}',
+               f'{street} {house} m. {apartment}', f'{house}/{apartment} {street}')
+    return formats[index % len(formats)]
+
+
+def delivery_address_columns(index):
+    """Kolumny adresu rekordu raportu (bulk insert pomija zdarzenia ORM)"""
+    from modules.reports.utils import DeliveryAddressParser
+
+    address = delivery_address(index)
+    postcode = f'{index % 100:02d}{index % 1000:03d}'
+    street, house, apartment = DeliveryAddressParser.parse(address)
+    return {
+        'delivery_address': address,
+        'delivery_street': street,
+        'delivery_house_number': house or None,
+        'delivery_apartment_number': apartment or None,
+        'delivery_postcode': postcode,
+        'delivery_postcode_normalized': DeliveryAddressParser.normalize_postcode(postcode)
+    }
+
+
+def _insert(model, rows):
+    for start in range(0, len(rows), CHUNK_SIZE):
+        db.session.bulk_insert_mappings(model, rows[start:start + CHUNK_SIZE])
+    db.session.commit()
+
+
+def reset_schema():
+    """Tworzy pusty schemat (wyłącznie na bazie benchmarków)"""
+    db.session.remove()
+    db.drop_all()
+    db.create_all()
+
+
+def seed_all(size, seed=SEED):
+    """
+    Wypełnia bazę danymi w rozmiarze ``size``:
+    size produktów produkcji, size wierszy raportów, size sesji kalkulatora
+    publicznego, size/5 wycen (po 3 pozycje) i size/10 klientów.
+
+    Returns:
+        dict: liczba wstawionych wierszy per tabela oraz id użytkownika benchmarku
+    """
+    from modules.calculator.models import User, Quote, QuoteItem, QuoteItemDetails
+    from modules.clients.models import Client
+    from modules.quotes.models import QuoteStatus
+    from modules.reports.models import BaselinkerReportOrder, ReportsDropdownValue
+    from modules.production.models import ProductionItem, ProductionOrderCounter
+    from modules.public_calculator.models import PublicSession
+
+    rng = random.Random(seed)
+    now = datetime.utcnow().replace(microsecond=0)
+    today = date.today()
+    year = now.year
+    year_code = str(year)[-2:]
+
+    user = User(email=BENCHMARK_USER_EMAIL, password=generate_password_hash('benchmark'),
+                role='admin', first_name='Benchmark', last_name='User', active=True)
+    db.session.add(user)
+    db.session.add_all([QuoteStatus(name=name, color_hex=color) for name, color in QUOTE_STATUSES])
+    db.session.commit()
+    status_ids = [status.id for status in QuoteStatus.query.order_by(QuoteStatus.id).all()]
+
+    # Klienci
+    clients_count = max(1, size // 10)
+    _insert(Client, [{
+        'client_number': f'B{i:07d}',
+        'client_name': f'Klient Benchmark {i:05d}',
+        'email': f'klient{i}@benchmark.local',
+        'phone': f'500{i:06d}',
+        'delivery_city': CITIES[i % len(CITIES)],
+        'delivery_region': VOIVODESHIPS[i % len(VOIVODESHIPS)],
+        'source': 'benchmark'
+    } for i in range(clients_count)])
+    client_ids = [row.id for row in db.session.query(Client.id).order_by(Client.id).all()]
+
+    # Wyceny z pozycjami (3 warianty na produkt) i szczegółami wykończenia
+    quotes_count = max(1, size // 5)
+    _insert(Quote, [{
+        'quote_number': f'B/{i:06d}/{year}',
+        'created_at': now - timedelta(hours=i),
+        'user_id': user.id,
+        'client_id': client_ids[i % len(client_ids)],
+        'status_id': status_ids[i % len(status_ids)],
+        'source': 'benchmark',
+        'total_price': Decimal('1000.00') + i % 500,
+        'public_token': f'BENCH{i:027d}',
+        'is_client_editable': True
+    } for i in range(quotes_count)])
+    quote_ids = [row.id for row in db.session.query(Quote.id).order_by(Quote.id).all()]
+
+    items, details = [], []
+    for quote_id in quote_ids:
+        for variant_index, variant in enumerate(('dab-lity-ab', 'dab-mikrowczep-ab', 'buk-lity-ab')):
+            price = Decimal(rng.randint(200, 2000))
+            items.append({
+                'quote_id': quote_id, 'product_index': 1, 'variant_code': variant,
+                'length_cm': Decimal(120), 'width_cm': Decimal(40), 'thickness_cm': Decimal(4),
+                'volume_m3': Decimal('0.019200'), 'price_per_m3': Decimal(9000), 'multiplier': Decimal('1.00'),
+                'is_selected': variant_index == 0, 'price_netto': price, 'price_brutto': price * Decimal('1.23'),
+                'original_price_netto': price, 'original_price_brutto': price * Decimal('1.23'),
+                'show_on_client_page': True
+            })
+        details.append({'quote_id': quote_id, 'product_index': 1, 'finishing_type': 'Brak',
+                        'finishing_price_netto': Decimal(0), 'finishing_price_brutto': Decimal(0),
+                        'quantity': rng.randint(1, 5)})
+    _insert(QuoteItem, items)
+    _insert(QuoteItemDetails, details)
+
+    # Raporty Baselinker (po 3 produkty na zamówienie)
+    report_rows = []
+    for i in range(size):
+        species, canonical = SPECIES[i % len(SPECIES)]
+        quantity = rng.randint(1, 6)
+        price_net = Decimal(rng.randint(150, 1500))
+        volume = Decimal('0.0192')
+        report_rows.append({
+            'is_manual': False,
+            'created_at': now, 'updated_at': now,
+            'date_created': today - timedelta(days=i % 365),
+            'baselinker_order_id': 900000 + i // 3,
+            'internal_order_number': f'{year_code}_{i // 3 + 1:05d}',
+            'customer_name': f'Klient Benchmark {i // 3 % clients_count:05d}',
+            'delivery_city': CITIES[i % len(CITIES)],
+            'delivery_state': VOIVODESHIPS[i % len(VOIVODESHIPS)],
+            'voivodeship': VOIVODESHIPS[i % len(VOIVODESHIPS)],
+            **delivery_address_columns(i // 3),
+            'caretaker': 'Benchmark User',
+            'delivery_method': 'Kurier',
+            'order_source': 'benchmark',
+            'group_type': 'towar',
+            'product_type': 'klejonka',
+            'finish_state': 'surowy',
+            'wood_species': canonical,
+            'technology': 'lity',
+            'wood_class': 'A/B',
+            'length_cm': Decimal(120), 'width_cm': Decimal(40), 'thickness_cm': Decimal(4),
+            'quantity': quantity,
+            'price_net': price_net, 'price_gross': price_net * Decimal('1.23'),
+            'value_net': price_net * quantity, 'value_gross': price_net * quantity * Decimal('1.23'),
+            'volume_per_piece': volume, 'total_volume': volume * quantity,
+            'total_m3': volume * quantity, 'order_amount_net': price_net * quantity,
+            'price_per_m3': Decimal(9000),
+            'current_status': 'W produkcji - surowe' if i % 4 else 'Zamówienie spakowane',
+            'baselinker_status_id': 138619,
+            'raw_product_name': product_name(rng)
+        })
+    _insert(BaselinkerReportOrder, report_rows)
+    ReportsDropdownValue.refresh()
+
+    # Produkty produkcji
+    item_rows = []
+    for i in range(size):
+        order_number = i // 3 + 1
+        species, canonical = SPECIES[i % len(SPECIES)]
+        item_rows.append({
+            'short_product_id': f'{year_code}_{order_number:05d}_{i % 3 + 1}',
+            'internal_order_number': f'{year_code}_{order_number:05d}',
+            'product_sequence_in_order': i % 3 + 1,
+            'baselinker_order_id': 900000 + i // 3,
+            'baselinker_product_id': str(i),
+            'original_product_name': product_name(rng),
+            'parsed_wood_species': canonical,
+            'parsed_technology': 'lity',
+            'parsed_wood_class': 'A/B',
+            'parsed_length_cm': Decimal(120), 'parsed_width_cm': Decimal(40),
+            'parsed_thickness_cm': Decimal(rng.choice([2, 3, 4])),
+            'parsed_finish_state': 'surowy',
+            'volume_m3': Decimal('0.0192'),
+            'unit_price_net': Decimal(500), 'total_value_net': Decimal(500),
+            'client_name': f'Klient Benchmark {i // 3 % clients_count:05d}',
+            'current_status': STATUSES_ACTIVE[i % len(STATUSES_ACTIVE)] if i % 5 else 'spakowane',
+            'deadline_date': today + timedelta(days=i % 30),
+            'payment_date': now - timedelta(days=i % 60),
+            'priority_rank': i + 1,
+            'priority_manual_override': False,
+            'created_at': now - timedelta(minutes=i)
+        })
+    _insert(ProductionItem, item_rows)
+    db.session.add(ProductionOrderCounter(year=year, current_counter=size // 3 + 1))
+    db.session.commit()
+
+    # Sesje kalkulatora publicznego
+    _insert(PublicSession, [{
+        'timestamp': now - timedelta(minutes=i),
+        'inputs': json.dumps({'length': 120, 'width': 40, 'thickness': 4, 'quantity': 1}),
+        'variant': 'dab-lity-ab', 'finishing': 'brak', 'color': None,
+        'duration_ms': rng.randint(100, 5000), 'user_agent': 'benchmark', 'ip_address': '127.0.0.1',
+        'dim_length': '120', 'dim_width': '40', 'dim_thickness': '4', 'dims_key': '120x40x4'
+    } for i in range(size)])
+
+    return {
+        'user_id': user.id,
+        'rows': {
+            'clients': clients_count,
+            'quotes': quotes_count,
+            'quote_items': len(items),
+            'baselinker_reports_orders': size,
+            'prod_items': size,
+            'public_sessions': size
+        }
+    }
@@ -0,0 +1,90 @@
+# modules/benchmarks/startup.py
+"""
+Profil startu procesu aplikacji
+
+Uruchamia ``import app`` w osobnym interpreterze z ``-X importtime`` (tak jak
+robi to worker Passengera po forku) i zwraca czas startu, RSS po imporcie,
+najdroższe importy oraz listę ciężkich bibliotek załadowanych przy starcie.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+# Biblioteki, które powinny być ładowane dopiero przy pierwszym użyciu
+HEAVY_MODULES = ('weasyprint', 'pandas', 'numpy', 'openpyxl', 'PIL', 'trimesh')
+
+_PROBE = r"""
+import json, resource, sys, time
+started = time.perf_counter()
+import app
+elapsed = time.perf_counter() - started
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+heavy = [name for name in %r if name in sys.modules]
+print('STARTUP_PROFILE ' + json.dumps({'seconds': elapsed, 'rss_kb': rss_kb, 'heavy_loaded': heavy}))
+"""
+
+
+def _parse_importtime(stderr):
+    """Wiersze 'import time: self | cumulative | moduł' -> lista słowników"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|')
+            depth = (len(name) - len(name.lstrip())) // 2
+            entries.append({
+                'module': name.strip(),
+                'self_ms': int(self_us) / 1000,
+                'cumulative_ms': int(cumulative_us) / 1000,
+                'depth': depth
+            })
+        except ValueError:
+            continue
+    return entries
+
+
+def profile_startup(top=25, app_root=None):
+    """
+    Returns:
+        dict: seconds, rss_mb, heavy_loaded, top_imports (wg czasu skumulowanego),
+              packages (czas własny zsumowany per pakiet główny)
+    """
+    app_root = app_root or os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', _PROBE % (HEAVY_MODULES,)],
+        cwd=app_root, capture_output=True, text=True, timeout=300
+    )
+
+    probe = None
+    for line in completed.stdout.splitlines():
+        if line.startswith('STARTUP_PROFILE '):
+            probe = json.loads(line[len('STARTUP_PROFILE '):])
+    if probe is None:
+        raise RuntimeError(f"Import aplikacji nie powiódł się:\n{completed.stderr[-3000:]}")
+
+    entries = _parse_importtime(completed.stderr)
+
+    packages = {}
+    for entry in entries:
+        root = entry['module'].split('.')[0]
+        packages[root] = packages.get(root, 0) + entry['self_ms']
+
+    # RSS: ru_maxrss jest w KB na Linuksie i w bajtach na macOS
+    rss_mb = probe['rss_kb'] / 1024 if sys.platform != 'darwin' else probe['rss_kb'] / 1024 / 1024
+
+    return {
+        'seconds': round(probe['seconds'], 3),
+        'rss_mb': round(rss_mb, 1),
+        'heavy_loaded': probe['heavy_loaded'],
+        'top_imports': [
+            {'module': e['module'], 'cumulative_ms': round(e['cumulative_ms'], 1), 'self_ms': round(e['self_ms'], 1)}
+            for e in sorted(entries, key=lambda e: -e['cumulative_ms'])[:top]
+        ],
+        'packages': [
+            {'package': name, 'self_ms': round(ms, 1)}
+            for name, ms in sorted(packages.items(), key=lambda item: -item[1])[:top]
+        ]
+    }
@@ -0,0 +1,236 @@
+# modules/benchmarks/suite.py
+"""
+Zestaw benchmarków ścieżek krytycznych
+
+Każdy przypadek jest mierzony ``repeat`` razy na świeżo wygenerowanych
+danych w kilku rozmiarach. Wynik (JSON) zawiera czasy min/mediana/max,
+liczbę zapytań SQL i metadane przebiegu (commit, dialekt bazy), więc
+pliki z różnych commitów można porównać przez ``compare_results``.
+
+Uruchamiać wyłącznie na osobnej bazie - schemat jest kasowany:
+
+    CRM_DATABASE_URI=sqlite:////tmp/crm_bench.db flask perf-suite --sizes 1000,10000 --output bench.json
+    CRM_DATABASE_URI=mysql+pymysql://root@localhost/crm_bench flask perf-suite --compare bench.json
+"""
+
+import os
+import platform
+import statistics
+import subprocess
+import time
+from datetime import date, datetime, timedelta
+
+from flask import current_app
+from sqlalchemy.engine import make_url
+
+from extensions import db
+from modules.logging import get_structured_logger
+from modules.logging.performance import performance_monitor
+from . import seed
+
+bench_logger = get_structured_logger('benchmarks.suite')
+
+
+class BenchmarkSuite:
+    """Seedowanie danych i pomiar przypadków"""
+
+    DEFAULT_SIZES = (1000, 10000)
+    DEFAULT_REPEAT = 3
+    PARSER_SAMPLE = 2000
+    ID_ORDERS = 50
+    REGRESSION_THRESHOLD = 0.20   # +20% mediany = regresja
+    SAFE_DATABASE_MARKERS = ('bench', 'test')
+
+    @classmethod
+    def check_database(cls, uri):
+        """
+        Zezwala tylko na SQLite lub bazę, której nazwa wskazuje na testową,
+        bo benchmark kasuje i tworzy schemat od nowa.
+        """
+        url = make_url(uri)
+        if url.get_backend_name() == 'sqlite':
+            return
+        name = (url.database or '').lower()
+        if not any(marker in name for marker in cls.SAFE_DATABASE_MARKERS):
+            raise RuntimeError(
+                f"Baza '{url.database}' nie wygląda na testową - ustaw CRM_DATABASE_URI "
+                f"na SQLite lub bazę z 'bench'/'test' w nazwie (albo użyj --force)")
+
+    # ------------------------------------------------------------------
+    # Pomiar
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _measure(func, repeat, setup=None):
+        timings, queries = [], []
+        for _ in range(repeat):
+            if setup:
+                setup()
+            with performance_monitor.track('benchmark') as stats:
+                started = time.perf_counter()
+                func()
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(stats.query_count)
+            db.session.rollback()
+        return {
+            'min_ms': round(min(timings), 2),
+            'median_ms': round(statistics.median(timings), 2),
+            'max_ms': round(max(timings), 2),
+            'queries': max(queries)
+        }
+
+    @classmethod
+    def _cases(cls, app, user_id, size):
+        """Lista (nazwa, funkcja, setup) dla jednego rozmiaru danych"""
+        from modules.production.services.parser_service import get_parser_service
+        from modules.production.services.priority_service import recalculate_all_priorities
+        from modules.production.services.id_generator import ProductIDGenerator
+        from modules.production.routers.station_routers import get_products_for_station
+        from modules.reports.models import BaselinkerReportOrder
+        from modules.reports.parser import ProductNameParser
+        from modules.reports.utils import DeliveryAddressParser
+
+        names = seed.product_names(min(size, cls.PARSER_SAMPLE))
+        addresses = [seed.delivery_address(index) for index in range(size)]
+        production_parser = get_parser_service()
+        reports_parser = ProductNameParser()
+
+        client = app.test_client()
+        with client.session_transaction() as flask_session:
+            flask_session['user_email'] = seed.BENCHMARK_USER_EMAIL
+            flask_session['user_id'] = user_id
+
+        date_to = date.today()
+        date_from = date_to - timedelta(days=90)
+        report_params = {'date_from': date_from.isoformat(), 'date_to': date_to.isoformat()}
+
+        def http_get(path, params=None):
+            def run():
+                response = client.get(path, query_string=params)
+                if response.status_code != 200:
+                    raise RuntimeError(f"{path}: HTTP {response.status_code}")
+                response.get_data()
+            return run
+
+        order_ids = iter(range(2_000_000, 3_000_000))
+
+        def generate_ids():
+            for _ in range(cls.ID_ORDERS):
+                ProductIDGenerator.generate_product_id_for_order(next(order_ids), 3)
+
+        return [
+            ('parse_product_name_production', lambda: [production_parser.parse_product_name(n, use_cache=False) for n in names], None),
+            ('parse_product_name_reports', lambda: [reports_parser.parse_product_name(n) for n in names], None),
+            ('parse_delivery_addresses', lambda: [DeliveryAddressParser.parse(a) for a in addresses],
+             DeliveryAddressParser.clear_cache),
+            ('generate_product_ids_%d_orders' % cls.ID_ORDERS, generate_ids, ProductIDGenerator.clear_order_cache),
+            ('recalculate_all_priorities', recalculate_all_priorities, None),
+            ('reports_get_statistics', lambda: BaselinkerReportOrder.get_statistics(BaselinkerReportOrder.query), None),
+            ('get_products_for_station_cutting', lambda: get_products_for_station('cutting', limit=50), None),
+            ('get_products_for_station_packaging', lambda: get_products_for_station('packaging', limit=50), None),
+            ('http_reports_api_data', http_get('/reports/api/data', report_params), None),
+            ('http_reports_map_statistics', http_get('/reports/api/map-statistics', report_params), None),
+            ('http_reports_api_data_filtered', http_get('/reports/api/data', dict(
+                report_params, filter_current_status='W produkcji - surowe', filter_wood_species='dąb')), None),
+            ('http_reports_dropdown_customer_name', http_get('/reports/api/dropdown-values/customer_name'), None),
+            ('http_quotes_api_quotes', http_get('/quotes/api/quotes'), None),
+            ('http_reports_export_excel', http_get('/reports/api/export-excel', report_params), None),
+            ('http_reports_export_routimo', http_get('/reports/api/export-routimo', report_params), None),
+        ]
+
+    @classmethod
+    def run(cls, sizes=None, repeat=None, only=None):
+        """
+        Wykonuje pełny zestaw dla każdego rozmiaru.
+
+        Args:
+            sizes (list[int]): Rozmiary danych (liczba produktów/wierszy raportu)
+            repeat (int): Liczba powtórzeń każdego przypadku
+            only (list[str]): Opcjonalnie tylko przypadki zawierające podane frazy
+
+        Returns:
+            dict: meta + wyniki per rozmiar
+        """
+        app = current_app._get_current_object()
+        sizes = sizes or cls.DEFAULT_SIZES
+        repeat = repeat or cls.DEFAULT_REPEAT
+
+        result = {'meta': cls._meta(app, repeat), 'sizes': {}}
+
+        for size in sizes:
+            started = time.perf_counter()
+            seed.reset_schema()
+            seeded = seed.seed_all(size)
+            size_result = {
+                'seed_seconds': round(time.perf_counter() - started, 2),
+                'rows': seeded['rows'],
+                'cases': {}
+            }
+
+            for name, func, setup in cls._cases(app, seeded['user_id'], size):
+                if only and not any(fragment in name for fragment in only):
+                    continue
+                try:
+                    size_result['cases'][name] = cls._measure(func, repeat, setup)
+                except Exception as e:
+                    db.session.rollback()
+                    size_result['cases'][name] = {'error': f'{type(e).__name__}: {e}'}
+                bench_logger.info("Benchmark", size=size, case=name, **size_result['cases'][name])
+
+            result['sizes'][str(size)] = size_result
+
+        db.session.remove()
+        return result
+
+    @staticmethod
+    def _meta(app, repeat):
+        try:
+            commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                    cwd=app.root_path, timeout=5).stdout.strip() or None
+        except Exception:
+            commit = None
+
+        import sqlalchemy
+        return {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'commit': commit,
+            'python': platform.python_version(),
+            'sqlalchemy': sqlalchemy.__version__,
+            'database': db.engine.dialect.name,
+            'host': platform.node(),
+            'pid': os.getpid(),
+            'repeat': repeat
+        }
+
+    # ------------------------------------------------------------------
+    # Porównanie
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def compare_results(cls, baseline, current, threshold=None):
+        """
+        Porównuje mediany dwóch wyników.
+
+        Returns:
+            list[dict]: size, case, baseline_ms, current_ms, change_pct, regression
+        """
+        threshold = cls.REGRESSION_THRESHOLD if threshold is None else threshold
+        rows = []
+        for size, size_result in current['sizes'].items():
+            baseline_cases = baseline.get('sizes', {}).get(size, {}).get('cases', {})
+            for name, case in size_result['cases'].items():
+                before = baseline_cases.get(name, {})
+                if 'median_ms' not in case or 'median_ms' not in before:
+                    continue
+                change = (case['median_ms'] - before['median_ms']) / before['median_ms'] if before['median_ms'] else 0
+                rows.append({
+                    'size': size,
+                    'case': name,
+                    'baseline_ms': before['median_ms'],
+                    'current_ms': case['median_ms'],
+                    'change_pct': round(change * 100, 1),
+                    'queries_before': before.get('queries'),
+                    'queries_after': case.get('queries'),
+                    'regression': change > threshold
+                })
+        return rows
@@ -0,0 +1,370 @@
+# modules/calculator/globkurier.py
+"""
+Klient API GlobKurier (wycena wysyłki w kalkulatorze)
+
+Endpoint /calculator/shipping_quote logował się przez /auth/login przy każdym
+wywołaniu, bez timeoutów i na nowym połączeniu. GlobKurierClient:
+
+- trzyma token do wygaśnięcia (TOKEN_TTL, ponowne logowanie po 401),
+- używa jednej sesji requests z pulą połączeń i timeoutami,
+- zapamiętuje wyceny (TTLCache) po zaokrąglonych wymiarach, wadze
+  i parze kodów pocztowych - te same paczki wyceniane są wielokrotnie
+  przy poprawianiu wyceny przez handlowca,
+- wycenia kilka paczek równolegle (quote_many).
+
+Klient jest per proces i per konfiguracja (GlobKurierClient.for_app).
+Adres API bierze z GLOB_KURIER.endpoint, więc można go skierować na lokalny
+stub (run_stub_server) - tak działa ``flask globkurier-loadtest --stub``.
+"""
+
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from modules.identity.service import TTLCache
+from modules.logging import get_structured_logger
+
+globkurier_logger = get_structured_logger('calculator.globkurier')
+
+TOKEN_TTL = 50 * 60          # sekundy - token odświeżany przed wygaśnięciem sesji API
+QUOTE_TTL = 15 * 60          # sekundy - ceny przewoźników zmieniają się rzadko
+QUOTE_CACHE_ENTRIES = 2000
+TIMEOUT = (3.05, 15)         # (połączenie, odczyt) w sekundach
+POOL_SIZE = 8
+BATCH_WORKERS = 4
+BATCH_MAX_PACKAGES = 20
+VAT_RATE = 1.23
+
+
+class GlobKurierError(Exception):
+    """Błąd API GlobKurier (status - kod HTTP odpowiedzi dla widoku)"""
+
+    def __init__(self, message, status=500, details=None):
+        super().__init__(message)
+        self.status = status
+        self.details = details
+
+
+def build_query_params(shipping_params):
+    """
+    Parametry /products z danych paczki z kalkulatora
+
+    Do każdego wymiaru doliczane jest 5 cm (opakowanie) i wynik zaokrąglany do
+    pełnych centymetrów, waga - do dwóch miejsc po przecinku. Te same wartości
+    tworzą klucz cache wyceny.
+
+    Raises:
+        ValueError: Błędne lub niedodatnie wymiary / waga
+    """
+    try:
+        original_length = float(shipping_params.get("length", 0))
+        original_width = float(shipping_params.get("width", 0))
+        original_height = float(shipping_params.get("height", 0))
+        weight = float(shipping_params.get("weight", 0))
+    except (TypeError, ValueError):
+        raise ValueError("Błędne dane wejściowe")
+
+    if original_length <= 0 or original_width <= 0 or original_height <= 0 or weight <= 0:
+        raise ValueError("Nieprawidlowe wymiary lub waga")
+
+    return {
+        "width": int(round(original_width + 5)),
+        "height": int(round(original_height + 5)),
+        "length": int(round(original_length + 5)),
+        "weight": f"{round(weight, 2):.2f}",
+        "quantity": 1,
+        "senderCountryId": str(shipping_params.get("senderCountryId", "1")),
+        "receiverCountryId": str(shipping_params.get("receiverCountryId", "1")),
+        "senderPostCode": str(shipping_params.get("senderPostCode", "01-001")).strip().upper(),
+        "receiverPostCode": str(shipping_params.get("receiverPostCode", "41-100")).strip().upper()
+    }
+
+
+def _quote_key(query_params):
+    return tuple(query_params[name] for name in sorted(query_params))
+
+
+def _parse_products(quote_data):
+    """Lista ofert przewoźników z odpowiedzi /products (kategorie -> produkty)"""
+    all_products = []
+    for category in quote_data:
+        items = quote_data[category]
+        if isinstance(items, list):
+            all_products.extend(items)
+        else:
+            all_products.append(items)
+
+    return [
+        {
+            "carrierName": product.get("carrierName", "Nieznany"),
+            "grossPrice": product.get("grossPrice", ""),
+            "netPrice": round(product.get("grossPrice", 0) / VAT_RATE, 2) if product.get("grossPrice") else "",
+            "carrierLogoLink": product.get("carrierLogoLink", "")
+        }
+        for product in all_products
+    ]
+
+
+class GlobKurierClient:
+    """Klient API GlobKurier z cache tokenu i wycen"""
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, endpoint, login, password, timeout=TIMEOUT, token_ttl=TOKEN_TTL,
+                 quote_ttl=QUOTE_TTL, pool_size=POOL_SIZE):
+        self.endpoint = endpoint.rstrip('/')
+        self.login = login
+        self.password = password
+        self.timeout = timeout
+        self.token_ttl = token_ttl
+
+        self.http_session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.http_session.mount('https://', adapter)
+        self.http_session.mount('http://', adapter)
+        self.http_session.headers.update({"accept-language": "en"})
+
+        self._token = None
+        self._token_expires = 0.0
+        self._token_lock = threading.Lock()
+        self._quotes = TTLCache(quote_ttl, QUOTE_CACHE_ENTRIES)
+
+        self.stats = {'logins': 0, 'api_calls': 0}
+
+    @classmethod
+    def for_app(cls, app):
+        """
+        Klient dla konfiguracji GLOB_KURIER aplikacji (jeden na proces)
+
+        Raises:
+            GlobKurierError: Brak konfiguracji
+        """
+        config = app.config.get("GLOB_KURIER")
+        if not config:
+            raise GlobKurierError("Brak konfiguracji GlobKURIER", 500)
+
+        key = (config["endpoint"], config["login"], config["password"])
+        with cls._instances_lock:
+            client = cls._instances.get(key)
+            if client is None:
+                client = cls(config["endpoint"], config["login"], config["password"],
+                             timeout=tuple(config.get("timeout", TIMEOUT)),
+                             token_ttl=config.get("token_ttl", TOKEN_TTL),
+                             quote_ttl=config.get("quote_ttl", QUOTE_TTL))
+                cls._instances[key] = client
+            return client
+
+    # ------------------------------------------------------------------
+    # Autoryzacja
+    # ------------------------------------------------------------------
+
+    def _get_token(self, force=False):
+        with self._token_lock:
+            if not force and self._token and time.monotonic() < self._token_expires:
+                return self._token
+
+            try:
+                response = self.http_session.post(
+                    self.endpoint + "/auth/login",
+                    json={"email": self.login, "password": self.password},
+                    timeout=self.timeout
+                )
+            except requests.RequestException as e:
+                raise GlobKurierError("Wyjatek podczas logowania: " + str(e), 500)
+
+            self.stats['logins'] += 1
+            if response.status_code != 200:
+                globkurier_logger.error("Błąd logowania do GlobKurier", status=response.status_code)
+                raise GlobKurierError("Blad logowania do GlobKurier", 401, {"status": response.status_code})
+
+            token = response.json().get("token")
+            if not token:
+                raise GlobKurierError("Nie otrzymano tokena", 401)
+
+            self._token = token
+            self._token_expires = time.monotonic() + self.token_ttl
+            return token
+
+    # ------------------------------------------------------------------
+    # Wyceny
+    # ------------------------------------------------------------------
+
+    def quote(self, query_params):
+        """
+        Oferty przewoźników dla paczki (z cache, jeśli była już wyceniana)
+
+        Args:
+            query_params: Wynik build_query_params()
+
+        Returns:
+            list[dict]: carrierName, grossPrice, netPrice, carrierLogoLink
+
+        Raises:
+            GlobKurierError
+        """
+        key = _quote_key(query_params)
+        cached = self._quotes.get(key)
+        if cached is not None:
+            return cached
+
+        result = self._fetch_products(query_params)
+        self._quotes.set(key, result)
+        return result
+
+    def _fetch_products(self, query_params, retry_auth=True):
+        token = self._get_token()
+        try:
+            response = self.http_session.get(
+                self.endpoint + "/products",
+                headers={"x-auth-token": token},
+                params=query_params,
+                timeout=self.timeout
+            )
+        except requests.RequestException as e:
+            raise GlobKurierError("Wyjatek podczas pobierania wyceny: " + str(e), 500)
+
+        self.stats['api_calls'] += 1
+        if response.status_code == 401 and retry_auth:
+            # Token wygasł po stronie API wcześniej niż TOKEN_TTL
+            self._get_token(force=True)
+            return self._fetch_products(query_params, retry_auth=False)
+
+        if response.status_code != 200:
+            globkurier_logger.error("Błąd pobierania wyceny GlobKurier",
+                                    status=response.status_code, body=response.text[:500])
+            raise GlobKurierError("Błąd pobierania wyceny", response.status_code,
+                                  {"status": response.status_code, "treść": response.text})
+
+        try:
+            return _parse_products(response.json())
+        except (ValueError, TypeError, AttributeError) as e:
+            raise GlobKurierError("Wyjatek podczas pobierania wyceny: " + str(e), 500)
+
+    def quote_many(self, packages, max_workers=BATCH_WORKERS):
+        """
+        Wycena kilku paczek równolegle (identyczne paczki wyceniane raz)
+
+        Args:
+            packages: Lista parametrów z build_query_params()
+
+        Returns:
+            list[dict]: dla każdej paczki {"quotes": [...]} albo {"error": ..., "status": ...}
+        """
+        unique = {}
+        for query_params in packages:
+            unique.setdefault(_quote_key(query_params), query_params)
+
+        # Token pobierany raz przed rozesłaniem zapytań
+        self._get_token()
+
+        def run(query_params):
+            try:
+                return {"quotes": self.quote(query_params)}
+            except GlobKurierError as e:
+                return {"error": str(e), "status": e.status}
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(unique)) or 1) as executor:
+            results = dict(zip(unique, executor.map(run, unique.values())))
+
+        return [results[_quote_key(query_params)] for query_params in packages]
+
+    def clear_cache(self):
+        self._quotes.clear()
+
+    def get_stats(self):
+        return dict(self.stats, cache_hits=self._quotes.hits, cache_misses=self._quotes.misses)
+
+
+# ----------------------------------------------------------------------
+# Lokalny stub API i test obciążeniowy
+# ----------------------------------------------------------------------
+
+def run_stub_server(host='127.0.0.1', port=0, latency=0.05):
+    """
+    Uruchamia w tle lokalny stub API GlobKurier (/auth/login, /products)
+
+    Returns:
+        tuple: (server, endpoint) - server.shutdown() zatrzymuje stub
+    """
+    class StubHandler(BaseHTTPRequestHandler):
+        def _send(self, status, payload):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            time.sleep(latency)
+            if urlparse(self.path).path.endswith('/auth/login'):
+                return self._send(200, {"token": "stub-token"})
+            self._send(404, {"error": "not found"})
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            time.sleep(latency)
+            if not url.path.endswith('/products'):
+                return self._send(404, {"error": "not found"})
+            if self.headers.get('x-auth-token') != "stub-token":
+                return self._send(401, {"error": "unauthorized"})
+            params = parse_qs(url.query)
+            weight = float(params.get('weight', ['1'])[0])
+            self._send(200, {
+                "standard": [{"carrierName": "Stub Kurier", "grossPrice": round(20 + weight * 1.5, 2)}],
+                "pallet": {"carrierName": "Stub Paleta", "grossPrice": round(150 + weight * 0.5, 2)}
+            })
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, name='globkurier-stub', daemon=True)
+    thread.start()
+    return server, f'http://{host}:{server.server_address[1]}/v1'
+
+
+def run_load_test(client, requests_count=200, distinct_packages=10, batch_size=5):
+    """
+    Wyceny pojedyncze (z powtórzeniami paczek) i wsadowe
+
+    Returns:
+        dict: czasy, liczba logowań i wywołań API, trafienia cache
+    """
+    packages = [
+        build_query_params({"length": 100 + index * 10, "width": 60, "height": 4, "weight": 5 + index})
+        for index in range(distinct_packages)
+    ]
+    client.clear_cache()
+    before = client.get_stats()
+
+    started = time.perf_counter()
+    for index in range(requests_count):
+        client.quote(packages[index % distinct_packages])
+    single_seconds = time.perf_counter() - started
+
+    client.clear_cache()
+    started = time.perf_counter()
+    client.quote_many(packages[:batch_size])
+    batch_seconds = time.perf_counter() - started
+
+    after = client.get_stats()
+    return {
+        'requests': requests_count,
+        'distinct_packages': distinct_packages,
+        'single_seconds': round(single_seconds, 3),
+        'single_ms_per_request': round(single_seconds / requests_count * 1000, 2) if requests_count else None,
+        'batch_packages': batch_size,
+        'batch_seconds': round(batch_seconds, 3),
+        'logins': after['logins'] - before['logins'],
+        'api_calls': after['api_calls'] - before['api_calls'],
+        'cache_hits': after['cache_hits'] - before['cache_hits']
+    }
@@ -49,6 +49,18 @@ class Quote(db.Model):
     # POLE: Mnożnik (grupa cenowa) przypisany do wyceny
     quote_multiplier = db.Column(db.Numeric(5, 2))
     quote_client_type = db.Column(db.String(100))  # Nazwa grupy cenowej
+
+    # Zdenormalizowane sumy wybranych pozycji (QuoteAggregate.refresh_totals po każdej zmianie)
+    total_products_netto = db.Column(db.Numeric(10, 2))
+    total_products_brutto = db.Column(db.Numeric(10, 2))
+    total_discount_netto = db.Column(db.Numeric(10, 2))
+    total_discount_brutto = db.Column(db.Numeric(10, 2))
+    total_finishing_netto = db.Column(db.Numeric(10, 2))
+    total_finishing_brutto = db.Column(db.Numeric(10, 2))
+    totals_updated_at = db.Column(db.DateTime)
+
+    # Wersja strony klienta - podbijana przy każdej zmianie widocznej dla klienta (ClientQuoteCache)
+    client_cache_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     # POPRAWIONE RELACJE - bez konfliktów
     user = db.relationship('User', foreign_keys=[user_id], backref='quotes')
@@ -214,7 +226,12 @@ class QuoteItem(db.Model):
     def get_quantity(self):
         """
         Pobiera ilość dla tego wariantu z QuoteItemDetails lub zwraca 1 jako domyślną
+        (bez zapytania, jeśli pozycja została załadowana przez QuoteAggregate)
         """
+        cached = self.__dict__.get('_cached_quantity')
+        if cached is not None:
+            return cached
+
         try:
             # Importuj dynamicznie aby uniknąć circular imports
             from extensions import db
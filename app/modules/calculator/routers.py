@@ -9,12 +9,14 @@ from extensions import db
 from flask import Blueprint, render_template, request, jsonify
 from modules.calculator.models import Quote, QuoteItem, QuoteCounter, QuoteLog, Multiplier, User
 from modules.clients.models import Client
+from modules.identity import IdentityService
 from datetime import datetime
 from sqlalchemy.exc import SQLAlchemyError
 import logging
-import requests
 from modules.quotes.models import QuoteStatus
 from modules.calculator.models import QuoteItemDetails
+from modules.calculator.globkurier import GlobKurierClient, GlobKurierError, build_query_params, BATCH_MAX_PACKAGES
+from modules.rate_limit import rate_limit, client_ip
 
 calculator_bp = Blueprint('calculator', __name__, template_folder='templates', static_folder='static')
 
@@ -25,7 +27,10 @@ def calculator_home():
     if not user_email:
         return redirect(url_for('login'))
 
-    user = User.query.filter_by(email=user_email).first()
+    identity = IdentityService.current()
+    if not identity:
+        return redirect(url_for('login'))
+    user = identity.get_user()
     user_role = user.role
     user_multiplier = user.multiplier.multiplier if user.multiplier else 1.0
     
@@ -51,129 +56,72 @@ def calculator_home():
 
     return render_template("calculator.html", user_email=user_email, user_id=user_id, prices_json=prices_json, multipliers_json=multipliers_json, user_role=user_role, user_multiplier=user_multiplier)
 
+def _shipping_rate_key():
+    # Limit wycen GlobKurier per użytkownik (biuro wychodzi jednym IP)
+    return f"user:{session.get('user_id') or client_ip()}"
+
+
 @calculator_bp.route('/shipping_quote', methods=['POST'])
+@rate_limit(max_requests=60, window=60, scope='shipping_quote', key_func=_shipping_rate_key)
 def shipping_quote():
     current_app.logger.info(">>> shipping_quote: endpoint wywołany")
+    if not session.get('user_email'):
+        return jsonify({"error": "Brak sesji uzytkownika."}), 401
     
     shipping_params = request.get_json()
     if not shipping_params:
         current_app.logger.error(">>> shipping_quote: Brak danych wysyłki")
         return jsonify({"error": "Brak danych wysyłki"}), 400
 
+    # Wymiary +5 cm i zaokrąglenie, waga do 2 miejsc - te same wartości są kluczem cache wyceny
     try:
-        original_length = float(shipping_params.get("length", 0))
-        original_width  = float(shipping_params.get("width", 0))
-        original_height = float(shipping_params.get("height", 0))
-        weight          = float(shipping_params.get("weight", 0))
-    except ValueError:
-        current_app.logger.error(">>> shipping_quote: Błędne dane wejściowe")
-        return jsonify({"error": "Błędne dane wejściowe"}), 400
-
-    if original_length <= 0 or original_width <= 0 or original_height <= 0 or weight <= 0:
-        current_app.logger.error(">>> shipping_quote: Nieprawidlowe wymiary lub waga")
-        return jsonify({"error": "Nieprawidlowe wymiary lub waga"}), 400
-
-    # Dodajemy 5 cm do każdego wymiaru i konwertujemy na liczbę całkowitą
-    length_int = int(round(original_length + 5))
-    width_int  = int(round(original_width + 5))
-    height_int = int(round(original_height + 5))
-
-    # Zaokrąglamy wagę do dwóch miejsc po przecinku i formatujemy jako string
-    weight_2dec = round(weight, 2)
-    weight_str = f"{weight_2dec:.2f}"
-
-    quantity = 1
-    senderCountryId   = shipping_params.get("senderCountryId", "1")
-    receiverCountryId = shipping_params.get("receiverCountryId", "1")
-    senderPostCode    = shipping_params.get("senderPostCode", "01-001")
-    receiverPostCode  = shipping_params.get("receiverPostCode", "41-100")
-
-    query_params = {
-        "width": width_int,
-        "height": height_int,
-        "length": length_int,
-        "weight": weight_str,
-        "quantity": quantity,
-        "senderCountryId": senderCountryId,
-        "receiverCountryId": receiverCountryId,
-        "senderPostCode": senderPostCode,
-        "receiverPostCode": receiverPostCode
-    }
-
-    glob_config = current_app.config.get("GLOB_KURIER")
-    if not glob_config:
-        current_app.logger.error(">>> shipping_quote: Brak konfiguracji GlobKURIER")
-        return jsonify({"error": "Brak konfiguracji GlobKURIER"}), 500
-
-    # Logowanie do GlobKurier
-    auth_url = glob_config["endpoint"] + "/auth/login"
-    login_payload = {
-        "email": glob_config["login"],
-        "password": glob_config["password"]
-    }
-
-    headers = {
-        "Content-Type": "application/json",
-        "accept-language": "en"
-    }
+        query_params = build_query_params(shipping_params)
+    except ValueError as e:
+        current_app.logger.error(">>> shipping_quote: %s", e)
+        return jsonify({"error": str(e)}), 400
 
+    # Token GlobKurier i wyceny paczek są cache'owane w kliencie (per proces)
     try:
-        auth_response = requests.post(auth_url, headers=headers, json=login_payload)
-        if auth_response.status_code != 200:
-            current_app.logger.error(">>> shipping_quote: Blad logowania, status: %s", auth_response.status_code)
-            return jsonify({"error": "Blad logowania do GlobKurier", "status": auth_response.status_code}), 401
-        auth_data = auth_response.json()
-        token = auth_data.get("token")
-        if not token:
-            current_app.logger.error(">>> shipping_quote: Nie otrzymano tokena")
-            return jsonify({"error": "Nie otrzymano tokena"}), 401
-    except Exception as e:
-        current_app.logger.error(">>> shipping_quote: Wyjatek podczas logowania: %s", e)
-        return jsonify({"error": "Wyjatek podczas logowania: " + str(e)}), 500
-
-    # Wysyłamy zapytanie do /products
-    products_url = glob_config["endpoint"] + "/products"
-    headers_quote = {
-        "accept-language": "en",
-        "x-auth-token": token
-    }
-    try:
-        quote_response = requests.get(products_url, headers=headers_quote, params=query_params)
-        if quote_response.status_code != 200:
-            current_app.logger.error(">>> shipping_quote: Blad pobierania wyceny, status: %s, treść: %s", 
-                                       quote_response.status_code, quote_response.text)
-            return jsonify({
-                "error": "Błąd pobierania wyceny",
-                "status": quote_response.status_code,
-                "treść": quote_response.text
-            }), quote_response.status_code
-        quote_data = quote_response.json()
-        # Łączymy wszystkie kategorie produktów, upewniając się, że każde zagranie jest listą
-        all_products = []
-        for category in quote_data:
-            items = quote_data[category]
-            if isinstance(items, list):
-                all_products.extend(items)
-            else:
-                all_products.append(items)
-        if not all_products:
-            result = []
-        else:
-            result = [
-                {
-                    "carrierName": product.get("carrierName", "Nieznany"),
-                    "grossPrice": product.get("grossPrice", ""),
-                    "netPrice": round(product.get("grossPrice", 0) / 1.23, 2) if product.get("grossPrice") else "",
-                    "carrierLogoLink": product.get("carrierLogoLink", "")
-                }
-                for product in all_products
-            ]
-    except Exception as e:
-        current_app.logger.error(">>> shipping_quote: Wyjatek podczas pobierania wyceny: %s", e)
-        return jsonify({"error": "Wyjatek podczas pobierania wyceny: " + str(e)}), 500
+        result = GlobKurierClient.for_app(current_app).quote(query_params)
+    except GlobKurierError as e:
+        current_app.logger.error(">>> shipping_quote: %s (status: %s)", e, e.status)
+        payload = {"error": str(e)}
+        payload.update(e.details or {})
+        return jsonify(payload), e.status
     
     return jsonify(result), 200
 
+@calculator_bp.route('/shipping_quote/batch', methods=['POST'])
+@rate_limit(max_requests=10, window=60, scope='shipping_quote_batch', key_func=_shipping_rate_key)
+def shipping_quote_batch():
+    """Wycena kilku paczek naraz: {"packages": [{length, width, height, weight, ...}, ...]}"""
+    if not session.get('user_email'):
+        return jsonify({"error": "Brak sesji uzytkownika."}), 401
+
+    data = request.get_json() or {}
+    packages = data.get("packages")
+    if not isinstance(packages, list) or not packages:
+        return jsonify({"error": "Brak danych wysyłki"}), 400
+    if len(packages) > BATCH_MAX_PACKAGES:
+        return jsonify({"error": f"Maksymalnie {BATCH_MAX_PACKAGES} paczek w jednym zapytaniu"}), 400
+
+    if not all(isinstance(package, dict) for package in packages):
+        return jsonify({"error": "Błędne dane wejściowe"}), 400
+    try:
+        packages_params = [build_query_params(package) for package in packages]
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        results = GlobKurierClient.for_app(current_app).quote_many(packages_params)
+    except GlobKurierError as e:
+        current_app.logger.error(">>> shipping_quote_batch: %s (status: %s)", e, e.status)
+        payload = {"error": str(e)}
+        payload.update(e.details or {})
+        return jsonify(payload), e.status
+
+    return jsonify(results), 200
+
 logger = logging.getLogger(__name__)
 
 @calculator_bp.route('/api/finishing-prices', methods=['GET'])
@@ -351,6 +299,10 @@ def save_quote():
         )
         db.session.add(log)
 
+        # Zdenormalizowane sumy nowej wyceny
+        from modules.quotes.aggregate import QuoteAggregate
+        QuoteAggregate.refresh_totals(quote)
+
         db.session.commit()
 
         return jsonify({
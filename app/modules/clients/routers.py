@@ -5,6 +5,7 @@ from modules.quotes.models import QuoteStatus
 from extensions import db
 from . import clients_bp
 from modules.calculator.models import Quote
+from modules.quotes.client_cache import ClientQuoteCache
 import requests
 import os
 from datetime import date
@@ -91,6 +92,7 @@ def update_client(client_id):
     client.invoice_city = invoice.get("city")
     client.invoice_nip = invoice.get("nip")
 
+    ClientQuoteCache.invalidate_for_client(client.id)
     db.session.commit()
     return jsonify({"success": True})
 
@@ -9,6 +9,7 @@ import logging
 from datetime import datetime
 from .services.user_activity_service import UserActivityService
 from .models import UserSession
+from ..identity import IdentityService
 
 logger = logging.getLogger(__name__)
 
@@ -31,7 +32,7 @@ def admin_required(func):
         if not user_email:
             return jsonify({'success': False, 'error': 'Nie zalogowano'}), 401
             
-        user = User.query.filter_by(email=user_email).first()
+        user = IdentityService.current()
         if not user or user.role != 'admin':
             return jsonify({'success': False, 'error': 'Brak uprawnień administratora'}), 403
             
@@ -44,7 +45,7 @@ def admin_required(func):
 def dashboard():
     """Główna strona dashboard z nowymi widgetami"""
     user_email = session.get('user_email')
-    user = User.query.filter_by(email=user_email).first()
+    user = IdentityService.current()
     
     logger.info("[Dashboard] DEBUG: Starting dashboard route")
     logger.info(f"[Dashboard] DEBUG: User email: {user_email}")
@@ -192,8 +193,7 @@ def debug_database():
 def refresh_stats():
     """API endpoint do odświeżania statystyk dashboard"""
     try:
-        user_email = session.get('user_email')
-        user = User.query.filter_by(email=user_email).first()
+        user = IdentityService.current()
         
         # Pobierz fresh dane
         dashboard_stats = get_dashboard_stats(user)
@@ -263,9 +263,7 @@ def create_changelog_entry():
         from datetime import datetime
         
         # Sprawdź czy użytkownik to admin
-        user_email = session.get('user_email')
-        from ..calculator.models import User
-        user = User.query.filter_by(email=user_email).first()
+        user = IdentityService.current()
         
         if not user or user.role != 'admin':
             return {'success': False, 'error': 'Brak uprawnień'}, 403
@@ -414,9 +412,7 @@ def delete_changelog_entry(entry_id):
         from extensions import db
         
         # Sprawdź uprawnienia
-        user_email = session.get('user_email')
-        from ..calculator.models import User
-        user = User.query.filter_by(email=user_email).first()
+        user = IdentityService.current()
         
         if not user or user.role != 'admin':
             return {'success': False, 'error': 'Brak uprawnień'}, 403
@@ -450,9 +446,7 @@ def toggle_changelog_visibility(entry_id):
         from extensions import db
         
         # Sprawdź uprawnienia
-        user_email = session.get('user_email')
-        from ..calculator.models import User
-        user = User.query.filter_by(email=user_email).first()
+        user = IdentityService.current()
         
         if not user or user.role != 'admin':
             return {'success': False, 'error': 'Brak uprawnień'}, 403
@@ -527,8 +521,7 @@ def force_logout_user(user_id):
         JSON: Wynik operacji wylogowania
     """
     try:
-        current_user_email = session.get('user_email')
-        current_user = User.query.filter_by(email=current_user_email).first()
+        current_user = IdentityService.current()
         
         logger.info(f"[Dashboard] Admin {current_user.email} wymusza wylogowanie user_id={user_id}")
         
@@ -679,8 +672,7 @@ def cleanup_old_sessions():
         JSON: Wynik operacji czyszczenia
     """
     try:
-        current_user_email = session.get('user_email')
-        current_user = User.query.filter_by(email=current_user_email).first()
+        current_user = IdentityService.current()
         
         logger.info(f"[Dashboard] Admin {current_user.email} uruchamia cleanup sesji")
         
@@ -714,8 +706,7 @@ def get_current_user_activity():
         JSON: Informacje o aktywności bieżącego użytkownika
     """
     try:
-        user_email = session.get('user_email')
-        user = User.query.filter_by(email=user_email).first()
+        user = IdentityService.current()
         
         if not user:
             return jsonify({
@@ -723,24 +714,17 @@ def get_current_user_activity():
                 'error': 'Użytkownik nie znaleziony'
             }), 404
         
-        # Pobierz aktualną sesję
-        session_token = session.get('user_session_token')
-        current_session = None
-        
-        if session_token:
-            current_session = UserSession.query.filter_by(
-                session_token=session_token,
-                is_active=True
-            ).first()
+        # Aktualna sesja z cache tożsamości (bez zapytania do user_sessions)
+        session_info = user.get_session_info()
         
         # Przygotuj odpowiedź
         activity_data = {
             'user_id': user.id,
-            'user_name': f"{user.first_name} {user.last_name}".strip() or user.email,
-            'has_active_session': bool(current_session),
-            'session_duration': current_session.get_session_duration() if current_session else None,
-            'last_activity': current_session.get_relative_time() if current_session else None,
-            'current_page': current_session.get_page_display_name() if current_session else None
+            'user_name': user.display_name,
+            'has_active_session': bool(session_info),
+            'session_duration': session_info.get('session_duration'),
+            'last_activity': session_info.get('last_activity'),
+            'current_page': session_info.get('current_page')
         }
         
         return jsonify({
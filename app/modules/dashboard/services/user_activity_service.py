@@ -9,6 +9,7 @@ from flask import session, request
 from extensions import db
 from ..models import UserSession
 from ...calculator.models import User
+from ...identity import IdentityService
 import logging
 import secrets
 
@@ -72,39 +73,8 @@ class UserActivityService:
         Returns:
             bool: Czy udało się zaktualizować
         """
-        try:
-            # Pobierz token sesji z Flask session
-            session_token = session.get('user_session_token')
-            if not session_token:
-                logger.debug("[UserActivity] Brak tokenu sesji w Flask session")
-                return False
-            
-            # Znajdź aktywną sesję
-            user_session = UserSession.query.filter_by(
-                session_token=session_token,
-                is_active=True
-            ).first()
-            
-            if not user_session:
-                logger.debug(f"[UserActivity] Nie znaleziono aktywnej sesji dla tokenu {session_token[:8]}...")
-                return False
-            
-            # Aktualizuj aktywność
-            user_session.last_activity_at = datetime.utcnow()
-            if current_page:
-                user_session.current_page = current_page
-            if ip_address:
-                user_session.ip_address = ip_address
-                
-            db.session.commit()
-            
-            logger.debug(f"[UserActivity] Zaktualizowano aktywność user_id={user_session.user_id}, page={current_page}")
-            return True
-            
-        except Exception as e:
-            db.session.rollback()
-            logger.exception(f"[UserActivity] Błąd aktualizacji aktywności: {e}")
-            return False
+        # Jeden UPDATE po tokenie sesji, ograniczony czasowo - patrz IdentityService.touch_activity
+        return IdentityService.touch_activity(current_page=current_page, ip_address=ip_address)
     
     @staticmethod
     def end_session(user_id=None, session_token=None):
@@ -140,6 +110,7 @@ class UserActivityService:
                 user_session.is_active = False
                 user_session.logout_time = datetime.utcnow()
                 db.session.commit()
+                IdentityService.invalidate_session(user_session.session_token)
                 
                 logger.info(f"[UserActivity] Zakończono sesję user_id={user_session.user_id}")
                 return True
@@ -266,6 +237,7 @@ class UserActivityService:
             # Wyloguj wszystkie sesje
             for session in active_sessions:
                 session.force_logout()
+            IdentityService.invalidate_user(user_id)
             
             user = User.query.get(user_id)
             user_name = f"{user.first_name} {user.last_name}".strip() or user.email if user else f"ID:{user_id}"
@@ -0,0 +1,14 @@
+# modules/identity/__init__.py
+"""
+Tożsamość użytkownika w żądaniu
+===============================
+
+Zalogowany użytkownik i jego sesja (UserSession) są rozwiązywane raz na
+żądanie i współdzielone przez widoki, context processor, dekoratory
+uprawnień i śledzenie aktywności. Dane trzymane są w krótkim cache procesu
+(TTL), invalidowanym przy zmianie profilu/roli i przy wylogowaniu.
+"""
+
+from .service import Identity, IdentityService
+
+__all__ = ['Identity', 'IdentityService']
@@ -0,0 +1,349 @@
+# modules/identity/service.py
+"""
+Tożsamość zalogowanego użytkownika w obrębie żądania
+
+Jedno żądanie strony wykonywało kilka identycznych zapytań: User po e-mailu
+w widoku, w inject_user i w dekoratorach uprawnień oraz UserSession po
+tokenie w inject_user i track_user_activity. IdentityService rozwiązuje
+tożsamość raz na żądanie (flask.g), a dane użytkownika i sesji trzyma
+w krótkim cache procesu (TTL) kluczowanym po user_id / tokenie sesji.
+
+Cache jest per proces (Passenger), więc zmiany profilu/roli/wylogowanie
+w innym procesie są widoczne najpóźniej po IDENTITY_CACHE_TTL sekundach;
+w bieżącym procesie - natychmiast (invalidate_user / invalidate_session).
+
+Użycie w widoku:
+
+    identity = IdentityService.current()
+    if not identity or not identity.is_admin:
+        ...
+    user = identity.get_user()   # obiekt ORM tylko gdy potrzebny (zapis, relacje)
+"""
+
+import threading
+import time
+from datetime import datetime
+
+from flask import g, session, has_app_context
+
+from extensions import db
+from modules.logging import get_structured_logger
+from modules.logging.performance import performance_monitor
+
+identity_logger = get_structured_logger('identity.service')
+
+
+class TTLCache:
+    """Prosty, ograniczony cache z czasem życia wpisów (per proces)"""
+
+    def __init__(self, ttl=30.0, max_entries=2000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            if len(self._data) >= self.max_entries:
+                self._evict_expired()
+                if len(self._data) >= self.max_entries:
+                    # Usuń najstarszy wpis (dict zachowuje kolejność wstawiania)
+                    self._data.pop(next(iter(self._data)))
+            self._data[key] = (time.monotonic() + self.ttl, value)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def pop_where(self, predicate):
+        with self._lock:
+            for key in [k for k, (_, value) in self._data.items() if predicate(value)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def _evict_expired(self):
+        now = time.monotonic()
+        for key in [k for k, (expires, _) in self._data.items() if expires < now]:
+            del self._data[key]
+
+    def get_stats(self):
+        with self._lock:
+            return {'entries': len(self._data), 'hits': self.hits, 'misses': self.misses, 'ttl': self.ttl}
+
+
+class Identity:
+    """
+    Niezmienny snapshot zalogowanego użytkownika. Udostępnia te same atrybuty
+    co model User używane w szablonach i sprawdzaniu uprawnień.
+    """
+
+    def __init__(self, user_data, session_data=None):
+        self.id = user_data['id']
+        self.email = user_data['email']
+        self.role = user_data['role']
+        self.first_name = user_data['first_name']
+        self.last_name = user_data['last_name']
+        self.avatar_path = user_data['avatar_path']
+        self.active = user_data['active']
+        self._session_data = session_data
+        self._user = None
+
+    @property
+    def user_id(self):
+        return self.id
+
+    @property
+    def is_admin(self):
+        return (self.role or '').lower() in ('admin', 'administrator')
+
+    @property
+    def display_name(self):
+        if self.first_name or self.last_name:
+            return f"{self.first_name or ''} {self.last_name or ''}".strip()
+        return self.email
+
+    @property
+    def session_token(self):
+        return self._session_data['session_token'] if self._session_data else None
+
+    def is_active(self):
+        return bool(self.active)
+
+    def get_user(self):
+        """Obiekt ORM User - ładowany leniwie, raz na żądanie"""
+        if self._user is None:
+            from modules.calculator.models import User
+            self._user = User.query.get(self.id)
+        return self._user
+
+    def get_session_info(self):
+        """Dane sesji do wyświetlenia w nagłówku (jak UserSession.get_*)"""
+        if not self._session_data:
+            return {}
+        from modules.dashboard.models import UserSession
+
+        # Obiekt tymczasowy (niedodany do sesji SQLAlchemy) - tylko do formatowania
+        snapshot = UserSession(
+            session_token=self._session_data['session_token'],
+            created_at=self._session_data['created_at'],
+            last_activity_at=self._session_data['last_activity_at'],
+            current_page=self._session_data['current_page']
+        )
+        return {
+            'session_duration': snapshot.get_session_duration(),
+            'last_activity': snapshot.get_relative_time(),
+            'current_page': snapshot.get_page_display_name()
+        }
+
+    def __repr__(self):
+        return f'<Identity {self.id}: {self.email} ({self.role})>'
+
+
+class IdentityService:
+    """Rozwiązywanie tożsamości raz na żądanie + cache procesu"""
+
+    DEFAULT_TTL = 30.0
+    ACTIVITY_WRITE_INTERVAL = 60.0  # s - jak często zapisywać last_activity_at dla tej samej strony
+
+    _users = TTLCache(DEFAULT_TTL)
+    _sessions = TTLCache(DEFAULT_TTL)
+    _activity_interval = ACTIVITY_WRITE_INTERVAL
+
+    @classmethod
+    def init_app(cls, app):
+        ttl = float(app.config.get('IDENTITY_CACHE_TTL', cls.DEFAULT_TTL))
+        cls._users.ttl = ttl
+        cls._sessions.ttl = ttl
+        cls._activity_interval = float(app.config.get('USER_ACTIVITY_WRITE_INTERVAL', cls.ACTIVITY_WRITE_INTERVAL))
+
+    @staticmethod
+    def query_count():
+        """Liczba zapytań SQL wykonanych w bieżącym żądaniu (patrz modules.logging.performance)"""
+        return performance_monitor.query_count()
+
+    # ------------------------------------------------------------------
+    # Rozwiązywanie tożsamości
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _user_snapshot(user):
+        return {
+            'id': user.id,
+            'email': user.email,
+            'role': user.role,
+            'first_name': user.first_name,
+            'last_name': user.last_name,
+            'avatar_path': user.avatar_path,
+            'active': bool(user.active),
+        }
+
+    @classmethod
+    def _load_user(cls, user_id, email):
+        from modules.calculator.models import User
+
+        if user_id:
+            cached = cls._users.get(user_id)
+            if cached is not None:
+                return cached, None
+            user = User.query.get(user_id)
+        else:
+            # Starsze sesje bez user_id
+            user = User.query.filter_by(email=email).first()
+
+        if not user:
+            return None, None
+
+        data = cls._user_snapshot(user)
+        cls._users.set(user.id, data)
+        return data, user
+
+    @classmethod
+    def _load_session(cls, session_token):
+        if not session_token:
+            return None
+
+        cached = cls._sessions.get(session_token)
+        if cached is not None:
+            return cached
+
+        from modules.dashboard.models import UserSession
+        user_session = UserSession.query.filter_by(session_token=session_token, is_active=True).first()
+        if not user_session:
+            return None
+
+        data = {
+            'session_token': user_session.session_token,
+            'user_id': user_session.user_id,
+            'created_at': user_session.created_at,
+            'last_activity_at': user_session.last_activity_at,
+            'current_page': user_session.current_page,
+            'ip_address': user_session.ip_address,
+        }
+        cls._sessions.set(session_token, data)
+        return data
+
+    @classmethod
+    def current(cls):
+        """
+        Tożsamość bieżącego żądania (None dla niezalogowanych).
+        Wynik jest zapamiętywany w flask.g - kolejne wywołania nie pytają bazy.
+        """
+        if '_identity' in g:
+            return g._identity
+
+        identity = None
+        email = session.get('user_email')
+        if email:
+            try:
+                user_data, user = cls._load_user(session.get('user_id'), email)
+                if user_data:
+                    session_data = cls._load_session(session.get('user_session_token'))
+                    identity = Identity(user_data, session_data)
+                    identity._user = user
+            except Exception as e:
+                identity_logger.error("Błąd rozwiązywania tożsamości", error=str(e))
+                identity = None
+
+        g._identity = identity
+        return identity
+
+    # ------------------------------------------------------------------
+    # Aktywność
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def touch_activity(cls, current_page=None, ip_address=None):
+        """
+        Aktualizuje last_activity_at bieżącej sesji jednym UPDATE (bez SELECT).
+        Zapis jest pomijany, jeśli strona się nie zmieniła, a poprzedni zapis
+        był mniej niż USER_ACTIVITY_WRITE_INTERVAL sekund temu.
+
+        Returns:
+            bool: Czy aktywność sesji jest aktualna (zapisana teraz lub w ciągu
+                  ostatnich USER_ACTIVITY_WRITE_INTERVAL sekund); False przy braku
+                  aktywnej sesji lub błędzie zapisu
+        """
+        identity = cls.current()
+        if not identity or not identity._session_data:
+            return False
+
+        data = identity._session_data
+        now = datetime.utcnow()
+        last = data.get('last_activity_at')
+        same_page = not current_page or current_page == data.get('current_page')
+        same_ip = not ip_address or ip_address == data.get('ip_address')
+        if same_page and same_ip and last and (now - last).total_seconds() < cls._activity_interval:
+            # Ostatni zapis jest świeży - pominięcie zapisu nie jest błędem
+            return True
+
+        from modules.dashboard.models import UserSession
+        values = {UserSession.last_activity_at: now}
+        if current_page:
+            values[UserSession.current_page] = current_page
+        if ip_address:
+            values[UserSession.ip_address] = ip_address
+
+        try:
+            updated = UserSession.query.filter_by(
+                session_token=data['session_token'], is_active=True
+            ).update(values, synchronize_session=False)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            identity_logger.debug("Błąd zapisu aktywności", error=str(e))
+            return False
+
+        if not updated:
+            cls.invalidate_session(data['session_token'])
+            return False
+
+        new_data = dict(data, last_activity_at=now,
+                        current_page=current_page or data.get('current_page'),
+                        ip_address=ip_address or data.get('ip_address'))
+        identity._session_data = new_data
+        cls._sessions.set(data['session_token'], new_data)
+        return True
+
+    # ------------------------------------------------------------------
+    # Invalidacja
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def invalidate_user(cls, user_id):
+        """Po zmianie profilu, roli, aktywności lub usunięciu użytkownika"""
+        cls._users.pop(user_id)
+        cls._sessions.pop_where(lambda data: data['user_id'] == user_id)
+        if has_app_context() and getattr(g.get('_identity'), 'id', None) == user_id:
+            g.pop('_identity', None)
+
+    @classmethod
+    def invalidate_session(cls, session_token):
+        """Po wylogowaniu / wymuszonym wylogowaniu"""
+        if session_token:
+            cls._sessions.pop(session_token)
+        if has_app_context():
+            g.pop('_identity', None)
+
+    @classmethod
+    def get_stats(cls):
+        return {
+            'users': cls._users.get_stats(),
+            'sessions': cls._sessions.get_stats(),
+            'request_queries': cls.query_count(),
+        }
@@ -5,6 +5,8 @@ Moduł logowania aplikacji Wood Power CRM
 
 from .logger import AppLogger, get_logger
 from .config import LogConfig
+from .reader import LogReader
+from .performance import PerformanceMonitor, performance_monitor
 from .routers import logging_bp
 from .structured_logger import StructuredLogger
 
@@ -21,4 +23,4 @@ def get_structured_logger(module_name):
     base_logger = AppLogger.get_logger(module_name)
     return StructuredLogger(base_logger)
 
-__all__ = ['AppLogger', 'get_logger', 'get_structured_logger', 'LogConfig', 'logging_bp', 'StructuredLogger']
\ No newline at end of file
+__all__ = ['AppLogger', 'get_logger', 'get_structured_logger', 'LogConfig', 'LogReader', 'PerformanceMonitor', 'performance_monitor', 'logging_bp', 'StructuredLogger']
\ No newline at end of file
@@ -0,0 +1,400 @@
+# modules/logging/performance.py
+"""
+Instrumentacja wydajności żądań
+
+- middleware WSGI mierzy czas obsługi każdego żądania i zapisuje go
+  w histogramie endpointu (stałe kubełki, stała pamięć)
+- listener SQLAlchemy liczy zapytania, ich łączny czas i zwrócone wiersze
+  w ramach żądania
+- żądania wolniejsze niż PERF_SLOW_REQUEST_MS trafiają do bufora z listą
+  najwolniejszych zapytań
+- zapytanie o tym samym kształcie wykonane w jednym żądaniu co najmniej
+  PERF_N_PLUS_ONE_THRESHOLD razy jest zgłaszane jako podejrzenie N+1
+
+Statystyki są per proces (Passenger uruchamia kilka procesów) - raport
+zawiera PID, z którego pochodzi.
+"""
+
+import contextvars
+import heapq
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from flask import request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .logger import AppLogger
+from .structured_logger import StructuredLogger
+
+perf_logger = StructuredLogger(AppLogger.get_logger('logging.performance'))
+
+_current_request = contextvars.ContextVar('perf_current_request', default=None)
+
+# Górne granice kubełków histogramu w ms (ostatni: wszystko powyżej)
+LATENCY_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, float('inf'))
+
+_WHITESPACE_RE = re.compile(r'\s+')
+_IN_LIST_RE = re.compile(r'\(\s*(?:%s|\?|:\w+)(?:\s*,\s*(?:%s|\?|:\w+))+\s*\)')
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+def normalize_statement(statement):
+    """Kształt zapytania: bez literałów i z listami IN zwiniętymi do (?)"""
+    normalized = _WHITESPACE_RE.sub(' ', statement).strip()
+    normalized = _LITERAL_RE.sub('?', normalized)
+    return _IN_LIST_RE.sub('(?)', normalized)[:500]
+
+
+class RequestStats:
+    """Pomiary jednego żądania"""
+
+    SLOWEST_KEPT = 5
+
+    __slots__ = ('method', 'path', 'endpoint', 'blueprint', 'started', 'query_count',
+                 'query_time', 'rows', 'statements', 'shapes', '_pending')
+
+    def __init__(self, method, path):
+        self.method = method
+        self.path = path
+        self.endpoint = None
+        self.blueprint = None
+        self.started = time.perf_counter()
+        self.query_count = 0
+        self.query_time = 0.0
+        self.rows = 0
+        self.statements = []   # kopiec (czas_ms, kształt) - najwolniejsze zapytania
+        self.shapes = {}       # kształt -> liczba wykonań
+        self._pending = []
+
+    def record_query(self, statement, duration_ms, rowcount):
+        shape = normalize_statement(statement)
+        self.query_count += 1
+        self.query_time += duration_ms
+        if rowcount and rowcount > 0:
+            self.rows += rowcount
+        self.shapes[shape] = self.shapes.get(shape, 0) + 1
+        if len(self.statements) < self.SLOWEST_KEPT:
+            heapq.heappush(self.statements, (duration_ms, shape))
+        elif duration_ms > self.statements[0][0]:
+            heapq.heapreplace(self.statements, (duration_ms, shape))
+
+    def slowest_statements(self):
+        return [
+            {'duration_ms': round(duration, 2), 'statement': shape}
+            for duration, shape in sorted(self.statements, reverse=True)
+        ]
+
+
+class EndpointStats:
+    """Zagregowane pomiary endpointu"""
+
+    def __init__(self, endpoint, blueprint):
+        self.endpoint = endpoint
+        self.blueprint = blueprint
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.queries = 0
+        self.max_queries = 0
+        self.query_ms = 0.0
+        self.rows = 0
+        self.n_plus_one = {}   # kształt -> maks. liczba powtórzeń w jednym żądaniu
+
+    def add(self, duration_ms, stats, status_code, n_plus_one_threshold):
+        self.count += 1
+        if status_code >= 500:
+            self.errors += 1
+        self.total_ms += duration_ms
+        self.max_ms = max(self.max_ms, duration_ms)
+        for index, upper in enumerate(LATENCY_BUCKETS):
+            if duration_ms <= upper:
+                self.buckets[index] += 1
+                break
+        self.queries += stats.query_count
+        self.max_queries = max(self.max_queries, stats.query_count)
+        self.query_ms += stats.query_time
+        self.rows += stats.rows
+        for shape, repeats in stats.shapes.items():
+            if repeats >= n_plus_one_threshold:
+                self.n_plus_one[shape] = max(self.n_plus_one.get(shape, 0), repeats)
+
+
+def percentile_from_buckets(buckets, fraction, max_value):
+    """Percentyl z histogramu z interpolacją liniową w kubełku"""
+    total = sum(buckets)
+    if not total:
+        return None
+    rank = fraction * total
+    cumulative = 0
+    lower = 0.0
+    for count, upper in zip(buckets, LATENCY_BUCKETS):
+        if count and cumulative + count >= rank:
+            upper = min(upper, max_value)
+            return round(lower + (upper - lower) * (rank - cumulative) / count, 1)
+        cumulative += count
+        lower = upper
+    return round(max_value, 1)
+
+
+class PerformanceMonitor:
+    """Middleware WSGI + listenery SQLAlchemy; jedna instancja na proces"""
+
+    SLOW_REQUEST_MS = 1000
+    N_PLUS_ONE_THRESHOLD = 10
+    SLOW_REQUESTS_KEPT = 50
+    IGNORED_PREFIXES = ('/static/',)
+
+    def __init__(self):
+        self.enabled = True
+        self.slow_request_ms = self.SLOW_REQUEST_MS
+        self.n_plus_one_threshold = self.N_PLUS_ONE_THRESHOLD
+        self._endpoints = {}
+        self._slow_requests = deque(maxlen=self.SLOW_REQUESTS_KEPT)
+        self._lock = threading.Lock()
+        self._listeners_installed = False
+        self._started_at = time.time()
+
+    def init_app(self, app):
+        self.enabled = app.config.get('PERF_MONITORING_ENABLED', True)
+        self.slow_request_ms = float(app.config.get('PERF_SLOW_REQUEST_MS', self.SLOW_REQUEST_MS))
+        self.n_plus_one_threshold = int(app.config.get('PERF_N_PLUS_ONE_THRESHOLD', self.N_PLUS_ONE_THRESHOLD))
+
+        self._install_listeners()
+        if self.enabled:
+            app.wsgi_app = PerformanceMiddleware(app.wsgi_app, self)
+
+        @app.before_request
+        def _perf_bind_endpoint():
+            stats = _current_request.get()
+            if stats is not None:
+                stats.endpoint = request.endpoint
+                stats.blueprint = request.blueprint
+
+        @app.after_request
+        def _perf_query_count_header(response):
+            if app.config.get('DEBUG') or app.config.get('EXPOSE_QUERY_COUNT'):
+                response.headers['X-DB-Query-Count'] = str(self.query_count())
+            return response
+
+    # ------------------------------------------------------------------
+    # SQLAlchemy
+    # ------------------------------------------------------------------
+
+    def _install_listeners(self):
+        if self._listeners_installed:
+            return
+
+        @event.listens_for(Engine, 'before_cursor_execute')
+        def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            stats = _current_request.get()
+            if stats is not None:
+                stats._pending.append(time.perf_counter())
+
+        @event.listens_for(Engine, 'after_cursor_execute')
+        def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            stats = _current_request.get()
+            if stats is not None and stats._pending:
+                duration_ms = (time.perf_counter() - stats._pending.pop()) * 1000
+                stats.record_query(statement, duration_ms, getattr(cursor, 'rowcount', -1))
+
+        self._listeners_installed = True
+
+    @staticmethod
+    def current():
+        """Pomiary bieżącego żądania (None poza żądaniem HTTP, np. w CLI)"""
+        return _current_request.get()
+
+    def query_count(self):
+        stats = _current_request.get()
+        return stats.query_count if stats is not None else 0
+
+    @contextmanager
+    def track(self, label='manual'):
+        """
+        Mierzy zapytania SQL w bloku kodu poza żądaniem HTTP (CLI, benchmarki).
+        Wynik nie trafia do statystyk endpointów.
+
+            with performance_monitor.track('priorities') as stats:
+                recalculate_all_priorities()
+            stats.query_count, stats.query_time
+        """
+        stats = RequestStats('CLI', label)
+        token = _current_request.set(stats)
+        try:
+            yield stats
+        finally:
+            _current_request.reset(token)
+
+    # ------------------------------------------------------------------
+    # Rejestracja żądań
+    # ------------------------------------------------------------------
+
+    def start_request(self, environ):
+        path = environ.get('PATH_INFO', '')
+        if not self.enabled or path.startswith(self.IGNORED_PREFIXES):
+            return None
+        stats = RequestStats(environ.get('REQUEST_METHOD', 'GET'), path)
+        return _current_request.set(stats)
+
+    def finish_request(self, token, status_code):
+        stats = _current_request.get()
+        _current_request.reset(token)
+        if stats is None:
+            return
+
+        # Żądanie wykonane wewnątrz track() (np. test_client w benchmarku)
+        parent = _current_request.get()
+        if parent is not None:
+            parent.query_count += stats.query_count
+            parent.query_time += stats.query_time
+            parent.rows += stats.rows
+
+        duration_ms = (time.perf_counter() - stats.started) * 1000
+        endpoint = stats.endpoint or '<unmatched>'
+        blueprint = stats.blueprint or ('<app>' if stats.endpoint else '<unmatched>')
+
+        with self._lock:
+            endpoint_stats = self._endpoints.get(endpoint)
+            if endpoint_stats is None:
+                endpoint_stats = self._endpoints[endpoint] = EndpointStats(endpoint, blueprint)
+            endpoint_stats.add(duration_ms, stats, status_code, self.n_plus_one_threshold)
+
+            if duration_ms >= self.slow_request_ms:
+                self._slow_requests.append({
+                    'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+                    'method': stats.method,
+                    'path': stats.path,
+                    'endpoint': endpoint,
+                    'blueprint': blueprint,
+                    'status': status_code,
+                    'duration_ms': round(duration_ms, 1),
+                    'query_count': stats.query_count,
+                    'query_ms': round(stats.query_time, 1),
+                    'rows': stats.rows,
+                    'slowest_statements': stats.slowest_statements()
+                })
+
+        if duration_ms >= self.slow_request_ms:
+            perf_logger.warning("Wolne żądanie", endpoint=endpoint, path=stats.path,
+                                duration_ms=round(duration_ms, 1), query_count=stats.query_count,
+                                query_ms=round(stats.query_time, 1))
+
+    # ------------------------------------------------------------------
+    # Raport
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _summary(name, buckets, count, errors, total_ms, max_ms, queries, max_queries, query_ms, rows):
+        return {
+            'name': name,
+            'count': count,
+            'errors': errors,
+            'avg_ms': round(total_ms / count, 1) if count else None,
+            'p50_ms': percentile_from_buckets(buckets, 0.50, max_ms),
+            'p95_ms': percentile_from_buckets(buckets, 0.95, max_ms),
+            'p99_ms': percentile_from_buckets(buckets, 0.99, max_ms),
+            'max_ms': round(max_ms, 1),
+            'avg_queries': round(queries / count, 1) if count else None,
+            'max_queries': max_queries,
+            'avg_query_ms': round(query_ms / count, 1) if count else None,
+            'avg_rows': round(rows / count, 1) if count else None,
+            'histogram': {
+                ('le_%s' % upper if upper != float('inf') else 'inf'): value
+                for upper, value in zip(LATENCY_BUCKETS, buckets)
+            }
+        }
+
+    def get_report(self, blueprint=None):
+        """
+        Raport per blueprint i endpoint: percentyle czasu odpowiedzi, liczby
+        zapytań, podejrzenia N+1 i ostatnie wolne żądania.
+
+        Args:
+            blueprint (str): Opcjonalny filtr (razem z blueprintami zagnieżdżonymi)
+        """
+        def matches(name):
+            # Blueprinty zagnieżdżone (np. production.api) należą do nadrzędnego
+            return not blueprint or name == blueprint or name.startswith(blueprint + '.')
+
+        with self._lock:
+            endpoints = [e for e in self._endpoints.values() if matches(e.blueprint)]
+            slow_requests = [r for r in self._slow_requests if matches(r['blueprint'])]
+
+            grouped = {}
+            for e in endpoints:
+                grouped.setdefault(e.blueprint, []).append(e)
+
+            blueprints = []
+            for name, items in sorted(grouped.items()):
+                buckets = [sum(column) for column in zip(*(e.buckets for e in items))]
+                summary = self._summary(
+                    name, buckets,
+                    sum(e.count for e in items), sum(e.errors for e in items),
+                    sum(e.total_ms for e in items), max(e.max_ms for e in items),
+                    sum(e.queries for e in items), max(e.max_queries for e in items),
+                    sum(e.query_ms for e in items), sum(e.rows for e in items)
+                )
+                summary['endpoints'] = sorted((
+                    dict(self._summary(e.endpoint, e.buckets, e.count, e.errors, e.total_ms, e.max_ms,
+                                       e.queries, e.max_queries, e.query_ms, e.rows),
+                         n_plus_one_suspects=[
+                             {'statement': shape, 'max_repeats': repeats}
+                             for shape, repeats in sorted(e.n_plus_one.items(), key=lambda item: -item[1])
+                         ])
+                    for e in items
+                ), key=lambda item: -(item['p95_ms'] or 0))
+                summary['n_plus_one_suspects'] = sum(len(e.n_plus_one) for e in items)
+                blueprints.append(summary)
+
+        return {
+            'pid': os.getpid(),
+            'collecting_since': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self._started_at)),
+            'slow_request_ms': self.slow_request_ms,
+            'n_plus_one_threshold': self.n_plus_one_threshold,
+            'blueprints': sorted(blueprints, key=lambda item: -(item['p95_ms'] or 0)),
+            'slow_requests': list(reversed(slow_requests))
+        }
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+            self._slow_requests.clear()
+            self._started_at = time.time()
+
+
+class PerformanceMiddleware:
+    """Middleware WSGI mierzące czas obsługi żądania (do zwrócenia odpowiedzi)"""
+
+    def __init__(self, wsgi_app, monitor):
+        self.wsgi_app = wsgi_app
+        self.monitor = monitor
+
+    def __call__(self, environ, start_response):
+        token = self.monitor.start_request(environ)
+        if token is None:
+            return self.wsgi_app(environ, start_response)
+
+        status = {'code': 500}
+
+        def _start_response(status_line, headers, exc_info=None):
+            try:
+                status['code'] = int(status_line.split(' ', 1)[0])
+            except ValueError:
+                pass
+            return start_response(status_line, headers, exc_info)
+
+        try:
+            return self.wsgi_app(environ, _start_response)
+        finally:
+            self.monitor.finish_request(token, status['code'])
+
+
+# Jedna instancja na proces
+performance_monitor = PerformanceMonitor()
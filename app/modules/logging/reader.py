@@ -0,0 +1,232 @@
+# modules/logging/reader.py
+"""
+Dostęp do plików logów dla panelu administracyjnego
+
+- tail: ostatnie N linii czytane blokami od końca pliku (bez wczytywania całości)
+- follow: tylko nowe bajty od offsetu przekazanego przez klienta
+- search: strumieniowe filtrowanie (poziom/moduł/użytkownik/tekst) po jednym
+  pliku lub całym zestawie plików rotowanych
+"""
+
+import glob
+import os
+import re
+import tempfile
+import time
+from collections import deque
+
+from .config import LogConfig
+
+
+# [timestamp] [LEVEL] [module] [user] [endpoint] message  (patrz LogConfig.LOG_FORMAT)
+LOG_LINE_RE = re.compile(
+    r'^\[(?P<timestamp>[^\]]*)\] \[(?P<level>[A-Z]+)\] \[(?P<module>[^\]]*)\] '
+    r'\[(?P<user>[^\]]*)\] \[(?P<endpoint>[^\]]*)\] (?P<message>.*)$'
+)
+
+
+class LogReader:
+    """Efektywny odczyt plików logów"""
+
+    BLOCK_SIZE = 64 * 1024
+    MAX_FOLLOW_BYTES = 1024 * 1024
+    MAX_TAIL_LINES = 5000
+    MAX_SEARCH_RESULTS = 2000
+
+    @staticmethod
+    def is_valid_filename(filename):
+        """Dopuszcza tylko pliki logów aplikacji (również rotowane: app_X.log.X)"""
+        return (
+            bool(filename)
+            and os.path.basename(filename) == filename
+            and filename.startswith('app_')
+            and '.log' in filename
+        )
+
+    @staticmethod
+    def get_filepath(filename):
+        return os.path.join(LogConfig.LOG_DIR, filename)
+
+    @staticmethod
+    def list_files():
+        """Wszystkie pliki logów (bieżące i rotowane) posortowane chronologicznie"""
+        pattern = os.path.join(LogConfig.LOG_DIR, 'app_*.log*')
+        return sorted(glob.glob(pattern))
+
+    @classmethod
+    def tail(cls, filepath, lines=250):
+        """
+        Zwraca ostatnie ``lines`` pełnych linii pliku, czytając bloki od końca.
+
+        Returns:
+            dict: content, lines_count, offset (pozycja za ostatnią pełną linią), size
+        """
+        lines = max(1, min(int(lines), cls.MAX_TAIL_LINES))
+
+        with open(filepath, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            position = size
+            data = b''
+
+            # +1: niepełna ostatnia linia nie jest liczona, odczyta ją follow
+            while position > 0 and data.count(b'\n') <= lines:
+                read_size = min(cls.BLOCK_SIZE, position)
+                position -= read_size
+                f.seek(position)
+                data = f.read(read_size) + data
+
+        last_newline = data.rfind(b'\n')
+        if last_newline == -1:
+            return {'content': '', 'lines_count': 0, 'offset': position, 'size': size}
+
+        complete = data[:last_newline + 1]
+        selected = complete.splitlines(keepends=True)[-lines:]
+
+        return {
+            'content': b''.join(selected).decode('utf-8', errors='replace'),
+            'lines_count': len(selected),
+            'offset': position + last_newline + 1,
+            'size': size
+        }
+
+    @classmethod
+    def follow(cls, filepath, offset, lines=250):
+        """
+        Zwraca pełne linie dopisane od ``offset``. Jeśli plik jest krótszy
+        niż offset (rotacja/obcięcie), zwraca tail z flagą reset.
+
+        Returns:
+            dict: content, lines_count, offset, size, reset
+        """
+        size = os.path.getsize(filepath)
+        offset = max(0, int(offset))
+
+        if offset > size:
+            result = cls.tail(filepath, lines)
+            result['reset'] = True
+            return result
+
+        with open(filepath, 'rb') as f:
+            f.seek(offset)
+            data = f.read(cls.MAX_FOLLOW_BYTES)
+
+        last_newline = data.rfind(b'\n')
+        if last_newline == -1:
+            # Brak pełnej linii - chyba że pojedyncza linia przekracza limit
+            chunk = data if len(data) >= cls.MAX_FOLLOW_BYTES else b''
+        else:
+            chunk = data[:last_newline + 1]
+
+        return {
+            'content': chunk.decode('utf-8', errors='replace'),
+            'lines_count': chunk.count(b'\n'),
+            'offset': offset + len(chunk),
+            'size': size,
+            'reset': False
+        }
+
+    @classmethod
+    def search(cls, filepaths, level=None, module=None, user=None, text=None, limit=500):
+        """
+        Strumieniowo przeszukuje pliki i zwraca ostatnie ``limit`` pasujących wpisów.
+        Linie kontynuacji (np. traceback) należą do poprzedzającego wpisu.
+
+        Returns:
+            dict: entries (lista słowników), scanned_lines, truncated
+        """
+        limit = max(1, min(int(limit), cls.MAX_SEARCH_RESULTS))
+        levels = {value.strip().upper() for value in level.split(',')} if level else None
+        module = module.lower() if module else None
+        user = user.lower() if user else None
+        text = text.lower() if text else None
+
+        results = deque(maxlen=limit)
+        matched_total = 0
+        scanned = 0
+
+        for filepath in filepaths:
+            current = None
+            with open(filepath, 'r', encoding='utf-8', errors='replace') as f:
+                for line in f:
+                    scanned += 1
+                    match = LOG_LINE_RE.match(line)
+
+                    if match is None:
+                        # Kontynuacja poprzedniego wpisu
+                        if current is not None:
+                            current['message'] += '\n' + line.rstrip('\n')
+                        continue
+
+                    current = None
+                    if levels and match.group('level') not in levels:
+                        continue
+                    if module and module not in match.group('module').lower():
+                        continue
+                    if user and user not in match.group('user').lower():
+                        continue
+                    if text and text not in line.lower():
+                        continue
+
+                    current = match.groupdict()
+                    current['file'] = os.path.basename(filepath)
+                    results.append(current)
+                    matched_total += 1
+
+        return {
+            'entries': list(results),
+            'scanned_lines': scanned,
+            'matched': matched_total,
+            'truncated': matched_total > len(results)
+        }
+
+    @classmethod
+    def benchmark(cls, size_mb=500, directory=None):
+        """
+        Generuje syntetyczny plik logu o rozmiarze ``size_mb`` i mierzy czas
+        tail, follow (ostatni 1 MB) oraz pełnego wyszukiwania.
+
+        Returns:
+            dict: czasy operacji w ms i przepustowość wyszukiwania w MB/s
+        """
+        sample = (
+            "[2025-09-15 00:00:41] [DEBUG] [production.api] [system] [production.api.dashboard] "
+            "API Request extra={\"method\": \"GET\", \"path\": \"/production/api/dashboard\"}\n"
+            "[2025-09-15 00:00:41] [INFO] [reports.routers] [admin@woodpower.pl] [reports.api_get_data] "
+            "Pobrano dane raportu extra={\"rows\": 250}\n"
+            "[2025-09-15 00:00:42] [ERROR] [baselinker.service] [system] [-] Timeout połączenia z API\n"
+            "Traceback (most recent call last):\n  File \"service.py\", line 10\n"
+        ).encode('utf-8')
+        block = sample * max(1, (1024 * 1024) // len(sample))
+
+        fd, filepath = tempfile.mkstemp(prefix='app_benchmark_', suffix='.log', dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for _ in range(size_mb):
+                    f.write(block)
+            size = os.path.getsize(filepath)
+
+            started = time.perf_counter()
+            tail_result = cls.tail(filepath, 250)
+            tail_ms = (time.perf_counter() - started) * 1000
+
+            started = time.perf_counter()
+            cls.follow(filepath, max(0, size - cls.MAX_FOLLOW_BYTES))
+            follow_ms = (time.perf_counter() - started) * 1000
+
+            started = time.perf_counter()
+            search_result = cls.search([filepath], level='ERROR', text='timeout', limit=100)
+            search_ms = (time.perf_counter() - started) * 1000
+
+            return {
+                'file_size_mb': round(size / 1024 / 1024, 1),
+                'tail_ms': round(tail_ms, 2),
+                'tail_lines': tail_result['lines_count'],
+                'follow_ms': round(follow_ms, 2),
+                'search_ms': round(search_ms, 2),
+                'search_mb_per_sec': round((size / 1024 / 1024) / (search_ms / 1000), 1) if search_ms else None,
+                'search_scanned_lines': search_result['scanned_lines'],
+                'search_matched': search_result['matched']
+            }
+        finally:
+            os.remove(filepath)
@@ -8,6 +8,8 @@ import glob
 from datetime import datetime
 from flask import Blueprint, jsonify, request
 from .config import LogConfig
+from .reader import LogReader
+from .performance import performance_monitor
 
 logging_bp = Blueprint('logging', __name__)
 
@@ -54,16 +56,21 @@ def list_log_files():
 
 @logging_bp.route('/api/logs/read/<filename>')
 def read_log_file(filename):
-    """Zwraca zawartość pliku logu (ostatnie 250 linii)"""
+    """
+    Zwraca końcówkę pliku logu (domyślnie ostatnie 250 linii).
+
+    Tryb follow: klient przekazuje ?offset=<bajt> zwrócony w poprzedniej
+    odpowiedzi i dostaje wyłącznie nowe linie dopisane od tego miejsca.
+    """
     try:
         # Sprawdź bezpieczeństwo nazwy pliku
-        if not filename.startswith('app_') or not filename.endswith('.log'):
+        if not LogReader.is_valid_filename(filename):
             return jsonify({
                 'success': False,
                 'error': 'Nieprawidłowa nazwa pliku'
             }), 400
         
-        filepath = os.path.join(LogConfig.LOG_DIR, filename)
+        filepath = LogReader.get_filepath(filename)
         
         if not os.path.exists(filepath):
             return jsonify({
@@ -71,20 +78,19 @@ def read_log_file(filename):
                 'error': 'Plik nie istnieje'
             }), 404
         
-        # Przeczytaj ostatnie 250 linii
-        lines = []
-        with open(filepath, 'r', encoding='utf-8') as f:
-            # Czytaj plik od końca
-            lines = f.readlines()
-            
-        # Weź ostatnie 250 linii
-        last_lines = lines[-250:] if len(lines) > 250 else lines
+        lines = request.args.get('lines', 250, type=int)
+        offset = request.args.get('offset', type=int)
+        
+        if offset is None:
+            result = LogReader.tail(filepath, lines)
+            result['reset'] = True
+        else:
+            result = LogReader.follow(filepath, offset, lines)
         
         return jsonify({
             'success': True,
-            'content': ''.join(last_lines),
-            'lines_count': len(last_lines),
-            'total_lines': len(lines)
+            'filename': filename,
+            **result
         })
         
     except Exception as e:
@@ -96,7 +102,7 @@ def read_log_file(filename):
 
 @logging_bp.route('/api/logs/current')
 def get_current_log():
-    """Zwraca aktualne logi (dla real-time refresh)"""
+    """Zwraca aktualne logi (dla real-time refresh, obsługuje ?offset=)"""
     try:
         # Pobierz dzisiejszy plik logu
         today_file = os.path.basename(LogConfig.get_log_filepath())
@@ -106,4 +112,93 @@ def get_current_log():
         return jsonify({
             'success': False,
             'error': str(e)
-        }), 500
\ No newline at end of file
+        }), 500
+
+
+@logging_bp.route('/api/logs/search')
+def search_logs():
+    """
+    Wyszukiwanie po stronie serwera bez wczytywania plików w całości.
+
+    Parametry: file (nazwa pliku lub 'all' dla całego zestawu rotowanego),
+    level (np. ERROR lub ERROR,WARNING), module, user, q (tekst), limit
+    """
+    try:
+        filename = request.args.get('file', 'current')
+        
+        if filename == 'all':
+            filepaths = LogReader.list_files()
+        else:
+            if filename == 'current':
+                filename = os.path.basename(LogConfig.get_log_filepath())
+            if not LogReader.is_valid_filename(filename):
+                return jsonify({
+                    'success': False,
+                    'error': 'Nieprawidłowa nazwa pliku'
+                }), 400
+            filepaths = [LogReader.get_filepath(filename)]
+            if not os.path.exists(filepaths[0]):
+                return jsonify({
+                    'success': False,
+                    'error': 'Plik nie istnieje'
+                }), 404
+        
+        result = LogReader.search(
+            filepaths,
+            level=request.args.get('level'),
+            module=request.args.get('module'),
+            user=request.args.get('user'),
+            text=request.args.get('q'),
+            limit=request.args.get('limit', 500, type=int)
+        )
+        
+        return jsonify({
+            'success': True,
+            **result
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+def _is_admin():
+    # Import lokalny - modules.identity importuje modules.logging
+    from modules.identity import IdentityService
+    identity = IdentityService.current()
+    return bool(identity and identity.role == 'admin')
+
+
+@logging_bp.route('/api/performance')
+def performance_report():
+    """
+    Czasy odpowiedzi (p50/p95/p99), liczby zapytań SQL i podejrzenia N+1
+    per blueprint i endpoint oraz ostatnie wolne żądania (bieżący proces).
+
+    Parametry: blueprint (opcjonalnie - tylko jeden blueprint)
+    """
+    if not _is_admin():
+        return jsonify({'success': False, 'error': 'Brak uprawnień administratora'}), 403
+
+    try:
+        return jsonify({
+            'success': True,
+            **performance_monitor.get_report(blueprint=request.args.get('blueprint'))
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@logging_bp.route('/api/performance/reset', methods=['POST'])
+def performance_reset():
+    """Zeruje statystyki wydajności bieżącego procesu"""
+    if not _is_admin():
+        return jsonify({'success': False, 'error': 'Brak uprawnień administratora'}), 403
+
+    performance_monitor.reset()
+    return jsonify({'success': True})
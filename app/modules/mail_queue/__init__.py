@@ -0,0 +1,16 @@
+# modules/mail_queue/__init__.py
+"""
+Kolejka wiadomości wychodzących (outbox)
+========================================
+
+Wiadomości zapisywane są w tabeli mail_outbox zamiast wysyłki SMTP
+w trakcie obsługi żądania. Wysyłką zajmuje się worker (wątek w procesie
+aplikacji lub komenda CLI ``flask mail-queue-worker``), który używa jednego
+połączenia SMTP dla całej partii, ponawia błędy z wykładniczym opóźnieniem
+i przenosi wiadomości do statusu 'dead' po wyczerpaniu prób.
+"""
+
+from .models import MailOutbox
+from .service import MailQueueService, mail_queue_worker
+
+__all__ = ['MailOutbox', 'MailQueueService', 'mail_queue_worker']
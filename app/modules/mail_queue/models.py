@@ -0,0 +1,58 @@
+# modules/mail_queue/models.py
+"""
+Model kolejki wiadomości wychodzących
+"""
+
+from extensions import db
+from datetime import datetime
+
+
+class MailOutbox(db.Model):
+    """Wiadomość oczekująca na wysyłkę (lub historia wysyłki)"""
+    __tablename__ = 'mail_outbox'
+
+    id = db.Column(db.Integer, primary_key=True)
+    category = db.Column(db.String(50), nullable=True)  # np. 'quote_offer', 'quote_acceptance', 'invitation'
+
+    # Treść wiadomości (serializowany flask_mail.Message)
+    subject = db.Column(db.String(255), nullable=False)
+    sender = db.Column(db.String(255), nullable=True)
+    recipients = db.Column(db.Text, nullable=False)      # JSON lista
+    cc = db.Column(db.Text, nullable=True)               # JSON lista
+    bcc = db.Column(db.Text, nullable=True)              # JSON lista
+    reply_to = db.Column(db.String(255), nullable=True)
+    body = db.Column(db.Text, nullable=True)
+    html = db.Column(db.Text(length=16777215), nullable=True)
+    attachments = db.Column(db.Text(length=4294967295), nullable=True)  # JSON z danymi base64
+
+    # Stan wysyłki
+    status = db.Column(db.Enum('pending', 'sending', 'sent', 'dead', name='mail_outbox_status_enum'),
+                       nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    claimed_by = db.Column(db.String(32), nullable=True)
+    claimed_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('idx_mail_outbox_status_next', 'status', 'next_attempt_at'),
+        db.Index('idx_mail_outbox_claimed_by', 'claimed_by'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'category': self.category,
+            'subject': self.subject,
+            'status': self.status,
+            'attempts': self.attempts,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'sent_at': self.sent_at.isoformat() if self.sent_at else None
+        }
+
+    def __repr__(self):
+        return f"<MailOutbox {self.id} {self.status} '{self.subject}'>"
@@ -0,0 +1,328 @@
+# modules/mail_queue/service.py
+"""
+Serwis kolejki wiadomości wychodzących
+
+Użycie w kodzie aplikacji:
+
+    msg = Message(subject=..., sender=..., recipients=[...])
+    msg.html = render_template(...)
+    MailQueueService.enqueue(msg, category='invitation')
+
+Wysyłka lokalnie (np. test z serwerem aiosmtpd):
+
+    python -m aiosmtpd -n -l localhost:8025
+    # core.json: "MAIL_SERVER": "localhost", "MAIL_PORT": 8025, "MAIL_USE_TLS": false
+    flask mail-queue-worker --once
+"""
+
+import base64
+import json
+import os
+import smtplib
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+from flask_mail import Message
+
+from extensions import db, mail
+from modules.logging import get_structured_logger
+from .models import MailOutbox
+
+mail_logger = get_structured_logger('mail_queue.service')
+
+
+class MailQueueService:
+    """Zapis do outboxa i wysyłka partiami z ponawianiem"""
+
+    BATCH_SIZE = 20
+    MAX_ATTEMPTS = 6
+    RETRY_BASE_SECONDS = 60        # 1 min, 2 min, 4 min, ...
+    RETRY_MAX_SECONDS = 60 * 60    # maks. 1 h między próbami
+    CLAIM_TIMEOUT = timedelta(minutes=10)
+
+    # Błędy, których ponawianie nie ma sensu (odrzucony adres, błąd treści)
+    PERMANENT_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+    # ------------------------------------------------------------------
+    # Serializacja
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _format_address(address):
+        if isinstance(address, (tuple, list)):
+            return json.dumps(list(address))
+        return address
+
+    @staticmethod
+    def _parse_address(value):
+        if value and value.startswith('['):
+            return tuple(json.loads(value))
+        return value
+
+    @classmethod
+    def _to_outbox(cls, msg, category=None):
+        attachments = [
+            {
+                'filename': attachment.filename,
+                'content_type': attachment.content_type,
+                'data': base64.b64encode(attachment.data).decode('ascii'),
+                'disposition': attachment.disposition,
+            }
+            for attachment in (msg.attachments or [])
+        ]
+
+        return MailOutbox(
+            category=category,
+            subject=(msg.subject or '')[:255],
+            sender=cls._format_address(msg.sender),
+            recipients=json.dumps([cls._format_address(r) for r in msg.recipients]),
+            cc=json.dumps(list(msg.cc)) if msg.cc else None,
+            bcc=json.dumps(list(msg.bcc)) if msg.bcc else None,
+            reply_to=cls._format_address(msg.reply_to) if msg.reply_to else None,
+            body=msg.body,
+            html=msg.html,
+            attachments=json.dumps(attachments) if attachments else None,
+            status='pending',
+            attempts=0,
+            next_attempt_at=datetime.utcnow()
+        )
+
+    @classmethod
+    def _to_message(cls, row):
+        msg = Message(
+            subject=row.subject,
+            sender=cls._parse_address(row.sender),
+            recipients=[cls._parse_address(r) for r in json.loads(row.recipients)],
+            cc=json.loads(row.cc) if row.cc else None,
+            bcc=json.loads(row.bcc) if row.bcc else None,
+            reply_to=cls._parse_address(row.reply_to) if row.reply_to else None,
+            body=row.body,
+            html=row.html
+        )
+        for attachment in json.loads(row.attachments) if row.attachments else []:
+            msg.attach(
+                attachment['filename'],
+                attachment['content_type'],
+                base64.b64decode(attachment['data']),
+                attachment.get('disposition') or 'attachment'
+            )
+        return msg
+
+    # ------------------------------------------------------------------
+    # Kolejkowanie
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def enqueue(cls, msg, category=None, commit=True):
+        """
+        Zapisuje wiadomość do wysyłki i budzi worker w bieżącym procesie.
+
+        Args:
+            msg (flask_mail.Message): Wiadomość
+            category (str): Kategoria (do statystyk/diagnostyki)
+            commit (bool): Czy zatwierdzić transakcję (False gdy wywołujący commituje sam)
+
+        Returns:
+            MailOutbox: Zapisany wiersz
+        """
+        row = cls._to_outbox(msg, category)
+        db.session.add(row)
+        try:
+            if commit:
+                db.session.commit()
+            else:
+                db.session.flush()
+        except Exception:
+            # Sesja po nieudanym commicie nie przyjmie kolejnych zapytań; przy
+            # commit=False transakcję (i jej wycofanie) prowadzi wywołujący
+            if commit:
+                db.session.rollback()
+            raise
+
+        mail_logger.info("Wiadomość dodana do kolejki",
+                         outbox_id=row.id, category=category, recipients=len(msg.recipients))
+        mail_queue_worker.wake()
+        return row
+
+    # ------------------------------------------------------------------
+    # Wysyłka
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def _retry_delay(cls, attempts):
+        return timedelta(seconds=min(cls.RETRY_BASE_SECONDS * (2 ** max(attempts - 1, 0)), cls.RETRY_MAX_SECONDS))
+
+    @classmethod
+    def _claim_batch(cls, batch_size):
+        """
+        Rezerwuje partię wiadomości dla bieżącego workera. Rezerwacja warunkowym
+        UPDATE zapobiega podwójnej wysyłce przy kilku procesach Passengera.
+        """
+        now = datetime.utcnow()
+        token = uuid.uuid4().hex
+
+        candidate_ids = [row.id for row in db.session.query(MailOutbox.id).filter(
+            db.or_(
+                db.and_(MailOutbox.status == 'pending', MailOutbox.next_attempt_at <= now),
+                # Wiadomości porzucone przez worker, który przerwał pracę
+                db.and_(MailOutbox.status == 'sending', MailOutbox.claimed_at < now - cls.CLAIM_TIMEOUT)
+            )
+        ).order_by(MailOutbox.id).limit(batch_size).all()]
+
+        if not candidate_ids:
+            return []
+
+        MailOutbox.query.filter(
+            MailOutbox.id.in_(candidate_ids),
+            db.or_(
+                MailOutbox.status == 'pending',
+                db.and_(MailOutbox.status == 'sending', MailOutbox.claimed_at < now - cls.CLAIM_TIMEOUT)
+            )
+        ).update({
+            MailOutbox.status: 'sending',
+            MailOutbox.claimed_by: token,
+            MailOutbox.claimed_at: now
+        }, synchronize_session=False)
+        db.session.commit()
+
+        return MailOutbox.query.filter_by(claimed_by=token, status='sending').order_by(MailOutbox.id).all()
+
+    @classmethod
+    def _mark_failed(cls, row, error, permanent=False):
+        row.attempts += 1
+        row.last_error = str(error)[:2000]
+        row.claimed_by = None
+        if permanent or row.attempts >= cls.MAX_ATTEMPTS:
+            row.status = 'dead'
+            mail_logger.error("Wiadomość przeniesiona do dead-letter",
+                              outbox_id=row.id, attempts=row.attempts, error=str(error))
+        else:
+            row.status = 'pending'
+            row.next_attempt_at = datetime.utcnow() + cls._retry_delay(row.attempts)
+            mail_logger.warning("Błąd wysyłki - ponowienie zaplanowane",
+                                outbox_id=row.id, attempts=row.attempts,
+                                next_attempt_at=row.next_attempt_at.isoformat(), error=str(error))
+
+    @classmethod
+    def process_batch(cls, batch_size=None):
+        """
+        Wysyła jedną partię wiadomości przez jedno połączenie SMTP.
+
+        Returns:
+            dict: sent, retried, dead
+        """
+        rows = cls._claim_batch(batch_size or cls.BATCH_SIZE)
+        result = {'sent': 0, 'retried': 0, 'dead': 0}
+        if not rows:
+            return result
+
+        try:
+            with mail.connect() as connection:
+                for row in rows:
+                    try:
+                        connection.send(cls._to_message(row))
+                        row.status = 'sent'
+                        row.sent_at = datetime.utcnow()
+                        row.attempts += 1
+                        row.claimed_by = None
+                        row.last_error = None
+                        result['sent'] += 1
+                    except cls.PERMANENT_ERRORS as e:
+                        cls._mark_failed(row, e, permanent=True)
+                        result['dead'] += 1
+                    except (smtplib.SMTPServerDisconnected, ConnectionError, socket.timeout):
+                        # Połączenie zerwane - reszta partii wraca do kolejki
+                        raise
+                    except Exception as e:
+                        cls._mark_failed(row, e)
+                        result['dead' if row.status == 'dead' else 'retried'] += 1
+        except Exception as e:
+            # Błąd połączenia SMTP - ponów wszystkie niewysłane wiadomości z partii
+            for row in rows:
+                if row.status == 'sending':
+                    cls._mark_failed(row, e)
+                    result['dead' if row.status == 'dead' else 'retried'] += 1
+
+        db.session.commit()
+        mail_logger.info("Przetworzono partię kolejki mailowej", **result)
+        return result
+
+    @classmethod
+    def process_all(cls, batch_size=None, max_batches=50):
+        """Wysyła partie aż do opróżnienia kolejki gotowych wiadomości"""
+        totals = {'sent': 0, 'retried': 0, 'dead': 0}
+        for _ in range(max_batches):
+            result = cls.process_batch(batch_size)
+            for key in totals:
+                totals[key] += result[key]
+            if not any(result.values()):
+                break
+        return totals
+
+    @staticmethod
+    def get_stats():
+        rows = db.session.query(MailOutbox.status, db.func.count(MailOutbox.id)).group_by(MailOutbox.status).all()
+        return {status: count for status, count in rows}
+
+    @staticmethod
+    def requeue_dead(ids=None):
+        """Ręczne przywrócenie wiadomości z dead-letter do kolejki"""
+        query = MailOutbox.query.filter_by(status='dead')
+        if ids:
+            query = query.filter(MailOutbox.id.in_(ids))
+        count = query.update({
+            MailOutbox.status: 'pending',
+            MailOutbox.attempts: 0,
+            MailOutbox.next_attempt_at: datetime.utcnow()
+        }, synchronize_session=False)
+        db.session.commit()
+        return count
+
+
+class MailQueueWorker:
+    """
+    Wątek wysyłki w procesie aplikacji webowej. Startuje leniwie przy pierwszym
+    enqueue (osobno w każdym procesie po forku) i budzony jest po dodaniu
+    wiadomości; co ``poll_interval`` sekund sprawdza też zaplanowane ponowienia.
+    """
+
+    def __init__(self, poll_interval=30.0):
+        self.poll_interval = poll_interval
+        self._app = None
+        self._enabled = True
+        self._thread = None
+        self._thread_pid = None
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self._app = app
+        self._enabled = app.config.get('MAIL_QUEUE_INLINE_WORKER', True)
+        self.poll_interval = app.config.get('MAIL_QUEUE_POLL_INTERVAL', self.poll_interval)
+
+    def wake(self):
+        if not self._enabled or self._app is None:
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive() or self._thread_pid != os.getpid():
+                self._thread = threading.Thread(target=self._run, name='mail-queue-worker', daemon=True)
+                self._thread_pid = os.getpid()
+                self._thread.start()
+        self._wakeup.set()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+            try:
+                with self._app.app_context():
+                    MailQueueService.process_all()
+                    db.session.remove()
+            except Exception as e:
+                mail_logger.error("Błąd wątku kolejki mailowej", error=str(e))
+
+
+# Jedna instancja na proces
+mail_queue_worker = MailQueueWorker()
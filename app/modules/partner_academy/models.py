@@ -176,13 +176,15 @@ class PartnerLearningSession(db.Model):
     
     # PROGRESS TRACKING
     completed_steps = db.Column(JSON, default=list, comment='Lista ukończonych kroków')
+    completed_steps_count = db.Column(db.Integer, nullable=False, default=0, index=True,
+                                      comment='Liczba ukończonych kroków (LearningService.update_progress)')
     locked_steps = db.Column(JSON, default=list, comment='Lista zablokowanych kroków')
     
     # QUIZ RESULTS
     quiz_results = db.Column(JSON, default=dict, comment='Wyniki quizów: {M1: {attempts: 2, passed: true}}')
     
     # TIME TRACKING
-    total_time_spent = db.Column(db.Integer, default=0, comment='Całkowity czas spędzony w sekundach')
+    total_time_spent = db.Column(db.Integer, default=0, index=True, comment='Całkowity czas spędzony w sekundach')
     step_times = db.Column(JSON, default=dict, comment='Czasy spędzone na krokach: {1.1: 300, 1.2: 450}')
     last_activity_at = db.Column(db.DateTime, comment='Ostatnia aktywność')
     
@@ -190,5 +192,9 @@ class PartnerLearningSession(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, comment='Data utworzenia sesji')
     completed_at = db.Column(db.DateTime, comment='Data ukończenia szkolenia')
     
+    __table_args__ = (
+        db.Index('idx_learning_completed_activity', 'completed_at', 'last_activity_at'),
+    )
+    
     def __repr__(self):
         return f'<PartnerLearningSession {self.session_id} - Step {self.current_step}>'
\ No newline at end of file
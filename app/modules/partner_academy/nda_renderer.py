@@ -0,0 +1,278 @@
+# modules/partner_academy/nda_renderer.py
+"""
+Renderowanie PDF umowy NDA (WeasyPrint)
+
+/api/application/generate-nda tworzył przy każdym wywołaniu nowy dokument
+WeasyPrint - z ponownym parsowaniem CSS, ładowaniem fontów i obrazów - a
+kandydaci często generują NDA kilka razy z tymi samymi danymi.
+
+- PDF-y trzymane są w cache procesu (TTLCache) pod skrótem SHA-256 danych
+  formularza; równoczesne żądania z tymi samymi danymi czekają na jedno
+  renderowanie.
+- Renderowanie odbywa się w puli NDA_RENDER_WORKERS procesów (domyślnie 2).
+  Każdy proces puli ma "rozgrzany" renderer: arkusz nda_pdf.css sparsowany
+  raz, wspólną konfigurację fontów i obrazy (logo, podpis) w pamięci.
+- Liczba zleceń z jednego procesu Passengera jest ograniczona
+  (NDA_RENDER_MAX_PENDING) - przy pełnej kolejce żądanie dostaje 503,
+  zamiast blokować wątek obsługi żądań.
+
+NDA_RENDER_WORKERS = 0 renderuje w procesie żądania (ten sam rozgrzany renderer).
+Przepustowość: flask partner-nda-benchmark
+"""
+
+import hashlib
+import importlib.util
+import json
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from modules.identity.service import TTLCache
+
+CACHE_TTL = 600            # sekundy - ponowne kliknięcia "Generuj NDA"
+CACHE_MAX_ENTRIES = 100    # ~100 kB na PDF
+RENDER_WORKERS = 2
+MAX_PENDING = 4            # zlecenia w toku z jednego procesu (czekające + renderowane)
+QUEUE_TIMEOUT = 10         # sekundy - oczekiwanie na miejsce w kolejce
+RENDER_TIMEOUT = 60        # sekundy - maksymalny czas renderowania
+
+STYLESHEET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'css', 'nda_pdf.css')
+
+
+class NdaRendererBusy(Exception):
+    """Kolejka renderowania pełna - klient powinien spróbować ponownie"""
+
+
+# ----------------------------------------------------------------------
+# Strona procesu renderującego
+# ----------------------------------------------------------------------
+
+class _WarmRenderer:
+    """Renderer WeasyPrint z arkuszem, fontami i plikami lokalnymi w pamięci"""
+
+    def __init__(self, stylesheet_path=STYLESHEET_PATH):
+        from weasyprint import CSS, HTML, default_url_fetcher
+        try:
+            from weasyprint.text.fonts import FontConfiguration
+        except ImportError:  # WeasyPrint < 53
+            from weasyprint.fonts import FontConfiguration
+
+        self._html = HTML
+        self._default_url_fetcher = default_url_fetcher
+        self._files = {}
+        self.font_config = FontConfiguration()
+        self.stylesheet = CSS(filename=stylesheet_path, font_config=self.font_config)
+
+        # Pierwsze renderowanie ładuje fonty (fontconfig / pango) - robimy je od razu
+        self.render('<html><body><p>NDA</p></body></html>')
+
+    def url_fetcher(self, url, *args, **kwargs):
+        # Logo i podpis (file://) czytane z dysku raz na proces
+        if not url.startswith('file://'):
+            return self._default_url_fetcher(url, *args, **kwargs)
+        cached = self._files.get(url)
+        if cached is None:
+            result = self._default_url_fetcher(url, *args, **kwargs)
+            file_obj = result.pop('file_obj', None)
+            if file_obj is not None:
+                result['string'] = file_obj.read()
+                file_obj.close()
+            cached = self._files[url] = result
+        return dict(cached)
+
+    def render(self, html_content, base_url=None):
+        document = self._html(string=html_content, base_url=base_url, url_fetcher=self.url_fetcher)
+        return document.write_pdf(stylesheets=[self.stylesheet], font_config=self.font_config)
+
+
+_worker_renderer = None
+
+
+def _init_worker(stylesheet_path):
+    global _worker_renderer
+    _worker_renderer = _WarmRenderer(stylesheet_path)
+
+
+def _render_in_worker(html_content, base_url):
+    return _worker_renderer.render(html_content, base_url)
+
+
+# ----------------------------------------------------------------------
+# Strona procesu żądań
+# ----------------------------------------------------------------------
+
+class NdaRenderer:
+    """Cache PDF-ów NDA i ograniczona pula procesów renderujących"""
+
+    _cache = TTLCache(CACHE_TTL, CACHE_MAX_ENTRIES)
+    _lock = threading.Lock()
+    _inflight = {}
+    _executor = None
+    _executor_pid = None
+    _workers = None
+    _slots = None
+    _render_timeout = RENDER_TIMEOUT
+
+    stats = {'renders': 0, 'cache_hits': 0, 'joined': 0, 'busy': 0}
+
+    @staticmethod
+    def cache_key(data):
+        """Skrót SHA-256 danych formularza (w cache nie ma danych osobowych wprost)"""
+        payload = json.dumps(data, sort_keys=True, default=str, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def is_available():
+        return importlib.util.find_spec('weasyprint') is not None
+
+    @classmethod
+    def _configure(cls, config):
+        cls._workers = int(config.get('NDA_RENDER_WORKERS', RENDER_WORKERS))
+        cls._render_timeout = config.get('NDA_RENDER_TIMEOUT', RENDER_TIMEOUT)
+        cls._slots = threading.BoundedSemaphore(config.get('NDA_RENDER_MAX_PENDING', MAX_PENDING))
+
+    @classmethod
+    def _get_executor(cls):
+        # Passenger forkuje procesy - pula tworzona leniwie, osobno w każdym procesie
+        if cls._executor is None or cls._executor_pid != os.getpid():
+            if cls._workers > 0:
+                cls._executor = ProcessPoolExecutor(max_workers=cls._workers, initializer=_init_worker,
+                                                    initargs=(STYLESHEET_PATH,))
+            else:
+                # Jeden wątek z rozgrzanym rendererem w procesie żądań
+                cls._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='nda-renderer',
+                                                   initializer=_init_worker, initargs=(STYLESHEET_PATH,))
+            cls._executor_pid = os.getpid()
+        return cls._executor
+
+    @classmethod
+    def render(cls, key, build_html, base_url, config):
+        """
+        PDF z cache albo wyrenderowany w puli
+
+        Args:
+            key: cache_key(dane formularza)
+            build_html: Funkcja bez argumentów zwracająca HTML (wołana tylko przy braku w cache)
+            base_url: Katalog bazowy ścieżek względnych
+            config: app.config (NDA_RENDER_*)
+
+        Raises:
+            NdaRendererBusy: Kolejka renderowania pełna
+        """
+        pdf_bytes = cls._cache.get(key)
+        if pdf_bytes is not None:
+            cls.stats['cache_hits'] += 1
+            return pdf_bytes
+
+        with cls._lock:
+            if cls._slots is None:
+                cls._configure(config)
+            future = cls._inflight.get(key)
+            owner = future is None
+
+        if owner:
+            html_content = build_html()
+            if not cls._slots.acquire(timeout=QUEUE_TIMEOUT):
+                cls.stats['busy'] += 1
+                raise NdaRendererBusy("Kolejka generowania NDA jest pełna")
+            submitted = False
+            try:
+                with cls._lock:
+                    future = cls._inflight.get(key)
+                    if future is None:
+                        future = cls._get_executor().submit(_render_in_worker, html_content, base_url)
+                        cls._inflight[key] = future
+                        submitted = True
+                        cls.stats['renders'] += 1
+            except Exception:
+                cls._slots.release()
+                raise
+
+            if submitted:
+                # Poza blokadą - dla zakończonego już zlecenia callback (_finish,
+                # który bierze _lock) wykonuje się od razu w tym wątku
+                future.add_done_callback(lambda done, key=key: cls._finish(key))
+            else:
+                # Inny wątek zlecił te same dane w międzyczasie
+                cls._slots.release()
+        else:
+            cls.stats['joined'] += 1
+
+        try:
+            pdf_bytes = future.result(timeout=cls._render_timeout)
+        except BrokenProcessPool:
+            # Proces puli zginął (np. OOM) - następne wywołanie utworzy nową pulę
+            with cls._lock:
+                cls._executor = None
+            raise
+
+        cls._cache.set(key, pdf_bytes)
+        return pdf_bytes
+
+    @classmethod
+    def _finish(cls, key):
+        with cls._lock:
+            cls._inflight.pop(key, None)
+        cls._slots.release()
+
+    @classmethod
+    def clear_cache(cls):
+        cls._cache.clear()
+
+    @classmethod
+    def get_stats(cls):
+        return dict(cls.stats, workers=cls._workers, pending=len(cls._inflight),
+                    cache_hits_total=cls._cache.hits, cache_misses_total=cls._cache.misses)
+
+
+def run_benchmark(app, renders=20, distinct=5, concurrency=4):
+    """
+    Przepustowość generowania NDA (renders/s)
+
+    - cold: ``renders`` różnych danych, po kolei
+    - concurrent: ``renders`` różnych danych, ``concurrency`` wątków naraz
+    - cached: ``renders`` wywołań dla ``distinct`` danych (po pierwszym - z cache)
+
+    Returns:
+        list[dict]: name, renders, seconds, renders_per_sec
+    """
+    from modules.partner_academy.utils import generate_nda_pdf
+
+    def sample(index, run):
+        return {
+            'first_name': 'Jan', 'last_name': f'Benchmark{run}x{index}', 'email': f'nda{run}x{index}@example.com',
+            'phone': '500600700', 'city': 'Warszawa', 'address': f'ul. Testowa {index + 1}',
+            'postal_code': '00-001', 'pesel': '90010112345', 'cooperation_type': 'b2b' if index % 2 else 'contract',
+            'company_name': 'Benchmark Sp. z o.o.', 'nip': '1234567890'
+        }
+
+    def measure(name, count, func):
+        started = time.perf_counter()
+        func()
+        seconds = time.perf_counter() - started
+        return {'name': name, 'renders': count, 'seconds': round(seconds, 3),
+                'renders_per_sec': round(count / seconds, 2) if seconds else None}
+
+    def generate(data):
+        with app.app_context():
+            generate_nda_pdf(data)
+
+    with app.app_context():
+        NdaRenderer.clear_cache()
+        generate(sample(0, 'warmup'))  # start puli i rozgrzanie procesów
+
+    results = [
+        measure('cold', renders, lambda: [generate(sample(index, 'cold')) for index in range(renders)]),
+    ]
+
+    def concurrent():
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(generate, [sample(index, 'concurrent') for index in range(renders)]))
+    results.append(measure('concurrent', renders, concurrent))
+
+    results.append(measure('cached', renders,
+                           lambda: [generate(sample(index % distinct, 'cached')) for index in range(renders)]))
+    NdaRenderer.clear_cache()
+    return results
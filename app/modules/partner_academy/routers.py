@@ -36,21 +36,24 @@ Data: 2025-09-30
 
 from flask import render_template, request, jsonify, current_app, send_file, session, redirect, url_for, flash, make_response
 from modules.partner_academy import partner_academy_bp
-from modules.partner_academy.services import ApplicationService, EmailService, LearningService
+from modules.partner_academy.services import ApplicationService, EmailService, LearningService, progress_store
 from modules.partner_academy.validators import validate_application_data, validate_file, validate_quiz_answers
 from modules.partner_academy.utils import rate_limit, get_quiz_answers, generate_nda_pdf
+from modules.partner_academy.nda_renderer import NdaRendererBusy
 from extensions import db
 from modules.partner_academy.models import PartnerApplication, PartnerLearningSession
 import io
 import os
 from datetime import datetime, timedelta
 
-from sqlalchemy import func, or_, desc
+from sqlalchemy import func, or_, and_, desc, case
 import json
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment
 from functools import wraps
 
+@partner_academy_bp.record_once
+def _init_progress_store(state):
+    progress_store.init_app(state.app)
+
 def json_response(data, status=200):
     """Helper do tworzenia JSON response z właściwym Content-Type"""
     response = make_response(jsonify(data), status)
@@ -143,6 +146,7 @@ def validate_application_field():
 
 
 @partner_academy_bp.route('/api/application/submit', methods=['POST'])
+@rate_limit(max_requests=5, window=3600)
 def submit_application():
     """
     Wysłanie kompletnego formularza aplikacyjnego z plikiem NDA
@@ -324,6 +328,16 @@ def generate_nda():
             }
         )
         
+    except NdaRendererBusy:
+        current_app.logger.warning("NDA generation queue full")
+        response = jsonify({
+            'success': False,
+            'error': 'Generowanie PDF jest chwilowo przeciążone. Spróbuj ponownie za chwilę.'
+        })
+        response.status_code = 503
+        response.headers['Retry-After'] = '5'
+        return response
+        
     except Exception as e:
         current_app.logger.error(f"NDA generation error: {str(e)}", exc_info=True)
         return jsonify({
@@ -552,42 +566,43 @@ def get_admin_stats():
     """Statystyki aplikacji i szkoleń dla dashboardu"""
     try:
         # ============================================================================
-        # STATYSTYKI APLIKACJI REKRUTACYJNYCH
+        # STATYSTYKI APLIKACJI REKRUTACYJNYCH (jedno zapytanie, agregacja warunkowa)
         # ============================================================================
-        total_applications = PartnerApplication.query.count()
-        pending_count = PartnerApplication.query.filter_by(status='pending').count()
-        contacted_count = PartnerApplication.query.filter_by(status='contacted').count()
-        accepted_count = PartnerApplication.query.filter_by(status='accepted').count()
-        rejected_count = PartnerApplication.query.filter_by(status='rejected').count()
+        def count_status(value):
+            return func.coalesce(func.sum(case((PartnerApplication.status == value, 1), else_=0)), 0)
+
+        applications = db.session.query(
+            func.count(PartnerApplication.id),
+            count_status('pending'),
+            count_status('contacted'),
+            count_status('accepted'),
+            count_status('rejected')
+        ).one()
+        total_applications, pending_count, contacted_count, accepted_count, rejected_count = (
+            int(value or 0) for value in applications
+        )
         
         # ============================================================================
-        # STATYSTYKI SESJI SZKOLENIOWYCH
+        # STATYSTYKI SESJI SZKOLENIOWYCH (jedno zapytanie na kolumnach liczbowych)
         # ============================================================================
-        total_sessions = PartnerLearningSession.query.count()
-        
-        # Sesje ukończone (completed_at IS NOT NULL)
-        completed_sessions = PartnerLearningSession.query.filter(
-            PartnerLearningSession.completed_at.isnot(None)
-        ).count()
-        
-        # Sesje aktywne (ostatnia aktywność w ciągu ostatnich 7 dni)
+        # Sesje aktywne: ostatnia aktywność w ciągu ostatnich 7 dni, nieukończone
         seven_days_ago = datetime.utcnow() - timedelta(days=7)
-        active_sessions = PartnerLearningSession.query.filter(
-            PartnerLearningSession.last_activity_at >= seven_days_ago,
-            PartnerLearningSession.completed_at.is_(None)
-        ).count()
+        sessions = db.session.query(
+            func.count(PartnerLearningSession.id),
+            func.coalesce(func.sum(case((PartnerLearningSession.completed_at.isnot(None), 1), else_=0)), 0),
+            func.coalesce(func.sum(case((and_(
+                PartnerLearningSession.last_activity_at >= seven_days_ago,
+                PartnerLearningSession.completed_at.is_(None)
+            ), 1), else_=0)), 0),
+            func.avg(PartnerLearningSession.completed_steps_count)
+        ).one()
+        total_sessions = int(sessions[0] or 0)
+        completed_sessions = int(sessions[1] or 0)
+        active_sessions = int(sessions[2] or 0)
         
         # Średni postęp (% ukończonych kroków)
-        all_sessions = PartnerLearningSession.query.all()
-        if all_sessions:
-            total_progress = 0
-            for session in all_sessions:
-                completed_steps = session.completed_steps or []
-                progress_percent = (len(completed_steps) / 29) * 100
-                total_progress += progress_percent
-            avg_progress = round(total_progress / len(all_sessions), 1)
-        else:
-            avg_progress = 0
+        avg_steps = float(sessions[3] or 0)
+        avg_progress = round(avg_steps / LearningService.TOTAL_STEPS * 100, 1) if total_sessions else 0
         
         return jsonify({
             'success': True,
@@ -778,7 +793,7 @@ def get_admin_learning_sessions():
         if status == 'active':
             seven_days_ago = datetime.utcnow() - timedelta(days=7)
             query = query.filter(
-                PartnerLearningSession.last_accessed_at >= seven_days_ago,
+                PartnerLearningSession.last_activity_at >= seven_days_ago,
                 PartnerLearningSession.completed_at.is_(None)
             )
         elif status == 'completed':
@@ -787,8 +802,8 @@ def get_admin_learning_sessions():
             seven_days_ago = datetime.utcnow() - timedelta(days=7)
             query = query.filter(
                 or_(
-                    PartnerLearningSession.last_accessed_at < seven_days_ago,
-                    PartnerLearningSession.last_accessed_at.is_(None)
+                    PartnerLearningSession.last_activity_at < seven_days_ago,
+                    PartnerLearningSession.last_activity_at.is_(None)
                 ),
                 PartnerLearningSession.completed_at.is_(None)
             )
@@ -802,22 +817,21 @@ def get_admin_learning_sessions():
         # Formatowanie wyników
         sessions = []
         for session in pagination.items:
-            completed_steps = session.completed_steps or []
             total_time_hours = round(session.total_time_spent / 3600, 2)
             
             # Sprawdź czy sesja jest aktywna
             is_active = False
-            if session.last_accessed_at:
+            if session.last_activity_at:
                 seven_days_ago = datetime.utcnow() - timedelta(days=7)
-                is_active = session.last_accessed_at >= seven_days_ago
+                is_active = session.last_activity_at >= seven_days_ago
             
             sessions.append({
                 'id': session.id,
                 'email': session.session_id,  # Używamy session_id jako identyfikatora
                 'current_step': session.current_step,
-                'completed_steps_count': len(completed_steps),
+                'completed_steps_count': session.completed_steps_count or 0,
                 'total_time_hours': total_time_hours,
-                'last_activity_at': session.last_accessed_at.strftime('%Y-%m-%d %H:%M') if session.last_accessed_at else None,
+                'last_activity_at': session.last_activity_at.strftime('%Y-%m-%d %H:%M') if session.last_activity_at else None,
                 'is_completed': session.completed_at is not None,
                 'is_active': is_active
             })
@@ -855,9 +869,9 @@ def get_admin_learning_session_detail(session_id):
         
         # Sprawdź czy sesja jest aktywna
         is_active = False
-        if session_obj.last_accessed_at:
+        if session_obj.last_activity_at:
             seven_days_ago = datetime.utcnow() - timedelta(days=7)
-            is_active = session_obj.last_accessed_at >= seven_days_ago
+            is_active = session_obj.last_activity_at >= seven_days_ago
         
         # NIE ŁĄCZYMY Z APLIKACJAMI - brak wspólnego klucza
         
@@ -876,7 +890,7 @@ def get_admin_learning_session_detail(session_id):
                 'is_completed': session_obj.completed_at is not None,
                 'is_active': is_active,
                 'created_at': session_obj.created_at.strftime('%Y-%m-%d %H:%M') if session_obj.created_at else None,
-                'last_activity_at': session_obj.last_accessed_at.strftime('%Y-%m-%d %H:%M') if session_obj.last_accessed_at else None,
+                'last_activity_at': session_obj.last_activity_at.strftime('%Y-%m-%d %H:%M') if session_obj.last_activity_at else None,
                 'completed_at': session_obj.completed_at.strftime('%Y-%m-%d %H:%M') if session_obj.completed_at else None,
                 'application_id': None  # Nie łączymy
             }
@@ -889,6 +903,9 @@ def get_admin_learning_session_detail(session_id):
 @login_required
 def export_applications_xlsx():
     """Eksport aplikacji do pliku XLSX"""
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, PatternFill, Alignment
+
     try:
         status = request.args.get('status', '')
         search = request.args.get('search', '')
@@ -981,6 +998,9 @@ def export_applications_xlsx():
 @login_required
 def export_sessions_xlsx():
     """Eksport sesji szkoleniowych do pliku XLSX"""
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, PatternFill, Alignment
+
     try:
         status = request.args.get('status', '')
         search = request.args.get('search', '')
@@ -993,7 +1013,7 @@ def export_sessions_xlsx():
         if status == 'active':
             seven_days_ago = datetime.utcnow() - timedelta(days=7)
             query = query.filter(
-                PartnerLearningSession.last_accessed_at >= seven_days_ago,
+                PartnerLearningSession.last_activity_at >= seven_days_ago,
                 PartnerLearningSession.completed_at.is_(None)
             )
         elif status == 'completed':
@@ -1002,8 +1022,8 @@ def export_sessions_xlsx():
             seven_days_ago = datetime.utcnow() - timedelta(days=7)
             query = query.filter(
                 or_(
-                    PartnerLearningSession.last_accessed_at < seven_days_ago,
-                    PartnerLearningSession.last_accessed_at.is_(None)
+                    PartnerLearningSession.last_activity_at < seven_days_ago,
+                    PartnerLearningSession.last_activity_at.is_(None)
                 ),
                 PartnerLearningSession.completed_at.is_(None)
             )
@@ -1030,15 +1050,15 @@ def export_sessions_xlsx():
             cell.alignment = Alignment(horizontal='center', vertical='center')
         
         for session in sessions:
-            completed_steps = session.completed_steps or []
-            progress_percent = round((len(completed_steps) / 29) * 100, 1)
+            completed_steps_count = session.completed_steps_count or 0
+            progress_percent = round((completed_steps_count / LearningService.TOTAL_STEPS) * 100, 1)
             total_time_hours = round(session.total_time_spent / 3600, 2)
             
             if session.completed_at:
                 status_text = 'Ukończone'
-            elif session.last_accessed_at:
+            elif session.last_activity_at:
                 seven_days_ago = datetime.utcnow() - timedelta(days=7)
-                status_text = 'Aktywne' if session.last_accessed_at >= seven_days_ago else 'Nieaktywne'
+                status_text = 'Aktywne' if session.last_activity_at >= seven_days_ago else 'Nieaktywne'
             else:
                 status_text = 'Nieaktywne'
             
@@ -1046,11 +1066,11 @@ def export_sessions_xlsx():
                 session.id,
                 session.session_id,
                 session.current_step,
-                len(completed_steps),
+                completed_steps_count,
                 f'{progress_percent}%',
                 total_time_hours,
                 session.created_at.strftime('%Y-%m-%d %H:%M') if session.created_at else '',
-                session.last_accessed_at.strftime('%Y-%m-%d %H:%M') if session.last_accessed_at else '',
+                session.last_activity_at.strftime('%Y-%m-%d %H:%M') if session.last_activity_at else '',
                 session.completed_at.strftime('%Y-%m-%d %H:%M') if session.completed_at else '',
                 status_text
             ]
@@ -1195,7 +1215,7 @@ def get_admin_learning_session(session_id):
                 'total_hours': round(session_obj.total_time_spent / 3600, 2),
                 'is_completed': session_obj.is_completed,
                 'completed_at': session_obj.completed_at.strftime('%Y-%m-%d %H:%M') if session_obj.completed_at else None,
-                'last_accessed_at': session_obj.last_accessed_at.strftime('%Y-%m-%d %H:%M') if session_obj.last_accessed_at else None
+                'last_accessed_at': session_obj.last_activity_at.strftime('%Y-%m-%d %H:%M') if session_obj.last_activity_at else None
             }
         }), 200
     except Exception as e:
@@ -1207,6 +1227,9 @@ def get_admin_learning_session(session_id):
 @login_required
 def export_admin_applications():
     """Eksport aplikacji do XLSX z wszystkimi polami"""
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, PatternFill, Alignment
+
     try:
         status_filter = request.args.get('status', '')
         search = request.args.get('search', '')
@@ -7,18 +7,23 @@ Warstwa logiki biznesowej dla modułu PartnerAcademy.
 
 Services:
 - ApplicationService: Obsługa aplikacji rekrutacyjnych
-- EmailService: Wysyłka emaili (potwierdzenia, notyfikacje)
+- EmailService: Wysyłka emaili (potwierdzenia, notyfikacje) przez kolejkę mail_outbox
 - LearningService: Zarządzanie postępem szkoleniowym
+- LearningProgressStore: Buforowany zapis postępu i czasu sesji (progress_store)
 
 Autor: Development Team
 Data: 2025-09-30
 """
 
+import atexit
 import os
+import threading
+import time
 from werkzeug.utils import secure_filename
 from flask import current_app, render_template
 from flask_mail import Message
 from extensions import db, mail
+from modules.mail_queue.service import MailQueueService
 from modules.partner_academy.models import PartnerApplication, PartnerLearningSession
 from datetime import datetime
 import magic
@@ -239,13 +244,15 @@ class EmailService:
                 company_name=application.company_name if application.is_b2b else None
             )
             
-            mail.send(msg)
+            MailQueueService.enqueue(msg, category='partner_application')
             
             current_app.logger.info(
-                f"Wysłano email potwierdzający do: {application.email}"
+                f"Zakolejkowano email potwierdzający do: {application.email}"
             )
             
         except Exception as e:
+            # Nieudany zapis do kolejki zostawia sesję w stanie wymagającym rollbacku
+            db.session.rollback()
             current_app.logger.error(
                 f"Błąd wysyłki emaila do {application.email}: {str(e)}"
             )
@@ -290,13 +297,15 @@ class EmailService:
                         f.read()
                     )
             
-            mail.send(msg)
+            MailQueueService.enqueue(msg, category='partner_admin_notification')
             
             current_app.logger.info(
-                f"Wysłano notyfikację do {len(notification_emails)} adresów o aplikacji: {application.id}"
+                f"Zakolejkowano notyfikację do {len(notification_emails)} adresów o aplikacji: {application.id}"
             )
             
         except Exception as e:
+            # Nieudany zapis do kolejki zostawia sesję w stanie wymagającym rollbacku
+            db.session.rollback()
             current_app.logger.error(
                 f"Błąd wysyłki notyfikacji do admina: {str(e)}"
             )
@@ -333,13 +342,15 @@ class EmailService:
                 application=application
             )
             
-            mail.send(msg)
+            MailQueueService.enqueue(msg, category='partner_status_update')
             
             current_app.logger.info(
-                f"Wysłano email o zmianie statusu do: {application.email} ({new_status})"
+                f"Zakolejkowano email o zmianie statusu do: {application.email} ({new_status})"
             )
             
         except Exception as e:
+            # Nieudany zapis do kolejki zostawia sesję w stanie wymagającym rollbacku
+            db.session.rollback()
             current_app.logger.error(
                 f"Błąd wysyłki emaila o statusie: {str(e)}"
             )
@@ -374,13 +385,15 @@ class EmailService:
                 application=application
             )
             
-            mail.send(msg)
+            MailQueueService.enqueue(msg, category='partner_status_update')
             
             current_app.logger.info(
-                f"Wysłano email o zmianie statusu do: {application.email} ({new_status})"
+                f"Zakolejkowano email o zmianie statusu do: {application.email} ({new_status})"
             )
             
         except Exception as e:
+            # Nieudany zapis do kolejki zostawia sesję w stanie wymagającym rollbacku
+            db.session.rollback()
             current_app.logger.error(
                 f"Błąd wysyłki emaila o statusie: {str(e)}"
             )
@@ -390,6 +403,8 @@ class EmailService:
 class LearningService:
     """Serwis zarządzania postępem szkoleniowym"""
     
+    TOTAL_STEPS = 29  # Liczba kroków szkolenia (do % postępu)
+    
     @staticmethod
     def find_or_create_session_by_ip(ip_address):
         """
@@ -407,7 +422,7 @@ class LearningService:
         
         existing_session = PartnerLearningSession.query.filter(
             PartnerLearningSession.ip_address == ip_address,
-            PartnerLearningSession.last_accessed_at >= yesterday
+            PartnerLearningSession.last_activity_at >= yesterday
         ).first()
         
         if existing_session:
@@ -454,17 +469,25 @@ class LearningService:
                 'total_time_spent': 0
             }
         
-        return {
+        progress = {
             'current_step': session.current_step,
             'completed_steps': session.completed_steps or [],
             'quiz_results': session.quiz_results or {},
             'total_time_spent': session.total_time_spent
         }
+        
+        # Zmiany czekające w buforze tego procesu na zapis do bazy
+        pending = progress_store.peek(session_id)
+        if pending:
+            merged = _merge_progress(progress, pending)
+            progress = {key: merged[key] for key in progress}
+        
+        return progress
     
     @staticmethod
     def update_progress(session_id, current_step, completed_steps, quiz_results=None):
         """
-        Aktualizuj progress użytkownika
+        Aktualizuj progress użytkownika (zapis do bazy partiami przez progress_store)
         
         Args:
             session_id (str): ID sesji
@@ -472,56 +495,326 @@ class LearningService:
             completed_steps (list): Lista ukończonych kroków
             quiz_results (dict, optional): Wyniki quizów
         """
-        session = LearningService.get_session(session_id)
-        
-        if not session:
+        if not progress_store.session_exists(session_id):
             raise ValueError(f"Sesja {session_id} nie istnieje")
         
-        session.current_step = current_step
-        session.completed_steps = completed_steps
-        
-        if quiz_results:
-            current_results = session.quiz_results or {}
-            current_results.update(quiz_results)
-            session.quiz_results = current_results
-        
-        session.last_accessed_at = datetime.utcnow()
-        
-        # Sprawdź czy szkolenie zostało ukończone
-        if current_step == '3.1' and not session.is_completed:
-            session.is_completed = True
-            session.completed_at = datetime.utcnow()
-        
-        db.session.commit()
-        
-        current_app.logger.info(
-            f"Zaktualizowano progress sesji {session_id}: krok {current_step}"
-        )
+        progress_store.record(session_id, {
+            'current_step': current_step,
+            'completed_steps': completed_steps or [],
+            'quiz_results': quiz_results or {},
+            # Szkolenie ukończone po dojściu do kroku 3.1
+            'completed_at': datetime.utcnow() if current_step == '3.1' else None
+        })
     
     @staticmethod
     def sync_time(session_id, time_spent, step_time_tracking=None):
         """
-        Synchronizuj czas spędzony w sesji
+        Synchronizuj czas spędzony w sesji (zapis do bazy partiami przez progress_store)
         
         Args:
             session_id (str): ID sesji
             time_spent (int): Czas w sekundach
             step_time_tracking (dict, optional): Czas na poszczególnych krokach
         """
-        session = LearningService.get_session(session_id)
-        
-        if not session:
+        if not progress_store.session_exists(session_id):
             raise ValueError(f"Sesja {session_id} nie istnieje")
         
-        session.total_time_spent = time_spent
-        
-        if step_time_tracking:
-            session.step_time_tracking = step_time_tracking
-        
-        session.last_accessed_at = datetime.utcnow()
-        
-        db.session.commit()
-        
-        current_app.logger.info(
-            f"Zsynchronizowano czas sesji {session_id}: {time_spent}s"
-        )
\ No newline at end of file
+        progress_store.record(session_id, {
+            'total_time_spent': int(time_spent or 0),
+            'step_times': step_time_tracking or {}
+        })
+
+
+def _merge_progress(current, update):
+    """
+    Łączy dwa stany postępu monotonicznie - synchronizacja wysłana wcześniej,
+    a zapisana później, nie cofa czasu ani ukończonych kroków.
+
+    - total_time_spent, step_times: maksimum (per krok)
+    - completed_steps: suma zbiorów (kolejność pierwszego wystąpienia)
+    - quiz_results: aktualizacja słownika (nowsze wyniki nadpisują)
+    - current_step, last_activity_at: najnowsza wartość
+    - completed_at: najwcześniejsza data ukończenia
+    """
+    merged = dict(current)
+
+    if update.get('current_step'):
+        merged['current_step'] = update['current_step']
+
+    if 'completed_steps' in update:
+        steps = list(current.get('completed_steps') or [])
+        seen = set(steps)
+        for step in update['completed_steps'] or []:
+            if step not in seen:
+                steps.append(step)
+                seen.add(step)
+        merged['completed_steps'] = steps
+
+    if update.get('quiz_results'):
+        quiz_results = dict(current.get('quiz_results') or {})
+        quiz_results.update(update['quiz_results'])
+        merged['quiz_results'] = quiz_results
+
+    if 'total_time_spent' in update:
+        merged['total_time_spent'] = max(int(current.get('total_time_spent') or 0),
+                                         int(update['total_time_spent'] or 0))
+
+    if update.get('step_times'):
+        step_times = dict(current.get('step_times') or {})
+        for step, seconds in update['step_times'].items():
+            try:
+                step_times[step] = max(float(step_times.get(step) or 0), float(seconds or 0))
+            except (TypeError, ValueError):
+                continue
+        merged['step_times'] = step_times
+
+    if update.get('completed_at') and (not current.get('completed_at')
+                                       or update['completed_at'] < current['completed_at']):
+        merged['completed_at'] = update['completed_at']
+
+    if update.get('last_activity_at'):
+        merged['last_activity_at'] = max(filter(None, (current.get('last_activity_at'),
+                                                       update['last_activity_at'])))
+
+    return merged
+
+
+class LearningProgressStore:
+    """
+    Bufor postępu sesji szkoleniowych (per proces)
+
+    /api/progress/update i /api/time/sync wywoływane są przez przeglądarkę
+    cyklicznie. Zamiast UPDATE + commit przy każdym wywołaniu najnowszy stan
+    sesji trzymany jest w pamięci (_merge_progress) i zapisywany partiami przez
+    wątek w tle:
+
+        flush_interval - maksymalny czas (s), przez który zmiana czeka na zapis
+        max_pending    - liczba sesji w buforze, po której zapis następuje od razu
+        batch_size     - liczba sesji w jednej transakcji
+
+    Przy zapisie stan łączony jest z wierszem w bazie (SELECT ... FOR UPDATE),
+    więc bufory kilku procesów Passengera nie cofają sobie postępu. Bufor
+    zapisywany jest też przy zamykaniu procesu (atexit).
+    """
+
+    def __init__(self, flush_interval=10.0, max_pending=500, batch_size=100):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+
+        self._pending = {}
+        self._known_sessions = set()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._app = None
+        self._thread = None
+        self._thread_pid = None
+
+        self.stats = {
+            'recorded': 0,
+            'coalesced': 0,
+            'written': 0,
+            'failed': 0,
+            'flushes': 0,
+        }
+
+    def init_app(self, app):
+        """Konfiguracja z app.config i rejestracja zapisu przy zamykaniu procesu"""
+        self._app = app
+        self.flush_interval = app.config.get('LEARNING_PROGRESS_FLUSH_INTERVAL', self.flush_interval)
+        self.max_pending = app.config.get('LEARNING_PROGRESS_MAX_PENDING', self.max_pending)
+        self.batch_size = app.config.get('LEARNING_PROGRESS_BATCH_SIZE', self.batch_size)
+        atexit.register(self.flush_all)
+
+    def _ensure_worker(self):
+        # Passenger forkuje procesy po załadowaniu aplikacji - wątek startujemy
+        # leniwie i ponownie po wykryciu nowego PID
+        if self._thread is not None and self._thread.is_alive() and self._thread_pid == os.getpid():
+            return
+        self._thread = threading.Thread(target=self._run, name='learning-progress-flusher', daemon=True)
+        self._thread_pid = os.getpid()
+        self._thread.start()
+
+    def session_exists(self, session_id):
+        """Czy sesja istnieje (zapytanie tylko przy pierwszym wywołaniu w procesie)"""
+        with self._lock:
+            if session_id in self._known_sessions or session_id in self._pending:
+                return True
+        exists = db.session.query(PartnerLearningSession.id).filter_by(session_id=session_id).first() is not None
+        if exists:
+            with self._lock:
+                if len(self._known_sessions) > 10000:
+                    self._known_sessions.clear()
+                self._known_sessions.add(session_id)
+        return exists
+
+    def record(self, session_id, update):
+        """Łączy zmianę ze stanem sesji w buforze"""
+        update = dict(update, last_activity_at=datetime.utcnow())
+        with self._lock:
+            current = self._pending.get(session_id)
+            if current is not None:
+                self.stats['coalesced'] += 1
+            self._pending[session_id] = _merge_progress(current or {}, update)
+            self.stats['recorded'] += 1
+            pending = len(self._pending)
+
+        if self._app is None:
+            # Bez init_app (np. skrypt) - zapis od razu
+            self.flush_all()
+            return
+        self._ensure_worker()
+        if pending >= self.max_pending:
+            self._wakeup.set()
+
+    def peek(self, session_id):
+        """Niezapisany jeszcze stan sesji lub None"""
+        with self._lock:
+            state = self._pending.get(session_id)
+            return dict(state) if state else None
+
+    def _take_batch(self):
+        with self._lock:
+            session_ids = list(self._pending)[:self.batch_size]
+            return {session_id: self._pending.pop(session_id) for session_id in session_ids}
+
+    def _restore(self, batch):
+        # Nieudany zapis - stan wraca do bufora (połączony z nowszymi zmianami)
+        with self._lock:
+            for session_id, state in batch.items():
+                newer = self._pending.get(session_id)
+                self._pending[session_id] = _merge_progress(state, newer) if newer else state
+
+    def flush(self):
+        """
+        Zapisuje jedną partię sesji w jednej transakcji
+
+        Returns:
+            int: liczba zapisanych sesji
+        """
+        with self._flush_lock:
+            batch = self._take_batch()
+            if not batch:
+                return 0
+
+            try:
+                rows = PartnerLearningSession.query.filter(
+                    PartnerLearningSession.session_id.in_(list(batch))
+                ).with_for_update().all()
+
+                for row in rows:
+                    stored = {
+                        'completed_steps': row.completed_steps or [],
+                        'quiz_results': row.quiz_results or {},
+                        'total_time_spent': row.total_time_spent or 0,
+                        'step_times': row.step_times or {},
+                        'completed_at': row.completed_at,
+                        'last_activity_at': row.last_activity_at
+                    }
+                    merged = _merge_progress(stored, batch[row.session_id])
+
+                    if merged.get('current_step'):
+                        row.current_step = merged['current_step']
+                    row.completed_steps = merged['completed_steps']
+                    row.completed_steps_count = len(merged['completed_steps'])
+                    row.quiz_results = merged['quiz_results']
+                    row.total_time_spent = merged['total_time_spent']
+                    row.step_times = merged['step_times']
+                    row.completed_at = merged['completed_at']
+                    row.last_activity_at = merged['last_activity_at']
+
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                self._restore(batch)
+                self.stats['failed'] += len(batch)
+                current_app.logger.error(f"Błąd zapisu postępu sesji szkoleniowych ({len(batch)}): {str(e)}")
+                return 0
+
+            missing = len(batch) - len(rows)
+            if missing:
+                current_app.logger.warning(f"Pominięto postęp {missing} nieistniejących sesji szkoleniowych")
+            self.stats['written'] += len(rows)
+            self.stats['flushes'] += 1
+            return len(rows)
+
+    def flush_all(self):
+        """Opróżnia cały bufor (np. przy zamykaniu procesu)"""
+        if not self._pending:
+            return 0
+        if self._app is None:
+            return self._flush_pending()
+        with self._app.app_context():
+            written = self._flush_pending()
+            db.session.remove()
+        return written
+
+    def _flush_pending(self):
+        written = 0
+        while self._pending:
+            flushed = self.flush()
+            if not flushed:
+                break
+            written += flushed
+        return written
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush_all()
+            except Exception as e:
+                with self._app.app_context():
+                    current_app.logger.error(f"Błąd wątku zapisu postępu szkoleń: {str(e)}")
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats, pending=len(self._pending), max_pending=self.max_pending)
+
+    def run_load_test(self, sessions=50, syncs=100):
+        """
+        Test obciążeniowy: ``sessions`` syntetycznych sesji wysyła po ``syncs``
+        synchronizacji czasu i postępu. Sesje testowe (prefiks 'loadtest-')
+        są usuwane po teście.
+
+        Returns:
+            dict: liczba wywołań, czas, wywołania/s, zapisane wiersze, transakcje
+        """
+        with self._app.app_context():
+            session_ids = [f'loadtest-{uuid.uuid4()}' for _ in range(sessions)]
+            db.session.add_all([PartnerLearningSession(session_id=session_id) for session_id in session_ids])
+            db.session.commit()
+
+            written_before = self.stats['written']
+            flushes_before = self.stats['flushes']
+            started = time.perf_counter()
+
+            for tick in range(1, syncs + 1):
+                for session_id in session_ids:
+                    LearningService.sync_time(session_id, tick * 30, {'1.1': tick * 30})
+                    LearningService.update_progress(session_id, '1.2', ['1.1'])
+            self.flush_all()
+
+            elapsed = time.perf_counter() - started
+            calls = sessions * syncs * 2
+
+            PartnerLearningSession.query.filter(
+                PartnerLearningSession.session_id.like('loadtest-%')
+            ).delete(synchronize_session=False)
+            db.session.commit()
+            with self._lock:
+                self._known_sessions.difference_update(session_ids)
+
+        return {
+            'calls': calls,
+            'seconds': round(elapsed, 3),
+            'calls_per_sec': round(calls / elapsed, 1) if elapsed > 0 else None,
+            'rows_written': self.stats['written'] - written_before,
+            'transactions': self.stats['flushes'] - flushes_before,
+        }
+
+
+# Jedna instancja na proces (inicjalizowana przy rejestracji blueprintu)
+progress_store = LearningProgressStore()
@@ -6,8 +6,8 @@ Partner Academy Utils
 Funkcje pomocnicze dla modułu PartnerAcademy.
 
 Utils:
-- generate_nda_pdf: Generowanie PDF z umową NDA
-- rate_limit: Dekorator rate limiting
+- generate_nda_pdf: Generowanie PDF z umową NDA (przez NdaRenderer - cache i pula procesów)
+- rate_limit: Dekorator rate limiting (re-eksport z modules.rate_limit)
 - get_quiz_answers: Pobieranie prawidłowych odpowiedzi do quizów
 
 Autor: Development Team
@@ -15,9 +15,9 @@ Data: 2025-09-30
 Ostatnia aktualizacja: 2025-10-02 - Dodanie debugowania i poprawka mapowania pól
 """
 
-from functools import wraps
-from flask import request, jsonify
-from datetime import datetime, timedelta
+from modules.rate_limit import rate_limit
+from modules.partner_academy.nda_renderer import NdaRendererBusy
+from datetime import datetime
 import io
 
 
@@ -25,57 +25,9 @@ import io
 # RATE LIMITING
 # ============================================================================
 
-# Prosta implementacja rate limiting w pamięci
-_rate_limit_storage = {}
-
-def rate_limit(max_requests=5, window=60):
-    """
-    Dekorator rate limiting
-    
-    Args:
-        max_requests (int): Maksymalna liczba requestów
-        window (int): Okno czasowe w sekundach
-    
-    Usage:
-        @rate_limit(max_requests=10, window=60)
-        def my_endpoint():
-            ...
-    """
-    def decorator(f):
-        @wraps(f)
-        def decorated_function(*args, **kwargs):
-            # Identyfikator klienta (IP)
-            client_id = request.headers.get('X-Forwarded-For', request.remote_addr)
-            if client_id and ',' in client_id:
-                client_id = client_id.split(',')[0].strip()
-            
-            # Klucz w storage
-            key = f"{f.__name__}:{client_id}"
-            now = datetime.now()
-            
-            # Inicjalizacja jeśli brak
-            if key not in _rate_limit_storage:
-                _rate_limit_storage[key] = []
-            
-            # Usuń stare requesty spoza okna
-            _rate_limit_storage[key] = [
-                timestamp for timestamp in _rate_limit_storage[key]
-                if now - timestamp < timedelta(seconds=window)
-            ]
-            
-            # Sprawdź limit
-            if len(_rate_limit_storage[key]) >= max_requests:
-                return jsonify({
-                    'success': False,
-                    'error': 'Zbyt wiele requestów. Spróbuj ponownie za chwilę.'
-                }), 429
-            
-            # Dodaj nowy request
-            _rate_limit_storage[key].append(now)
-            
-            return f(*args, **kwargs)
-        return decorated_function
-    return decorator
+# Dekorator rate_limit pochodzi ze wspólnego modułu modules.rate_limit
+# (okno przesuwne, backend z RATE_LIMIT_BACKEND) - import powyżej zachowuje
+# dotychczasową ścieżkę modules.partner_academy.utils.rate_limit
 
 
 # ============================================================================
@@ -153,6 +105,7 @@ def generate_nda_pdf(data):
         bytes: PDF jako surowe bajty
         
     Raises:
+        NdaRendererBusy: Gdy kolejka generowania jest pełna
         Exception: Gdy WeasyPrint nie jest zainstalowany lub wystąpi błąd generowania
     
     Example:
@@ -169,10 +122,13 @@ def generate_nda_pdf(data):
         >>> pdf_bytes = generate_nda_pdf(data)
     """
     try:
-        from weasyprint import HTML
         from flask import render_template, current_app
+        from modules.partner_academy.nda_renderer import NdaRenderer
         import os
         
+        if not NdaRenderer.is_available():
+            raise ImportError("weasyprint")
+        
         # Dodaj bieżącą datę do danych
         data['current_date'] = datetime.now().strftime('%d.%m.%Y')
         
@@ -210,30 +166,37 @@ def generate_nda_pdf(data):
         data['logo_path'] = logo_path
         data['sign_path'] = sign_path
         
-        # Renderuj HTML template z danymi
-        html_content = render_template(
-            'nda_template.html',
-            **data
-        )
-        
-        # DEBUGOWANIE - Loguj fragment HTML z danymi osobowymi
-        if 'PESEL' in html_content:
-            start_idx = html_content.find('PESEL')
-            snippet = html_content[max(0, start_idx-100):start_idx+200]
-            current_app.logger.info(f"HTML snippet around PESEL: {snippet}")
-        
-        # Generuj PDF z HTML - zwróć surowe bajty
-        html = HTML(string=html_content, base_url=app_root)
-        pdf_bytes = html.write_pdf()
+        def build_html():
+            # Renderuj HTML template z danymi (style: static/css/nda_pdf.css, dołączane przez renderer)
+            html_content = render_template(
+                'nda_template.html',
+                **data
+            )
+            
+            # DEBUGOWANIE - Loguj fragment HTML z danymi osobowymi
+            if 'PESEL' in html_content:
+                start_idx = html_content.find('PESEL')
+                snippet = html_content[max(0, start_idx-100):start_idx+200]
+                current_app.logger.info(f"HTML snippet around PESEL: {snippet}")
+            
+            return html_content
         
-        # Zwróć surowe bajty
-        return pdf_bytes
+        # PDF z cache (te same dane) albo z puli rozgrzanych rendererów - surowe bajty
+        return NdaRenderer.render(
+            NdaRenderer.cache_key(data),
+            build_html,
+            base_url=app_root,
+            config=current_app.config
+        )
         
     except ImportError as e:
         error_msg = "WeasyPrint nie jest zainstalowane. Użyj: pip install WeasyPrint"
         current_app.logger.error(error_msg)
         raise Exception(error_msg)
         
+    except NdaRendererBusy:
+        raise
+        
     except Exception as e:
         current_app.logger.error(f"Error generating NDA PDF: {str(e)}")
         import traceback
@@ -11,9 +11,6 @@ import zipfile
 import shutil
 import random
 from flask import current_app, url_for
-import trimesh
-import numpy as np
-from PIL import Image
 
 class TextureConfig:
     """Konfiguracja tekstur z fallbackiem do szarego koloru"""
@@ -186,6 +183,8 @@ class RealityGenerator:
             print(f"[RealityGenerator] Texture not found: {texture_path}", file=sys.stderr)
             return None
 
+        from PIL import Image
+
         try:
             with Image.open(texture_path) as img:
                 if img.mode != 'RGB':
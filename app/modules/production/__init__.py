@@ -56,7 +56,8 @@ try:
         ProductionPriorityConfig,
         ProductionSyncLog,
         ProductionError,
-        ProductionConfig
+        ProductionConfig,
+        ProductionDayOff
     )
     
     logger.info("Zaimportowano wszystkie modele modułu production")
@@ -10,6 +10,7 @@ Definiuje wszystkie tabele bazy danych dla systemu zarządzania produkcją:
 - ProductionSyncLog - logi synchronizacji z Baselinker
 - ProductionError - rejestr błędów systemu
 - ProductionConfig - konfiguracja modułu
+- ProductionDayOff - święta i przestoje zakładu (kalendarz dni roboczych)
 
 Autor: Konrad Kmiecik
 Wersja: 2.0 (Enhanced Priority System - Data opłacenia + grupowanie tygodniowe)
@@ -17,7 +18,7 @@ Data: 2025-01-22
 """
 
 from datetime import datetime, date
-from sqlalchemy import Column, Integer, String, Text, DateTime, Date, Numeric, Enum, Boolean, JSON, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, Date, Numeric, Enum, Boolean, JSON, ForeignKey, Index
 from sqlalchemy.orm import relationship, validates
 from sqlalchemy.sql import func
 from extensions import db
@@ -88,6 +89,13 @@ class ProductionItem(db.Model):
     ENHANCED VERSION 2.0: Nowy system priorytetów oparty na dacie opłacenia
     """
     __tablename__ = 'prod_items'
+
+    # Indeksy listy produktów: partycja statusu + kolumna sortowania (keyset)
+    __table_args__ = (
+        Index('idx_prod_items_status_rank', 'current_status', 'priority_rank', 'id'),
+        Index('idx_prod_items_status_deadline', 'current_status', 'deadline_date', 'id'),
+        Index('idx_prod_items_status_created', 'current_status', 'created_at', 'id'),
+    )
     
     id = Column(Integer, primary_key=True)
     
@@ -653,4 +661,38 @@ class ProductionConfig(db.Model):
         elif self.config_type == 'ip_list':
             return [ip.strip() for ip in self.config_value.split(',') if ip.strip()]
         else:
-            return self.config_value
\ No newline at end of file
+            return self.config_value
+
+
+class ProductionDayOff(db.Model):
+    """
+    Dni wolne od pracy zakładu poza weekendami
+    Ustawowe święta liczone są w kodzie (BusinessCalendar) - tutaj trafiają
+    dodatkowe święta oraz przestoje/urlopy zakładowe edytowane przez admina
+    """
+    __tablename__ = 'prod_days_off'
+
+    id = Column(Integer, primary_key=True)
+    day_date = Column(Date, unique=True, nullable=False, index=True)
+    day_type = Column(Enum('holiday', 'closure', name='day_off_type'), nullable=False, default='closure')
+    name = Column(String(255))
+
+    # METADANE
+    created_by = Column(Integer, ForeignKey('users.id'))
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    # RELACJE
+    creator = relationship("User")
+
+    def __repr__(self):
+        return f'<ProductionDayOff {self.day_date} {self.day_type}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'day_date': self.day_date.isoformat() if self.day_date else None,
+            'day_type': self.day_type,
+            'name': self.name,
+            'created_by': self.created_by,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
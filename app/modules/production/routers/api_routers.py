@@ -11,6 +11,8 @@ REST API endpoints zgodne z PRD Section 6:
 - POST /api/update-config → aktualizacja konfiguracji
 - GET /api/health → health check
 - POST /api/complete-packaging → ukończenie pakowania z Baselinker update
+- GET /api/products-page → lista produktów stronicowana kursorem (wirtualny scroll)
+- GET/POST/DELETE /api/days-off → święta i przestoje zakładu (kalendarz deadline'ów)
 
 Zwraca JSON responses z odpowiednimi kodami HTTP.
 Autoryzacja zależna od endpointu.
@@ -20,6 +22,7 @@ Wersja: 1.0 (Podstawowa zgodnie z PRD)
 Data: 2025-01-09
 """
 
+import copy
 import json
 from datetime import datetime, date, timedelta
 from flask import Blueprint, request, jsonify, current_app, render_template, render_template_string
@@ -42,6 +45,8 @@ try:
 except ImportError:
     from modules.production.models import ProductionItem, ProductionError, ProductionSyncLog, ProductionConfig, ProductionPriorityConfig
 
+from ..services.products_query_service import ProductsQueryService, InvalidCursor
+
 # ============================================================================
 # DECORATORS - zabezpieczenia dla różnych typów endpointów
 # ============================================================================
@@ -1068,6 +1073,86 @@ def update_config():
         }), 500
     
 
+@api_bp.route('/days-off', methods=['GET'])
+@admin_required
+def list_days_off():
+    """
+    GET /production/api/days-off?year=2025
+
+    Święta ustawowe (liczone w kodzie) i dni wolne zakładu z prod_days_off
+    """
+    try:
+        from ..services.business_calendar import BusinessCalendarService
+
+        year = request.args.get('year', type=int) or date.today().year
+        return jsonify({
+            'success': True,
+            'year': year,
+            **BusinessCalendarService.list_days_off(year)
+        })
+    except Exception as e:
+        logger.error("API: Błąd pobierania dni wolnych", extra={'error': str(e)})
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@api_bp.route('/days-off', methods=['POST'])
+@admin_required
+def add_day_off():
+    """
+    POST /production/api/days-off - dodanie dnia wolnego zakładu
+
+    Body JSON:
+    {
+        "day_date": "2025-08-14",
+        "day_type": "closure",      // closure (przestój) lub holiday (dodatkowe święto)
+        "name": "Przerwa urlopowa"
+    }
+
+    Nowe deadline'y (kolejne synchronizacje) omijają ten dzień; istniejące
+    produkty nie są przeliczane.
+    """
+    try:
+        from ..services.business_calendar import BusinessCalendarService
+
+        data = request.get_json() or {}
+        try:
+            day_date = date.fromisoformat(data.get('day_date') or '')
+        except ValueError:
+            return jsonify({'success': False, 'error': 'Wymagane pole day_date w formacie RRRR-MM-DD'}), 400
+
+        try:
+            entry = BusinessCalendarService.add_day_off(
+                day_date,
+                day_type=data.get('day_type', 'closure'),
+                name=(data.get('name') or '').strip() or None,
+                user_id=current_user.id
+            )
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+
+        return jsonify({'success': True, 'day_off': entry.to_dict()}), 201
+    except Exception as e:
+        db.session.rollback()
+        logger.error("API: Błąd dodawania dnia wolnego", extra={'error': str(e)})
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@api_bp.route('/days-off/<int:day_off_id>', methods=['DELETE'])
+@admin_required
+def delete_day_off(day_off_id):
+    """DELETE /production/api/days-off/<id> - usunięcie dnia wolnego zakładu"""
+    try:
+        from ..services.business_calendar import BusinessCalendarService
+
+        if not BusinessCalendarService.remove_day_off(day_off_id, user_id=current_user.id):
+            return jsonify({'success': False, 'error': 'Nie znaleziono dnia wolnego'}), 404
+        return jsonify({'success': True})
+    except Exception as e:
+        db.session.rollback()
+        logger.error("API: Błąd usuwania dnia wolnego", extra={'day_off_id': day_off_id, 'error': str(e)})
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 @api_bp.route('/baselinker-health')
 @login_required
 def baselinker_health():
@@ -1932,262 +2017,41 @@ def dashboard_tab_content():
 @login_required  
 def products_tab_content():
     """
-    Endpoint zwracający zawartość taba produktów - NAPRAWIONY
-    BUGFIX: Usuwa limit 100 produktów, zwraca wszystkie produkty z parsowanymi polami
+    Endpoint zwracający zawartość taba produktów
+
+    Zwraca pierwszą stronę listy (paginacja keyset), statystyki całego
+    przefiltrowanego zbioru i opcje filtrów. Kolejne strony pobiera
+    frontend przez /products-page z kursorem next_cursor.
+    Domyślnie tylko produkty w realizacji (scope=active).
     """
     try:
-        # Pobierz podstawowe parametry
-        status_filter = request.args.get('status', 'all')
-        search_query = request.args.get('search', '')
-        load_all = request.args.get('load_all', 'true').lower() == 'true'
-                
-        # Pobierz produkty z bazy danych - BEZ LIMITU
-        products_query = ProductionItem.query
-        
-        # Filtrowanie po statusie
-        if status_filter and status_filter != 'all':
-            products_query = products_query.filter(ProductionItem.current_status == status_filter)
-        
-        # Wyszukiwanie - bezpieczne sprawdzenie atrybutów
-        if search_query:
-            search_pattern = f"%{search_query}%"
-            search_conditions = []
-            
-            if hasattr(ProductionItem, 'original_product_name'):
-                search_conditions.append(ProductionItem.original_product_name.ilike(search_pattern))
-            if hasattr(ProductionItem, 'short_product_id'):
-                search_conditions.append(ProductionItem.short_product_id.ilike(search_pattern))
-            if hasattr(ProductionItem, 'client_name'):
-                search_conditions.append(ProductionItem.client_name.ilike(search_pattern))
-                
-            if search_conditions:
-                products_query = products_query.filter(or_(*search_conditions))
-        
-        # Obsługa parametrów sortowania
-        sort_by = request.args.get('sort_by', 'priority_rank')  # ZMIANA: domyślnie priority_rank
-        sort_order = request.args.get('sort_order', 'asc' if sort_by == 'priority_rank' else 'desc')
-        
-        # Sortowanie z obsługą parametrów
-        sort_column = None
-        if sort_by == 'priority_rank' and hasattr(ProductionItem, 'priority_rank'):
-            sort_column = ProductionItem.priority_rank
-        elif sort_by == 'priority_score' and hasattr(ProductionItem, 'priority_score'):
-            sort_column = ProductionItem.priority_score
-        elif sort_by == 'created_at' and hasattr(ProductionItem, 'created_at'):
-            sort_column = ProductionItem.created_at
-        elif sort_by == 'deadline_date' and hasattr(ProductionItem, 'deadline_date'):
-            sort_column = ProductionItem.deadline_date
-            
-        if sort_column is not None:
-            if sort_order == 'desc':
-                products_query = products_query.order_by(sort_column.desc())
-            else:
-                products_query = products_query.order_by(sort_column.asc())
-        else:
-            # Fallback - domyślnie priority_rank ASC
-            if hasattr(ProductionItem, 'priority_rank'):
-                products_query = products_query.order_by(ProductionItem.priority_rank.asc())
-            else:
-                products_query = products_query.order_by(ProductionItem.id.desc())
-        
-        # ZMIANA: Pobierz WSZYSTKIE produkty (usuń limit)
-        products = products_query.all()
-        
-        logger.info(f"[BUGFIX] Pobranych produktów: {len(products)} (bez limitu)")
-        
-        # Renderuj HTML template
+        filters = ProductsQueryService.parse_filters(request.args)
+        limit = request.args.get('limit', ProductsQueryService.DEFAULT_LIMIT, type=int)
+
+        page = ProductsQueryService.fetch_page(filters, limit=limit)
+        stats_data = ProductsQueryService.get_stats(filters)
+        filters_data = ProductsQueryService.get_filter_options()
+
         html_content = render_template('components/products-tab-content.html')
-        
-        # Przygotuj dane produktów z bezpiecznym dostępem do atrybutów
-        products_data = []
-        for product in products:
-            # Bezpieczne pobieranie wartości z fallback
-            def get_attr(obj, attr_name, default=None):
-                return getattr(obj, attr_name, default) if hasattr(obj, attr_name) else default
-            
-            # Oblicz dni do deadline
-            days_to_deadline = None
-            if hasattr(product, 'deadline_date') and product.deadline_date:
-                try:
-                    deadline = product.deadline_date
-                    if isinstance(deadline, str):
-                        deadline = datetime.strptime(deadline, '%Y-%m-%d').date()
-                    days_to_deadline = (deadline - date.today()).days
-                except:
-                    days_to_deadline = None
-            
-            # Bezpieczne pobieranie objętości
-            volume_m3 = 0.0
-            try:
-                vol = get_attr(product, 'volume_m3', 0)
-                volume_m3 = float(vol) if vol is not None else 0.0
-            except (ValueError, TypeError):
-                volume_m3 = 0.0
-            
-            # Bezpieczne pobieranie wartości netto
-            total_value_net = 0.0
-            try:
-                val = get_attr(product, 'total_value_net', 0)
-                total_value_net = float(val) if val is not None else 0.0
-            except (ValueError, TypeError):
-                total_value_net = 0.0
-            
-            # Bezpieczne pobieranie ceny jednostkowej
-            unit_price_net = 0.0
-            try:
-                price = get_attr(product, 'unit_price_net', 0)
-                unit_price_net = float(price) if price is not None else 0.0
-            except (ValueError, TypeError):
-                unit_price_net = 0.0
-            
-            # Bezpieczne pobieranie parsowanych wymiarów
-            parsed_length_cm = 0.0
-            parsed_width_cm = 0.0
-            parsed_thickness_cm = 0.0
-            try:
-                if get_attr(product, 'parsed_length_cm') is not None:
-                    parsed_length_cm = float(get_attr(product, 'parsed_length_cm', 0))
-                if get_attr(product, 'parsed_width_cm') is not None:
-                    parsed_width_cm = float(get_attr(product, 'parsed_width_cm', 0))
-                if get_attr(product, 'parsed_thickness_cm') is not None:
-                    parsed_thickness_cm = float(get_attr(product, 'parsed_thickness_cm', 0))
-            except (ValueError, TypeError):
-                pass
-            
-            product_dict = {
-                # Podstawowe dane
-                'id': product.id,
-                'short_product_id': get_attr(product, 'short_product_id', ''),
-                'original_product_name': get_attr(product, 'original_product_name', ''),
-                'current_status': get_attr(product, 'current_status', 'czeka_na_wyciecie'),
-                'priority_rank': get_attr(product, 'priority_rank', None),
-                'priority_manual_override': get_attr(product, 'priority_manual_override', False),
-
-                # Wymiary i wartości
-                'volume_m3': volume_m3,
-                'total_value_net': total_value_net,
-                'unit_price_net': unit_price_net,
-                
-                # Deadline
-                'deadline_date': get_attr(product, 'deadline_date').isoformat() if get_attr(product, 'deadline_date') else None,
-                'days_until_deadline': days_to_deadline,
-                
-                # Dane klienta
-                'client_name': get_attr(product, 'client_name', ''),
-                'client_email': get_attr(product, 'client_email', ''),
-                'client_phone': get_attr(product, 'client_phone', ''),
-                'delivery_address': get_attr(product, 'delivery_address', ''),
-                
-                # Dane zamówienia
-                'internal_order_number': get_attr(product, 'internal_order_number', ''),
-                'baselinker_order_id': get_attr(product, 'baselinker_order_id', None),
-                'baselinker_product_id': get_attr(product, 'baselinker_product_id', ''),
-                'product_sequence_in_order': get_attr(product, 'product_sequence_in_order', 1),
-                
-                # POPRAWIONE: Specyfikacja produktu - PARSOWANE POLA z bazy danych
-                'parsed_wood_species': get_attr(product, 'parsed_wood_species', None),
-                'parsed_technology': get_attr(product, 'parsed_technology', None),
-                'parsed_wood_class': get_attr(product, 'parsed_wood_class', None),
-                'parsed_length_cm': parsed_length_cm,
-                'parsed_width_cm': parsed_width_cm,
-                'parsed_thickness_cm': parsed_thickness_cm,
-                'parsed_finish_state': get_attr(product, 'parsed_finish_state', None),
-                
-                # Produkcja - statusy i czasami
-                'cutting_started_at': get_attr(product, 'cutting_started_at').isoformat() if get_attr(product, 'cutting_started_at') else None,
-                'cutting_completed_at': get_attr(product, 'cutting_completed_at').isoformat() if get_attr(product, 'cutting_completed_at') else None,
-                'cutting_duration_minutes': get_attr(product, 'cutting_duration_minutes', None),
-                'assembly_started_at': get_attr(product, 'assembly_started_at').isoformat() if get_attr(product, 'assembly_started_at') else None,
-                'assembly_completed_at': get_attr(product, 'assembly_completed_at').isoformat() if get_attr(product, 'assembly_completed_at') else None,
-                'assembly_duration_minutes': get_attr(product, 'assembly_duration_minutes', None),
-                'packaging_started_at': get_attr(product, 'packaging_started_at').isoformat() if get_attr(product, 'packaging_started_at') else None,
-                'packaging_completed_at': get_attr(product, 'packaging_completed_at').isoformat() if get_attr(product, 'packaging_completed_at') else None,
-                'packaging_duration_minutes': get_attr(product, 'packaging_duration_minutes', None),
-                
-                # Przypisani pracownicy
-                'cutting_assigned_worker_id': get_attr(product, 'cutting_assigned_worker_id', None),
-                'assembly_assigned_worker_id': get_attr(product, 'assembly_assigned_worker_id', None),
-                'packaging_assigned_worker_id': get_attr(product, 'packaging_assigned_worker_id', None),
-                
-                # Notatki i problemy
-                'production_notes': get_attr(product, 'production_notes', ''),
-                'quality_issues': get_attr(product, 'quality_issues', ''),
-                
-                # Timestampy
-                'created_at': product.created_at.isoformat() if hasattr(product, 'created_at') and product.created_at else None,
-                'updated_at': product.updated_at.isoformat() if hasattr(product, 'updated_at') and product.updated_at else None,
-                'sync_source': get_attr(product, 'sync_source', None),
-                
-                # Unique identifier dla frontend
-                'unique_id': f"{get_attr(product, 'short_product_id', '')}-{product.id}"
-            }
-            products_data.append(product_dict)
-        
-        # Przygotuj statystyki
-        total_volume = sum(p['volume_m3'] for p in products_data)
-        total_value = sum(p['total_value_net'] for p in products_data)
-        
-        # Oblicz pilne produkty (deadline <= 3 dni)
-        urgent_count = 0
-        for p in products_data:
-            if p['days_until_deadline'] is not None and p['days_until_deadline'] <= 3:
-                urgent_count += 1
-        
-        # Breakdown statusów
-        status_breakdown = {}
-        for p in products_data:
-            status = p['current_status']
-            status_breakdown[status] = status_breakdown.get(status, 0) + 1
-        
-        stats_data = {
-            'total_count': len(products_data),
-            'total_volume': round(total_volume, 3),
-            'total_value': round(total_value, 2),
-            'urgent_count': urgent_count,
-            'status_breakdown': status_breakdown
-        }
-        
-        # Przygotuj opcje filtrów z produktów
-        filters_data = {
-            'wood_species': list(set(p['parsed_wood_species'] for p in products_data if p['parsed_wood_species'])),
-            'technologies': list(set(p['parsed_technology'] for p in products_data if p['parsed_technology'])),
-            'wood_classes': list(set(p['parsed_wood_class'] for p in products_data if p['parsed_wood_class'])),
-            'thicknesses': list(set(f"{p['parsed_thickness_cm']}cm" for p in products_data if p['parsed_thickness_cm'] and p['parsed_thickness_cm'] > 0)),
-            'statuses': list(set(p['current_status'] for p in products_data if p['current_status']))
-        }
-        
-        # Sortuj opcje filtrów
-        filters_data['wood_species'].sort()
-        filters_data['technologies'].sort()
-        filters_data['wood_classes'].sort()
-        filters_data['thicknesses'].sort(key=lambda x: float(x.replace('cm', '')))
-        filters_data['statuses'].sort()
-        
-        logger.info(f"[BUGFIX] Statystyki: {stats_data}")
-        logger.info(f"[BUGFIX] Opcje filtrów: gatunki={len(filters_data['wood_species'])}, technologie={len(filters_data['technologies'])}")
-        
+
         return jsonify({
             'success': True,
             'html': html_content,
             'initial_data': {
-                'products': products_data,
+                'products': page['products'],
+                'next_cursor': page['next_cursor'],
+                'has_more': page['has_more'],
                 'stats': stats_data,
                 'filters': filters_data,
-                'total_count': len(products_data),
-                'load_all': load_all
+                'total_count': stats_data['total_count'],
+                'load_all': False
             },
-            'products_count': len(products),
-            'debug_info': {
-                'status_filter': status_filter,
-                'search_query': search_query,
-                'products_returned': len(products_data),
-                'load_all': load_all,
-                'query_without_limit': True,
-                'parsed_fields_included': True,
-                'filters_data_included': True
-            }
+            'products_count': len(page['products']),
+            'filters_applied': _filters_to_json(filters)
         })
         
+    except InvalidCursor as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         # Szczegółowe logowanie błędu
         error_traceback = traceback.format_exc()
@@ -2201,6 +2065,81 @@ def products_tab_content():
         }), 500
 
 
+def _filters_to_json(filters):
+    """Filtry listy produktów w formie do odesłania klientowi"""
+    return dict(filters, thicknesses=[f"{float(value)}cm" for value in filters['thicknesses']])
+
+
+@api_bp.route('/products-page', methods=['GET'])
+@login_required
+def products_page():
+    """
+    GET /production/api/products-page
+
+    Kolejna strona listy produktów dla wirtualnego scrolla.
+
+    Query params:
+        scope: active (domyślnie) | archive | all
+        statuses, wood_species, technologies, wood_classes, thicknesses: listy rozdzielone przecinkami
+        search: prefiks ID produktu / numeru zamówienia / klienta
+        search_mode: prefix (domyślnie) | contains - także fragment klienta, ID, nazwy produktu
+                     (tylko z scope=active / archive lub statuses)
+        sort_by: priority_rank | deadline_date | created_at | short_product_id
+        sort_order: asc | desc
+        cursor: next_cursor z poprzedniej strony
+        limit: rozmiar strony (maks. 500)
+        include_stats: 1 - dołącz statystyki (domyślnie tylko dla pierwszej strony)
+    """
+    try:
+        filters = ProductsQueryService.parse_filters(request.args)
+        cursor = request.args.get('cursor') or None
+        limit = request.args.get('limit', ProductsQueryService.DEFAULT_LIMIT, type=int)
+
+        page = ProductsQueryService.fetch_page(filters, cursor=cursor, limit=limit)
+
+        include_stats = request.args.get('include_stats')
+        if include_stats is None:
+            include_stats = cursor is None
+        else:
+            include_stats = include_stats.lower() in ('1', 'true')
+
+        response = {
+            'success': True,
+            'products': page['products'],
+            'next_cursor': page['next_cursor'],
+            'has_more': page['has_more'],
+            'filters_applied': _filters_to_json(filters)
+        }
+        if include_stats:
+            response['stats'] = ProductsQueryService.get_stats(filters)
+
+        return jsonify(response)
+
+    except InvalidCursor as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        logger.error("Błąd endpoint products-page", extra={'error': str(e)})
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@api_bp.route('/products/filter-options', methods=['GET'])
+@login_required
+def products_filter_options():
+    """
+    GET /production/api/products/filter-options
+
+    Opcje dropdownów filtrów listy produktów (DISTINCT w SQL, cache w procesie)
+    """
+    try:
+        return jsonify({
+            'success': True,
+            'filters': ProductsQueryService.get_filter_options()
+        })
+    except Exception as e:
+        logger.error("Błąd pobierania opcji filtrów produktów", extra={'error': str(e)})
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 # Dla paginowanych zapytań
 @api_bp.route('/products-paginated', methods=['GET'])
 @login_required
@@ -2224,16 +2163,7 @@ def products_paginated():
             products_query = products_query.filter(ProductionItem.current_status == status_filter)
             
         if search_query:
-            search_pattern = f"%{search_query}%"
-            search_conditions = []
-            
-            if hasattr(ProductionItem, 'original_product_name'):
-                search_conditions.append(ProductionItem.original_product_name.ilike(search_pattern))
-            if hasattr(ProductionItem, 'short_product_id'):
-                search_conditions.append(ProductionItem.short_product_id.ilike(search_pattern))
-                
-            if search_conditions:
-                products_query = products_query.filter(or_(*search_conditions))
+            products_query = products_query.filter(ProductsQueryService.search_condition(search_query))
         
         # Sortowanie
         if hasattr(ProductionItem, 'priority_score'):
@@ -3152,22 +3082,9 @@ def products_filtered():
         if status_filter and status_filter != 'all':
             query = query.filter(ProductionItem.current_status == status_filter)
         
-        # Wyszukiwanie - bez zmian
+        # Wyszukiwanie po prefiksie (indeksy ID produktu, numeru zamówienia, klienta)
         if search_query:
-            search_pattern = f"%{search_query}%"
-            search_conditions = []
-            
-            if hasattr(ProductionItem, 'original_product_name'):
-                search_conditions.append(ProductionItem.original_product_name.ilike(search_pattern))
-            if hasattr(ProductionItem, 'short_product_id'):
-                search_conditions.append(ProductionItem.short_product_id.ilike(search_pattern))
-            if hasattr(ProductionItem, 'internal_order_number'):
-                search_conditions.append(ProductionItem.internal_order_number.ilike(search_pattern))
-            if hasattr(ProductionItem, 'client_name'):
-                search_conditions.append(ProductionItem.client_name.ilike(search_pattern))
-            
-            if search_conditions:
-                query = query.filter(or_(*search_conditions))
+            query = query.filter(ProductsQueryService.search_condition(search_query))
         
         # ZMIANA: Sortowanie - priority_rank jako główne sortowanie
         sort_column = None
@@ -3650,10 +3567,14 @@ def fetch_orders_preview():
         # Filtruj zamówienia po statusach
         status_ids_set = set(status_ids)
         filtered_orders = []
+        raw_orders = []
         
         for order in all_orders:
             order_status = order.get('order_status_id') or order.get('status_id')
             if order_status in status_ids_set:
+                # Surowa kopia dla cache wyboru (poniżej zamówienie jest przerabiane dla frontendu)
+                raw_orders.append(copy.deepcopy(order))
+
                 # Dodaj dodatkowe pola dla frontendu
                 order['id'] = order.get('order_id')
                 order['customer_name'] = order.get('delivery_fullname') or order.get('buyer_name') or 'Brak nazwy'
@@ -3684,9 +3605,14 @@ def fetch_orders_preview():
             'user_id': current_user.id
         })
         
+        # save_selected_orders użyje tych danych zamiast ponownie pytać Baselinker
+        from modules.reports.selection_cache import OrderSelectionCache
+        selection_token = OrderSelectionCache.put(raw_orders, user_id=current_user.id, scope='production')
+
         return jsonify({
             'success': True,
             'orders': filtered_orders,
+            'selection_token': selection_token,
             'pages_processed': pages_processed,
             'total_count': len(all_orders),
             'filtered_count': len(filtered_orders),
@@ -3799,8 +3725,21 @@ def save_selected_orders():
             'recalculate_priorities': True  # Przelicz priorytety
         }
 
+        # Zamówienia z podglądu (cache wyboru) - sync nie pobiera wtedy ponownie całego zakresu
+        # z Baselinker. Gdy któregoś zamówienia brakuje (np. wygasł TTL), sync pobiera zakres jak dotąd.
+        selection_token = data.get('selection_token')
+        if selection_token:
+            from modules.reports.selection_cache import OrderSelectionCache
+            cached_orders, missing_ids = OrderSelectionCache.take(
+                selection_token, order_ids, user_id=current_user.id, scope='production')
+            if cached_orders and not missing_ids:
+                sync_payload['prefetched_orders'] = cached_orders
+
+        log_payload = {k: v for k, v in sync_payload.items() if k != 'prefetched_orders'}
+
         logger.info("API: Wywołanie manual_sync_with_filtering", extra={
-            'sync_payload': sync_payload,
+            'sync_payload': log_payload,
+            'prefetched_orders': len(sync_payload.get('prefetched_orders', [])),
             'user_id': current_user.id,
             'sync_service_available': True
         })
@@ -3811,7 +3750,7 @@ def save_selected_orders():
         except Exception as sync_exception:
             logger.error("API: Exception podczas manual_sync_with_filtering", extra={
                 'user_id': current_user.id,
-                'sync_payload': sync_payload,
+                'sync_payload': log_payload,
                 'exception': str(sync_exception)
             })
             return jsonify({
@@ -3827,7 +3766,7 @@ def save_selected_orders():
         if sync_result is None:
             logger.error("API: sync_result is None", extra={
                 'user_id': current_user.id,
-                'sync_payload': sync_payload
+                'sync_payload': log_payload
             })
             return jsonify({
                 'success': False,
@@ -909,6 +909,10 @@ def test_performance_suite():
     t_prio = (perf_counter() - start) * 1000.0
     results["benchmarks"]["priority_calc_1000_ms"] = round(t_prio, 2)
 
+    # 4) Rzeczywiste pomiary żądań modułu (middleware wydajności, bieżący proces)
+    from modules.logging.performance import performance_monitor
+    results["request_metrics"] = performance_monitor.get_report(blueprint='production')
+
     # (opcjonalnie) progi ostrzegawcze
     if t_id > 200:    results["warnings"].append("ID generation 1000x powyżej 200 ms")
     if t_db > 50:     results["warnings"].append("DB SELECT 1 powyżej 50 ms")
@@ -10,6 +10,9 @@ Centralna inicjalizacja wszystkich serwisów biznesowych modułu produkcyjnego:
 - ProductNameParser - parsowanie nazw produktów z Baselinker
 - PriorityCalculator - obliczanie priorytetów na podstawie konfiguracji
 - BaselinkerSyncService - synchronizacja z API Baselinker
+- ProductsQueryService - lista produktów (keyset, filtry, agregaty)
+- BusinessCalendarService - kalendarz dni roboczych (święta, przestoje zakładu)
+- BaselinkerWriteBackQueue - kolejka komentarzy i zmian statusów wysyłanych do BL po sync
 
 Autor: Konrad Kmiecik
 Wersja: 1.2 (Finalna - z zabezpieczeniami)
@@ -64,6 +67,28 @@ except ImportError as e:
     logger.warning(f"Nie można zaimportować BaselinkerSyncService: {e}")
     BaselinkerSyncService = None
 
+try:
+    from .products_query_service import ProductsQueryService, InvalidCursor
+    logger.debug("Zaimportowano ProductsQueryService")
+except ImportError as e:
+    logger.warning(f"Nie można zaimportować ProductsQueryService: {e}")
+    ProductsQueryService = None
+    InvalidCursor = None
+
+try:
+    from .business_calendar import BusinessCalendarService
+    logger.debug("Zaimportowano BusinessCalendarService")
+except ImportError as e:
+    logger.warning(f"Nie można zaimportować BusinessCalendarService: {e}")
+    BusinessCalendarService = None
+
+try:
+    from .baselinker_writeback import BaselinkerWriteBackQueue
+    logger.debug("Zaimportowano BaselinkerWriteBackQueue")
+except ImportError as e:
+    logger.warning(f"Nie można zaimportować BaselinkerWriteBackQueue: {e}")
+    BaselinkerWriteBackQueue = None
+
 # Singleton instances dla cache'owanych serwisów
 _config_service_instance = None
 _parser_instance = None
@@ -145,6 +170,10 @@ def invalidate_caches():
         except AttributeError:
             pass
     
+    # Kalendarz dni roboczych (święta/przestoje)
+    if BusinessCalendarService:
+        BusinessCalendarService.invalidate()
+    
     logger.info("Zinvalidowano wszystkie cache serwisów production")
 
 def reload_services():
@@ -332,6 +361,9 @@ __all__ = [
     'ProductNameParser',
     'PriorityCalculator',
     'BaselinkerSyncService',
+    'ProductsQueryService',
+    'BusinessCalendarService',
+    'BaselinkerWriteBackQueue',
     
     # Singleton gettery
     'get_config_service',
@@ -4,6 +4,7 @@ Serwis Cache Statusów Baselinker
 ===============================
 
 Implementuje cache'owanie statusów z Baselinker API w tabeli prod_config:
+- Najpierw wspólne słowniki Baselinker (modules.baselinker.dictionaries)
 - Automatyczne pobieranie statusów z API przy pierwszym wywołaniu
 - Cache z 7-dniowym TTL (Time To Live)
 - Automatyczne odświeżanie przy przedawnieniu cache
@@ -22,6 +23,7 @@ Data: 2025-01-17
 """
 
 import json
+import time
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 from modules.logging import get_structured_logger
@@ -101,6 +103,16 @@ class BaselinkerStatusCacheService:
                 'cache_key': self.CACHE_KEY
             })
             
+            # Wspólne słowniki Baselinker (baselinker_config, w pamięci procesu)
+            shared_statuses, shared_age_hours = self._get_shared_statuses()
+            if shared_statuses:
+                sorted_statuses = self._sort_statuses_by_workflow(shared_statuses)
+                logger.info("Użyto wspólnych słowników statusów Baselinker", extra={
+                    'statuses_count': len(sorted_statuses),
+                    'user_id': user_id
+                })
+                return sorted_statuses, True, shared_age_hours
+
             # Sprawdź cache
             cached_data, cache_age_hours = self._get_cached_statuses()
             
@@ -148,6 +160,25 @@ class BaselinkerStatusCacheService:
             # W przypadku błędu zwróć fallback
             return self.FALLBACK_STATUSES, False, 0.0
     
+    def _get_shared_statuses(self) -> Tuple[Optional[List[Dict]], float]:
+        """
+        Statusy ze wspólnych słowników Baselinker (BaselinkerDictionaries)
+        
+        Returns:
+            Tuple[Optional[List[Dict]], float]: (statusy lub None, wiek synchronizacji w godzinach)
+        """
+        try:
+            from modules.baselinker.dictionaries import BaselinkerDictionaries
+            snapshot = BaselinkerDictionaries.snapshot()
+        except Exception as e:
+            logger.warning("Wspólne słowniki Baselinker niedostępne", extra={'error': str(e)})
+            return None, 0.0
+        
+        statuses = [{'id': status['id'], 'name': status['name']} for status in snapshot['statuses']]
+        synced_at = snapshot.get('synced_at')
+        age_hours = (time.time() - synced_at) / 3600 if synced_at else 0.0
+        return statuses or None, age_hours
+    
     def _get_cached_statuses(self) -> Tuple[Optional[List[Dict]], Optional[float]]:
         """
         Pobiera statusy z cache w prod_config
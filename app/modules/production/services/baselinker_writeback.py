@@ -0,0 +1,173 @@
+# modules/production/services/baselinker_writeback.py
+"""
+Kolejka zapisów zwrotnych do Baselinker
+=======================================
+
+Synchronizacja produkcji zapisuje w Baselinker dwa rodzaje efektów ubocznych:
+- komentarz z błędami walidacji (addOrderInvoiceComment)
+- zmianę statusu zamówienia po zapisaniu produktów (setOrderStatus)
+
+Zamiast blokujących wywołań HTTP w pętli synchronizacji efekty są zbierane
+w kolejce (jeden wpis na zamówienie i typ - późniejszy zastępuje wcześniejszy)
+i wysyłane po commicie do bazy przez pulę wątków o ograniczonej liczbie
+równoległych zapytań, z ponawianiem nieudanych prób.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from modules.logging import get_structured_logger
+
+logger = get_structured_logger('production.baselinker_writeback')
+
+COMMENT = 'validation_comment'
+STATUS = 'status_change'
+
+
+class BaselinkerWriteBackQueue:
+    """
+    Kolejka zapisów zwrotnych jednej synchronizacji.
+
+    Użycie:
+        queue = BaselinkerWriteBackQueue(sync_service)
+        queue.add_validation_comment(order_id, errors)
+        queue.change_status(order_id, 138619)
+        ...  # commit do bazy
+        result = queue.flush()
+    """
+
+    MAX_WORKERS = 4      # maks. równoległych zapytań do Baselinker
+    MAX_ATTEMPTS = 3
+    RETRY_DELAY = 1.0    # sekundy, rośnie wykładniczo z każdą próbą
+
+    def __init__(self, sync_service, max_workers: int = None):
+        self.sync_service = sync_service
+        self.max_workers = max_workers or self.MAX_WORKERS
+        self._pending: Dict[Tuple[str, int], Dict[str, Any]] = {}
+        self._duplicates = 0
+        self._local = threading.local()
+
+    def __len__(self):
+        return len(self._pending)
+
+    # ------------------------------------------------------------------
+    # Zbieranie
+    # ------------------------------------------------------------------
+
+    def _enqueue(self, kind: str, order_id: int, request_data: Dict[str, Any]):
+        key = (kind, int(order_id))
+        if key in self._pending:
+            self._duplicates += 1
+        self._pending[key] = request_data
+
+    def add_validation_comment(self, order_id: int, errors: List[str]):
+        if errors:
+            self._enqueue(COMMENT, order_id, self.sync_service._validation_comment_request(order_id, errors))
+
+    def change_status(self, order_id: int, target_status: int):
+        self._enqueue(STATUS, order_id, self.sync_service._status_change_request(order_id, target_status))
+
+    # ------------------------------------------------------------------
+    # Wysyłka
+    # ------------------------------------------------------------------
+
+    def _session(self) -> requests.Session:
+        # Sesja per wątek - połączenia HTTP są ponownie używane między zapytaniami
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=1))
+            self._local.session = session
+        return session
+
+    def _send(self, key: Tuple[str, int], request_data: Dict[str, Any]) -> Dict[str, Any]:
+        kind, order_id = key
+        started = time.perf_counter()
+        error = None
+
+        for attempt in range(1, self.MAX_ATTEMPTS + 1):
+            try:
+                response = self._session().post(
+                    self.sync_service.api_endpoint,
+                    data=request_data,
+                    timeout=self.sync_service.api_timeout,
+                    headers={'Content-Type': 'application/x-www-form-urlencoded'}
+                )
+                response.raise_for_status()
+                response_data = response.json()
+                if response_data.get('status') == 'SUCCESS':
+                    return {'kind': kind, 'order_id': order_id, 'success': True, 'attempts': attempt,
+                            'duration_ms': round((time.perf_counter() - started) * 1000, 1)}
+                error = response_data.get('error_message') or response_data.get('error_code') or 'Unknown error'
+            except (requests.RequestException, ValueError) as e:
+                error = str(e)
+
+            if attempt < self.MAX_ATTEMPTS:
+                time.sleep(self.RETRY_DELAY * 2 ** (attempt - 1))
+
+        logger.error("Nie udało się wykonać zapisu zwrotnego do Baselinker", extra={
+            'kind': kind,
+            'order_id': order_id,
+            'attempts': self.MAX_ATTEMPTS,
+            'error': error
+        })
+        return {'kind': kind, 'order_id': order_id, 'success': False, 'attempts': self.MAX_ATTEMPTS,
+                'error': error, 'duration_ms': round((time.perf_counter() - started) * 1000, 1)}
+
+    def flush(self) -> Dict[str, Any]:
+        """
+        Wysyła zebrane zapisy (wywoływać po commicie do bazy) i czyści kolejkę.
+
+        Returns:
+            Dict: liczniki per typ, duration_ms (czas całej wysyłki), max_request_ms,
+                  retries, failed (lista nieudanych zapisów)
+        """
+        pending, self._pending = self._pending, {}
+        duplicates, self._duplicates = self._duplicates, 0
+
+        result = {
+            'requests': len(pending),
+            'duplicates_skipped': duplicates,
+            'comments_sent': 0,
+            'comments_failed': 0,
+            'status_changes_count': 0,
+            'status_change_errors': 0,
+            'retries': 0,
+            'duration_ms': 0.0,
+            'max_request_ms': 0.0,
+            'failed': []
+        }
+        if not pending:
+            return result
+
+        if not self.sync_service.api_key:
+            logger.error("Brak klucza API - pominięto zapisy zwrotne do Baselinker", extra={'requests': len(pending)})
+            for kind, order_id in pending:
+                result['comments_failed' if kind == COMMENT else 'status_change_errors'] += 1
+                result['failed'].append({'kind': kind, 'order_id': order_id, 'error': 'Brak klucza API'})
+            return result
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(pending))) as executor:
+            outcomes = list(executor.map(lambda item: self._send(*item), pending.items()))
+        result['duration_ms'] = round((time.perf_counter() - started) * 1000, 1)
+
+        for outcome in outcomes:
+            result['retries'] += outcome['attempts'] - 1
+            result['max_request_ms'] = max(result['max_request_ms'], outcome['duration_ms'])
+            if outcome['kind'] == COMMENT:
+                result['comments_sent' if outcome['success'] else 'comments_failed'] += 1
+            else:
+                result['status_changes_count' if outcome['success'] else 'status_change_errors'] += 1
+            if not outcome['success']:
+                result['failed'].append({k: outcome[k] for k in ('kind', 'order_id', 'error')})
+
+        logger.info("Wysłano zapisy zwrotne do Baselinker", extra={
+            k: v for k, v in result.items() if k != 'failed'
+        })
+        return result
@@ -0,0 +1,294 @@
+# modules/production/services/business_calendar.py
+"""
+Kalendarz dni roboczych produkcji
+=================================
+
+Deadline produktu to data startowa + N dni roboczych. Dzień roboczy to dzień
+od poniedziałku do piątku, który nie jest:
+- ustawowym świętem w Polsce (liczone w kodzie, łącznie ze świętami ruchomymi)
+- dniem z tabeli prod_days_off (dodatkowe święta, przestoje zakładu)
+
+Kalendarz budowany jest raz dla zakresu lat i trzyma dwie tablice:
+- ordynały kolejnych dni roboczych
+- skumulowaną liczbę dni roboczych dla każdego dnia zakresu
+
+dzięki czemu przesunięcie o N dni roboczych to dwa odczyty z tablic (O(1))
+zamiast iteracji dzień po dniu. Zbudowany kalendarz jest cache'owany
+w procesie (CACHE_TTL) i przebudowywany po zmianie listy dni wolnych
+w tym procesie lub gdy data wypada poza zakres.
+"""
+
+import threading
+import time
+from array import array
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from extensions import db
+from modules.logging import get_structured_logger
+
+logger = get_structured_logger('production.business_calendar')
+
+# Święta stałe (miesiąc, dzień, nazwa)
+FIXED_HOLIDAYS = (
+    (1, 1, 'Nowy Rok'),
+    (1, 6, 'Trzech Króli'),
+    (5, 1, 'Święto Pracy'),
+    (5, 3, 'Święto Konstytucji 3 Maja'),
+    (8, 15, 'Wniebowzięcie NMP'),
+    (11, 1, 'Wszystkich Świętych'),
+    (11, 11, 'Święto Niepodległości'),
+    (12, 25, 'Boże Narodzenie'),
+    (12, 26, 'Drugi dzień Bożego Narodzenia'),
+)
+
+# Wigilia jest dniem wolnym od pracy od 2025 roku
+CHRISTMAS_EVE_SINCE = 2025
+
+
+def easter_sunday(year: int) -> date:
+    """Data Wielkanocy (algorytm Meeusa/Jonesa/Butchera, kalendarz gregoriański)"""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def polish_public_holidays(year: int) -> Dict[date, str]:
+    """Ustawowe dni wolne od pracy w danym roku"""
+    holidays = {date(year, month, day): name for month, day, name in FIXED_HOLIDAYS}
+    if year >= CHRISTMAS_EVE_SINCE:
+        holidays[date(year, 12, 24)] = 'Wigilia'
+
+    easter = easter_sunday(year)
+    holidays[easter] = 'Wielkanoc'
+    holidays[easter + timedelta(days=1)] = 'Poniedziałek Wielkanocny'
+    holidays[easter + timedelta(days=49)] = 'Zielone Świątki'
+    holidays[easter + timedelta(days=60)] = 'Boże Ciało'
+    return holidays
+
+
+class BusinessCalendar:
+    """
+    Niezmienny indeks dni roboczych dla zakresu lat [first_year, last_year]
+    """
+
+    def __init__(self, first_year: int, last_year: int, days_off: Iterable[date] = ()):
+        self.first_year = first_year
+        self.last_year = last_year
+        self._origin = date(first_year, 1, 1).toordinal()
+        self._end = date(last_year, 12, 31).toordinal()
+
+        off = {day.toordinal() for day in days_off}
+        for year in range(first_year, last_year + 1):
+            off.update(day.toordinal() for day in polish_public_holidays(year))
+
+        # _cumulative[i] = liczba dni roboczych w [origin, origin + i]
+        self._business = array('l')
+        self._cumulative = array('l')
+        count = 0
+        for ordinal in range(self._origin, self._end + 1):
+            # date.fromordinal(1) to poniedziałek, więc (ordinal - 1) % 7 == weekday()
+            if (ordinal - 1) % 7 < 5 and ordinal not in off:
+                self._business.append(ordinal)
+                count += 1
+            self._cumulative.append(count)
+
+    def covers(self, day: date) -> bool:
+        return self._origin <= day.toordinal() <= self._end
+
+    def is_business_day(self, day: date) -> bool:
+        index = day.toordinal() - self._origin
+        previous = self._cumulative[index - 1] if index > 0 else 0
+        return self._cumulative[index] > previous
+
+    def add_business_days(self, start: date, business_days: int) -> Optional[date]:
+        """
+        N-ty dzień roboczy po ``start`` (sam ``start`` się nie liczy).
+        Zwraca None, jeśli wynik wypada poza zakres kalendarza.
+        """
+        if business_days <= 0:
+            return start
+        position = self._cumulative[start.toordinal() - self._origin] + business_days - 1
+        if position >= len(self._business):
+            return None
+        return date.fromordinal(self._business[position])
+
+    def business_days_between(self, start: date, end: date) -> int:
+        """Liczba dni roboczych w przedziale (start, end]"""
+        return (self._cumulative[end.toordinal() - self._origin]
+                - self._cumulative[start.toordinal() - self._origin])
+
+
+class BusinessCalendarService:
+    """Kalendarz procesu (cache) + zarządzanie listą dni wolnych"""
+
+    CACHE_TTL = 600          # sekundy - zmiany z innych procesów widoczne najpóźniej po tym czasie
+    YEARS_BEFORE = 1
+    YEARS_AFTER = 2
+
+    _calendar = None
+    _built_at = 0.0
+    _lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Kalendarz
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _load_days_off(first_year: int, last_year: int) -> List[date]:
+        from ..models import ProductionDayOff
+        rows = db.session.query(ProductionDayOff.day_date).filter(
+            ProductionDayOff.day_date >= date(first_year, 1, 1),
+            ProductionDayOff.day_date <= date(last_year, 12, 31)
+        ).all()
+        return [row.day_date for row in rows]
+
+    @classmethod
+    def get_calendar(cls, first_year: Optional[int] = None, last_year: Optional[int] = None) -> BusinessCalendar:
+        """
+        Kalendarz obejmujący co najmniej lata [first_year, last_year]
+        (domyślnie rok bieżący -YEARS_BEFORE / +YEARS_AFTER).
+        """
+        this_year = date.today().year
+        first_year = min(first_year or this_year, this_year - cls.YEARS_BEFORE)
+        last_year = max(last_year or this_year, this_year + cls.YEARS_AFTER)
+
+        with cls._lock:
+            calendar = cls._calendar
+            fresh = calendar is not None and time.monotonic() - cls._built_at < cls.CACHE_TTL
+            if fresh and calendar.first_year <= first_year and calendar.last_year >= last_year:
+                return calendar
+
+            if calendar is not None and fresh:
+                # Rozszerzenie zakresu - nie zawężaj tego, co już było zbudowane
+                first_year = min(first_year, calendar.first_year)
+                last_year = max(last_year, calendar.last_year)
+
+            started = time.perf_counter()
+            try:
+                days_off = cls._load_days_off(first_year, last_year)
+            except Exception as e:
+                # Bez tabeli (np. przed migracją) liczymy tylko weekendy i święta ustawowe
+                db.session.rollback()
+                logger.warning("Nie udało się pobrać dni wolnych zakładu", extra={'error': str(e)})
+                days_off = []
+
+            calendar = BusinessCalendar(first_year, last_year, days_off)
+            cls._calendar = calendar
+            cls._built_at = time.monotonic()
+
+        logger.debug("Zbudowano kalendarz dni roboczych", extra={
+            'first_year': first_year,
+            'last_year': last_year,
+            'days_off': len(days_off),
+            'build_ms': round((time.perf_counter() - started) * 1000, 2)
+        })
+        return calendar
+
+    @classmethod
+    def invalidate(cls):
+        with cls._lock:
+            cls._calendar = None
+
+    @classmethod
+    def add_business_days(cls, start_date: date, business_days: int) -> date:
+        return cls.add_business_days_batch([start_date], business_days)[0]
+
+    @classmethod
+    def add_business_days_batch(cls, start_dates: List[date], business_days: int) -> List[date]:
+        """
+        Deadline'y dla wielu dat startowych przy jednej liczbie dni roboczych
+        (cała synchronizacja) - kalendarz pobierany jest raz.
+        """
+        if not start_dates:
+            return []
+        if business_days <= 0:
+            return list(start_dates)
+
+        # Zapas na N dni roboczych: ~N*7/5 dni kalendarzowych + święta
+        span_years = business_days * 2 // 365 + 1
+        calendar = cls.get_calendar(min(start_dates).year, max(start_dates).year + span_years)
+
+        results = []
+        for start in start_dates:
+            deadline = calendar.add_business_days(start, business_days)
+            if deadline is None:
+                calendar = cls.get_calendar(calendar.first_year, calendar.last_year + span_years)
+                deadline = calendar.add_business_days(start, business_days)
+            results.append(deadline)
+        return results
+
+    @classmethod
+    def is_business_day(cls, day: date) -> bool:
+        return cls.get_calendar(day.year, day.year).is_business_day(day)
+
+    # ------------------------------------------------------------------
+    # Dni wolne (admin)
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def list_days_off(cls, year: int) -> Dict[str, list]:
+        """Święta ustawowe (tylko do odczytu) i wpisy z prod_days_off dla roku"""
+        from ..models import ProductionDayOff
+
+        entries = ProductionDayOff.query.filter(
+            ProductionDayOff.day_date >= date(year, 1, 1),
+            ProductionDayOff.day_date <= date(year, 12, 31)
+        ).order_by(ProductionDayOff.day_date).all()
+
+        return {
+            'public_holidays': [
+                {'day_date': day.isoformat(), 'name': name}
+                for day, name in sorted(polish_public_holidays(year).items())
+            ],
+            'days_off': [entry.to_dict() for entry in entries]
+        }
+
+    @classmethod
+    def add_day_off(cls, day_date: date, day_type: str = 'closure', name: Optional[str] = None,
+                    user_id: Optional[int] = None):
+        from ..models import ProductionDayOff
+
+        if day_type not in ('holiday', 'closure'):
+            raise ValueError(f"Nieprawidłowy typ dnia wolnego: {day_type}")
+        if ProductionDayOff.query.filter_by(day_date=day_date).first():
+            raise ValueError(f"Dzień {day_date.isoformat()} jest już na liście dni wolnych")
+
+        entry = ProductionDayOff(day_date=day_date, day_type=day_type, name=name, created_by=user_id)
+        db.session.add(entry)
+        db.session.commit()
+        cls.invalidate()
+
+        logger.info("Dodano dzień wolny produkcji", extra={
+            'day_date': day_date.isoformat(),
+            'day_type': day_type,
+            'user_id': user_id
+        })
+        return entry
+
+    @classmethod
+    def remove_day_off(cls, day_off_id: int, user_id: Optional[int] = None) -> bool:
+        from ..models import ProductionDayOff
+
+        entry = ProductionDayOff.query.get(day_off_id)
+        if not entry:
+            return False
+
+        day_date = entry.day_date
+        db.session.delete(entry)
+        db.session.commit()
+        cls.invalidate()
+
+        logger.info("Usunięto dzień wolny produkcji", extra={
+            'day_date': day_date.isoformat(),
+            'user_id': user_id
+        })
+        return True
@@ -0,0 +1,536 @@
+# modules/production/services/products_query_service.py
+"""
+Zapytania listy produktów dla taba "Produkty"
+=============================================
+
+Lista produktów rośnie z każdym zsynchronizowanym zamówieniem, więc tab nie
+pobiera już całej tabeli prod_items:
+
+- partycja statusów: domyślnie tylko produkty w realizacji (scope=active),
+  archiwum (spakowane/anulowane) dostępne osobno (scope=archive) lub razem (all)
+- paginacja keyset (kursor na kolumnie sortowania + id) zamiast OFFSET -
+  koszt kolejnej strony nie zależy od jej numeru
+- wyszukiwanie domyślnie po prefiksie ID produktu, numeru zamówienia
+  i klienta (LIKE 'term%' - indeksy); dopasowanie w dowolnym miejscu
+  (LIKE '%..%' w kliencie, ID i nazwie produktu) tylko na żądanie
+  (search_mode=contains) i tylko w obrębie jednej partycji statusów
+- statystyki i opcje filtrów liczone agregatami SQL
+"""
+
+import base64
+import json
+import threading
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import and_, or_, func, case, distinct
+
+from extensions import db
+from modules.logging import get_structured_logger
+from ..models import ProductionItem
+
+logger = get_structured_logger('production.products_query')
+
+
+class InvalidCursor(ValueError):
+    """Nieprawidłowy lub niepasujący do sortowania kursor"""
+    pass
+
+
+class ProductsQueryService:
+    """Filtrowanie, paginacja keyset i agregaty dla listy produktów"""
+
+    ACTIVE_STATUSES = ('czeka_na_wyciecie', 'czeka_na_skladanie', 'czeka_na_pakowanie',
+                       'wstrzymane', 'w_realizacji')
+    ARCHIVE_STATUSES = ('spakowane', 'anulowane')
+    SCOPES = ('active', 'archive', 'all')
+    SEARCH_MODES = ('prefix', 'contains')
+
+    SORT_COLUMNS = {
+        'priority_rank': ProductionItem.priority_rank,
+        'deadline_date': ProductionItem.deadline_date,
+        'created_at': ProductionItem.created_at,
+        'short_product_id': ProductionItem.short_product_id,
+    }
+
+    DEFAULT_LIMIT = 100
+    MAX_LIMIT = 500
+    URGENT_DAYS = 3
+    FILTER_OPTIONS_TTL = 300  # sekundy
+
+    _filter_options_cache = None
+    _filter_options_at = 0.0
+    _filter_options_lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Parametry żądania
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _split(value):
+        if not value:
+            return []
+        if isinstance(value, (list, tuple)):
+            return [str(v).strip() for v in value if str(v).strip()]
+        return [v.strip() for v in str(value).split(',') if v.strip()]
+
+    @classmethod
+    def parse_filters(cls, args):
+        """
+        Buduje słownik filtrów z parametrów żądania (request.args lub dict).
+        Listy mogą być przekazane jako wartości rozdzielone przecinkami.
+        """
+        scope = (args.get('scope') or 'active').lower()
+        if scope not in cls.SCOPES:
+            scope = 'active'
+
+        statuses = cls._split(args.get('statuses') or args.get('status'))
+        statuses = [s for s in statuses if s != 'all']
+
+        thicknesses = []
+        for value in cls._split(args.get('thicknesses')):
+            try:
+                thicknesses.append(Decimal(value.lower().replace('cm', '').strip()))
+            except Exception:
+                continue
+
+        # Dopasowanie '%..%' skanuje partycję - niedostępne dla całej tabeli (scope=all)
+        search_mode = (args.get('search_mode') or 'prefix').lower()
+        if search_mode not in cls.SEARCH_MODES or (scope == 'all' and not statuses):
+            search_mode = 'prefix'
+
+        sort_by = args.get('sort_by') or 'priority_rank'
+        if sort_by not in cls.SORT_COLUMNS:
+            sort_by = 'priority_rank'
+        sort_order = (args.get('sort_order') or 'asc').lower()
+        if sort_order not in ('asc', 'desc'):
+            sort_order = 'asc'
+
+        return {
+            'scope': scope,
+            'statuses': statuses,
+            'search': (args.get('search') or '').strip()[:100],
+            'search_mode': search_mode,
+            'wood_species': cls._split(args.get('wood_species')),
+            'technologies': cls._split(args.get('technologies')),
+            'wood_classes': cls._split(args.get('wood_classes')),
+            'thicknesses': thicknesses,
+            'sort_by': sort_by,
+            'sort_order': sort_order,
+        }
+
+    # ------------------------------------------------------------------
+    # Filtrowanie
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def search_condition(cls, term, mode='prefix'):
+        """
+        Warunek wyszukiwania po prefiksie (LIKE 'term%') - korzysta z indeksów
+        short_product_id, internal_order_number i client_name.
+        Tryb 'contains' dodaje LIKE '%term%' w kliencie, ID i nazwie produktu
+        (bez indeksu - tylko w obrębie partycji statusów).
+        Znaki '_' i '%' w zapytaniu są escapowane (ID zawierają '_').
+        """
+        conditions = [
+            ProductionItem.short_product_id.startswith(term, autoescape=True),
+            ProductionItem.internal_order_number.startswith(term, autoescape=True),
+            ProductionItem.client_name.startswith(term, autoescape=True),
+        ]
+        if mode == 'contains':
+            conditions += [
+                ProductionItem.client_name.contains(term, autoescape=True),
+                ProductionItem.short_product_id.contains(term, autoescape=True),
+                ProductionItem.original_product_name.contains(term, autoescape=True),
+            ]
+        return or_(*conditions)
+
+    @classmethod
+    def apply_filters(cls, query, filters):
+        """Nakłada partycję statusów i filtry (bez kursora i sortowania)"""
+        statuses = filters.get('statuses')
+        if statuses:
+            query = query.filter(ProductionItem.current_status.in_(statuses))
+        elif filters.get('scope') == 'active':
+            query = query.filter(ProductionItem.current_status.in_(cls.ACTIVE_STATUSES))
+        elif filters.get('scope') == 'archive':
+            query = query.filter(ProductionItem.current_status.in_(cls.ARCHIVE_STATUSES))
+
+        if filters.get('search'):
+            query = query.filter(cls.search_condition(filters['search'], filters.get('search_mode', 'prefix')))
+
+        if filters.get('wood_species'):
+            query = query.filter(ProductionItem.parsed_wood_species.in_(filters['wood_species']))
+        if filters.get('technologies'):
+            query = query.filter(ProductionItem.parsed_technology.in_(filters['technologies']))
+        if filters.get('wood_classes'):
+            query = query.filter(ProductionItem.parsed_wood_class.in_(filters['wood_classes']))
+        if filters.get('thicknesses'):
+            query = query.filter(ProductionItem.parsed_thickness_cm.in_(filters['thicknesses']))
+
+        return query
+
+    # ------------------------------------------------------------------
+    # Kursor keyset
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _encode_value(value):
+        if isinstance(value, datetime):
+            return {'t': 'dt', 'v': value.isoformat()}
+        if isinstance(value, date):
+            return {'t': 'd', 'v': value.isoformat()}
+        return {'t': 'raw', 'v': value}
+
+    @staticmethod
+    def _decode_value(data):
+        if data['t'] == 'dt':
+            return datetime.fromisoformat(data['v'])
+        if data['t'] == 'd':
+            return date.fromisoformat(data['v'])
+        return data['v']
+
+    @classmethod
+    def encode_cursor(cls, item, filters):
+        value = getattr(item, filters['sort_by'])
+        payload = {
+            's': filters['sort_by'],
+            'o': filters['sort_order'],
+            'k': cls._encode_value(value),
+            'id': item.id,
+        }
+        raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+    @classmethod
+    def decode_cursor(cls, cursor, filters):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+            value = cls._decode_value(payload['k'])
+            last_id = int(payload['id'])
+        except Exception:
+            raise InvalidCursor("Nieprawidłowy kursor")
+
+        if payload.get('s') != filters['sort_by'] or payload.get('o') != filters['sort_order']:
+            raise InvalidCursor("Kursor nie pasuje do sortowania")
+        return value, last_id
+
+    @staticmethod
+    def _after_cursor(column, value, last_id, descending):
+        """
+        Warunek "wiersze po kursorze" dla ORDER BY column, id. NULL traktowany
+        jest jak najmniejsza wartość (tak sortuje MySQL), więc w ASC NULL-e są
+        na początku, a w DESC na końcu.
+        """
+        pk = ProductionItem.id
+        if not descending:
+            if value is None:
+                return or_(and_(column.is_(None), pk > last_id), column.isnot(None))
+            return or_(column > value, and_(column == value, pk > last_id))
+
+        if value is None:
+            return and_(column.is_(None), pk < last_id)
+        return or_(column < value, and_(column == value, pk < last_id), column.is_(None))
+
+    # ------------------------------------------------------------------
+    # Strony i agregaty
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def fetch_page(cls, filters, cursor=None, limit=None):
+        """
+        Pobiera jedną stronę produktów.
+
+        Returns:
+            dict: products (lista słowników), next_cursor, has_more
+        """
+        limit = max(1, min(int(limit or cls.DEFAULT_LIMIT), cls.MAX_LIMIT))
+        column = cls.SORT_COLUMNS[filters['sort_by']]
+        descending = filters['sort_order'] == 'desc'
+
+        query = cls.apply_filters(ProductionItem.query, filters)
+        if cursor:
+            value, last_id = cls.decode_cursor(cursor, filters)
+            query = query.filter(cls._after_cursor(column, value, last_id, descending))
+
+        if descending:
+            query = query.order_by(column.desc(), ProductionItem.id.desc())
+        else:
+            query = query.order_by(column.asc(), ProductionItem.id.asc())
+
+        items = query.limit(limit + 1).all()
+        has_more = len(items) > limit
+        items = items[:limit]
+
+        return {
+            'products': [cls.serialize(item) for item in items],
+            'next_cursor': cls.encode_cursor(items[-1], filters) if has_more else None,
+            'has_more': has_more,
+        }
+
+    @classmethod
+    def get_stats(cls, filters):
+        """Statystyki całego przefiltrowanego zbioru - dwa zapytania agregujące"""
+        urgent_limit = date.today() + timedelta(days=cls.URGENT_DAYS)
+
+        totals = cls.apply_filters(db.session.query(
+            func.count(ProductionItem.id),
+            func.coalesce(func.sum(ProductionItem.volume_m3), 0),
+            func.coalesce(func.sum(ProductionItem.total_value_net), 0),
+            func.coalesce(func.sum(case((ProductionItem.deadline_date <= urgent_limit, 1), else_=0)), 0)
+        ), filters).one()
+
+        breakdown = cls.apply_filters(db.session.query(
+            ProductionItem.current_status, func.count(ProductionItem.id)
+        ), filters).group_by(ProductionItem.current_status).all()
+
+        return {
+            'total_count': int(totals[0] or 0),
+            'total_volume': round(float(totals[1] or 0), 3),
+            'total_value': round(float(totals[2] or 0), 2),
+            'urgent_count': int(totals[3] or 0),
+            'status_breakdown': {status: count for status, count in breakdown},
+        }
+
+    @classmethod
+    def get_filter_options(cls, force=False):
+        """Unikalne wartości dla dropdownów filtrów (cache w procesie)"""
+        with cls._filter_options_lock:
+            if (not force and cls._filter_options_cache is not None
+                    and time.monotonic() - cls._filter_options_at < cls.FILTER_OPTIONS_TTL):
+                return cls._filter_options_cache
+
+        def _distinct(column):
+            rows = db.session.query(distinct(column)).filter(column.isnot(None)).all()
+            return [row[0] for row in rows if row[0] not in (None, '')]
+
+        thicknesses = sorted(float(value) for value in _distinct(ProductionItem.parsed_thickness_cm) if value > 0)
+        options = {
+            'wood_species': sorted(_distinct(ProductionItem.parsed_wood_species)),
+            'technologies': sorted(_distinct(ProductionItem.parsed_technology)),
+            'wood_classes': sorted(_distinct(ProductionItem.parsed_wood_class)),
+            'thicknesses': [f"{value}cm" for value in thicknesses],
+            'statuses': list(cls.ACTIVE_STATUSES + cls.ARCHIVE_STATUSES),
+        }
+
+        with cls._filter_options_lock:
+            cls._filter_options_cache = options
+            cls._filter_options_at = time.monotonic()
+        return options
+
+    # ------------------------------------------------------------------
+    # Serializacja
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _float(value):
+        try:
+            return float(value) if value is not None else 0.0
+        except (TypeError, ValueError):
+            return 0.0
+
+    @staticmethod
+    def _iso(value):
+        return value.isoformat() if value else None
+
+    @classmethod
+    def serialize(cls, product):
+        """Dane wiersza listy produktów (format jak w products-tab-content)"""
+        days_to_deadline = (product.deadline_date - date.today()).days if product.deadline_date else None
+
+        return {
+            'id': product.id,
+            'short_product_id': product.short_product_id or '',
+            'original_product_name': product.original_product_name or '',
+            'current_status': product.current_status,
+            'priority_rank': product.priority_rank,
+            'priority_manual_override': bool(product.priority_manual_override),
+
+            'volume_m3': cls._float(product.volume_m3),
+            'total_value_net': cls._float(product.total_value_net),
+            'unit_price_net': cls._float(product.unit_price_net),
+
+            'deadline_date': cls._iso(product.deadline_date),
+            'days_until_deadline': days_to_deadline,
+
+            'client_name': product.client_name or '',
+            'client_email': product.client_email or '',
+            'client_phone': product.client_phone or '',
+            'delivery_address': product.delivery_address or '',
+
+            'internal_order_number': product.internal_order_number or '',
+            'baselinker_order_id': product.baselinker_order_id,
+            'baselinker_product_id': product.baselinker_product_id or '',
+            'product_sequence_in_order': product.product_sequence_in_order or 1,
+
+            'parsed_wood_species': product.parsed_wood_species,
+            'parsed_technology': product.parsed_technology,
+            'parsed_wood_class': product.parsed_wood_class,
+            'parsed_length_cm': cls._float(product.parsed_length_cm),
+            'parsed_width_cm': cls._float(product.parsed_width_cm),
+            'parsed_thickness_cm': cls._float(product.parsed_thickness_cm),
+            'parsed_finish_state': product.parsed_finish_state,
+
+            'cutting_started_at': cls._iso(product.cutting_started_at),
+            'cutting_completed_at': cls._iso(product.cutting_completed_at),
+            'cutting_duration_minutes': product.cutting_duration_minutes,
+            'assembly_started_at': cls._iso(product.assembly_started_at),
+            'assembly_completed_at': cls._iso(product.assembly_completed_at),
+            'assembly_duration_minutes': product.assembly_duration_minutes,
+            'packaging_started_at': cls._iso(product.packaging_started_at),
+            'packaging_completed_at': cls._iso(product.packaging_completed_at),
+            'packaging_duration_minutes': product.packaging_duration_minutes,
+
+            'cutting_assigned_worker_id': product.cutting_assigned_worker_id,
+            'assembly_assigned_worker_id': product.assembly_assigned_worker_id,
+            'packaging_assigned_worker_id': product.packaging_assigned_worker_id,
+
+            'production_notes': product.production_notes or '',
+            'quality_issues': product.quality_issues or '',
+
+            'created_at': cls._iso(product.created_at),
+            'updated_at': cls._iso(product.updated_at),
+            'sync_source': product.sync_source,
+
+            'unique_id': f"{product.short_product_id or ''}-{product.id}",
+        }
+
+    # ------------------------------------------------------------------
+    # Benchmark
+    # ------------------------------------------------------------------
+
+    BENCHMARK_PREFIX = '99_'
+
+    @classmethod
+    def _seed_benchmark_rows(cls, rows, batch_size=5000):
+        """
+        Wstawia syntetyczne produkty z ID '99_NNNNN_S' (10 produktów na
+        zamówienie). ~90% rekordów to archiwum - jak w produkcyjnej historii.
+        """
+        statuses_active = cls.ACTIVE_STATUSES[:3]
+        species = ('dąb', 'jesion', 'buk')
+        now = datetime.now()
+        batch = []
+
+        for i in range(rows):
+            order_no, sequence = divmod(i, 10)
+            archived = i % 10 != 0
+            batch.append({
+                'short_product_id': f"{cls.BENCHMARK_PREFIX}{order_no:05d}_{sequence + 1}",
+                'internal_order_number': f"{cls.BENCHMARK_PREFIX}{order_no:05d}",
+                'product_sequence_in_order': sequence + 1,
+                'baselinker_order_id': 0,
+                'original_product_name': f"Klejonka {species[i % 3]} lita A/B 200x60x4 cm surowa",
+                'parsed_wood_species': species[i % 3],
+                'parsed_technology': 'lity',
+                'parsed_wood_class': 'A/B',
+                'parsed_thickness_cm': Decimal('4.00'),
+                'volume_m3': Decimal('0.0480'),
+                'total_value_net': Decimal('450.00'),
+                'client_name': f"BENCHMARK Klient {order_no % 5000:04d}",
+                'current_status': 'spakowane' if archived else statuses_active[i % 3],
+                'priority_rank': None if archived else i // 10 + 1,
+                'deadline_date': (now + timedelta(days=i % 30)).date(),
+                'created_at': now - timedelta(minutes=rows - i),
+                'updated_at': now,
+                'sync_source': 'manual_entry',
+            })
+            if len(batch) >= batch_size:
+                db.session.execute(ProductionItem.__table__.insert(), batch)
+                db.session.commit()
+                batch = []
+
+        if batch:
+            db.session.execute(ProductionItem.__table__.insert(), batch)
+            db.session.commit()
+
+    @classmethod
+    def _cleanup_benchmark_rows(cls):
+        deleted = ProductionItem.query.filter(
+            ProductionItem.short_product_id.startswith(cls.BENCHMARK_PREFIX, autoescape=True)
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        return deleted
+
+    @staticmethod
+    def _measure(fn, repeat=3):
+        timings = []
+        result = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = fn()
+            timings.append((time.perf_counter() - started) * 1000)
+        return round(min(timings), 2), result
+
+    @classmethod
+    def benchmark(cls, rows=100000, pages=20, keep=False):
+        """
+        Mierzy czasy zapytań listy produktów na ``rows`` syntetycznych rekordach
+        (uruchamiać na bazie testowej). Porównuje keyset z dotychczasowym
+        OFFSET + ILIKE '%..%'.
+
+        Returns:
+            dict: czasy w ms (najlepszy z 3 przebiegów)
+        """
+        if ProductionItem.query.filter(
+                ProductionItem.short_product_id.startswith(cls.BENCHMARK_PREFIX, autoescape=True)).first():
+            raise RuntimeError("W tabeli są już rekordy benchmarku - usuń je przed uruchomieniem")
+
+        started = time.perf_counter()
+        cls._seed_benchmark_rows(rows)
+        seed_seconds = round(time.perf_counter() - started, 1)
+
+        try:
+            active = cls.parse_filters({})
+            archive = cls.parse_filters({'scope': 'archive', 'sort_by': 'created_at', 'sort_order': 'desc'})
+            search = cls.parse_filters({'scope': 'all', 'search': 'BENCHMARK Klient 0042'})
+            search_contains = cls.parse_filters({'scope': 'archive', 'search': 'Klient 0042',
+                                                 'search_mode': 'contains'})
+            per_page = cls.DEFAULT_LIMIT
+
+            def walk_pages(filters):
+                cursor = None
+                for _ in range(pages):
+                    page = cls.fetch_page(filters, cursor=cursor, limit=per_page)
+                    cursor = page['next_cursor']
+                    if not cursor:
+                        break
+                return cursor
+
+            deep_cursor = walk_pages(archive)
+
+            result = {'rows': rows, 'seed_seconds': seed_seconds}
+            result['active_first_page_ms'], _ = cls._measure(lambda: cls.fetch_page(active, limit=per_page))
+            result['archive_first_page_ms'], _ = cls._measure(lambda: cls.fetch_page(archive, limit=per_page))
+            if deep_cursor:
+                result[f'archive_page_{pages + 1}_keyset_ms'], _ = cls._measure(
+                    lambda: cls.fetch_page(archive, cursor=deep_cursor, limit=per_page))
+            result['search_prefix_ms'], _ = cls._measure(lambda: cls.fetch_page(search, limit=per_page))
+            result['search_contains_archive_ms'], _ = cls._measure(
+                lambda: cls.fetch_page(search_contains, limit=per_page))
+            result['stats_active_ms'], _ = cls._measure(lambda: cls.get_stats(active))
+
+            # Dotychczasowe podejście: OFFSET + ILIKE '%..%' po czterech kolumnach
+            pattern = '%BENCHMARK Klient 0042%'
+            legacy_search = ProductionItem.query.filter(or_(
+                ProductionItem.original_product_name.ilike(pattern),
+                ProductionItem.short_product_id.ilike(pattern),
+                ProductionItem.internal_order_number.ilike(pattern),
+                ProductionItem.client_name.ilike(pattern),
+            )).order_by(ProductionItem.priority_rank.asc())
+            result['legacy_search_offset_ms'], _ = cls._measure(
+                lambda: legacy_search.limit(per_page).offset(0).all())
+            result[f'legacy_page_{pages + 1}_offset_ms'], _ = cls._measure(
+                lambda: ProductionItem.query
+                .filter(ProductionItem.current_status.in_(cls.ARCHIVE_STATUSES))
+                .order_by(ProductionItem.created_at.desc())
+                .limit(per_page).offset(pages * per_page).all())
+
+            logger.info("Benchmark listy produktów", extra=result)
+            return result
+        finally:
+            db.session.rollback()
+            if not keep:
+                cls._cleanup_benchmark_rows()
@@ -94,6 +94,9 @@ class BaselinkerSyncService:
         self.max_retries = 3
         self.retry_delay = 5  # sekund
         
+        # Deadline'y bieżącej paczki zamówień (order_id -> date), patrz _precompute_deadlines
+        self._deadline_dates = {}
+
         # Inicjalizacja konfiguracji
         self._load_config()
         
@@ -251,6 +254,7 @@ class BaselinkerSyncService:
                     'orders_moved_to_production': processing_result.get('status_changes_count', 0),
                     'status_change_errors': processing_result.get('status_change_errors', 0)
                 },
+                'writeback': processing_result.get('writeback'),
                 'priority_recalculation': {
                     'triggered': processing_result.get('priority_recalc_triggered', False),
                     'products_updated': processing_result.get('priority_products_updated', 0),
@@ -313,6 +317,13 @@ class BaselinkerSyncService:
         error_details = []
         orders_for_status_change = []  # NOWE: Lista zamówień które kwalifikują się do zmiany statusu
 
+        # Komentarze walidacji i zmiany statusów wysyłane są do Baselinker po zapisie do bazy
+        from .baselinker_writeback import BaselinkerWriteBackQueue
+        writeback = BaselinkerWriteBackQueue(self)
+
+        # Deadline'y całej paczki: jedna konfiguracja, jeden kalendarz dni roboczych
+        self._precompute_deadlines(orders_data)
+
         for order_data in orders_data:
             try:
                 # BEZPIECZNE pobieranie order_id
@@ -354,14 +365,8 @@ class BaselinkerSyncService:
                         'validation_errors': validation_errors
                     })
                 
-                    # Dodaj komentarz do Baselinker
-                    try:
-                        self.add_validation_comment_to_baselinker(order_id, validation_errors)
-                    except Exception as comment_error:
-                        logger.error("ENHANCED: Błąd dodawania komentarza walidacji", extra={
-                            'order_id': order_id,
-                            'error': str(comment_error)
-                        })
+                    # Komentarz do Baselinker (wysyłany po zakończeniu pętli)
+                    writeback.add_validation_comment(order_id, validation_errors)
                 
                     processing_stats['products_skipped'] += len(order_data.get('products', []))
                     processing_stats['errors_count'] += 1
@@ -526,36 +531,21 @@ class BaselinkerSyncService:
                     'details': str(order_error)
                 })
 
+        self._deadline_dates = {}
+
         # KROK 5: Zmiana statusu TYLKO dla zamówień z successful product creation
         if auto_status_change and orders_for_status_change:
             logger.info("ENHANCED: Rozpoczęcie zmiany statusu", extra={
                 'orders_for_status_change': len(orders_for_status_change),
                 'order_ids': orders_for_status_change
             })
-        
             for order_id in orders_for_status_change:
-                try:
-                    success = self.change_order_status_in_baselinker(
-                        order_id, self.target_production_status
-                    )
-                    if success:
-                        processing_stats['status_changes_count'] += 1
-                        logger.info("Zmieniono status zamówienia w Baselinker", extra={
-                            'order_id': order_id,
-                            'new_status': self.target_production_status
-                        })
-                    else:
-                        processing_stats['status_change_errors'] += 1
-                        logger.error("ENHANCED: Błąd zmiany statusu", extra={
-                            'order_id': order_id,
-                            'target_status': self.target_production_status
-                        })
-                except Exception as status_error:
-                    processing_stats['status_change_errors'] += 1
-                    logger.error("ENHANCED: Exception podczas zmiany statusu", extra={
-                        'order_id': order_id,
-                        'error': str(status_error)
-                    })
+                writeback.change_status(order_id, self.target_production_status)
+
+        # Produkty są już zapisane - wysyłka komentarzy i zmian statusów do Baselinker
+        writeback_result = writeback.flush()
+        processing_stats['status_changes_count'] = writeback_result['status_changes_count']
+        processing_stats['status_change_errors'] = writeback_result['status_change_errors']
 
         # KROK 6: Przeliczenie priorytetów (jeśli utworzono produkty)
         priority_recalc_result = {}
@@ -588,6 +578,8 @@ class BaselinkerSyncService:
             'errors_count': processing_stats['errors_count'],
             'status_changes_count': processing_stats['status_changes_count'],
             'status_change_errors': processing_stats['status_change_errors'],
+            'writeback': writeback_result,
+            'writeback_duration_ms': writeback_result['duration_ms'],
             'priority_recalc_triggered': bool(priority_recalc_result),
             'priority_recalc_duration': priority_recalc_result.get('calculation_duration', '00:00:00'),
             'manual_overrides_preserved': priority_recalc_result.get('manual_overrides_preserved', 0),
@@ -872,6 +864,38 @@ class BaselinkerSyncService:
             })
             return False, [f'Błąd walidacji: {str(e)}']
 
+    def _validation_comment_request(self, order_id: int, errors: List[str]) -> Dict[str, Any]:
+        """Request addOrderInvoiceComment z podsumowaniem błędów walidacji"""
+        error_summary = '; '.join(errors[:3])  # Maksymalnie 3 pierwsze błędy
+        if len(errors) > 3:
+            error_summary += f' (i {len(errors)-3} więcej błędów)'
+
+        validation_message = (
+            f"SYSTEM: Zamówienie nie posiada pełnych danych do synchronizacji z produkcją. "
+            f"Błędy: {error_summary}. "
+            f"Sprawdź kompletność nazw produktów."
+        )
+
+        return {
+            'token': self.api_key,
+            'method': 'addOrderInvoiceComment',
+            'parameters': json.dumps({
+                'order_id': order_id,
+                'invoice_comment': validation_message
+            })
+        }
+
+    def _status_change_request(self, order_id: int, target_status: int) -> Dict[str, Any]:
+        """Request setOrderStatus"""
+        return {
+            'token': self.api_key,
+            'method': 'setOrderStatus',
+            'parameters': json.dumps({
+                'order_id': order_id,
+                'status_id': target_status
+            })
+        }
+
     def add_validation_comment_to_baselinker(self, order_id: int, errors: List[str]) -> bool:
         """
         NOWA METODA: Dodaje komentarz z błędami walidacji do zamówienia w BL
@@ -890,28 +914,7 @@ class BaselinkerSyncService:
             return False
         
         try:
-            # Przygotuj tekst komentarza
-            error_summary = '; '.join(errors[:3])  # Maksymalnie 3 pierwsze błędy
-            if len(errors) > 3:
-                error_summary += f' (i {len(errors)-3} więcej błędów)'
-            
-            validation_message = (
-                f"SYSTEM: Zamówienie nie posiada pełnych danych do synchronizacji z produkcją. "
-                f"Błędy: {error_summary}. "
-                f"Sprawdź kompletność nazw produktów."
-            )
-            
-            # API call do dodania komentarza
-            request_data = {
-                'token': self.api_key,
-                'method': 'addOrderInvoiceComment',
-                'parameters': json.dumps({
-                    'order_id': order_id,
-                    'invoice_comment': validation_message
-                })
-            }
-            
-            response_data = self._make_api_request(request_data)
+            response_data = self._make_api_request(self._validation_comment_request(order_id, errors))
             
             if response_data.get('status') == 'SUCCESS':
                 logger.info("Dodano komentarz walidacji do Baselinker", extra={
@@ -953,16 +956,7 @@ class BaselinkerSyncService:
             return False
         
         try:
-            request_data = {
-                'token': self.api_key,
-                'method': 'setOrderStatus',
-                'parameters': json.dumps({
-                    'order_id': order_id,
-                    'status_id': target_status
-                })
-            }
-            
-            response_data = self._make_api_request(request_data)
+            response_data = self._make_api_request(self._status_change_request(order_id, target_status))
             
             if response_data.get('status') == 'SUCCESS':
                 logger.info("Zmieniono status zamówienia w Baselinker", extra={
@@ -1433,12 +1427,18 @@ class BaselinkerSyncService:
             if not reports_service:
                 raise SyncError('Nie można zainicjować serwisu raportów Baselinker.')
 
-            fetch_result = reports_service.fetch_orders_from_date_range(
-                date_from=date_from,
-                date_to=date_to,
-                get_all_statuses=True,
-                limit_per_page=limit_per_page
-            )
+            prefetched_orders = params.get('prefetched_orders')
+            if prefetched_orders is not None:
+                # Zamówienia z podglądu (cache wyboru) - bez ponownego pobierania zakresu z Baselinker
+                fetch_result = {'success': True, 'orders': prefetched_orders, 'pages_processed': 0}
+                add_log(f'Użyto {len(prefetched_orders)} zamówień z cache podglądu.', 'info')
+            else:
+                fetch_result = reports_service.fetch_orders_from_date_range(
+                    date_from=date_from,
+                    date_to=date_to,
+                    get_all_statuses=True,
+                    limit_per_page=limit_per_page
+                )
 
             if not fetch_result.get('success'):
                 raise SyncError(fetch_result.get('error', 'Nie udało się pobrać zamówień z Baselinker.'))
@@ -1637,6 +1637,7 @@ class BaselinkerSyncService:
                 })
 
             # NOWE: Enhanced processing dla qualified orders
+            writeback_stats = None
             if qualified_orders and not dry_run:
                 enhanced_result = self.process_orders_with_priority_logic(
                     qualified_orders,
@@ -1652,12 +1653,19 @@ class BaselinkerSyncService:
         
                 if enhanced_result.get('error_details'):
                     error_details.extend(enhanced_result['error_details'])
+                writeback_stats = enhanced_result.get('writeback')
         
                 add_log(
                     f'Enhanced processing: {stats["orders_processed"]} zamówień, '
                     f'{stats["products_created"]} produktów utworzonych.',
                     'info'
                 )
+                if writeback_stats and writeback_stats['requests']:
+                    add_log(
+                        f'Zapisy zwrotne do Baselinker: {writeback_stats["requests"]} '
+                        f'w {writeback_stats["duration_ms"]} ms (nieudane: {len(writeback_stats["failed"])}).',
+                        'warning' if writeback_stats['failed'] else 'info'
+                    )
         
             elif qualified_orders and dry_run:
                 # Dry run simulation
@@ -1707,6 +1715,8 @@ class BaselinkerSyncService:
                 'products_skipped': int(stats['products_skipped']),
                 'errors_count': int(stats['errors_count'])
             }
+            if writeback_stats:
+                stats_payload['writeback'] = writeback_stats
 
             # ENHANCED RESPONSE with new fields
             response = {
@@ -2049,6 +2059,8 @@ class BaselinkerSyncService:
             'error_details': []
         }
         
+        self._precompute_deadlines(orders_data)
+
         for order in orders_data:
             try:
                 order_id = order.get('order_id')
@@ -2092,6 +2104,7 @@ class BaselinkerSyncService:
                     'error': str(e)
                 })
         
+        self._deadline_dates = {}
         return results
 
     def _order_already_processed(self, baselinker_order_id: int) -> bool:
@@ -2366,15 +2379,68 @@ class BaselinkerSyncService:
 
     def _calculate_deadline_date(self, order: Dict[str, Any]) -> date:
         """
-        ✅ POPRAWIONA: Oblicza deadline_date na podstawie date_in_status + dni z prod_config
+        Oblicza deadline_date: data bazowa zamówienia + DEADLINE_DEFAULT_DAYS dni roboczych
 
-        Logika:
-        1. Pobierz timestamp z date_in_status (data zmiany statusu)
-        2. Pobierz liczbę dni z tabeli prod_config (klucz: DEADLINE_DEFAULT_DAYS)
-        3. Dodaj dni do timestamp i zwróć jako datę
+        Podczas synchronizacji deadline'y całej paczki liczone są z góry
+        (_precompute_deadlines) - tu zwracany jest wynik z tej mapy. Poza
+        synchronizacją liczymy pojedynczo.
+        """
+        order_id = order.get('order_id')
+        precomputed = getattr(self, '_deadline_dates', None)
+        if precomputed and order_id in precomputed:
+            return precomputed[order_id]
+
+        base_date = self._deadline_base_date(order)
+        deadline_days = self._get_deadline_days()
+
+        try:
+            deadline_date = self._add_business_days(base_date, deadline_days)
+        except Exception as e:
+            deadline_date = self._add_business_days(date.today(), 14)
+            logger.error("Błąd obliczania deadline_date", extra={
+                'error': str(e),
+                'fallback_date': deadline_date.isoformat()
+            })
+
+        logger.debug("Obliczono deadline_date", extra={
+            'order_id': order_id,
+            'base_date': base_date.isoformat(),
+            'deadline_days': deadline_days,
+            'deadline_date': deadline_date.isoformat()
+        })
+
+        return deadline_date
+
+    def _precompute_deadlines(self, orders_data: List[Dict[str, Any]]) -> Dict[Any, date]:
+        """
+        Deadline'y dla wszystkich zamówień synchronizacji: konfiguracja pobierana
+        raz, kalendarz dni roboczych budowany raz (BusinessCalendarService)
         """
+        orders = [order for order in orders_data if isinstance(order, dict) and order.get('order_id')]
+        if not orders:
+            self._deadline_dates = {}
+            return self._deadline_dates
 
-        # ✅ KROK 1: Pobierz timestamp z date_in_status (zamiast payment_date)
+        deadline_days = self._get_deadline_days()
+        base_dates = [self._deadline_base_date(order) for order in orders]
+
+        try:
+            from .business_calendar import BusinessCalendarService
+            deadlines = BusinessCalendarService.add_business_days_batch(base_dates, deadline_days)
+            self._deadline_dates = {order['order_id']: deadline for order, deadline in zip(orders, deadlines)}
+        except Exception as e:
+            # Brak mapy = fallback na liczenie per zamówienie w _calculate_deadline_date
+            logger.error("Błąd wyliczania deadline'ów synchronizacji", extra={'error': str(e)})
+            self._deadline_dates = {}
+
+        logger.info("Wyliczono deadline'y synchronizacji", extra={
+            'orders_count': len(self._deadline_dates),
+            'deadline_days': deadline_days
+        })
+        return self._deadline_dates
+
+    def _deadline_base_date(self, order: Dict[str, Any]) -> date:
+        """Data bazowa deadline'u: date_in_status → date_status_change → date_add → dzisiaj"""
         base_timestamp = None
 
         # Sprawdź date_in_status (preferowany)
@@ -2429,7 +2495,10 @@ class BaselinkerSyncService:
                 'order_id': order.get('order_id')
             })
 
-        # ✅ KROK 2: Pobierz liczbę dni z tabeli prod_config
+        return base_date
+
+    def _get_deadline_days(self) -> int:
+        """Liczba dni roboczych do deadline'u z prod_config (DEADLINE_DEFAULT_DAYS)"""
         try:
             from ..models import ProductionConfig
             config_record = ProductionConfig.query.filter_by(config_key='DEADLINE_DEFAULT_DAYS').first()
@@ -2450,39 +2519,16 @@ class BaselinkerSyncService:
                 'fallback_days': deadline_days
             })
 
-        # ✅ KROK 3: Oblicz deadline_date używając dni roboczych (base_date + deadline_days)
-        try:
-            deadline_date = self._add_business_days(base_date, deadline_days)
-        except Exception as e:
-            deadline_date = self._add_business_days(date.today(), 14)
-            logger.error("Błąd obliczania deadline_date", extra={
-                'error': str(e),
-                'fallback_date': deadline_date.isoformat()
-            })
-
-        logger.debug("Obliczono deadline_date", extra={
-            'order_id': order.get('order_id'),
-            'base_date': base_date.isoformat(),
-            'deadline_days': deadline_days,
-            'deadline_date': deadline_date.isoformat()
-        })
+        return deadline_days
 
-        return deadline_date
-
-    
     def _add_business_days(self, start_date: date, business_days: int) -> date:
-        """Dodaje określoną liczbę dni roboczych do daty startowej."""
+        """Dodaje określoną liczbę dni roboczych (bez weekendów, świąt i przestojów zakładu)."""
         if not isinstance(start_date, date):
             start_date = get_local_now().date()
         if business_days <= 0:
             return start_date
-        current_date = start_date
-        added_days = 0
-        while added_days < business_days:
-            current_date += timedelta(days=1)
-            if current_date.weekday() < 5:  # Poniedziałek=0 ... Niedziela=6
-                added_days += 1
-        return current_date
+        from .business_calendar import BusinessCalendarService
+        return BusinessCalendarService.add_business_days(start_date, business_days)
 
     def debug_id_generator_state(self, baselinker_order_id: int):
         """Debug stanu ID generatora"""
@@ -29,6 +29,7 @@ class DashboardBLSyncModal {
         this.selectedStatuses = [];
         this.availableStatuses = [];
         this.fetchedOrders = [];
+        this.selectionToken = null;
         this.selectedOrders = [];
         this.syncResults = null;
 
@@ -339,6 +340,7 @@ class DashboardBLSyncModal {
         this.syncInProgress = false;
         this.selectedStatuses = [];
         this.fetchedOrders = [];
+        this.selectionToken = null;
         this.selectedOrders = [];
         this.syncResults = null;
         this.syncLogs = [];
@@ -758,6 +760,7 @@ class DashboardBLSyncModal {
 
             if (data.success) {
                 this.fetchedOrders = data.orders || [];
+                this.selectionToken = data.selection_token || null;
                 this.stats.apiPages = data.pages_processed || 0;
                 this.stats.ordersCount = this.fetchedOrders.length;
 
@@ -1267,7 +1270,8 @@ class DashboardBLSyncModal {
             const requestData = {
                 order_ids: orderIds,
                 days_range: this.selectedDays,
-                status_ids: this.selectedStatuses
+                status_ids: this.selectedStatuses,
+                selection_token: this.selectionToken  // zapis użyje zamówień z podglądu
             };
 
             this.updateSaveProgressBar(30, 'Wysyłanie do serwera...');
@@ -5,8 +5,9 @@
  * Moduł zarządzania listą produktów - restrukturyzacja tab produktów
  * 
  * Odpowiedzialności:
- * - Zaawansowane filtrowanie produktów (text search + 5 multi-select dropdownów)
- * - Proste renderowanie listy produktów (bez virtual scroll)
+ * - Filtrowanie po stronie serwera (text search + 5 multi-select dropdownów + zakres statusów)
+ * - Wirtualny scroll: renderowane są tylko widoczne wiersze, kolejne strony
+ *   pobierane kursorem z /production/api/products-page
  * - Drag & drop z animacjami feedback
  * - Akcje grupowe (bulk actions) z modal
  * - Export Excel z opcjami
@@ -118,6 +119,14 @@ class ProductsModule {
             sortColumn: null,
             sortDirection: 'asc',
 
+            // Stronicowanie serwerowe (keyset)
+            scope: 'active',
+            nextCursor: null,
+            hasMore: false,
+            isLoadingMore: false,
+            serverStats: null,
+            requestSeq: 0,
+
             // Auto-refresh
             lastUpdate: null,
             refreshInterval: null,
@@ -137,6 +146,16 @@ class ProductsModule {
             }
         };
 
+        // Wirtualny scroll - stała wysokość wiersza (min-height 65px + margines 6px)
+        this.virtualScroll = {
+            rowHeight: 71,
+            overscan: 15,
+            pageSize: 200,
+            start: -1,
+            end: -1,
+            frame: null
+        };
+
         // DOM elements
         this.elements = {
             container: null,
@@ -158,6 +177,8 @@ class ProductsModule {
         this.onExport = this.handleExport.bind(this);
         this.onSort = this.handleSort.bind(this);
         this.onKeydown = this.handleKeydown.bind(this);
+        this.onScroll = this.handleScroll.bind(this);
+        this.onScopeChange = this.handleScopeChange.bind(this);
 
         console.log('[ProductsModule] Constructor completed');
     }
@@ -279,8 +300,11 @@ class ProductsModule {
                 emptyState: document.getElementById('products-empty-state'),
                 errorState: document.getElementById('products-error-state'),
                 textSearch: document.getElementById('products-text-search'),
+                scopeSelect: document.getElementById('products-scope'),
                 selectAllCheckbox: document.getElementById('select-all-products'),
-                productsCount: document.getElementById('products-count')
+                productsCount: document.getElementById('products-count'),
+                spacerTop: document.getElementById('virtual-scroll-spacer-top'),
+                spacerBottom: document.getElementById('virtual-scroll-spacer-bottom')
             };
 
             // Walidacja kluczowych elementów
@@ -288,13 +312,14 @@ class ProductsModule {
                 throw new Error('Required DOM elements not found');
             }
 
-            // Ukryj spacery - nie potrzebujemy ich dla prostego renderowania
-            const spacerTop = document.getElementById('virtual-scroll-spacer-top');
-            const spacerBottom = document.getElementById('virtual-scroll-spacer-bottom');
-            if (spacerTop) spacerTop.style.display = 'none';
-            if (spacerBottom) spacerBottom.style.display = 'none';
+            // Spacery wirtualnego scrolla zastępują niewyrenderowane wiersze
+            [this.elements.spacerTop, this.elements.spacerBottom].forEach(spacer => {
+                if (spacer) {
+                    spacer.style.display = 'block';
+                    spacer.style.height = '0px';
+                }
+            });
 
-            // Ustaw CSS dla prostego renderowania
             this.elements.container.style.overflow = 'auto';
             this.elements.container.style.maxHeight = '70vh';
             this.elements.viewport.style.position = 'relative';
@@ -564,9 +589,7 @@ class ProductsModule {
         }
 
         // Zastosuj filtry
-        this.applyAllFilters();
-        this.renderProductsList();
-        this.updateStats();
+        this.reloadProducts();
     }
 
     updateCustomMultiSelectFromState(filterType, value, isSelected) {
@@ -638,9 +661,7 @@ class ProductsModule {
         this.updateFilterBadges();
 
         // Zastosuj filtry
-        this.applyAllFilters();
-        this.renderProductsList();
-        this.updateStats();
+        this.reloadProducts();
     }
 
     initializeDragDrop() {
@@ -692,6 +713,17 @@ class ProductsModule {
             this.elements.selectAllCheckbox.addEventListener('change', this.onSelectAll);
         }
 
+        // Zakres statusów (aktywne / archiwum / wszystkie)
+        if (this.elements.scopeSelect) {
+            this.elements.scopeSelect.value = this.state.scope;
+            this.elements.scopeSelect.addEventListener('change', this.onScopeChange);
+        }
+
+        // Wirtualny scroll
+        if (this.elements.container) {
+            this.elements.container.addEventListener('scroll', this.onScroll, { passive: true });
+        }
+
         // Sortowanie nagłówków
         const sortableHeaders = document.querySelectorAll('.sortable-header');
         sortableHeaders.forEach(header => {
@@ -756,6 +788,19 @@ class ProductsModule {
             this.elements.selectAllCheckbox.removeEventListener('change', this.onSelectAll);
         }
 
+        if (this.elements.scopeSelect) {
+            this.elements.scopeSelect.removeEventListener('change', this.onScopeChange);
+        }
+
+        if (this.elements.container) {
+            this.elements.container.removeEventListener('scroll', this.onScroll);
+        }
+
+        if (this.virtualScroll.frame) {
+            cancelAnimationFrame(this.virtualScroll.frame);
+            this.virtualScroll.frame = null;
+        }
+
         const sortableHeaders = document.querySelectorAll('.sortable-header');
         sortableHeaders.forEach(header => {
             header.removeEventListener('click', this.onSort);
@@ -815,95 +860,158 @@ class ProductsModule {
         }
     }
 
-    async loadProductsData() {
-        try {
-            console.log('[ProductsModule] Loading products data...');
+    /**
+     * Parametry zapytania listy produktów - filtry są stosowane po stronie serwera
+     */
+    buildServerQuery(cursor = null) {
+        const filters = this.state.currentFilters;
+        const params = new URLSearchParams({
+            scope: this.state.scope,
+            sort_by: this.getServerSortColumn(),
+            sort_order: this.getServerSortColumn() === this.state.sortColumn ? this.state.sortDirection : 'asc',
+            limit: this.virtualScroll.pageSize
+        });
 
-            // Użyj shared service jeśli dostępne
-            if (this.shared && this.shared.apiClient) {
-                console.log('[ProductsModule] Using shared API client');
+        if (filters.textSearch) params.append('search', filters.textSearch);
+        if (filters.statuses.length > 0) params.append('statuses', filters.statuses.join(','));
+        if (filters.woodSpecies.length > 0) params.append('wood_species', filters.woodSpecies.join(','));
+        if (filters.technologies.length > 0) params.append('technologies', filters.technologies.join(','));
+        if (filters.woodClasses.length > 0) params.append('wood_classes', filters.woodClasses.join(','));
+        if (filters.thicknesses.length > 0) params.append('thicknesses', filters.thicknesses.join(','));
+        if (cursor) params.append('cursor', cursor);
 
-                const filtersForApi = {
-                    status: this.state.currentFilters.statuses.length > 0 ?
-                        this.state.currentFilters.statuses[0] : 'all',
-                    search: this.state.currentFilters.textSearch || '',
-                    // DODAJ SORTOWANIE:
-                    sort_by: 'priority_rank',    // NOWE: domyślnie sortuj po priority_rank
-                    sort_order: 'asc',           // NOWE: rosnąco (1,2,3,4...)
-                    load_all: 'true'
-                };
+        return params;
+    }
 
-                const data = await this.shared.apiClient.getProductsTabContent(filtersForApi);
+    getServerSortColumn() {
+        const serverSortable = ['priority_rank', 'deadline_date', 'created_at', 'short_product_id'];
+        return serverSortable.includes(this.state.sortColumn) ? this.state.sortColumn : 'priority_rank';
+    }
 
-                if (data.success && data.initial_data && data.initial_data.products) {
-                    this.state.products = data.initial_data.products;
-                    this.state.lastUpdate = new Date().toISOString();
+    async fetchProductsPage(cursor = null) {
+        const params = this.buildServerQuery(cursor);
 
-                } else {
-                    throw new Error(data.message || 'Failed to load products data from shared service');
-                }
-            } else {
-                // Fallback - bezpośrednie wywołanie GET
-                console.log('[ProductsModule] Using direct GET request');
-
-                const params = new URLSearchParams({
-                    status: this.state.currentFilters.statuses.length > 0 ?
-                        this.state.currentFilters.statuses[0] : 'all',
-                    search: this.state.currentFilters.textSearch || '',
-                    // DODAJ SORTOWANIE:
-                    sort_by: 'priority_rank',    // NOWE: domyślnie sortuj po priority_rank  
-                    sort_order: 'asc',           // NOWE: rosnąco (1,2,3,4...)
-                    load_all: 'true'
-                });
+        if (this.shared && this.shared.apiClient && this.shared.apiClient.getProductsPage) {
+            return this.shared.apiClient.getProductsPage(params);
+        }
 
-                // ZMIANA: Użyj /products-filtered zamiast /products-tab-content
-                const response = await fetch(`/production/api/products-filtered?${params.toString()}`, {
-                    method: 'GET',
-                    headers: {
-                        'Content-Type': 'application/json',
-                    }
-                });
+        const response = await fetch(`/production/api/products-page?${params.toString()}`, {
+            method: 'GET',
+            headers: {
+                'X-Requested-With': 'XMLHttpRequest'
+            }
+        });
 
-                if (!response.ok) {
-                    throw new Error(`API request failed: ${response.status}`);
-                }
+        if (!response.ok) {
+            throw new Error(`API request failed: ${response.status}`);
+        }
+        return response.json();
+    }
 
-                const data = await response.json();
+    /**
+     * Ładuje pierwszą stronę produktów (reset listy) wraz ze statystykami
+     */
+    async loadProductsData() {
+        try {
+            console.log('[ProductsModule] Loading products data...');
 
-                if (data.success && data.products) {
-                    this.state.products = data.products;  // ZMIANA: data.products zamiast data.initial_data.products
-                    this.state.lastUpdate = new Date().toISOString();
+            const requestSeq = ++this.state.requestSeq;
+            const data = await this.fetchProductsPage();
 
-                    console.log(`[ProductsModule] Loaded ${data.products.length} products via direct GET`);
-                } else {
-                    throw new Error(data.message || 'Failed to load products data');
-                }
+            // Odpowiedź na nieaktualne zapytanie (np. szybkie wpisywanie w wyszukiwarkę)
+            if (requestSeq !== this.state.requestSeq) return;
+
+            if (!data.success) {
+                throw new Error(data.error || 'Failed to load products data');
             }
 
+            this.state.products = data.products || [];
+            this.state.nextCursor = data.next_cursor || null;
+            this.state.hasMore = Boolean(data.has_more);
+            this.state.serverStats = data.stats || null;
+            this.state.lastUpdate = new Date().toISOString();
+
+            console.log(`[ProductsModule] Loaded ${this.state.products.length} products (has_more: ${this.state.hasMore})`);
+
         } catch (error) {
             console.error('[ProductsModule] Error loading products data:', error);
             throw error;
         }
     }
 
+    /**
+     * Dociąga kolejną stronę gdy użytkownik zbliża się do końca listy
+     */
+    async loadNextPage() {
+        if (!this.state.hasMore || this.state.isLoadingMore || !this.state.nextCursor) return;
+
+        this.state.isLoadingMore = true;
+        const requestSeq = this.state.requestSeq;
+
+        try {
+            const data = await this.fetchProductsPage(this.state.nextCursor);
+            if (requestSeq !== this.state.requestSeq || !data.success) return;
+
+            this.state.products = this.state.products.concat(data.products || []);
+            this.state.nextCursor = data.next_cursor || null;
+            this.state.hasMore = Boolean(data.has_more);
+
+            this.applyAllFilters();
+            this.renderProductsList();
+
+        } catch (error) {
+            console.error('[ProductsModule] Error loading next page:', error);
+        } finally {
+            this.state.isLoadingMore = false;
+        }
+    }
+
+    /**
+     * Przeładowanie listy po zmianie filtrów / zakresu / sortowania serwerowego
+     */
+    async reloadProducts() {
+        try {
+            await this.loadProductsData();
+            this.applyAllFilters();
+            this.renderProductsList({ resetScroll: true });
+            this.updateStats();
+        } catch (error) {
+            this.showErrorState('Nie udało się załadować listy produktów');
+        }
+    }
+
     async loadFiltersData() {
         try {
             console.log('[ProductsModule] Loading filters data...');
 
-            // TODO: Endpoint /products/filters-data będzie dodany w kolejnych krokach
-            // Tymczasowo - ekstraktuj opcje filtrów z załadowanych produktów
-            if (this.state.products.length > 0) {
-                const filtersData = this.extractFiltersFromProducts(this.state.products);
-                this.updateFilterOptions(filtersData);
-                this.setupMultiSelectFilters();
-                console.log('[ProductsModule] Filter options extracted from products');
-            } else {
-                console.log('[ProductsModule] No products loaded yet, skipping filters data');
+            const response = await fetch('/production/api/products/filter-options', {
+                method: 'GET',
+                headers: {
+                    'X-Requested-With': 'XMLHttpRequest'
+                }
+            });
+            const data = await response.json();
+
+            if (!response.ok || !data.success) {
+                throw new Error(data.error || `API request failed: ${response.status}`);
             }
 
+            this.updateFilterOptions({
+                woodSpecies: data.filters.wood_species,
+                technologies: data.filters.technologies,
+                woodClasses: data.filters.wood_classes,
+                thicknesses: data.filters.thicknesses,
+                statuses: data.filters.statuses
+            });
+            this.setupMultiSelectFilters();
+
         } catch (error) {
             console.error('[ProductsModule] Error loading filters data:', error);
-            // Nie przerywa ładowania, filtry będą działać z dostępnymi opcjami
+            // Fallback - opcje z załadowanej strony produktów
+            if (this.state.products.length > 0) {
+                this.updateFilterOptions(this.extractFiltersFromProducts(this.state.products));
+                this.setupMultiSelectFilters();
+            }
         }
     }
 
@@ -1060,9 +1168,7 @@ class ProductsModule {
         // WAŻNE: Aktualizuj badges po "select all"
         this.updateFilterBadges();
         
-        this.applyAllFilters();
-        this.renderProductsList();
-        this.updateStats();
+        this.reloadProducts();
     }
 
     handleOptionChange(filterType, value, isChecked) {
@@ -1190,9 +1296,7 @@ class ProductsModule {
             // Apply filters after a short delay to allow for multiple selections
             clearTimeout(this.filterUpdateTimeout);
             this.filterUpdateTimeout = setTimeout(() => {
-                this.applyAllFilters();
-                this.renderProductsList();
-                this.updateStats();
+                this.reloadProducts();
             }, 150);
         });
 
@@ -1223,55 +1327,94 @@ class ProductsModule {
     }
 
     // ========================================================================
-    // SIMPLE LIST RENDERING (NO VIRTUAL SCROLL)
+    // VIRTUAL SCROLL RENDERING
     // ========================================================================
 
-    renderProductsList() {
+    /**
+     * Renderuje listę od nowa (po zmianie danych). W DOM trafiają tylko wiersze
+     * z widocznego okna + zapas, resztę zastępują spacery o odpowiedniej wysokości.
+     */
+    renderProductsList(options = {}) {
         try {
-            console.log('[ProductsModule] Rendering products list...');
-            
             if (!this.elements.viewport) {
                 throw new Error('Viewport element not found');
             }
 
-            // Wyczyść viewport
-            this.elements.viewport.innerHTML = '';
-
             const products = this.state.filteredProducts;
 
+            if (options.resetScroll && this.elements.container) {
+                this.elements.container.scrollTop = 0;
+            }
+
             if (!products || products.length === 0) {
+                this.elements.viewport.innerHTML = '';
+                this.setSpacerHeights(0, 0);
+                this.updateProductsCount(0);
                 this.showEmptyState();
                 return;
             }
 
-            // Utwórz fragment dla lepszej wydajności
-            const fragment = document.createDocumentFragment();
+            this.hideAllStates();
 
-            // Renderuj wszystkie produkty naraz
-            products.forEach((product, index) => {
-                const rowElement = this.createProductRow(product, index);
+            // Wymuś przebudowę okna
+            this.virtualScroll.start = -1;
+            this.virtualScroll.end = -1;
+            this.renderVisibleRows();
+
+            this.updateProductsCount(this.getTotalCount());
+
+        } catch (error) {
+            console.error('[ProductsModule] Error rendering products list:', error);
+            this.showErrorState('Wystąpił błąd podczas renderowania listy produktów');
+        }
+    }
+
+    renderVisibleRows() {
+        const container = this.elements.container;
+        const viewport = this.elements.viewport;
+        const products = this.state.filteredProducts;
+        if (!container || !viewport || !products) return;
+
+        const { rowHeight, overscan } = this.virtualScroll;
+        const visibleCount = Math.ceil((container.clientHeight || 600) / rowHeight);
+        const firstVisible = Math.floor(container.scrollTop / rowHeight);
+
+        const start = Math.max(0, firstVisible - overscan);
+        const end = Math.min(products.length, firstVisible + visibleCount + overscan);
+
+        if (start !== this.virtualScroll.start || end !== this.virtualScroll.end) {
+            const fragment = document.createDocumentFragment();
+            for (let index = start; index < end; index++) {
+                const rowElement = this.createProductRow(products[index], index);
                 if (rowElement) {
                     fragment.appendChild(rowElement);
                 }
-            });
-
-            // Dodaj wszystkie wiersze do viewport
-            this.elements.viewport.appendChild(fragment);
+            }
 
-            // Aktualizuj licznik produktów
-            this.updateProductsCount(products.length);
+            viewport.innerHTML = '';
+            viewport.appendChild(fragment);
+            this.setSpacerHeights(start * rowHeight, (products.length - end) * rowHeight);
 
-            // Synchronizuj checkboxy
+            this.virtualScroll.start = start;
+            this.virtualScroll.end = end;
             this.syncAllCheckboxes();
+        }
 
-            console.log(`[ProductsModule] Rendered ${products.length} products`);
-
-        } catch (error) {
-            console.error('[ProductsModule] Error rendering products list:', error);
-            this.showErrorState('Wystąpił błąd podczas renderowania listy produktów');
+        // Dociągnij kolejną stronę zanim użytkownik dojdzie do końca
+        if (this.state.hasMore && end >= products.length - overscan) {
+            this.loadNextPage();
         }
     }
 
+    setSpacerHeights(top, bottom) {
+        if (this.elements.spacerTop) this.elements.spacerTop.style.height = `${top}px`;
+        if (this.elements.spacerBottom) this.elements.spacerBottom.style.height = `${bottom}px`;
+    }
+
+    getTotalCount() {
+        return this.state.serverStats ? this.state.serverStats.total_count : this.state.filteredProducts.length;
+    }
+
     createProductRow(product, index) {
         try {
             const template = document.getElementById('product-row-template');
@@ -1290,7 +1433,7 @@ class ProductsModule {
             // Ustaw podstawowe właściwości dla prostego renderowania
             rowElement.style.position = 'relative';
             rowElement.style.width = '100%';
-            rowElement.style.minHeight = '65px';
+            rowElement.style.height = `${this.virtualScroll.rowHeight - 6}px`;
             rowElement.style.marginBottom = '6px';
             rowElement.classList.add('simple-row');
             rowElement.setAttribute('data-product-id', product.id);
@@ -1669,30 +1812,16 @@ class ProductsModule {
 
     applyAllFilters() {
         try {
-            console.log('[ProductsModule] Applying all filters...');
-            
-            let filtered = [...this.state.products];
-
-            // Text search z fuzzy matching
-            if (this.state.currentFilters.textSearch) {
-                filtered = this.components.fuzzySearchEngine.search(
-                    this.state.currentFilters.textSearch,
-                    filtered,
-                    {
-                        fields: ['original_product_name', 'short_product_id', 'client_name'],
-                        threshold: 2
-                    }
-                );
-            }
+            // Filtry tekstowe i multi-select są stosowane po stronie serwera
+            // (products-page) - tu tylko kopia załadowanych stron i sortowanie lokalne
+            this.state.filteredProducts = [...this.state.products];
 
-            // Multi-select filtry (gdy będą zaimplementowane)
-            filtered = this.applyMultiSelectFilters(filtered);
+            if (this.state.sortColumn && this.state.sortColumn !== this.getServerSortColumn()) {
+                this.sortProducts();
+            }
 
-            this.state.filteredProducts = filtered;
             this.updateFilterBadges();
 
-            console.log(`[ProductsModule] Filters applied. ${filtered.length}/${this.state.products.length} products match`);
-
         } catch (error) {
             console.error('[ProductsModule] Error applying filters:', error);
             this.state.filteredProducts = [...this.state.products];
@@ -1759,9 +1888,7 @@ class ProductsModule {
         this.state.currentFilters.statuses = [];
 
         // Zastosuj filtry
-        this.applyAllFilters();
-        this.renderProductsList();
-        this.updateStats();
+        this.reloadProducts();
     }
 
     // ========================================================================
@@ -1790,9 +1917,7 @@ class ProductsModule {
                 console.error('[ProductsModule] Error in updateFilterBadges():', error);
             }
             
-            this.applyAllFilters();
-            this.renderProductsList();
-            this.updateStats();
+            this.reloadProducts();
         }, 300);
     }
 
@@ -1807,9 +1932,7 @@ class ProductsModule {
         }
 
         this.debounceTimers.filtersUpdate = setTimeout(() => {
-            this.applyAllFilters();
-            this.renderProductsList();
-            this.updateStats();
+            this.reloadProducts();
         }, 150);
     }
 
@@ -1875,10 +1998,34 @@ class ProductsModule {
             this.state.sortDirection = 'asc';
         }
 
-        // Sortuj produkty
+        this.updateSortIndicators();
+
+        // Kolumny z indeksem sortuje serwer (pełny zbiór), pozostałe - lokalnie załadowane strony
+        if (this.getServerSortColumn() === column) {
+            this.reloadProducts();
+            return;
+        }
+
         this.sortProducts();
         this.renderProductsList();
-        this.updateSortIndicators();
+    }
+
+    handleScopeChange(e) {
+        const scope = e.target.value;
+        if (!['active', 'archive', 'all'].includes(scope) || scope === this.state.scope) return;
+
+        console.log(`[ProductsModule] Scope changed: ${scope}`);
+        this.state.scope = scope;
+        this.reloadProducts();
+    }
+
+    handleScroll() {
+        if (this.virtualScroll.frame) return;
+
+        this.virtualScroll.frame = requestAnimationFrame(() => {
+            this.virtualScroll.frame = null;
+            this.renderVisibleRows();
+        });
     }
 
     handleKeydown(e) {
@@ -2284,6 +2431,21 @@ class ProductsModule {
 
     updateStats() {
         const products = this.state.filteredProducts;
+        const serverStats = this.state.serverStats;
+
+        // Statystyki całego przefiltrowanego zbioru liczone przez serwer (SQL)
+        if (serverStats) {
+            this.state.stats = {
+                totalCount: serverStats.total_count,
+                filteredCount: serverStats.total_count,
+                totalVolume: serverStats.total_volume,
+                totalValue: serverStats.total_value,
+                urgentCount: serverStats.urgent_count,
+                statusBreakdown: serverStats.status_breakdown || {}
+            };
+            this.updateStatsDisplay();
+            return;
+        }
         
         this.state.stats = {
             totalCount: this.state.products.length,
@@ -2322,6 +2484,11 @@ class ProductsModule {
             });
         }
 
+        if (this.state.stats.urgentCount !== undefined) {
+            if (urgentEl) urgentEl.textContent = this.state.stats.urgentCount;
+            return;
+        }
+
         // Oblicz pilne produkty (deadline <= 3 dni)
         const urgentCount = this.state.filteredProducts.filter(p => {
             if (!p.deadline_date) return false;
@@ -238,6 +238,11 @@ class ApiClient {
         return this.request(endpoint);
     }
 
+    async getProductsPage(params) {
+        // Strony listy produktów (keyset) - bez cache, kursor zmienia się przy każdej stronie
+        return this.request(`/products-page?${params.toString()}`, { skipCache: true });
+    }
+
     async getStationsTabContent() {
         return this.request('/stations-tab-content');
     }
@@ -1,5 +1,6 @@
 from extensions import db
 from datetime import datetime
+import json
 
 class PublicSession(db.Model):
     __tablename__ = 'public_sessions'
@@ -12,4 +13,83 @@ class PublicSession(db.Model):
     color = db.Column(db.String(100))      # 🧨 TO DODAJ
     duration_ms = db.Column(db.Integer)
     user_agent = db.Column(db.Text)
-    ip_address = db.Column(db.String(50))
\ No newline at end of file
+    ip_address = db.Column(db.String(50))
+
+    # Wymiary wyciągnięte z 'inputs' przy zapisie (statystyki bez parsowania JSON)
+    dim_length = db.Column(db.String(20))
+    dim_width = db.Column(db.String(20))
+    dim_thickness = db.Column(db.String(20))
+    dims_key = db.Column(db.String(64), index=True)  # np. "200x60x4"
+
+    @staticmethod
+    def extract_dimensions(inputs):
+        """
+        Wyciąga wymiary z danych wejściowych kalkulatora.
+
+        Returns:
+            tuple: (length, width, thickness, dims_key) - None gdy brak wymiarów
+        """
+        if isinstance(inputs, str):
+            try:
+                inputs = json.loads(inputs)
+            except (json.JSONDecodeError, TypeError):
+                return None, None, None, None
+
+        if not isinstance(inputs, dict):
+            return None, None, None, None
+
+        values = [inputs.get(name) for name in ('length', 'width', 'thickness')]
+        if all(value in (None, '') for value in values):
+            return None, None, None, None
+
+        length, width, thickness = [str(value)[:20] if value not in (None, '') else None for value in values]
+        dims_key = 'x'.join(value if value is not None else '?' for value in (length, width, thickness))[:64]
+        return length, width, thickness, dims_key
+
+    def fill_dimensions(self, inputs=None):
+        """Uzupełnia kolumny wymiarów na podstawie 'inputs'"""
+        self.dim_length, self.dim_width, self.dim_thickness, self.dims_key = \
+            self.extract_dimensions(inputs if inputs is not None else self.inputs)
+        return self
+
+    @classmethod
+    def backfill_dimensions(cls, batch_size=1000):
+        """
+        Jednorazowe uzupełnienie kolumn wymiarów dla sesji zapisanych
+        przed ich wprowadzeniem. Przetwarza dane partiami po id.
+
+        Returns:
+            int: liczba zaktualizowanych sesji
+        """
+        updated = 0
+        last_id = 0
+
+        while True:
+            rows = db.session.query(cls.id, cls.inputs).filter(
+                cls.id > last_id,
+                cls.dims_key.is_(None)
+            ).order_by(cls.id).limit(batch_size).all()
+
+            if not rows:
+                break
+
+            mappings = []
+            for row in rows:
+                length, width, thickness, dims_key = cls.extract_dimensions(row.inputs)
+                if dims_key:
+                    mappings.append({
+                        'id': row.id,
+                        'dim_length': length,
+                        'dim_width': width,
+                        'dim_thickness': thickness,
+                        'dims_key': dims_key
+                    })
+
+            if mappings:
+                db.session.bulk_update_mappings(cls, mappings)
+                db.session.commit()
+                updated += len(mappings)
+
+            last_id = rows[-1].id
+
+        return updated
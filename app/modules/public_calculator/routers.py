@@ -2,10 +2,8 @@ from flask import render_template, current_app, request, jsonify
 from . import public_calculator_bp
 from modules.calculator.models import Price
 import json
-from extensions import db
-from .models import PublicSession
-import sys
-from datetime import datetime
+from .services import session_buffer, build_session_row, InvalidSessionEvent
+from modules.rate_limit import rate_limit
 
 @public_calculator_bp.route("/kalkulator", methods=["GET"])
 def public_calculator():
@@ -26,29 +24,30 @@ def public_calculator():
     ]
     return render_template("public_calculator.html", prices_data=json.dumps(prices_data))
 
+@public_calculator_bp.record_once
+def _init_session_buffer(state):
+    session_buffer.init_app(state.app)
+
 @public_calculator_bp.route("/log_session_public", methods=["POST"])
+@rate_limit(max_requests=60, window=60)
 def log_session_public():
     try:
-        data_raw = request.data or request.get_data()
-        data = json.loads(data_raw)
-        print("[log_session_public] Otrzymane dane:", data, file=sys.stderr)
+        ip_address = request.environ.get('HTTP_X_FORWARDED_FOR', request.remote_addr)
+        if ip_address and ',' in ip_address:
+            ip_address = ip_address.split(',')[0].strip()
 
-        session = PublicSession(
-            inputs=json.dumps(data.get("inputs", {})),
-            variant=data.get("variant"),
-            finishing=data.get("finishing"),
-            color=data.get("color"),
-            duration_ms=int(data.get("duration_ms", 0)),
+        row = build_session_row(
+            request.get_data(cache=False),
             user_agent=request.headers.get("User-Agent"),
-            ip_address=request.remote_addr,
-            timestamp=datetime.utcnow()
+            ip_address=ip_address
         )
-        db.session.add(session)
-        db.session.commit()
-        print("[log_session_public] Zapisano sesję ID:", session.id, file=sys.stderr)
+    except InvalidSessionEvent as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
 
-        return jsonify({"status": "ok"}), 200
+    if not session_buffer.enqueue(row):
+        # Bufor pełny - klient może ponowić później
+        response = jsonify({"status": "busy", "message": "Zbyt wiele żądań, spróbuj ponownie później"})
+        response.headers['Retry-After'] = str(int(session_buffer.flush_interval) or 1)
+        return response, 429
 
-    except Exception as e:
-        print("[log_session_public] Błąd:", str(e), file=sys.stderr)
-        return jsonify({"status": "error", "message": str(e)}), 500
+    return jsonify({"status": "ok"}), 202
@@ -0,0 +1,298 @@
+# modules/public_calculator/services.py
+"""
+Buforowany zapis sesji kalkulatora publicznego
+==============================================
+
+Endpoint log_session_public jest publiczny i wywoływany przez każdego
+odwiedzającego kalkulator. Zamiast osobnego INSERT + COMMIT na każde żądanie,
+zdarzenia trafiają do ograniczonego bufora w pamięci procesu i są zapisywane
+wielowierszowymi INSERT-ami po przekroczeniu progu rozmiaru lub czasu.
+
+Gdy bufor jest pełny, enqueue() zwraca False - endpoint odpowiada 429,
+więc skok ruchu nie przekłada się bezpośrednio na obciążenie MySQL.
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from extensions import db
+from modules.logging import get_structured_logger
+from .models import PublicSession
+
+ingest_logger = get_structured_logger('public_calculator.ingest')
+
+# Limity walidacji danych z publicznego endpointu
+MAX_PAYLOAD_BYTES = 16 * 1024
+MAX_TEXT_LENGTH = 100
+MAX_DURATION_MS = 24 * 60 * 60 * 1000
+
+
+class InvalidSessionEvent(ValueError):
+    """Nieprawidłowe dane zdarzenia sesji"""
+    pass
+
+
+def build_session_row(data_raw, user_agent=None, ip_address=None):
+    """
+    Waliduje surowe dane z żądania i buduje wiersz do zapisu w public_sessions.
+
+    Args:
+        data_raw (bytes|str): Treść żądania (JSON)
+        user_agent (str): Nagłówek User-Agent
+        ip_address (str): Adres IP klienta
+
+    Returns:
+        dict: Wiersz gotowy do INSERT
+
+    Raises:
+        InvalidSessionEvent: gdy dane są nieprawidłowe
+    """
+    if not data_raw:
+        raise InvalidSessionEvent("Brak danych")
+    if len(data_raw) > MAX_PAYLOAD_BYTES:
+        raise InvalidSessionEvent("Zbyt duży rozmiar danych")
+
+    try:
+        data = json.loads(data_raw)
+    except (json.JSONDecodeError, TypeError, UnicodeDecodeError):
+        raise InvalidSessionEvent("Nieprawidłowy JSON")
+
+    if not isinstance(data, dict):
+        raise InvalidSessionEvent("Oczekiwano obiektu JSON")
+
+    inputs = data.get("inputs") or {}
+    if not isinstance(inputs, dict):
+        raise InvalidSessionEvent("Pole 'inputs' musi być obiektem")
+
+    try:
+        duration_ms = int(data.get("duration_ms") or 0)
+    except (TypeError, ValueError):
+        raise InvalidSessionEvent("Pole 'duration_ms' musi być liczbą")
+    duration_ms = max(0, min(duration_ms, MAX_DURATION_MS))
+
+    def _text(name):
+        value = data.get(name)
+        if value is None:
+            return None
+        return str(value)[:MAX_TEXT_LENGTH]
+
+    length, width, thickness, dims_key = PublicSession.extract_dimensions(inputs)
+
+    return {
+        'timestamp': datetime.utcnow(),
+        'inputs': json.dumps(inputs),
+        'variant': _text("variant"),
+        'finishing': _text("finishing"),
+        'color': _text("color"),
+        'duration_ms': duration_ms,
+        'user_agent': user_agent[:1000] if user_agent else None,
+        'ip_address': ip_address[:50] if ip_address else None,
+        'dim_length': length,
+        'dim_width': width,
+        'dim_thickness': thickness,
+        'dims_key': dims_key,
+    }
+
+
+class PublicSessionBuffer:
+    """
+    Ograniczony bufor zdarzeń sesji z wątkiem zapisującym w tle.
+
+    Progi:
+        max_size       - maksymalna liczba zdarzeń w buforze (powyżej -> 429)
+        batch_size     - liczba wierszy w jednym wielowierszowym INSERT
+        flush_interval - maksymalny czas (s) oczekiwania zdarzenia w buforze
+        max_retries    - liczba ponownych prób zapisu partii po błędzie bazy
+
+    Partia, której zapis się nie powiódł, wraca do bufora i jest zapisywana
+    ponownie przy kolejnych przebiegach wątku (co flush_interval). Dopiero po
+    wyczerpaniu max_retries prób jest odrzucana i logowana.
+    """
+
+    def __init__(self, max_size=5000, batch_size=200, flush_interval=5.0, max_retries=3):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+
+        self._queue = deque()
+        self._retry = deque()       # (liczba_prób, partia) - partie po nieudanym zapisie
+        self._retry_rows = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._app = None
+        self._thread = None
+        self._thread_pid = None
+
+        self.stats = {
+            'accepted': 0,
+            'rejected': 0,
+            'written': 0,
+            'failed': 0,
+            'retried': 0,
+            'flushes': 0,
+        }
+
+    def init_app(self, app):
+        """Konfiguracja z app.config i rejestracja zapisu przy zamykaniu procesu"""
+        self._app = app
+        self.max_size = app.config.get('PUBLIC_SESSION_BUFFER_SIZE', self.max_size)
+        self.batch_size = app.config.get('PUBLIC_SESSION_BATCH_SIZE', self.batch_size)
+        self.flush_interval = app.config.get('PUBLIC_SESSION_FLUSH_INTERVAL', self.flush_interval)
+        self.max_retries = app.config.get('PUBLIC_SESSION_MAX_RETRIES', self.max_retries)
+        atexit.register(self.flush_all)
+
+    def _ensure_worker(self):
+        # Passenger forkuje procesy po załadowaniu aplikacji - wątek startujemy
+        # leniwie i ponownie po wykryciu nowego PID
+        if self._thread is not None and self._thread.is_alive() and self._thread_pid == os.getpid():
+            return
+        self._thread = threading.Thread(target=self._run, name='public-session-flusher', daemon=True)
+        self._thread_pid = os.getpid()
+        self._thread.start()
+
+    def enqueue(self, row):
+        """
+        Dodaje zdarzenie do bufora.
+
+        Returns:
+            bool: False gdy bufor jest pełny (backpressure)
+        """
+        with self._lock:
+            if len(self._queue) + self._retry_rows >= self.max_size:
+                self.stats['rejected'] += 1
+                return False
+            self._queue.append(row)
+            self.stats['accepted'] += 1
+            queued = len(self._queue)
+
+        self._ensure_worker()
+        if queued >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    def _take_batch(self):
+        """(liczba wcześniejszych prób, partia) - najpierw partie do ponowienia"""
+        with self._lock:
+            if self._retry:
+                attempts, batch = self._retry.popleft()
+                self._retry_rows -= len(batch)
+                return attempts, batch
+            count = min(self.batch_size, len(self._queue))
+            return 0, [self._queue.popleft() for _ in range(count)]
+
+    def _requeue(self, attempts, batch, error):
+        if attempts >= self.max_retries:
+            self.stats['failed'] += len(batch)
+            ingest_logger.error("Odrzucono partię sesji kalkulatora publicznego po nieudanych próbach zapisu",
+                                batch_size=len(batch), attempts=attempts + 1, error=error)
+            return
+        with self._lock:
+            self._retry.append((attempts + 1, batch))
+            self._retry_rows += len(batch)
+        self.stats['retried'] += len(batch)
+        ingest_logger.warning("Błąd zapisu partii sesji kalkulatora publicznego - ponowienie w kolejnym przebiegu",
+                              batch_size=len(batch), attempt=attempts + 1, error=error)
+
+    def _pending(self):
+        return bool(self._queue) or bool(self._retry)
+
+    def flush(self):
+        """
+        Zapisuje jedną partię zdarzeń wielowierszowym INSERT.
+
+        Returns:
+            int: liczba zapisanych wierszy
+        """
+        with self._flush_lock:
+            attempts, batch = self._take_batch()
+            if not batch:
+                return 0
+
+            try:
+                db.session.execute(PublicSession.__table__.insert(), batch)
+                db.session.commit()
+                self.stats['written'] += len(batch)
+                self.stats['flushes'] += 1
+                return len(batch)
+            except Exception as e:
+                db.session.rollback()
+                self._requeue(attempts, batch, str(e))
+                return 0
+
+    def flush_all(self):
+        """Opróżnia cały bufor (np. przy zamykaniu procesu)"""
+        if self._app is None or not self._pending():
+            return 0
+        written = 0
+        with self._app.app_context():
+            while self._pending():
+                flushed = self.flush()
+                if not flushed:
+                    break
+                written += flushed
+            db.session.remove()
+        return written
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            if self._app is None:
+                continue
+            try:
+                self.flush_all()
+            except Exception as e:
+                ingest_logger.error("Błąd wątku zapisu sesji kalkulatora publicznego", error=str(e))
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats, queued=len(self._queue), retry_queued=self._retry_rows,
+                        max_size=self.max_size)
+
+    def run_load_test(self, events=10000, payload=None):
+        """
+        Test obciążeniowy ścieżki zapisu: przepuszcza ``events`` syntetycznych
+        zdarzeń przez bufor (z zapisem do bazy) i mierzy przepustowość.
+        Wiersze testowe są oznaczane user_agent='loadtest' i usuwane po teście.
+
+        Returns:
+            dict: liczba zdarzeń, czas, zdarzenia/s, odrzucenia
+        """
+        payload = payload or json.dumps({
+            'inputs': {'length': 200, 'width': 60, 'thickness': 4},
+            'variant': 'dab-lity-ab', 'finishing': 'surowe', 'color': None, 'duration_ms': 12000
+        })
+
+        rejected_before = self.stats['rejected']
+        started = time.perf_counter()
+
+        for _ in range(events):
+            row = build_session_row(payload, user_agent='loadtest', ip_address='127.0.0.1')
+            while not self.enqueue(row):
+                # Backpressure - czekamy aż wątek zapisu zwolni miejsce
+                self._wakeup.set()
+                time.sleep(0.001)
+        self.flush_all()
+
+        elapsed = time.perf_counter() - started
+        with self._app.app_context():
+            PublicSession.query.filter_by(user_agent='loadtest').delete(synchronize_session=False)
+            db.session.commit()
+
+        return {
+            'events': events,
+            'seconds': round(elapsed, 3),
+            'events_per_sec': round(events / elapsed, 1) if elapsed > 0 else None,
+            'backpressure_hits': self.stats['rejected'] - rejected_before,
+        }
+
+
+# Jedna instancja na proces
+session_buffer = PublicSessionBuffer()
@@ -0,0 +1,259 @@
+# modules/quotes/aggregate.py
+"""
+Agregat wyceny - wycena z pozycjami, detalami wykończenia, statusem, klientem
+i kolorami wykończeń ładowana stałą liczbą zapytań (niezależnie od liczby pozycji):
+
+1. wycena + klient + opiekun + status + użytkownik akceptujący (joinedload)
+2. pozycje (QuoteItem)
+3. detale wykończenia (QuoteItemDetails) - z nich ilości produktów
+4. kolory wykończeń (FinishingColor) - tylko gdy potrzebne obrazki
+
+load_many() ładuje w ten sam sposób wiele wycen naraz (np. zamówienia
+Baselinker dla wielu wycen, backfill sum).
+
+Sumy (produkty, wartości oryginalne, rabat, wykończenie, koszty z VAT) liczone
+są raz w konstruktorze. Pozycje dostają ilość z detali, więc QuoteItem.to_dict()
+i get_total_*() nie wykonują już osobnego zapytania o ilość.
+
+Sumy wybranych pozycji są też zapisywane w kolumnach total_* wyceny
+(refresh_totals po każdej zmianie pozycji, rabatu lub ilości).
+"""
+
+from datetime import datetime
+
+from sqlalchemy.orm import joinedload
+
+from extensions import db
+from modules.calculator.models import Quote, QuoteItem, QuoteItemDetails, FinishingColor
+
+VAT_RATE = 0.23
+
+
+def calculate_costs_with_vat(products_netto, finishing_netto, shipping_brutto):
+    """Oblicza koszty z VAT"""
+    vat_rate = VAT_RATE
+
+    # Produkty
+    products_vat = products_netto * vat_rate
+    products_brutto = products_netto + products_vat
+
+    # Wykończenie
+    finishing_vat = finishing_netto * vat_rate
+    finishing_brutto = finishing_netto + finishing_vat
+
+    # Shipping - zakładamy że mamy już brutto
+    shipping_netto = shipping_brutto / (1 + vat_rate)
+    shipping_vat = shipping_brutto - shipping_netto
+
+    # Totale
+    total_netto = products_netto + finishing_netto + shipping_netto
+    total_vat = products_vat + finishing_vat + shipping_vat
+    total_brutto = total_netto + total_vat
+
+    return {
+        'products': {
+            'netto': round(products_netto, 2),
+            'vat': round(products_vat, 2),
+            'brutto': round(products_brutto, 2)
+        },
+        'finishing': {
+            'netto': round(finishing_netto, 2),
+            'vat': round(finishing_vat, 2),
+            'brutto': round(finishing_brutto, 2)
+        },
+        'shipping': {
+            'netto': round(shipping_netto, 2),
+            'vat': round(shipping_vat, 2),
+            'brutto': round(shipping_brutto, 2)
+        },
+        'total': {
+            'netto': round(total_netto, 2),
+            'vat': round(total_vat, 2),
+            'brutto': round(total_brutto, 2)
+        }
+    }
+
+
+def _quantity(details_by_index, product_index):
+    detail = details_by_index.get(product_index)
+    return int(detail.quantity) if detail and detail.quantity else 1
+
+
+def compute_totals(quote, items, details):
+    """
+    Sumy wyceny z już pobranych pozycji i detali (bez zapytań do bazy)
+
+    Returns:
+        dict: products_*, original_*, discount_*, finishing_*, shipping_* (netto/brutto)
+              oraz costs (calculate_costs_with_vat)
+    """
+    details_by_index = {detail.product_index: detail for detail in details}
+    totals = dict.fromkeys((
+        'products_netto', 'products_brutto', 'original_netto', 'original_brutto'
+    ), 0.0)
+
+    for item in items:
+        if not item.is_selected:
+            continue
+        quantity = _quantity(details_by_index, item.product_index)
+        totals['products_netto'] += float(item.price_netto or 0) * quantity
+        totals['products_brutto'] += float(item.price_brutto or 0) * quantity
+        totals['original_netto'] += float(item.original_price_netto or item.price_netto or 0) * quantity
+        totals['original_brutto'] += float(item.original_price_brutto or item.price_brutto or 0) * quantity
+
+    totals['discount_netto'] = totals['original_netto'] - totals['products_netto']
+    totals['discount_brutto'] = totals['original_brutto'] - totals['products_brutto']
+    totals['finishing_netto'] = sum(float(d.finishing_price_netto or 0) for d in details)
+    totals['finishing_brutto'] = sum(float(d.finishing_price_brutto or 0) for d in details)
+    totals['shipping_netto'] = float(quote.shipping_cost_netto or 0)
+    totals['shipping_brutto'] = float(quote.shipping_cost_brutto or 0)
+
+    totals = {key: round(value, 2) for key, value in totals.items()}
+    totals['costs'] = calculate_costs_with_vat(
+        totals['products_netto'], totals['finishing_netto'], totals['shipping_brutto'])
+    return totals
+
+
+class QuoteAggregate:
+    """Wycena z danymi potrzebnymi do widoków, PDF i maili"""
+
+    def __init__(self, quote, items, details, color_images=None):
+        self.quote = quote
+        self.items = items
+        self.details = details
+        self.details_by_index = {detail.product_index: detail for detail in details}
+        self.color_images = color_images or {}
+
+        # Ilość z detali - QuoteItem.get_quantity() nie odpytuje już bazy
+        for item in items:
+            item._cached_quantity = _quantity(self.details_by_index, item.product_index)
+
+        self.selected_items = [item for item in items if item.is_selected]
+        self.totals = compute_totals(quote, items, details)
+
+    @classmethod
+    def load(cls, quote_id=None, public_token=None, with_colors=False):
+        """Wycena po ID lub tokenie publicznym (None, jeśli nie istnieje)"""
+        query = Quote.query.options(
+            joinedload(Quote.client),
+            joinedload(Quote.user),
+            joinedload(Quote.quote_status),
+            joinedload(Quote.accepted_by_user)
+        )
+        if quote_id is not None:
+            query = query.filter(Quote.id == quote_id)
+        else:
+            query = query.filter(Quote.public_token == public_token)
+
+        quote = query.first()
+        if not quote:
+            return None
+        return cls.from_quote(quote, with_colors=with_colors)
+
+    @classmethod
+    def from_quote(cls, quote, with_colors=False):
+        """Agregat dla już pobranej wyceny (pozycje i detale - dwa zapytania)"""
+        items = QuoteItem.query.filter_by(quote_id=quote.id).order_by(QuoteItem.id).all()
+        details = QuoteItemDetails.query.filter_by(quote_id=quote.id).order_by(QuoteItemDetails.product_index).all()
+
+        color_images = {}
+        if with_colors:
+            names = {d.finishing_color for d in details if d.finishing_color and d.finishing_color != 'Brak'}
+            if names:
+                color_images = {
+                    color.name: color.image_path
+                    for color in FinishingColor.query.filter(FinishingColor.name.in_(names)).all()
+                }
+
+        return cls(quote, items, details, color_images)
+
+    @classmethod
+    def load_many(cls, quote_ids):
+        """
+        Agregaty wielu wycen naraz - trzy zapytania niezależnie od liczby wycen
+
+        Returns:
+            dict: {quote_id: QuoteAggregate} (tylko istniejące wyceny)
+        """
+        quote_ids = list(quote_ids)
+        if not quote_ids:
+            return {}
+
+        quotes = Quote.query.options(
+            joinedload(Quote.client),
+            joinedload(Quote.user),
+            joinedload(Quote.quote_status),
+            joinedload(Quote.accepted_by_user)
+        ).filter(Quote.id.in_(quote_ids)).order_by(Quote.id).all()
+        found_ids = [quote.id for quote in quotes]
+        if not found_ids:
+            return {}
+
+        items_by_quote = {}
+        for item in QuoteItem.query.filter(QuoteItem.quote_id.in_(found_ids)).order_by(QuoteItem.id).all():
+            items_by_quote.setdefault(item.quote_id, []).append(item)
+        details_by_quote = {}
+        for detail in QuoteItemDetails.query.filter(QuoteItemDetails.quote_id.in_(found_ids)) \
+                .order_by(QuoteItemDetails.product_index).all():
+            details_by_quote.setdefault(detail.quote_id, []).append(detail)
+
+        return {
+            quote.id: cls(quote, items_by_quote.get(quote.id, []), details_by_quote.get(quote.id, []))
+            for quote in quotes
+        }
+
+    def quantity(self, product_index):
+        return _quantity(self.details_by_index, product_index)
+
+    # ------------------------------------------------------------------
+    # Zdenormalizowane sumy
+    # ------------------------------------------------------------------
+
+    def persist_totals(self):
+        """Zapisuje sumy w kolumnach wyceny (commit po stronie wywołującego)"""
+        quote = self.quote
+        totals = self.totals
+        quote.total_products_netto = totals['products_netto']
+        quote.total_products_brutto = totals['products_brutto']
+        quote.total_discount_netto = totals['discount_netto']
+        quote.total_discount_brutto = totals['discount_brutto']
+        quote.total_finishing_netto = totals['finishing_netto']
+        quote.total_finishing_brutto = totals['finishing_brutto']
+        quote.totals_updated_at = datetime.utcnow()
+
+    @classmethod
+    def refresh_totals(cls, quote_or_id):
+        """
+        Przelicza i zapisuje sumy wyceny po zmianie pozycji, rabatu lub ilości.
+        Wywoływać przed commitem - zapytania widzą niezapisane jeszcze zmiany (autoflush).
+        """
+        quote = quote_or_id if isinstance(quote_or_id, Quote) else db.session.get(Quote, quote_or_id)
+        if not quote:
+            return None
+        aggregate = cls.from_quote(quote)
+        aggregate.persist_totals()
+        return aggregate
+
+    @classmethod
+    def backfill_totals(cls, batch_size=200):
+        """
+        Uzupełnia kolumny total_* dla wszystkich wycen (jednorazowo po migracji 006).
+
+        Returns:
+            int: Liczba zaktualizowanych wycen
+        """
+        updated = 0
+        last_id = 0
+        while True:
+            quote_ids = [row.id for row in db.session.query(Quote.id).filter(Quote.id > last_id)
+                         .order_by(Quote.id).limit(batch_size).all()]
+            if not quote_ids:
+                break
+
+            for aggregate in cls.load_many(quote_ids).values():
+                aggregate.persist_totals()
+            db.session.commit()
+
+            updated += len(quote_ids)
+            last_id = quote_ids[-1]
+        return updated
@@ -0,0 +1,177 @@
+# modules/quotes/client_cache.py
+"""
+Cache publicznej strony wyceny (/quotes/c/<token>) i jej API
+(/quotes/api/client/quote/<token>)
+
+Odpowiedzi trzymane są w pamięci procesu pod tokenem wyceny. Aktualność
+sprawdzana jest jednym zapytaniem o (id, client_cache_version, status_id) -
+z tych wartości budowany jest ETag, więc zmiana wyceny w dowolnym procesie
+Passengera unieważnia wpisy we wszystkich pozostałych.
+
+Endpointy zmieniające dane widoczne dla klienta (pozycje, rabaty, ilości,
+akceptacja) wywołują ClientQuoteCache.invalidate() przed commitem, a edycja
+klienta lub handlowca - invalidate_for_client() / invalidate_for_user(). Zmiana
+statusu z innych modułów (np. Baselinker) zmienia ETag przez status_id.
+
+Przeglądarka dostaje ETag z Cache-Control: no-cache - przy każdym otwarciu
+strony rewaliduje ją warunkowo i przy braku zmian dostaje 304 bez treści.
+"""
+
+import time
+
+from flask import make_response, request
+from sqlalchemy import func
+
+from extensions import db
+from modules.calculator.models import Quote
+from modules.identity.service import TTLCache
+
+CACHE_TTL = 300          # sekundy
+CACHE_MAX_ENTRIES = 500
+
+
+class ClientQuoteCache:
+    """Odpowiedzi strony klienta per (rodzaj, token), walidowane wersją wyceny"""
+
+    _entries = TTLCache(CACHE_TTL, CACHE_MAX_ENTRIES)
+
+    @staticmethod
+    def _stamp(token):
+        """(id, wersja, status) wyceny lub None, jeśli token nie istnieje"""
+        return db.session.query(
+            Quote.id, Quote.client_cache_version, Quote.status_id
+        ).filter(Quote.public_token == token).first()
+
+    @staticmethod
+    def _etag(kind, stamp):
+        return f'{kind}-{stamp.id}-{stamp.client_cache_version or 0}-{stamp.status_id or 0}'
+
+    @classmethod
+    def respond(cls, kind, token, build):
+        """
+        Odpowiedź z cache lub zbudowana przez build() (i zapisana, jeśli HTTP 200)
+
+        Args:
+            kind: Rodzaj odpowiedzi ('page' / 'data')
+            token: Token publiczny wyceny
+            build: Funkcja bez argumentów zwracająca odpowiedź widoku
+        """
+        stamp = cls._stamp(token)
+        if stamp is None:
+            # Nieistniejący token - widok sam zwraca stronę / JSON błędu
+            return build()
+
+        etag = cls._etag(kind, stamp)
+        if etag in request.if_none_match:
+            return cls._headers(make_response('', 304), etag)
+
+        key = (kind, token)
+        cached = cls._entries.get(key)
+        if cached and cached['etag'] == etag:
+            response = make_response(cached['body'], 200)
+            response.mimetype = cached['mimetype']
+            return cls._headers(response, etag)
+
+        response = make_response(build())
+        if response.status_code == 200:
+            cls._entries.set(key, {
+                'etag': etag,
+                'body': response.get_data(),
+                'mimetype': response.mimetype,
+                'quote_id': stamp.id
+            })
+            cls._headers(response, etag)
+        return response
+
+    @staticmethod
+    def _headers(response, etag):
+        response.set_etag(etag)
+        # Przeglądarka może trzymać kopię, ale musi ją rewalidować przy każdym otwarciu
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+
+    @classmethod
+    def invalidate(cls, quote_or_id):
+        """
+        Podbija wersję strony klienta (commit po stronie wywołującego)
+        i usuwa wpisy wyceny z cache bieżącego procesu.
+        """
+        quote = quote_or_id if isinstance(quote_or_id, Quote) else db.session.get(Quote, quote_or_id)
+        if not quote:
+            return
+        quote.client_cache_version = (quote.client_cache_version or 0) + 1
+        cls._entries.pop_where(lambda entry: entry['quote_id'] == quote.id)
+
+    @classmethod
+    def invalidate_for_client(cls, client_id):
+        """Podbija wersję wszystkich wycen klienta (zmiana danych klienta)"""
+        cls._invalidate_where(Quote.client_id == client_id)
+
+    @classmethod
+    def invalidate_for_user(cls, user_id):
+        """Podbija wersję wszystkich wycen handlowca (zmiana danych użytkownika)"""
+        cls._invalidate_where(Quote.user_id == user_id)
+
+    @classmethod
+    def _invalidate_where(cls, criterion):
+        # Jeden UPDATE zamiast ładowania wycen (commit po stronie wywołującego)
+        quote_ids = {row.id for row in db.session.query(Quote.id).filter(criterion)}
+        if not quote_ids:
+            return
+        Quote.query.filter(criterion).update(
+            {Quote.client_cache_version: func.coalesce(Quote.client_cache_version, 0) + 1},
+            synchronize_session=False
+        )
+        cls._entries.pop_where(lambda entry: entry['quote_id'] in quote_ids)
+
+    @classmethod
+    def clear(cls):
+        cls._entries.clear()
+
+    @classmethod
+    def stats(cls):
+        return {'hits': cls._entries.hits, 'misses': cls._entries.misses}
+
+
+def run_load_test(app, token, requests_count=1000):
+    """
+    Przepustowość strony klienta na rozgrzanym cache (test_client, jeden proces)
+
+    Returns:
+        list[dict]: name, requests, seconds, requests_per_sec, statuses
+    """
+    client = app.test_client()
+    cases = (
+        ('data', f'/quotes/api/client/quote/{token}', False),
+        ('page', f'/quotes/c/{token}', False),
+        ('data_304', f'/quotes/api/client/quote/{token}', True),
+    )
+
+    # Wszystkie żądania idą z jednego IP - limit endpointów klienta wyłączony na czas testu
+    rate_limit_enabled = app.config.get('RATE_LIMIT_ENABLED', True)
+    app.config['RATE_LIMIT_ENABLED'] = False
+
+    results = []
+    try:
+        for name, path, conditional in cases:
+            warm = client.get(path)
+            headers = {'If-None-Match': warm.headers['ETag']} if conditional and warm.headers.get('ETag') else {}
+            statuses = {}
+
+            started = time.perf_counter()
+            for _ in range(requests_count):
+                response = client.get(path, headers=headers)
+                response.get_data()
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            seconds = time.perf_counter() - started
+
+            results.append({
+                'name': name,
+                'requests': requests_count,
+                'seconds': round(seconds, 3),
+                'requests_per_sec': round(requests_count / seconds, 1) if seconds else None,
+                'statuses': statuses
+            })
+    finally:
+        app.config['RATE_LIMIT_ENABLED'] = rate_limit_enabled
+    return results
@@ -0,0 +1,71 @@
+# modules/quotes/query_count.py
+"""
+Kontrola liczby zapytań endpointów wyceny
+
+Wywołuje endpointy wyceny (test_client, zalogowany użytkownik) i liczy
+wykonane zapytania SQL. Dzięki QuoteAggregate liczba zapytań nie zależy od
+liczby pozycji wyceny - przekroczenie limitu oznacza regresję (N+1).
+
+    flask quotes-query-count --quote-id 123
+"""
+
+from sqlalchemy import event
+
+from extensions import db
+from modules.quotes.client_cache import ClientQuoteCache
+
+# (nazwa, ścieżka - {id} / {token} wypełniane z wyceny, limit zapytań)
+QUERY_BUDGETS = (
+    ('quote_details', '/quotes/api/quotes/{id}', 8),
+    # +1 zapytanie o wersję wyceny (ClientQuoteCache) - mierzony jest zimny cache
+    ('client_quote_data', '/quotes/api/client/quote/{token}', 7),
+)
+
+
+def count_quote_queries(app, quote, user_email, user_id, budgets=None):
+    """
+    Args:
+        app: Aplikacja Flask
+        quote: Wycena (najlepiej z wieloma pozycjami)
+        user_email / user_id: Użytkownik, w imieniu którego wołane są endpointy
+        budgets: Lista (nazwa, ścieżka, limit) - domyślnie QUERY_BUDGETS
+
+    Returns:
+        list[dict]: name, path, status, queries, budget, items, ok
+    """
+    client = app.test_client()
+    with client.session_transaction() as flask_session:
+        flask_session['user_email'] = user_email
+        flask_session['user_id'] = user_id
+
+    items_count = quote.items.count()
+    ClientQuoteCache.clear()
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    results = []
+    engine = db.engine
+    for name, path_template, budget in budgets or QUERY_BUDGETS:
+        path = path_template.format(id=quote.id, token=quote.public_token)
+        statements.clear()
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            response = client.get(path)
+            response.get_data()
+        finally:
+            event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+        results.append({
+            'name': name,
+            'path': path,
+            'status': response.status_code,
+            'queries': len(statements),
+            'budget': budget,
+            'items': items_count,
+            'ok': response.status_code == 200 and len(statements) <= budget,
+            'statements': [' '.join(statement.split())[:200] for statement in statements]
+        })
+
+    return results
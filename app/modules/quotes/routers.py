@@ -6,9 +6,9 @@ from modules.clients.models import Client
 from modules.baselinker.service import BaselinkerService
 from modules.baselinker.models import BaselinkerConfig
 from extensions import db, mail
-from weasyprint import HTML
 from io import BytesIO
 from flask_mail import Message
+from modules.mail_queue.service import MailQueueService
 from functools import wraps
 import logging
 import sys
@@ -32,6 +32,9 @@ from modules.quotes.models import (
     User,
     DiscountReason
 )
+from modules.quotes.aggregate import QuoteAggregate
+from modules.quotes.client_cache import ClientQuoteCache
+from modules.rate_limit import rate_limit
 
 def render_client_error(error_type, error_code, error_message, error_details=None, quote_number=None):
     """Renderuje stronę błędu dla klienta"""
@@ -45,50 +48,6 @@ def render_client_error(error_type, error_code, error_message, error_details=Non
     ), error_code
 
 # Funkcje pomocnicze
-def calculate_costs_with_vat(products_netto, finishing_netto, shipping_brutto):
-    """Oblicza koszty z VAT"""
-    vat_rate = 0.23
-    
-    # Produkty
-    products_vat = products_netto * vat_rate
-    products_brutto = products_netto + products_vat
-    
-    # Wykończenie
-    finishing_vat = finishing_netto * vat_rate
-    finishing_brutto = finishing_netto + finishing_vat
-    
-    # Shipping - zakładamy że mamy już brutto
-    shipping_netto = shipping_brutto / (1 + vat_rate)
-    shipping_vat = shipping_brutto - shipping_netto
-    
-    # Totale
-    total_netto = products_netto + finishing_netto + shipping_netto
-    total_vat = products_vat + finishing_vat + shipping_vat
-    total_brutto = total_netto + total_vat
-    
-    return {
-        'products': {
-            'netto': round(products_netto, 2),
-            'vat': round(products_vat, 2),
-            'brutto': round(products_brutto, 2)
-        },
-        'finishing': {
-            'netto': round(finishing_netto, 2),
-            'vat': round(finishing_vat, 2),
-            'brutto': round(finishing_brutto, 2)
-        },
-        'shipping': {
-            'netto': round(shipping_netto, 2),
-            'vat': round(shipping_vat, 2),
-            'brutto': round(shipping_brutto, 2)
-        },
-        'total': {
-            'netto': round(total_netto, 2),
-            'vat': round(total_vat, 2),
-            'brutto': round(total_brutto, 2)
-        }
-    }
-
 def login_required(func):
     @wraps(func)
     def wrapper(*args, **kwargs):
@@ -247,6 +206,7 @@ def update_quote_status(quote_id):
         new_status = QuoteStatus.query.get_or_404(status_id)
 
         quote.status_id = new_status.id
+        ClientQuoteCache.invalidate(quote)
         db.session.commit()
 
         return jsonify({"message": "Status updated successfully", "new_status": new_status.name})
@@ -258,27 +218,24 @@ def update_quote_status(quote_id):
 @quotes_bp.route("/api/quotes/<token>/pdf.<format>", methods=["GET"])
 def generate_quote_pdf(token, format):
     
+    from weasyprint import HTML
+
     try:
         if format not in ["pdf", "png"]:
             print(f"[generate_quote_pdf] Unsupported format: {format}", file=sys.stderr)
             return {"error": "Unsupported format"}, 400
 
         # ZMIANA: Wyszukiwanie po tokenie zamiast ID
-        quote = Quote.query.filter_by(public_token=token).first()
-        if not quote:
+        aggregate = QuoteAggregate.load(public_token=token)
+        if not aggregate:
             print(f"[generate_quote_pdf] Brak wyceny dla tokenu: {token}", file=sys.stderr)
             return {"error": "Quote not found"}, 404
 
-        # KLUCZOWE: Oblicz koszty (tak jak w send_email i get_client_quote_data)
-        selected_items = [item for item in quote.items if item.is_selected]
-        finishing_details = db.session.query(QuoteItemDetails).filter_by(quote_id=quote.id).all()
-        
-        cost_products_netto = round(sum(item.get_total_price_netto() for item in selected_items), 2)
-        cost_finishing_netto = round(sum(d.finishing_price_netto or 0.0 for d in finishing_details), 2)
-        cost_shipping_brutto = quote.shipping_cost_brutto or 0.0
-        
-        # Użyj funkcji calculate_costs_with_vat
-        costs = calculate_costs_with_vat(cost_products_netto, cost_finishing_netto, cost_shipping_brutto)
+        # KLUCZOWE: Koszty z agregatu (tak jak w send_email i get_client_quote_data)
+        quote = aggregate.quote
+        selected_items = aggregate.selected_items
+        finishing_details = aggregate.details
+        costs = aggregate.totals['costs']
 
         # Funkcja pomocnicza do ładowania ikon
         def load_icon_as_base64(icon_name):
@@ -359,31 +316,27 @@ def generate_quote_pdf(token, format):
 @quotes_bp.route("/api/quotes/<int:quote_id>/send_email", methods=["POST"])
 @login_required
 def send_email(quote_id):
+    from weasyprint import HTML
+
     print(f"[send_email] Wysylka maila dla wyceny ID {quote_id}", file=sys.stderr)
 
     data = request.get_json()
     recipient_email = data.get("email")
     print(f"[send_email] Do: {recipient_email}", file=sys.stderr)
 
-    quote = db.session.get(Quote, quote_id)
-    if not quote:
+    aggregate = QuoteAggregate.load(quote_id=quote_id)
+    if not aggregate:
         return jsonify({"error": "Quote not found"}), 404
 
-    client = db.session.get(Client, quote.client_id)
-    user = db.session.get(User, quote.user_id)
-    status = db.session.get(QuoteStatus, quote.status_id)
+    quote = aggregate.quote
+    client = quote.client
+    user = quote.user
+    status = quote.quote_status
 
-    # Pobierz wybrane produkty
-    selected_items = [item for item in quote.items if item.is_selected]
-    
-    # Oblicz koszty
-    cost_products_netto = round(sum(i.get_total_price_netto or 0 for i in selected_items), 2)
-    cost_finishing_netto = round(sum(d.finishing_price_netto or 0.0 for d in db.session.query(QuoteItemDetails).filter_by(quote_id=quote.id).all()), 2)
-    cost_shipping_brutto = quote.shipping_cost_brutto or 0.0
-    costs = calculate_costs_with_vat(cost_products_netto, cost_finishing_netto, cost_shipping_brutto)
-    
-    # Pobierz detale wykończenia
-    finishing_details = db.session.query(QuoteItemDetails).filter_by(quote_id=quote.id).all()
+    # Wybrane produkty, koszty i detale wykończenia z agregatu
+    selected_items = aggregate.selected_items
+    costs = aggregate.totals['costs']
+    finishing_details = aggregate.details
     
     # Załaduj ikony (opcjonalnie - można pominąć dla emaili)
     icons = {}  # Można dodać ikony jeśli potrzebne
@@ -409,10 +362,11 @@ def send_email(quote_id):
     msg.attach(f"Oferta_{quote.quote_number}.pdf", "application/pdf", pdf_file.read())
 
     try:
-        mail.send(msg)
-        return jsonify({"success": True, "message": "Email wysłany pomyślnie"})
+        MailQueueService.enqueue(msg, category='quote_offer')
+        return jsonify({"success": True, "message": "Email przekazany do wysyłki"})
     except Exception as e:
-        print(f"[send_email] Blad wysylki emaila: {str(e)}", file=sys.stderr)
+        db.session.rollback()
+        print(f"[send_email] Blad kolejkowania emaila: {str(e)}", file=sys.stderr)
         return jsonify({"error": "Błąd wysyłki emaila"}), 500
 
 @quotes_bp.route('/api/quotes/status-counts')
@@ -458,41 +412,22 @@ def get_users():
 def get_quote_details(quote_id):
     
     try:
-        # Pobierz wycenę z relacjami
-        quote = db.session.query(Quote)\
-            .options(
-                joinedload(Quote.client),
-                joinedload(Quote.user),
-                joinedload(Quote.quote_status),
-                joinedload(Quote.accepted_by_user)  # NOWA RELACJA
-            )\
-            .filter_by(id=quote_id).first()
+        # Wycena z relacjami, pozycjami i detalami wykończenia (stała liczba zapytań)
+        aggregate = QuoteAggregate.load(quote_id=quote_id)
 
-        if not quote:
+        if not aggregate:
             print(f"[get_quote_details] ❌ Wycena {quote_id} nie znaleziona", file=sys.stderr)
             return jsonify({"error": "Wycena nie znaleziona"}), 404
 
-        # Pobierz szczegóły wykończenia
-        finishing_details = db.session.query(QuoteItemDetails).filter_by(quote_id=quote_id).all()
+        quote = aggregate.quote
+        quote_items = aggregate.items
+        finishing_details = aggregate.details
 
-        # POPRAWKA: Pobierz items osobno (ponieważ lazy='dynamic')
-        quote_items = quote.items.all()  # .all() na dynamic relationship
-        
-        # Analiza statystyczna
-        show_values = [item.show_on_client_page for item in quote_items]
-        selected_values = [item.is_selected for item in quote_items]
-        
-        # DEBUGOWANIE: Sprawdź to_dict() dla każdej pozycji
-        items_data = []
-        for i, item in enumerate(quote_items):
-            item_dict = item.to_dict()
-            items_data.append(item_dict)
-
-        selected_items = [item for item in quote_items if item.is_selected]
-        cost_products_netto = round(sum(item.get_total_price_netto() for item in selected_items), 2)
-        cost_finishing_netto = round(sum(d.finishing_price_netto or 0.0 for d in finishing_details), 2)
-        cost_shipping_brutto = quote.shipping_cost_brutto or 0.0
-        costs = calculate_costs_with_vat(cost_products_netto, cost_finishing_netto, cost_shipping_brutto)
+        totals = aggregate.totals
+        cost_products_netto = totals['products_netto']
+        cost_finishing_netto = totals['finishing_netto']
+        cost_shipping_brutto = totals['shipping_brutto']
+        costs = totals['costs']
 
         # Pobierz wszystkie statusy
         all_statuses = QuoteStatus.query.all()
@@ -503,29 +438,6 @@ def get_quote_details(quote_id):
             quote.accepted_by_email and 
             quote.accepted_by_email.startswith('internal_user_')):
             accepted_by_user = quote.accepted_by_user
-
-        # KOŃCOWY PRZEGLĄD JSON
-        final_json_items = [item.to_dict() for item in quote_items]
-        
-        # Analiza końcowego JSON
-        final_show_values = [item.get('show_on_client_page') for item in final_json_items]
-        final_selected_values = [item.get('is_selected') for item in final_json_items]
-        
-        # Test pojedynczej pozycji
-        test_item = quote_items[5]  # jes-micro-ab (show_on_client_page=False)
-        test_dict = test_item.to_dict()
-        
-        # Test serializacji przez Flask jsonify
-        import json
-        json_string = json.dumps(test_dict)
-        
-        # Test deserializacji
-        parsed_back = json.loads(json_string)
-        
-        # Test całej listy
-        all_items_dict = [item.to_dict() for item in quote_items]
-        all_json = json.dumps(all_items_dict)
-        all_parsed = json.loads(all_json)
         
         return jsonify({
             "id": quote.id,
@@ -608,6 +520,8 @@ def select_quote_item(item_id):
 
         # Ustaw nowy jako wybrany
         item.is_selected = True
+        QuoteAggregate.refresh_totals(item.quote_id)
+        ClientQuoteCache.invalidate(item.quote_id)
         db.session.commit()
 
         return jsonify({"message": "Wariant ustawiony jako wybrany"})
@@ -646,6 +560,8 @@ def update_variant_discount(quote_id, item_id):
         # Zastosuj rabat
         item.apply_discount(discount_percentage, reason_id)
         item.show_on_client_page = show_on_client_page
+        QuoteAggregate.refresh_totals(quote_id)
+        ClientQuoteCache.invalidate(quote_id)
         
         db.session.commit()
                 
@@ -694,6 +610,8 @@ def apply_total_discount(quote_id):
                     detail.finishing_price_brutto = detail.finishing_price_brutto * multiplier
 
         # --- ZAPIS DO BAZY ---
+        aggregate = QuoteAggregate.refresh_totals(quote)
+        ClientQuoteCache.invalidate(quote)
         db.session.commit()
 
         # --- ODPOWIEDŹ JSON ---
@@ -701,9 +619,8 @@ def apply_total_discount(quote_id):
             "message": f"Rabat został zastosowany do {affected_items} pozycji",
             "affected_items": affected_items,
             "include_finishing": include_finishing,
-            # Jeżeli masz w modelu metody get_total_discount_amount_netto / brutto, to możesz je tu zwrócić
-            "total_discount_netto": quote.get_total_discount_amount_netto(),
-            "total_discount_brutto": quote.get_total_discount_amount_brutto()
+            "total_discount_netto": aggregate.totals['discount_netto'],
+            "total_discount_brutto": aggregate.totals['discount_brutto']
         }), 200
 
     except Exception as e:
@@ -715,8 +632,12 @@ def apply_total_discount(quote_id):
 
 
 @quotes_bp.route("/c/<token>")
+@rate_limit(max_requests=120, window=60, scope='client_quote_read')
 def client_quote_view(token):
-    """Widok strony klienta z redesignem"""
+    """Widok strony klienta z redesignem (cache per token, ETag)"""
+    return ClientQuoteCache.respond('page', token, lambda: _render_client_quote_page(token))
+
+def _render_client_quote_page(token):
     try:
         
         # Znajdź wycenę po tokenie
@@ -758,37 +679,38 @@ def client_quote_view(token):
         )
 
 @quotes_bp.route("/api/client/quote/<token>")
+@rate_limit(max_requests=120, window=60, scope='client_quote_read')
 def get_client_quote_data(token):
-    """API dla strony klienta - rozszerzone dane dla redesignu"""
+    """API dla strony klienta - rozszerzone dane dla redesignu (cache per token, ETag)"""
+    return ClientQuoteCache.respond('data', token, lambda: _build_client_quote_data(token))
+
+def _build_client_quote_data(token):
     try:
-        quote = Quote.query.filter_by(public_token=token).first()
+        aggregate = QuoteAggregate.load(public_token=token, with_colors=True)
         
-        if not quote:
+        if not aggregate:
             return jsonify({
                 "error": "not_found", 
                 "message": "Wycena nie została znaleziona"
             }), 404
+
+        quote = aggregate.quote
         
-        # Oblicz koszty
-        cost_products_netto = round(sum(i.get_total_price_netto() for i in quote.items if i.is_selected), 2)
-        cost_finishing_netto = round(sum(d.finishing_price_netto or 0.0 for d in db.session.query(QuoteItemDetails).filter_by(quote_id=quote.id).all()), 2)
-        cost_shipping_brutto = quote.shipping_cost_brutto or 0.0
-        cost_shipping_netto = quote.shipping_cost_netto or 0.0
-        costs = calculate_costs_with_vat(cost_products_netto, cost_finishing_netto, cost_shipping_brutto)
+        # Koszty z agregatu
+        costs = aggregate.totals['costs']
+        cost_shipping_brutto = aggregate.totals['shipping_brutto']
+        cost_shipping_netto = aggregate.totals['shipping_netto']
         
         # Pobierz wszystkie pozycje jeśli wycena jest zaakceptowana, 
         # w przeciwnym razie tylko te oznaczone jako widoczne
         if not quote.is_client_editable:
-            visible_items = quote.items
+            visible_items = aggregate.items
         else:
-            visible_items = [item for item in quote.items if item.show_on_client_page]
-        
-        # Pobierz szczegóły wykończenia
-        finishing_details = db.session.query(QuoteItemDetails).filter_by(quote_id=quote.id).all()
+            visible_items = [item for item in aggregate.items if item.show_on_client_page]
         
         # Przygotuj dane o wykończeniach z obrazkami
         finishing_data = []
-        for detail in finishing_details:
+        for detail in aggregate.details:
             finishing_info = {
                 "product_index": detail.product_index,
                 "finishing_type": detail.finishing_type,
@@ -801,11 +723,9 @@ def get_client_quote_data(token):
             }
             
             # Dodaj ścieżkę do obrazka jeśli istnieje kolor
-            if detail.finishing_color and detail.finishing_color != 'Brak':
-                # Sprawdź czy istnieje obrazek w bazie
-                color_image = FinishingColor.query.filter_by(name=detail.finishing_color).first()
-                if color_image and color_image.image_path:
-                    finishing_info["image_path"] = color_image.image_path
+            image_path = aggregate.color_images.get(detail.finishing_color)
+            if image_path:
+                finishing_info["image_path"] = image_path
             
             finishing_data.append(finishing_info)
         
@@ -815,8 +735,7 @@ def get_client_quote_data(token):
             item_dict = item.to_dict()
             
             # Upewnij się, że ceny są jednostkowe (nie całkowite)
-            finishing = next((f for f in finishing_details if f.product_index == item.product_index), None)
-            quantity = finishing.quantity if finishing else 1
+            quantity = aggregate.quantity(item.product_index)
             
             # Popraw ceny jeśli są już pomnożone przez ilość
             if quantity > 1:
@@ -852,6 +771,7 @@ def get_client_quote_data(token):
         return jsonify({"error": "server_error", "message": str(e)}), 500
 
 @quotes_bp.route("/api/client/quote/<token>/update-variant", methods=["PATCH"])
+@rate_limit(max_requests=30, window=60, scope='client_quote_write')
 def client_update_variant(token):
     """Zmiana wariantu przez klienta - tylko dla edytowalnych wycen"""
     try:
@@ -877,6 +797,8 @@ def client_update_variant(token):
         # Odznacz wszystkie warianty w tej grupie i zaznacz wybrany
         QuoteItem.query.filter_by(quote_id=quote.id, product_index=item.product_index).update({QuoteItem.is_selected: False})
         item.is_selected = True
+        QuoteAggregate.refresh_totals(quote)
+        ClientQuoteCache.invalidate(quote)
         db.session.commit()
 
         return jsonify({"message": "Wariant został zmieniony"})
@@ -886,6 +808,7 @@ def client_update_variant(token):
         return jsonify({"error": "Błąd podczas zmiany wariantu"}), 500
 
 @quotes_bp.route("/api/client/quote/<token>/accept", methods=["POST"])
+@rate_limit(max_requests=30, window=60, scope='client_quote_write')
 def client_accept_quote(token):
     """Akceptacja wyceny przez klienta z rozszerzonymi danymi"""
     try:
@@ -948,6 +871,7 @@ def client_accept_quote(token):
             description=f"Wycena zaakceptowana przez klienta (email: {email_or_phone})"
         )
         db.session.add(log_entry)
+        ClientQuoteCache.invalidate(quote)
         
         db.session.commit()
                 
@@ -978,17 +902,11 @@ def send_acceptance_email_to_salesperson(quote):
         return
     
     try:
-        # Przygotuj dane do szablonu
-        selected_items = quote.get_selected_items()
-        
-        # Oblicz koszty
-        cost_products_netto = round(sum(i.get_total_price_netto or 0 for i in selected_items), 2)
-        cost_finishing_netto = round(sum(d.finishing_price_netto or 0.0 for d in db.session.query(QuoteItemDetails).filter_by(quote_id=quote.id).all()), 2)
-        cost_shipping_brutto = quote.shipping_cost_brutto or 0.0
-        costs = calculate_costs_with_vat(cost_products_netto, cost_finishing_netto, cost_shipping_brutto)
-        
-        # Pobierz detale wykończenia
-        finishing_details = db.session.query(QuoteItemDetails).filter_by(quote_id=quote.id).all()
+        # Przygotuj dane do szablonu (pozycje, detale i koszty z agregatu)
+        aggregate = QuoteAggregate.from_quote(quote)
+        selected_items = aggregate.selected_items
+        costs = aggregate.totals['costs']
+        finishing_details = aggregate.details
         
         # Renderuj szablon HTML
         html_body = render_template('quote_accept_email.html', 
@@ -1007,7 +925,7 @@ def send_acceptance_email_to_salesperson(quote):
             html=html_body
         )
         
-        mail.send(msg)
+        MailQueueService.enqueue(msg, category='quote_acceptance')
         
     except Exception as e:
         print(f"[send_acceptance_email_to_salesperson] Błąd wysyłki maila do sprzedawcy: {e}", file=sys.stderr)
@@ -1026,17 +944,11 @@ def send_acceptance_email_to_client(quote):
         return
     
     try:
-        # Przygotuj dane do szablonu
-        selected_items = quote.get_selected_items()
-        
-        # Oblicz koszty
-        cost_products_netto = round(sum(i.get_total_price_netto or 0 for i in selected_items), 2)
-        cost_finishing_netto = round(sum(d.finishing_price_netto or 0.0 for d in db.session.query(QuoteItemDetails).filter_by(quote_id=quote.id).all()), 2)
-        cost_shipping_brutto = quote.shipping_cost_brutto or 0.0
-        costs = calculate_costs_with_vat(cost_products_netto, cost_finishing_netto, cost_shipping_brutto)
-        
-        # Pobierz detale wykończenia
-        finishing_details = db.session.query(QuoteItemDetails).filter_by(quote_id=quote.id).all()
+        # Przygotuj dane do szablonu (pozycje, detale i koszty z agregatu)
+        aggregate = QuoteAggregate.from_quote(quote)
+        selected_items = aggregate.selected_items
+        costs = aggregate.totals['costs']
+        finishing_details = aggregate.details
         
         # Renderuj szablon HTML dla klienta
         html_body = render_template('quote_accept_email_client.html', 
@@ -1059,7 +971,7 @@ def send_acceptance_email_to_client(quote):
         if quote.user and quote.user.email:
             msg.reply_to = quote.user.email
         
-        mail.send(msg)
+        MailQueueService.enqueue(msg, category='quote_acceptance')
         
     except Exception as e:
         print(f"[send_acceptance_email_to_client] Błąd wysyłki maila do klienta: {e}", file=sys.stderr)
@@ -1130,6 +1042,8 @@ def update_quote_quantity(quote_id):
         
         # Aktualizuj ilość w QuoteItemDetails
         finishing_details.quantity = new_quantity
+        QuoteAggregate.refresh_totals(quote)
+        ClientQuoteCache.invalidate(quote)
                 
         # Zaloguj zmianę
         current_user_id = session.get('user_id')
@@ -1210,6 +1124,7 @@ def user_accept_quote(quote_id):
         else:
             # Jeśli była już akceptacja przez klienta, dodaj oznaczenie że użytkownik też zaakceptował
             quote.accepted_by_email = f"internal_user_{user.id}"
+        ClientQuoteCache.invalidate(quote)
                 
         # Zapisz zmiany
         try:
@@ -1256,17 +1171,11 @@ def send_user_acceptance_email_to_client(quote, accepting_user):
         return
     
     try:
-        # Przygotuj dane do szablonu
-        selected_items = quote.get_selected_items()
-        
-        # Oblicz koszty
-        cost_products_netto = round(sum(i.get_total_price_netto() for i in selected_items), 2)
-        cost_finishing_netto = round(sum(d.finishing_price_netto or 0.0 for d in db.session.query(QuoteItemDetails).filter_by(quote_id=quote.id).all()), 2)
-        cost_shipping_brutto = quote.shipping_cost_brutto or 0.0
-        costs = calculate_costs_with_vat(cost_products_netto, cost_finishing_netto, cost_shipping_brutto)
-        
-        # Pobierz detale wykończenia
-        finishing_details = db.session.query(QuoteItemDetails).filter_by(quote_id=quote.id).all()
+        # Przygotuj dane do szablonu (pozycje, detale i koszty z agregatu)
+        aggregate = QuoteAggregate.from_quote(quote)
+        selected_items = aggregate.selected_items
+        costs = aggregate.totals['costs']
+        finishing_details = aggregate.details
         
         # Renderuj szablon HTML dla klienta (podobny do istniejącego)
         html_body = render_template('quote_accept_email_client.html', 
@@ -1291,13 +1200,14 @@ def send_user_acceptance_email_to_client(quote, accepting_user):
         if accepting_user.email:
             msg.reply_to = accepting_user.email
         
-        mail.send(msg)
+        MailQueueService.enqueue(msg, category='quote_acceptance')
         
     except Exception as e:
         print(f"[send_user_acceptance_email_to_client] Błąd wysyłki maila do klienta: {e}", file=sys.stderr)
         raise
 
 @quotes_bp.route("/api/client/quote/<token>/accept-with-data", methods=["POST"])
+@rate_limit(max_requests=30, window=60, scope='client_quote_write')
 def client_accept_quote_with_data(token):
     """Akceptacja wyceny przez klienta z pełnymi danymi - ROZSZERZONA WERSJA"""
     try:
@@ -1443,6 +1353,9 @@ def client_accept_quote_with_data(token):
         quote.is_client_editable = False
         quote.acceptance_date = datetime.now()
         quote.accepted_by_email = email
+        ClientQuoteCache.invalidate(quote)
+        # Dane klienta widoczne są też w jego pozostałych wycenach
+        ClientQuoteCache.invalidate_for_client(client.id)
                 
         # === ZAPISZ ZMIANY ===
         try:
@@ -1485,6 +1398,7 @@ def client_accept_quote_with_data(token):
         return jsonify({"error": "Wystąpił błąd podczas przetwarzania żądania"}), 500
 
 @quotes_bp.route("/api/client/quote/<token>/validate-contact", methods=["POST"])
+@rate_limit(max_requests=30, window=60, scope='client_quote_write')
 def validate_client_contact(token):
     """Waliduje dane kontaktowe klienta przed przejściem do następnego kroku"""
     try:
@@ -1557,6 +1471,7 @@ def validate_client_contact(token):
         return jsonify({"error": "Błąd podczas walidacji danych"}), 500
 
 @quotes_bp.route("/api/client/quote/<token>/client-data", methods=["GET"])
+@rate_limit(max_requests=30, window=60, scope='client_quote_write')
 def get_client_data_for_modal(token):
     """Pobiera dane klienta do wypełnienia modalboxa - ENDPOINT DO AUTO-UZUPEŁNIENIA"""
     try:
@@ -1751,6 +1666,8 @@ def update_quote_variant(quote_id):
         
         # Ustaw nowy wariant jako wybrany
         target_item.is_selected = True
+        QuoteAggregate.refresh_totals(quote)
+        ClientQuoteCache.invalidate(quote)
         
         # Zapisz zmiany
         db.session.commit()
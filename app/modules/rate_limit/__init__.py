@@ -0,0 +1,14 @@
+# modules/rate_limit/__init__.py
+"""
+Rate limiting endpointów publicznych
+====================================
+
+Licznik okna przesuwnego (dwa okna stałe ważone czasem) - sprawdzenie to
+stała liczba operacji niezależnie od limitu. Backend wybierany przez
+RATE_LIMIT_BACKEND: 'memory' (per proces, ograniczona liczba kluczy)
+albo 'database' (tabela rate_limit_counters wspólna dla procesów Passengera).
+"""
+
+from .limiter import RateLimiter, MemoryBackend, DatabaseBackend, limiter, rate_limit, client_ip
+
+__all__ = ['RateLimiter', 'MemoryBackend', 'DatabaseBackend', 'limiter', 'rate_limit', 'client_ip']
@@ -0,0 +1,340 @@
+# modules/rate_limit/limiter.py
+"""
+Rate limiter z licznikiem okna przesuwnego
+
+Poprzednia implementacja (partner_academy.utils) trzymała listę znaczników
+czasu per klucz i przebudowywała ją przy każdym żądaniu, nigdy nie usuwała
+nieaktywnych kluczy i działała osobno w każdym procesie Passengera.
+
+Tu każdy klucz ma dwa liczniki: bieżące i poprzednie okno stałe. Szacowana
+liczba żądań w ostatnich ``window`` sekundach to:
+
+    poprzednie * (1 - część_bieżącego_okna_która_upłynęła) + bieżące
+
+Backendy:
+    MemoryBackend   - słownik LRU w procesie, ograniczony RATE_LIMIT_MAX_KEYS,
+                      klucze nieaktywne dłużej niż dwa okna są usuwane
+    DatabaseBackend - tabela rate_limit_counters (wspólna dla procesów);
+                      przy błędzie bazy decyduje backend pamięciowy
+
+Użycie:
+
+    @rate_limit(max_requests=5, window=3600)
+    def submit_application():
+        ...
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, jsonify, request
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects import mysql, sqlite
+
+from extensions import db
+from modules.logging import get_structured_logger
+from .models import RateLimitCounter
+
+rate_limit_logger = get_structured_logger('rate_limit')
+
+DEFAULT_MAX_KEYS = 20000
+CLEANUP_INTERVAL = 60      # sekundy - usuwanie wygasłych liczników w bazie
+ERROR_LOG_INTERVAL = 60    # sekundy - nie logujemy każdego błędu bazy
+
+
+def _estimate(previous, current, window, now, window_id):
+    """Szacowana liczba żądań w ostatnich ``window`` sekundach"""
+    elapsed = (now - window_id * window) / window
+    return previous * (1.0 - elapsed) + current
+
+
+def _retry_after(previous, current, limit, window, now, window_id):
+    """Sekundy do zwolnienia miejsca w limicie (nagłówek Retry-After)"""
+    window_end = (window_id + 1) * window
+    if previous and current < limit:
+        # Miejsce zwolni się, gdy waga poprzedniego okna spadnie wystarczająco
+        needed_fraction = 1.0 - (limit - current) / previous
+        return max(1, int(window_id * window + needed_fraction * window - now) + 1)
+    return max(1, int(window_end - now) + 1)
+
+
+class MemoryBackend:
+    """Liczniki w pamięci procesu (OrderedDict jako LRU)"""
+
+    name = 'memory'
+
+    def __init__(self, max_keys=DEFAULT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._counters = OrderedDict()   # klucz -> [window_id, bieżące, poprzednie, okno]
+        self._lock = threading.Lock()
+        self.evicted = 0
+
+    def hit(self, key, limit, window, now):
+        window_id = int(now // window)
+        with self._lock:
+            entry = self._counters.get(key)
+            if entry is None:
+                entry = [window_id, 0, 0, window]
+                self._counters[key] = entry
+            else:
+                self._counters.move_to_end(key)
+                if entry[0] != window_id:
+                    # Przesunięcie okien - poprzednie liczy się tylko, gdy sąsiaduje z bieżącym
+                    entry[2] = entry[1] if entry[0] == window_id - 1 else 0
+                    entry[1] = 0
+                    entry[0] = window_id
+
+            self._evict(now)
+
+            if _estimate(entry[2], entry[1], window, now, window_id) >= limit:
+                return False, _retry_after(entry[2], entry[1], limit, window, now, window_id)
+            entry[1] += 1
+            return True, 0
+
+    def _evict(self, now):
+        # Początek OrderedDict to klucze najdawniej używane - sprawdzamy co najwyżej
+        # dwa, więc koszt jest stały, a nieaktywne klucze znikają stopniowo
+        for _ in range(2):
+            if not self._counters:
+                return
+            key, entry = next(iter(self._counters.items()))
+            if (entry[0] + 2) * entry[3] > now:
+                break
+            del self._counters[key]
+            self.evicted += 1
+        while len(self._counters) > self.max_keys:
+            self._counters.popitem(last=False)
+            self.evicted += 1
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+
+    def stats(self):
+        return {'backend': self.name, 'keys': len(self._counters), 'max_keys': self.max_keys,
+                'evicted': self.evicted}
+
+
+class DatabaseBackend:
+    """Liczniki w tabeli rate_limit_counters - limit wspólny dla wszystkich procesów"""
+
+    name = 'database'
+
+    def __init__(self, fallback=None):
+        self.fallback = fallback or MemoryBackend()
+        self._table = RateLimitCounter.__table__
+        self._last_cleanup = 0.0
+        self._last_error_log = 0.0
+        self.errors = 0
+
+    def hit(self, key, limit, window, now):
+        window_id = int(now // window)
+        table = self._table
+        try:
+            with db.engine.begin() as connection:
+                rows = connection.execute(
+                    select(table.c.window_id, table.c.hits).where(
+                        table.c.limit_key == key,
+                        table.c.window_id.in_((window_id - 1, window_id))
+                    )
+                ).all()
+                counts = {row.window_id: row.hits for row in rows}
+                previous, current = counts.get(window_id - 1, 0), counts.get(window_id, 0)
+
+                if _estimate(previous, current, window, now, window_id) >= limit:
+                    return False, _retry_after(previous, current, limit, window, now, window_id)
+
+                self._increment(connection, key, window_id, int((window_id + 2) * window))
+                if now - self._last_cleanup > CLEANUP_INTERVAL:
+                    self._last_cleanup = now
+                    connection.execute(delete(table).where(table.c.expires_at < int(now)))
+                return True, 0
+        except Exception as e:
+            self.errors += 1
+            if now - self._last_error_log > ERROR_LOG_INTERVAL:
+                self._last_error_log = now
+                rate_limit_logger.warning("Błąd bazy rate limitera - limit liczony w procesie",
+                                          error=str(e), errors=self.errors)
+            return self.fallback.hit(key, limit, window, now)
+
+    def _increment(self, connection, key, window_id, expires_at):
+        table = self._table
+        values = {'limit_key': key, 'window_id': window_id, 'hits': 1, 'expires_at': expires_at}
+        dialect = connection.dialect.name
+
+        if dialect == 'mysql':
+            statement = mysql.insert(table).values(**values)
+            connection.execute(statement.on_duplicate_key_update(hits=table.c.hits + 1))
+        elif dialect == 'sqlite':
+            statement = sqlite.insert(table).values(**values)
+            connection.execute(statement.on_conflict_do_update(
+                index_elements=[table.c.limit_key, table.c.window_id],
+                set_={'hits': table.c.hits + 1}
+            ))
+        else:
+            result = connection.execute(
+                update(table).where(table.c.limit_key == key, table.c.window_id == window_id)
+                .values(hits=table.c.hits + 1)
+            )
+            if not result.rowcount:
+                connection.execute(table.insert().values(**values))
+
+    def clear(self):
+        with db.engine.begin() as connection:
+            connection.execute(delete(self._table))
+        self.fallback.clear()
+
+    def stats(self):
+        return {'backend': self.name, 'errors': self.errors, 'fallback': self.fallback.stats()}
+
+
+BACKENDS = {
+    MemoryBackend.name: MemoryBackend,
+    DatabaseBackend.name: DatabaseBackend,
+}
+
+
+class RateLimiter:
+    """
+    Rate limiter z wymiennym backendem
+
+    Backend tworzony jest przy pierwszym sprawdzeniu na podstawie
+    RATE_LIMIT_BACKEND ('memory' / 'database') i RATE_LIMIT_MAX_KEYS.
+    RATE_LIMIT_ENABLED = False wyłącza limity (np. testy obciążeniowe).
+    """
+
+    def __init__(self, backend=None):
+        self._backend = backend
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.rejected = 0
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            with self._lock:
+                if self._backend is None:
+                    self._backend = self._create_backend(current_app.config)
+        return self._backend
+
+    @staticmethod
+    def _create_backend(config):
+        name = config.get('RATE_LIMIT_BACKEND', MemoryBackend.name)
+        max_keys = config.get('RATE_LIMIT_MAX_KEYS', DEFAULT_MAX_KEYS)
+        if name == DatabaseBackend.name:
+            return DatabaseBackend(fallback=MemoryBackend(max_keys))
+        if name != MemoryBackend.name:
+            rate_limit_logger.warning("Nieznany backend rate limitera - używam pamięci", backend=name)
+        return MemoryBackend(max_keys)
+
+    def set_backend(self, backend):
+        with self._lock:
+            self._backend = backend
+
+    def hit(self, key, limit, window, now=None):
+        """
+        Rejestruje żądanie klucza, jeśli mieści się w limicie
+
+        Returns:
+            tuple: (allowed, retry_after_seconds)
+        """
+        allowed, retry_after = self.backend.hit(key, limit, window, time.time() if now is None else now)
+        if allowed:
+            self.allowed += 1
+        else:
+            self.rejected += 1
+        return allowed, retry_after
+
+    def stats(self):
+        return dict(self.backend.stats(), allowed=self.allowed, rejected=self.rejected)
+
+    def benchmark(self, checks=100000, keys=1000, backends=(MemoryBackend.name, DatabaseBackend.name)):
+        """
+        Koszt pojedynczego sprawdzenia dla każdego backendu (wymaga kontekstu aplikacji)
+
+        Returns:
+            list[dict]: backend, checks, keys, seconds, us_per_check, allowed, rejected
+        """
+        results = []
+        key_names = [f'benchmark:{index}' for index in range(keys)]
+        for name in backends:
+            backend = BACKENDS[name]()
+            # Baza jest o rzędy wielkości wolniejsza - mniej sprawdzeń wystarczy do pomiaru
+            count = checks if name == MemoryBackend.name else max(1, checks // 100)
+            allowed = 0
+
+            started = time.perf_counter()
+            for index in range(count):
+                allowed += backend.hit(key_names[index % keys], 100, 60, time.time())[0]
+            seconds = time.perf_counter() - started
+
+            if name == DatabaseBackend.name:
+                with db.engine.begin() as connection:
+                    connection.execute(delete(RateLimitCounter.__table__)
+                                       .where(RateLimitCounter.limit_key.like('benchmark:%')))
+
+            results.append({
+                'backend': name,
+                'checks': count,
+                'keys': keys,
+                'seconds': round(seconds, 3),
+                'us_per_check': round(seconds / count * 1e6, 2),
+                'allowed': allowed,
+                'rejected': count - allowed,
+                'stats': backend.stats()
+            })
+        return results
+
+
+# Jedna instancja na proces
+limiter = RateLimiter()
+
+
+def client_ip():
+    """Adres IP klienta (pierwszy z X-Forwarded-For za proxy)"""
+    ip_address = request.headers.get('X-Forwarded-For', request.remote_addr)
+    if ip_address and ',' in ip_address:
+        ip_address = ip_address.split(',')[0].strip()
+    return ip_address or 'unknown'
+
+
+def rate_limit(max_requests=5, window=60, scope=None, key_func=None):
+    """
+    Dekorator rate limiting (po IP klienta)
+
+    Args:
+        max_requests (int): Maksymalna liczba requestów w oknie
+        window (int): Okno czasowe w sekundach
+        scope (str, optional): Nazwa limitu - domyślnie nazwa widoku; endpointy
+                               z tym samym scope dzielą limit
+        key_func (callable, optional): Identyfikator klienta zamiast IP
+
+    Usage:
+        @rate_limit(max_requests=10, window=60)
+        def my_endpoint():
+            ...
+    """
+    def decorator(f):
+        limit_scope = scope or f.__name__
+
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if not current_app.config.get('RATE_LIMIT_ENABLED', True):
+                return f(*args, **kwargs)
+
+            key = f"{limit_scope}:{(key_func or client_ip)()}"
+            allowed, retry_after = limiter.hit(key, max_requests, window)
+            if not allowed:
+                response = jsonify({
+                    'success': False,
+                    'error': 'Zbyt wiele requestów. Spróbuj ponownie za chwilę.'
+                })
+                response.status_code = 429
+                response.headers['Retry-After'] = str(retry_after)
+                return response
+
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
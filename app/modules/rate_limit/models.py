@@ -0,0 +1,12 @@
+# modules/rate_limit/models.py
+from extensions import db
+
+
+class RateLimitCounter(db.Model):
+    """Licznik żądań klucza w oknie czasowym (backend 'database')"""
+    __tablename__ = 'rate_limit_counters'
+
+    limit_key = db.Column(db.String(191), primary_key=True)   # np. 'submit_application:1.2.3.4'
+    window_id = db.Column(db.BigInteger, primary_key=True, autoincrement=False)  # floor(czas / okno)
+    hits = db.Column(db.Integer, nullable=False, default=0)
+    expires_at = db.Column(db.BigInteger, nullable=False, index=True)  # unix time - po nim wiersz do usunięcia
@@ -5,9 +5,9 @@ Modele bazy danych dla modułu Reports
 
 from extensions import db
 from datetime import datetime, timedelta
-from sqlalchemy import Index
+from sqlalchemy import Index, event
 import re
-from .utils import PostcodeToStateMapper
+from .utils import PostcodeToStateMapper, DeliveryAddressParser
 from modules.logging import get_structured_logger
 # Inicjalizacja loggera
 reports_logger = get_structured_logger('reports.routers')
@@ -38,6 +38,11 @@ class BaselinkerReportOrder(db.Model):
     delivery_city = db.Column(db.String(100), nullable=True, comment="8. Miejscowość dostawy")
     delivery_address = db.Column(db.String(250), nullable=True, comment="9. Ulica i numer domu/mieszkania")
     delivery_state = db.Column(db.String(50), nullable=True, comment="10. Województwo dostawy")
+    voivodeship = db.Column(db.String(30), nullable=True, comment="Klucz województwa (znormalizowany delivery_state) - mapa i agregaty")
+    delivery_street = db.Column(db.String(250), nullable=True, comment="Ulica z delivery_address (DeliveryAddressParser) - eksport Routimo")
+    delivery_house_number = db.Column(db.String(20), nullable=True, comment="Numer domu z delivery_address")
+    delivery_apartment_number = db.Column(db.String(20), nullable=True, comment="Numer mieszkania z delivery_address")
+    delivery_postcode_normalized = db.Column(db.String(20), nullable=True, comment="Kod pocztowy w formacie NN-NNN")
     phone = db.Column(db.String(100), nullable=True, comment="11. Numer telefonu")
     caretaker = db.Column(db.String(100), nullable=True, comment="12. Opiekun (kto złożył zamówienie)")
     delivery_method = db.Column(db.String(100), nullable=True, comment="13. Metoda dostawy")
@@ -92,9 +97,14 @@ class BaselinkerReportOrder(db.Model):
     # === INDEKSY ===
     __table_args__ = (
         Index('idx_baselinker_order_id', 'baselinker_order_id'),
-        Index('idx_date_created', 'date_created'),
         Index('idx_is_manual', 'is_manual'),
         Index('idx_internal_order_number', 'internal_order_number'),
+        Index('idx_voivodeship_date', 'voivodeship', 'date_created'),
+        # Ścieżki filtrowania tabeli raportów (zakres dat + filtry kolumn), migracja 005
+        Index('idx_reports_date_status', 'date_created', 'current_status'),
+        Index('idx_reports_status_date', 'current_status', 'date_created'),
+        Index('idx_reports_group_date', 'group_type', 'date_created'),
+        Index('idx_reports_species_date', 'wood_species', 'date_created'),
     )
     
     def __repr__(self):
@@ -122,10 +132,10 @@ class BaselinkerReportOrder(db.Model):
         if date_to:
             query = query.filter(cls.date_created <= date_to)
 
-        # Dodatkowe filtry (obsługa multiple values)
+        # Dodatkowe filtry (obsługa multiple values) - tylko kolumny tabeli
         if filters:
             for column, values in filters.items():
-                if values and hasattr(cls, column):
+                if values and column in cls.__table__.columns:
                     column_attr = getattr(cls, column)
                     if isinstance(values, list) and values:
                         # Multiple values - użyj IN
@@ -172,7 +182,84 @@ class BaselinkerReportOrder(db.Model):
         print(f"[DEBUG] get_orders_by_date_range: Pokazuję WSZYSTKIE statusy (bez domyślnych wykluczeń)")
 
         return query.order_by(cls.date_created.desc()).all()
+
+    @classmethod
+    def backfill_voivodeship(cls, batch_size=1000):
+        """
+        Jednorazowe uzupełnienie kolumny voivodeship dla rekordów zapisanych
+        przed jej wprowadzeniem. Przetwarza dane partiami po id.
+
+        Returns:
+            int: liczba zaktualizowanych rekordów
+        """
+        updated = 0
+        last_id = 0
+
+        while True:
+            rows = db.session.query(cls.id, cls.delivery_state).filter(
+                cls.id > last_id,
+                cls.voivodeship.is_(None),
+                cls.delivery_state.isnot(None)
+            ).order_by(cls.id).limit(batch_size).all()
+
+            if not rows:
+                break
+
+            mappings = []
+            for row in rows:
+                key = PostcodeToStateMapper.voivodeship_key(row.delivery_state)
+                if key:
+                    mappings.append({'id': row.id, 'voivodeship': key})
+
+            if mappings:
+                db.session.bulk_update_mappings(cls, mappings)
+                db.session.commit()
+                updated += len(mappings)
+
+            last_id = rows[-1].id
+
+        return updated
     
+    @classmethod
+    def backfill_delivery_address(cls, batch_size=1000):
+        """
+        Jednorazowe uzupełnienie kolumn adresu (ulica, numer domu/mieszkania,
+        znormalizowany kod) dla rekordów zapisanych przed ich wprowadzeniem.
+
+        Returns:
+            int: liczba zaktualizowanych rekordów
+        """
+        updated = 0
+        last_id = 0
+
+        while True:
+            rows = db.session.query(cls.id, cls.delivery_address, cls.delivery_postcode).filter(
+                cls.id > last_id,
+                cls.delivery_street.is_(None),
+                cls.delivery_postcode_normalized.is_(None)
+            ).order_by(cls.id).limit(batch_size).all()
+
+            if not rows:
+                break
+
+            mappings = []
+            for row in rows:
+                street, house, apartment = DeliveryAddressParser.parse(row.delivery_address)
+                mappings.append({
+                    'id': row.id,
+                    'delivery_street': street or None,
+                    'delivery_house_number': house or None,
+                    'delivery_apartment_number': apartment or None,
+                    'delivery_postcode_normalized': DeliveryAddressParser.normalize_postcode(row.delivery_postcode)
+                })
+
+            db.session.bulk_update_mappings(cls, mappings)
+            db.session.commit()
+            updated += len(mappings)
+            last_id = rows[-1].id
+
+        return updated
+
     @classmethod
     def get_statistics(cls, filtered_query=None):
         """
@@ -793,6 +880,32 @@ class BaselinkerReportOrder(db.Model):
         return processed_amount, self.price_type
 
 
+@event.listens_for(BaselinkerReportOrder.delivery_state, 'set')
+def _sync_voivodeship(target, value, oldvalue, initiator):
+    """
+    Każde przypisanie delivery_state (auto_fill_delivery_state, normalize_delivery_state,
+    synchronizacja, edycja ręczna) aktualizuje indeksowaną kolumnę voivodeship
+    """
+    target.voivodeship = PostcodeToStateMapper.voivodeship_key(value)
+
+
+@event.listens_for(BaselinkerReportOrder.delivery_address, 'set')
+def _sync_delivery_address_parts(target, value, oldvalue, initiator):
+    """
+    Adres rozbijany jest raz - przy zapisie (synchronizacja, edycja ręczna),
+    a nie przy każdym eksporcie Routimo
+    """
+    street, house, apartment = DeliveryAddressParser.parse(value)
+    target.delivery_street = street or None
+    target.delivery_house_number = house or None
+    target.delivery_apartment_number = apartment or None
+
+
+@event.listens_for(BaselinkerReportOrder.delivery_postcode, 'set')
+def _sync_delivery_postcode(target, value, oldvalue, initiator):
+    target.delivery_postcode_normalized = DeliveryAddressParser.normalize_postcode(value)
+
+
 class ReportsSyncLog(db.Model):
     """
     Log synchronizacji z Baselinker
@@ -811,4 +924,114 @@ class ReportsSyncLog(db.Model):
     duration_seconds = db.Column(db.Integer, nullable=True)
     
     def __repr__(self):
-        return f'<ReportsSyncLog {self.id}: {self.sync_date}, {self.status}>'
\ No newline at end of file
+        return f'<ReportsSyncLog {self.id}: {self.sync_date}, {self.status}>'
+
+
+class ReportsDropdownValue(db.Model):
+    """
+    Wartości dropdownów filtrów tabeli raportów (DISTINCT per kolumna)
+
+    Przeliczane po synchronizacji z Baselinker (refresh) zamiast przy każdym
+    otwarciu strony. Edycje ręczne oznaczają tabelę jako nieaktualną
+    (invalidate) - przeliczenie nastąpi przy następnym odczycie.
+    """
+    __tablename__ = 'reports_dropdown_values'
+
+    FIELDS = (
+        'customer_name', 'delivery_state', 'wood_species', 'current_status',
+        'group_type', 'product_type', 'finish_state', 'technology', 'wood_class',
+        'caretaker', 'delivery_method', 'order_source', 'delivery_city'
+    )
+    EXCLUDED_STATUSES = ('Zamówienie anulowane', 'Nowe - nieopłacone')
+    MAX_AGE = timedelta(hours=1)  # zabezpieczenie dla zmian z pominięciem refresh/invalidate
+
+    id = db.Column(db.Integer, primary_key=True)
+    field_name = db.Column(db.String(50), nullable=False)
+    value = db.Column(db.String(255), nullable=False)
+    rows_count = db.Column(db.Integer, nullable=False, default=0)
+    refreshed_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        Index('idx_dropdown_field_value', 'field_name', 'value', unique=True),
+    )
+
+    def __repr__(self):
+        return f'<ReportsDropdownValue {self.field_name}: {self.value}>'
+
+    @classmethod
+    def _live_values(cls, field_name):
+        """Unikalne wartości kolumny z liczbą wierszy (bez anulowanych i nieopłaconych)"""
+        column = getattr(BaselinkerReportOrder, field_name)
+        rows = db.session.query(column, db.func.count(BaselinkerReportOrder.id)) \
+            .filter(column.isnot(None)) \
+            .filter(~BaselinkerReportOrder.current_status.in_(cls.EXCLUDED_STATUSES)) \
+            .group_by(column) \
+            .all()
+        return [(value, count) for value, count in rows if value]
+
+    @classmethod
+    def refresh(cls, fields=None):
+        """
+        Przelicza wartości dla podanych pól (domyślnie wszystkich FIELDS)
+
+        Returns:
+            dict: liczba wartości per pole
+        """
+        fields = fields or cls.FIELDS
+        now = datetime.utcnow()
+        counts = {}
+
+        for field_name in fields:
+            values = cls._live_values(field_name)
+            cls.query.filter_by(field_name=field_name).delete(synchronize_session=False)
+            db.session.bulk_insert_mappings(cls, [{
+                'field_name': field_name,
+                'value': str(value)[:255],
+                'rows_count': count,
+                'refreshed_at': now
+            } for value, count in values])
+            counts[field_name] = len(values)
+
+        db.session.commit()
+        return counts
+
+    @classmethod
+    def refresh_safely(cls, fields=None):
+        """refresh() bez przerywania operacji wywołującej (synchronizacji) w razie błędu"""
+        try:
+            counts = cls.refresh(fields)
+            reports_logger.info("Przeliczono wartości dropdownów raportów", counts=counts)
+        except Exception as e:
+            db.session.rollback()
+            reports_logger.error("Błąd przeliczania wartości dropdownów raportów", error=str(e))
+
+    @classmethod
+    def invalidate(cls):
+        """Oznacza wartości jako nieaktualne (po edycji ręcznej) - bez przeliczania"""
+        try:
+            cls.query.update({cls.refreshed_at: None}, synchronize_session=False)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            reports_logger.error("Błąd oznaczania dropdownów jako nieaktualne", error=str(e))
+
+    @classmethod
+    def get_values(cls, field_name):
+        """
+        Posortowana lista wartości dropdownu. Pola spoza FIELDS liczone są na
+        żywo; dla FIELDS tabela przeliczana jest, gdy jest pusta lub nieaktualna.
+        """
+        if field_name not in cls.FIELDS:
+            return sorted(value for value, _ in cls._live_values(field_name))
+
+        rows = db.session.query(cls.value, cls.refreshed_at).filter_by(field_name=field_name).all()
+        stale = (
+            not rows
+            or any(refreshed_at is None for _, refreshed_at in rows)
+            or rows[0].refreshed_at < datetime.utcnow() - cls.MAX_AGE
+        )
+        if stale:
+            cls.refresh([field_name])
+            rows = db.session.query(cls.value, cls.refreshed_at).filter_by(field_name=field_name).all()
+
+        return sorted(value for value, _ in rows)
@@ -0,0 +1,122 @@
+# modules/reports/query_plans.py
+"""
+Przechwytywanie planów zapytań endpointów raportów
+
+Wywołuje endpointy modułu (test_client, zalogowany użytkownik), zbiera
+wykonane przez nie zapytania SELECT i dla każdego unikalnego zapytania
+wykonuje EXPLAIN z tymi samymi parametrami. Wynik pokazuje, które ścieżki
+filtrowania korzystają z indeksów, a które skanują całą tabelę.
+
+    flask reports-explain --email admin@woodpower.pl --output plans.json
+"""
+
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import event
+
+from extensions import db
+
+# (nazwa, ścieżka, dodatkowe parametry) - daty dokładane są do każdego przypadku
+DEFAULT_CASES = (
+    ('data_date_range', '/reports/api/data', {}),
+    ('data_status', '/reports/api/data', {'filter_current_status': 'W produkcji - surowe'}),
+    ('data_group_species', '/reports/api/data', {'filter_group_type': 'towar', 'filter_wood_species': 'dąb'}),
+    ('map_statistics', '/reports/api/map-statistics', {}),
+    ('dropdown_customer_name', '/reports/api/dropdown-values/customer_name', None),
+    ('dropdown_current_status', '/reports/api/dropdown-values/current_status', None),
+)
+
+
+def _explain(connection, statement, parameters):
+    """Plan jednego zapytania jako lista słowników (format zależny od bazy)"""
+    if connection.dialect.name == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN '
+    else:
+        prefix = 'EXPLAIN '
+    result = connection.exec_driver_sql(prefix + statement, parameters)
+    return [dict(row._mapping) for row in result]
+
+
+def _full_scans(dialect, plan):
+    """Tabele czytane w całości (MySQL: type=ALL, SQLite: SCAN bez indeksu)"""
+    if dialect == 'sqlite':
+        return [row['detail'] for row in plan
+                if row.get('detail', '').startswith('SCAN') and 'INDEX' not in row['detail']]
+    return [row.get('table') for row in plan if row.get('type') == 'ALL']
+
+
+def capture_query_plans(app, user_email, user_id, days=90, cases=None):
+    """
+    Args:
+        app: Aplikacja Flask
+        user_email / user_id: Użytkownik, w imieniu którego wołane są endpointy
+        days (int): Zakres dat filtrów (ostatnie N dni)
+        cases: Lista (nazwa, ścieżka, parametry) - domyślnie DEFAULT_CASES
+
+    Returns:
+        list[dict]: name, path, status, duration_ms, queries[statement, duration_ms, plan, full_scans]
+    """
+    client = app.test_client()
+    with client.session_transaction() as flask_session:
+        flask_session['user_email'] = user_email
+        flask_session['user_id'] = user_id
+
+    date_to = date.today()
+    dates = {'date_from': (date_to - timedelta(days=days)).isoformat(), 'date_to': date_to.isoformat()}
+
+    captured = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith('SELECT'):
+            conn.info.setdefault('_plan_started', []).append(time.perf_counter())
+            captured.append({'statement': statement, 'parameters': parameters})
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get('_plan_started')
+        if starts and captured and captured[-1]['statement'] == statement:
+            captured[-1]['duration_ms'] = round((time.perf_counter() - starts.pop()) * 1000, 2)
+
+    results = []
+    engine = db.engine
+    dialect = engine.dialect.name
+
+    for name, path, params in cases or DEFAULT_CASES:
+        captured.clear()
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+        try:
+            started = time.perf_counter()
+            response = client.get(path, query_string=None if params is None else dict(dates, **params))
+            response.get_data()
+            duration_ms = round((time.perf_counter() - started) * 1000, 2)
+        finally:
+            event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+            event.remove(engine, 'after_cursor_execute', after_cursor_execute)
+
+        queries, seen = [], set()
+        with engine.connect() as connection:
+            for query in captured:
+                if query['statement'] in seen:
+                    continue
+                seen.add(query['statement'])
+                try:
+                    plan = _explain(connection, query['statement'], query['parameters'])
+                except Exception as e:
+                    plan = [{'error': f'{type(e).__name__}: {e}'}]
+                queries.append({
+                    'statement': ' '.join(query['statement'].split()),
+                    'duration_ms': query.get('duration_ms'),
+                    'plan': plan,
+                    'full_scans': _full_scans(dialect, plan)
+                })
+
+        results.append({
+            'name': name,
+            'path': path,
+            'status': response.status_code,
+            'duration_ms': duration_ms,
+            'queries': queries
+        })
+
+    return results
@@ -6,20 +6,19 @@ import csv
 import re
 import os
 os.environ['OPENBLAS_NUM_THREADS'] = '1'
-import pandas as pd
 import io
+import copy
 import sys
 from flask import render_template, jsonify, request, session, redirect, url_for, flash, Response, make_response
 from datetime import datetime, timedelta, date
 from functools import wraps
 from extensions import db
 from . import reports_bp
-from .models import BaselinkerReportOrder, ReportsSyncLog
+from .models import BaselinkerReportOrder, ReportsSyncLog, ReportsDropdownValue
+from .utils import PostcodeToStateMapper, DeliveryAddressParser
+from .selection_cache import OrderSelectionCache
 from .service import BaselinkerReportsService, get_reports_service
 from modules.logging import get_structured_logger
-from collections import defaultdict
-import openpyxl
-from openpyxl.styles import PatternFill, Font, Alignment, Border, Side
 from typing import Dict, Optional, Tuple, List
 
 # Inicjalizacja loggera
@@ -525,6 +524,7 @@ def api_add_manual_row():
             # Zapisz do bazy
             db.session.add(record)
             db.session.commit()
+            ReportsDropdownValue.invalidate()
 
             # DEBUG: Sprawdź zapisany rekord
             created_records = [record]
@@ -605,6 +605,7 @@ def api_add_manual_row():
             
             # Zapisz wszystkie rekordy
             db.session.commit()
+            ReportsDropdownValue.invalidate()
 
             # Sprawdź czy rekordy są w bazie
             fresh_records = BaselinkerReportOrder.query.filter(
@@ -712,6 +713,7 @@ def api_update_manual_row():
                 record.updated_at = datetime.utcnow()
             
             db.session.commit()
+            ReportsDropdownValue.invalidate()
             
             reports_logger.info("Zaktualizowano zamówienie wieloproduktowe",
                               user_email=user_email,
@@ -736,6 +738,7 @@ def api_update_manual_row():
             main_record.updated_at = datetime.utcnow()
             
             db.session.commit()
+            ReportsDropdownValue.invalidate()
             
             return jsonify({
                 'success': True,
@@ -842,6 +845,8 @@ def api_export_excel():
     API endpoint do eksportu danych do Excel z zaawansowanym formatowaniem
     POPRAWKA: Pełna obsługa kodowania UTF-8 i zabezpieczenia przed błędami
     """
+    import pandas as pd
+
     user_email = session.get('user_email')
     
     try:
@@ -1622,22 +1627,12 @@ def api_get_dropdown_values(field_name):
     API endpoint do pobierania unikalnych wartości dla dropdown'ów
     """
     try:
-        if not hasattr(BaselinkerReportOrder, field_name):
+        if field_name not in BaselinkerReportOrder.__table__.columns:
             return jsonify({'success': False, 'error': 'Nieprawidłowe pole'}), 400
         
-        # Pobierz unikalne wartości z bazy (wykluczając anulowane i nieopłacone)
-        excluded_statuses = ['Zamówienie anulowane', 'Nowe - nieopłacone']
-        column = getattr(BaselinkerReportOrder, field_name)
-        
-        query = db.session.query(column)\
-            .filter(column.isnot(None))\
-            .filter(~BaselinkerReportOrder.current_status.in_(excluded_statuses))\
-            .distinct()
-        
-        values = query.all()
-        
-        # Wyciągnij wartości z tupli
-        unique_values = sorted([value[0] for value in values if value[0]])
+        # Wartości z tabeli reports_dropdown_values (przeliczanej po synchronizacji),
+        # z wykluczeniem anulowanych i nieopłaconych
+        unique_values = ReportsDropdownValue.get_values(field_name)
         
         return jsonify({
             'success': True,
@@ -1645,6 +1640,7 @@ def api_get_dropdown_values(field_name):
         })
         
     except Exception as e:
+        db.session.rollback()
         reports_logger.error("Błąd pobierania dropdown values",
                            field_name=field_name,
                            error=str(e))
@@ -1656,13 +1652,16 @@ def api_get_dropdown_values(field_name):
 
 # ===== FUNKCJE POMOCNICZE =====
 
-def _sync_selected_orders(service: BaselinkerReportsService, order_ids: List[int]) -> Dict:
+def _sync_selected_orders(service: BaselinkerReportsService, order_ids: List[int],
+                          selection_token: Optional[str] = None) -> Dict:
     """
     Synchronizuje wybrane zamówienia - pobiera pełne informacje i aktualizuje wszystkie dane
     
     Args:
         service: Serwis Baselinker
         order_ids: Lista ID zamówień do synchronizacji
+        selection_token: Token z fetch-orders-for-selection - zamówienia z cache
+            nie są ponownie pobierane z Baselinker
         
     Returns:
         Dict: Wynik synchronizacji
@@ -1670,13 +1669,25 @@ def _sync_selected_orders(service: BaselinkerReportsService, order_ids: List[int
     try:
         reports_logger.info("Rozpoczęcie synchronizacji wybranych zamówień",
                           order_ids_count=len(order_ids),
-                          order_ids=order_ids[:10])  # Loguj pierwsze 10
+                          order_ids=order_ids[:10],  # Loguj pierwsze 10
+                          has_selection_token=bool(selection_token))
         
         orders = []
         failed_orders = []
+
+        ids_to_fetch = order_ids
+        if selection_token:
+            cached_orders, ids_to_fetch = OrderSelectionCache.take(
+                selection_token, order_ids, user_id=session.get('user_email'), scope='reports')
+            for cached_order in cached_orders:
+                order = service.prepare_order_details(cached_order)
+                if order:
+                    orders.append(order)
+                else:
+                    failed_orders.append(cached_order.get('order_id'))
         
-        # Pobierz pełne dane każdego zamówienia
-        for order_id in order_ids:
+        # Pobierz pełne dane zamówień spoza cache
+        for order_id in ids_to_fetch:
             try:
                 order = service.get_order_details(order_id)
                 if order:
@@ -1883,6 +1894,7 @@ def api_sync_statuses():
         
         # Zapisz zmiany
         db.session.commit()
+        ReportsDropdownValue.refresh_safely()
         
         duration = (datetime.utcnow() - sync_start).total_seconds()
         
@@ -1985,6 +1997,7 @@ def api_delete_manual_row():
         
         # Zatwierdź transakcję
         db.session.commit()
+        ReportsDropdownValue.invalidate()
         
         reports_logger.info("Pomyślnie usunięto rekordy",
                           user_email=user_email,
@@ -2112,6 +2125,7 @@ def api_fetch_orders_for_selection():
         
         # ZMIANA: Filtruj zamówienia - pokaż TYLKO te które NIE istnieją w bazie danych
         processed_orders = []
+        raw_orders = []
         new_orders_count = 0
         ignored_existing_count = 0
         
@@ -2135,6 +2149,9 @@ def api_fetch_orders_for_selection():
                                    status_name=service.status_map.get(status_id, f'Status {status_id}'))
                 continue
             
+            # Surowa kopia dla cache wyboru (analiza poniżej modyfikuje zamówienie)
+            raw_orders.append(copy.deepcopy(order))
+
             # Wykonaj analizę objętości dla produktów w zamówieniu
             order = analyze_order_products_for_volume(order)
             
@@ -2165,9 +2182,13 @@ def api_fetch_orders_for_selection():
                 'message': f'Brak nowych zamówień w wybranym okresie. Zignorowano {ignored_existing_count} zamówień już istniejących w bazie danych.'
             })
 
+        # Zapis wybranych zamówień użyje tych danych zamiast ponownie pytać Baselinker
+        selection_token = OrderSelectionCache.put(raw_orders, user_id=user_email, scope='reports')
+
         return jsonify({
             'success': True,
             'orders': processed_orders,
+            'selection_token': selection_token,
             'total_orders': len(processed_orders),
             'new_orders': new_orders_count,
             'ignored_existing': ignored_existing_count,
@@ -2422,7 +2443,7 @@ def api_save_selected_orders_with_dimensions():
                               fixes_count=len(dimension_fixes))
 
         # Synchronizuj wybrane zamówienia
-        result = _sync_selected_orders(service, new_order_ids)
+        result = _sync_selected_orders(service, new_order_ids, data.get('selection_token'))
         
         # Wyczyść poprawki wymiarów
         if dimension_fixes:
@@ -2601,7 +2622,7 @@ def api_save_selected_orders():
                           new_order_ids=new_order_ids)
 
         # Użyj funkcji _sync_selected_orders (może trzeba będzie ją zmodyfikować)
-        result = _sync_selected_orders(service, new_order_ids)
+        result = _sync_selected_orders(service, new_order_ids, data.get('selection_token'))
 
         if result.get('success'):
             reports_logger.info("Zapisywanie wybranych zamówień zakończone pomyślnie",
@@ -2692,24 +2713,24 @@ def export_routimo():
             BaselinkerReportOrder.baselinker_order_id
         )
         
-        # Wykonaj zapytanie
-        orders = query.all()
+        # Tylko kolumny eksportu (adres już rozbity przy zapisie), strumieniowo partiami
+        rows = query.with_entities(*ROUTIMO_COLUMNS).yield_per(ROUTIMO_BATCH_SIZE)
+        
+        # Grupuj dane po zamówieniach
+        grouped_orders = group_orders_for_routimo(rows)
 
         reports_logger.info("Pobrano dane do eksportu Routimo Excel",
                           user_email=user_email,
-                          raw_records=len(orders),
+                          grouped_orders=len(grouped_orders),
                           excluded_status_ids=excluded_status_ids,
                           date_from=date_from.isoformat() if date_from else None,
                           date_to=date_to.isoformat() if date_to else None)
 
-        if not orders:
+        if not grouped_orders:
             return jsonify({
                 'success': False,
                 'error': 'Brak danych do eksportu'
             }), 400
-            
-        # Grupuj dane po zamówieniach
-        grouped_orders = group_orders_for_routimo(orders)
         
         # ZMIANA: Generuj EXCEL zamiast CSV
         excel_content = generate_routimo_excel(grouped_orders)
@@ -2743,6 +2764,9 @@ def generate_routimo_excel(grouped_orders):
     ZAKTUALIZOWANA FUNKCJA: Generuje Excel w formacie identycznym z wzorcem
     DODANE: kolumny "Numer wew." i "Koszty kuriera netto"
     """
+    import openpyxl
+    from openpyxl.styles import PatternFill, Font, Alignment, Border, Side
+
     # Nagłówki - ZAKTUALIZOWANE z nowymi kolumnami
     headers = [
         'Nazwa', 'Klient', 'Nazwa przesyłki', 'Numer wew.', 'Koszty kuriera netto', 'Ulica', 'Numer domu', 'Numer mieszkania',
@@ -2848,8 +2872,8 @@ def generate_routimo_excel(grouped_orders):
     
             # Dodaj dane
     for row_idx, order in enumerate(grouped_orders, 2):  # Zaczynaj od wiersza 2
-        # Wyciągnij numer domu i mieszkania z adresu
-        house_number, apartment_number, clean_street = extract_house_and_apartment_number(order['delivery_address'])
+        # Numer domu i mieszkania rozbite przy zapisie rekordu
+        house_number, apartment_number, clean_street = routimo_address(order)
         
         # Oblicz wagę (jak w oryginalnym CSV)
         weight = round(order['total_volume'] * 800, 2)
@@ -2971,6 +2995,35 @@ def generate_products_comment_multiline(order_records):
     # Połącz wszystkie produkty znakiem nowej linii
     return '\n'.join(products_list)
 
+# Kolumny potrzebne do eksportu Routimo (projekcja zamiast pełnych obiektów ORM)
+ROUTIMO_COLUMNS = (
+    BaselinkerReportOrder.id,
+    BaselinkerReportOrder.baselinker_order_id,
+    BaselinkerReportOrder.internal_order_number,
+    BaselinkerReportOrder.customer_name,
+    BaselinkerReportOrder.delivery_address,
+    BaselinkerReportOrder.delivery_street,
+    BaselinkerReportOrder.delivery_house_number,
+    BaselinkerReportOrder.delivery_apartment_number,
+    BaselinkerReportOrder.delivery_postcode,
+    BaselinkerReportOrder.delivery_postcode_normalized,
+    BaselinkerReportOrder.delivery_city,
+    BaselinkerReportOrder.delivery_state,
+    BaselinkerReportOrder.phone,
+    BaselinkerReportOrder.email,
+    BaselinkerReportOrder.delivery_cost,
+    BaselinkerReportOrder.payment_method,
+    BaselinkerReportOrder.order_amount_net,
+    BaselinkerReportOrder.current_status,
+    BaselinkerReportOrder.group_type,
+    BaselinkerReportOrder.quantity,
+    BaselinkerReportOrder.total_volume,
+    BaselinkerReportOrder.value_net,
+    BaselinkerReportOrder.raw_product_name,
+)
+ROUTIMO_BATCH_SIZE = 1000
+
+
 def group_orders_for_routimo(orders):
     """
     Grupuje dane po zamówieniach dla eksportu Routimo
@@ -2979,83 +3032,84 @@ def group_orders_for_routimo(orders):
     DODANE: internal_order_number i delivery_cost
     
     Args:
-        orders (List[BaselinkerReportOrder]): Lista rekordów z bazy danych
+        orders: Rekordy BaselinkerReportOrder lub wiersze projekcji ROUTIMO_COLUMNS
+                (dowolny iterowalny - przetwarzany jednym przejściem)
         
     Returns:
         List[Dict]: Lista zamówień zgrupowanych (tylko produkty fizyczne)
     """
-    # NOWE: Filtruj usługi na początku - Routimo dostaje tylko produkty fizyczne
-    physical_products_only = [order for order in orders if order.group_type != 'usługa']
-    
-    if len(orders) != len(physical_products_only):
-        services_excluded = len(orders) - len(physical_products_only)
-        reports_logger.info("Wykluczono usługi z eksportu Routimo",
-                          total_records=len(orders),
-                          physical_products=len(physical_products_only),
-                          services_excluded=services_excluded)
+    grouped = {}
+    raw_records = 0
+    services_excluded = 0
     
-    grouped = defaultdict(lambda: {
-        'records': [],
-        'baselinker_order_id': None,
-        'internal_order_number': None,  # NOWE: dodane pole
-        'customer_name': None,
-        'delivery_address': None,
-        'delivery_postcode': None,
-        'delivery_city': None,
-        'delivery_state': None,
-        'phone': None,
-        'email': None,
-        'delivery_cost': 0,  # NOWE: dodane pole
-        'payment_method': None,  # NOWE: dodane pole dla order_amount_net
-        'order_amount_net': 0,  # NOWE: dodane pole
-        'total_quantity': 0,
-        'total_volume': 0,
-        'total_value_net': 0,
-        'current_status': None
-    })
-    
-    for order in physical_products_only:
+    for order in orders:
+        raw_records += 1
+        # NOWE: Pomijaj usługi - Routimo dostaje tylko produkty fizyczne
+        if order.group_type == 'usługa':
+            services_excluded += 1
+            continue
+        
         # Klucz grupowania - baselinker_order_id lub manual_id
         if order.baselinker_order_id:
             order_key = f"bl_{order.baselinker_order_id}"
         else:
             order_key = f"manual_{order.id}"
             
-        order_group = grouped[order_key]
-        order_group['records'].append(order)
+        order_group = grouped.get(order_key)
+        if order_group is None:
+            # Dane zamówienia z pierwszego rekordu
+            order_group = grouped[order_key] = {
+                'records': [],
+                'baselinker_order_id': order.baselinker_order_id or f"Manual_{order.id}",
+                'internal_order_number': order.internal_order_number or '',
+                'customer_name': order.customer_name or '',
+                'delivery_address': order.delivery_address or '',
+                'delivery_street': order.delivery_street,
+                'delivery_house_number': order.delivery_house_number or '',
+                'delivery_apartment_number': order.delivery_apartment_number or '',
+                'delivery_postcode': order.delivery_postcode_normalized or order.delivery_postcode or '',
+                'delivery_city': order.delivery_city or '',
+                'delivery_state': order.delivery_state or '',
+                'phone': order.phone or '',
+                'email': order.email or '',
+                'delivery_cost': float(order.delivery_cost or 0),
+                'payment_method': order.payment_method or '',
+                'order_amount_net': float(order.order_amount_net or 0),
+                'current_status': order.current_status or '',
+                'total_quantity': 0,
+                'total_volume': 0,
+                'total_value_net': 0
+            }
         
-        # Ustaw dane zamówienia (z pierwszego rekordu)
-        if not order_group['customer_name']:
-            order_group['baselinker_order_id'] = order.baselinker_order_id or f"Manual_{order.id}"
-            order_group['internal_order_number'] = order.internal_order_number or ''  # NOWE
-            order_group['customer_name'] = order.customer_name or ''
-            order_group['delivery_address'] = order.delivery_address or ''
-            order_group['delivery_postcode'] = order.delivery_postcode or ''
-            order_group['delivery_city'] = order.delivery_city or ''
-            order_group['delivery_state'] = order.delivery_state or ''
-            order_group['phone'] = order.phone or ''
-            order_group['email'] = order.email or ''
-            order_group['delivery_cost'] = float(order.delivery_cost or 0)  # NOWE
-            order_group['payment_method'] = order.payment_method or ''  # NOWE
-            order_group['order_amount_net'] = float(order.order_amount_net or 0)  # NOWE
-            order_group['current_status'] = order.current_status or ''
-        
-        # Sumuj wartości - POPRAWKA: używaj właściwości SQLAlchemy
+        order_group['records'].append(order)
         order_group['total_quantity'] += float(order.quantity or 0)
         order_group['total_volume'] += float(order.total_volume or 0)
         order_group['total_value_net'] += float(order.value_net or 0)
     
-    # Konwertuj na listę
-    result = []
-    for order_key, order_data in grouped.items():
-        result.append(order_data)
+    result = list(grouped.values())
     
+    if services_excluded:
+        reports_logger.info("Wykluczono usługi z eksportu Routimo",
+                          total_records=raw_records,
+                          physical_products=raw_records - services_excluded,
+                          services_excluded=services_excluded)
     reports_logger.info("Zgrupowano zamówienia dla Routimo",
-                      raw_records=len(orders),
+                      raw_records=raw_records,
                       grouped_orders=len(result))
     
     return result
 
+def routimo_address(order):
+    """
+    (numer domu, numer mieszkania, ulica) zamówienia z eksportu Routimo
+    
+    Części adresu zapisywane są przy zapisie rekordu; dla rekordów sprzed
+    migracji 010 (bez reports-address-backfill) adres parsowany jest w locie.
+    """
+    if order.get('delivery_street') is not None:
+        return order['delivery_house_number'], order['delivery_apartment_number'], order['delivery_street']
+    return extract_house_and_apartment_number(order['delivery_address'])
+
 def extract_house_and_apartment_number(address):
     """
     Wyciąga numer domu i mieszkania z adresu oraz zwraca oczyszczoną ulicę
@@ -3067,114 +3121,8 @@ def extract_house_and_apartment_number(address):
     Returns:
         tuple: (house_number, apartment_number, clean_street)
     """
-    if not address or not isinstance(address, str):
-        return '', '', address or ''
-        
-    original_address = address.strip()
-    
-    # WZORCE - NUMER PO NAZWIE ULICY (tradycyjne)
-    traditional_patterns = [
-        # "ul. Nazwa 123/45" 
-        {
-            'pattern': r'^(.+?)\s+(\d+[A-Za-z]*)\/(\d+[A-Za-z]*)$',
-            'has_apartment': True,
-            'street_group': 1,
-            'house_group': 2,
-            'apartment_group': 3
-        },
-        # "ul. Nazwa 123 / 45" (ze spacjami)  
-        {
-            'pattern': r'^(.+?)\s+(\d+[A-Za-z]*)\s*\/\s*(\d+[A-Za-z]*)$',
-            'has_apartment': True,
-            'street_group': 1,
-            'house_group': 2,
-            'apartment_group': 3
-        },
-        # "ul. Nazwa 123m45"
-        {
-            'pattern': r'^(.+?)\s+(\d+[A-Za-z]*)\s*m\.?\s*(\d+[A-Za-z]*)$',
-            'has_apartment': True,
-            'street_group': 1,
-            'house_group': 2,
-            'apartment_group': 3
-        },
-        # "ul. Nazwa 123" (tylko dom)
-        {
-            'pattern': r'^(.+?)\s+(\d+[A-Za-z]*)\s*$',
-            'has_apartment': False,
-            'street_group': 1,
-            'house_group': 2,
-            'apartment_group': None
-        }
-    ]
-    
-    # WZORCE - NUMER PRZED NAZWĄ ULICY (odwrócone)
-    reversed_patterns = [
-        # "123/45 Nazwa ulicy"
-        {
-            'pattern': r'^(\d+[A-Za-z]*)\/(\d+[A-Za-z]*)\s+(.+)$',
-            'has_apartment': True,
-            'street_group': 3,
-            'house_group': 1,
-            'apartment_group': 2
-        },
-        # "123 / 45 Nazwa ulicy" (ze spacjami)
-        {
-            'pattern': r'^(\d+[A-Za-z]*)\s*\/\s*(\d+[A-Za-z]*)\s+(.+)$',
-            'has_apartment': True,
-            'street_group': 3,
-            'house_group': 1,
-            'apartment_group': 2
-        },
-        # "123m45 Nazwa ulicy"
-        {
-            'pattern': r'^(\d+[A-Za-z]*)\s*m\.?\s*(\d+[A-Za-z]*)\s+(.+)$',
-            'has_apartment': True,
-            'street_group': 3,
-            'house_group': 1,
-            'apartment_group': 2
-        },
-        # "123 Nazwa ulicy" (tylko dom)
-        {
-            'pattern': r'^(\d+[A-Za-z]*)\s+(.+)$',
-            'has_apartment': False,
-            'street_group': 2,
-            'house_group': 1,
-            'apartment_group': None
-        }
-    ]
-    
-    # Sprawdź wszystkie wzorce - najpierw tradycyjne, potem odwrócone
-    all_patterns = traditional_patterns + reversed_patterns
-    
-    for pattern_info in all_patterns:
-        match = re.search(pattern_info['pattern'], original_address, re.IGNORECASE)
-        if match:
-            groups = match.groups()
-            
-            # Wyciągnij komponenty według grup
-            street = groups[pattern_info['street_group'] - 1].strip()
-            house = groups[pattern_info['house_group'] - 1].strip()
-            apartment = ''
-            
-            if pattern_info['has_apartment'] and pattern_info['apartment_group']:
-                apartment = groups[pattern_info['apartment_group'] - 1].strip()
-            
-            # Sprawdź czy ulica nie jest pusta
-            if not street:
-                continue
-                
-            # Oczyść ulicę delikatnie
-            clean_street = clean_street_name(street)
-            
-            # Jeśli po czyszczeniu ulica jest pusta, spróbuj następny wzorzec
-            if not clean_street:
-                continue
-                
-            return house, apartment, clean_street
-    
-    # Fallback - nie znaleziono wzorca, zwróć oryginalny adres
-    return '', '', original_address
+    street, house, apartment = DeliveryAddressParser.parse(address)
+    return house, apartment, street
 
 
 def clean_street_name(street):
@@ -3188,37 +3136,7 @@ def clean_street_name(street):
     Returns:
         str: Oczyszczona nazwa ulicy
     """
-    if not street:
-        return ''
-    
-    # Usuń zbędne białe znaki
-    street = street.strip()
-    
-    # Usuń końcowe przecinki i kropki
-    street = re.sub(r'[,\.]+$', '', street).strip()
-    
-    # Usuń miasto z początku (tylko jeśli po przecinku jest coś więcej)
-    # "Warszawa, ul. Nowa" → "ul. Nowa"
-    city_pattern = r'^([A-ZĄĆĘŁŃÓŚŹŻ][a-ząćęłńóśźż]+)\s*,\s*(.+)$'
-    city_match = re.match(city_pattern, street)
-    if city_match and city_match.group(2).strip():
-        street = city_match.group(2).strip()
-    
-    # POPRAWKA: Usuń prefiksy TYLKO jeśli są na początku i po nich jest jeszcze tekst
-    # ALE zachowaj "Aleja Nazwa" jako całość - nie traktuj "Aleja" jako prefiksu do usunięcia
-    
-    # Lista prefixów do usunięcia TYLKO jeśli są na samym początku
-    prefixes_to_remove = ['ul', 'ulica']  # Skróciłem listę!
-    
-    for prefix in prefixes_to_remove:
-        # Usuń tylko "ul." lub "ulica" na początku, ale zostaw "al.", "pl.", "os."
-        pattern = rf'^{prefix}\.?\s+(.+)$'
-        match = re.match(pattern, street, re.IGNORECASE)
-        if match and match.group(1).strip():
-            street = match.group(1).strip()
-            break  # Usuń tylko pierwszy pasujący prefiks
-    
-    return street
+    return DeliveryAddressParser.clean_street(street)
 
 def generate_routimo_csv(grouped_orders):
     """
@@ -3241,8 +3159,8 @@ def generate_routimo_csv(grouped_orders):
     writer.writerow(headers)
     
     for order in grouped_orders:
-        # ZMIANA: Używaj nowej funkcji z czyszczeniem ulicy
-        house_number, apartment_number, clean_street = extract_house_and_apartment_number(order['delivery_address'])
+        # Ulica, numer domu i mieszkania rozbite przy zapisie rekordu
+        house_number, apartment_number, clean_street = routimo_address(order)
         
         # Oblicz wagę
         weight = round(order['total_volume'] * 800, 2)
@@ -3833,6 +3751,9 @@ def _sync_selected_orders_with_volume_analysis(service, order_ids, orders_data):
                 reports_logger.error(error_msg)
                 continue
 
+        if orders_added:
+            ReportsDropdownValue.refresh_safely()
+
         # Przygotuj wynik
         result = {
             'success': True,
@@ -3862,8 +3783,14 @@ def api_map_statistics():
     """
     API endpoint dla danych mapy województw
     Zwraca statystyki produkcji pogrupowane według województw
+
+    Agregacja w SQL: jedno GROUP BY voivodeship, status_bucket po indeksowanej
+    kolumnie voivodeship (znormalizowany delivery_state), więc koszt nie rośnie
+    z liczbą pozycji zamówień.
     """
     try:
+        from sqlalchemy import case, func
+
         user_email = session.get('user_email', 'Nieznany użytkownik')
         reports_logger.info("Żądanie danych mapy województw", user_email=user_email)
         
@@ -3889,36 +3816,33 @@ def api_map_statistics():
                 reports_logger.warning("Nieprawidłowy format date_to", 
                                      date_to=date_to_str, user_email=user_email)
         
-        # Pobierz dane z bazy
-        query = BaselinkerReportOrder.get_filtered_orders(
-            date_from=date_from,
-            date_to=date_to
-        )
-        
-        orders = query.all()
-        
-        reports_logger.info("Pobrano zamówienia dla mapy", 
-                          count=len(orders), 
-                          user_email=user_email,
-                          date_from=date_from.isoformat() if date_from else "wszystkie",
-                          date_to=date_to.isoformat() if date_to else "wszystkie")
-        
         # Statusy dla grupowania
         IN_PRODUCTION_STATUSES = [155824, 138619, 148830, 148831, 148832]  # W produkcji
         READY_STATUSES = [138620, 138623, 149777]  # Wyprodukowane
-        
-        # Inicjalizuj dane dla wszystkich 16 województw
-        voivodeships_data = {}
-        all_voivodeships = [
-            'dolnośląskie', 'kujawsko-pomorskie', 'lubelskie', 'lubuskie',
-            'łódzkie', 'małopolskie', 'mazowieckie', 'opolskie',
-            'podkarpackie', 'podlaskie', 'pomorskie', 'śląskie',
-            'świętokrzyskie', 'warmińsko-mazurskie', 'wielkopolskie',
-            'zachodniopomorskie'
-        ]
+
+        status_bucket = case(
+            (BaselinkerReportOrder.baselinker_status_id.in_(IN_PRODUCTION_STATUSES), 'production'),
+            (BaselinkerReportOrder.baselinker_status_id.in_(READY_STATUSES), 'ready'),
+            else_='other'
+        ).label('status_bucket')
+
+        query = db.session.query(
+            BaselinkerReportOrder.voivodeship,
+            status_bucket,
+            func.count(BaselinkerReportOrder.id).label('orders_count'),
+            func.coalesce(func.sum(BaselinkerReportOrder.total_volume), 0).label('volume'),
+            func.coalesce(func.sum(BaselinkerReportOrder.value_net), 0).label('value_net')
+        )
+        if date_from:
+            query = query.filter(BaselinkerReportOrder.date_created >= date_from)
+        if date_to:
+            query = query.filter(BaselinkerReportOrder.date_created <= date_to)
+
+        rows = query.group_by(BaselinkerReportOrder.voivodeship, status_bucket).all()
         
         # Inicjalizuj wszystkie województwa z zerami
-        for voivodeship in all_voivodeships:
+        voivodeships_data = {}
+        for voivodeship in PostcodeToStateMapper.POSTCODE_RANGES:
             voivodeships_data[voivodeship] = {
                 'production_volume': 0.0,
                 'ready_volume': 0.0,
@@ -3928,294 +3852,44 @@ def api_map_statistics():
                 'total_value_net': 0.0,
                 'orders_count': 0
             }
-        
-        # Mapowanie nazw województw do kluczy (normalizacja)
-        voivodeship_mapping = {
-            'dolnośląskie': 'dolnośląskie',
-            'dolnoslaskie': 'dolnośląskie',
-            'kujawsko-pomorskie': 'kujawsko-pomorskie',
-            'kujawsko pomorskie': 'kujawsko-pomorskie',
-            'lubelskie': 'lubelskie',
-            'lubuskie': 'lubuskie', 
-            'łódzkie': 'łódzkie',
-            'lódzkie': 'łódzkie',
-            'lodzkie': 'łódzkie',
-            'małopolskie': 'małopolskie',
-            'malopolskie': 'małopolskie',
-            'mazowieckie': 'mazowieckie',
-            'opolskie': 'opolskie',
-            'podkarpackie': 'podkarpackie',
-            'podlaskie': 'podlaskie',
-            'pomorskie': 'pomorskie',
-            'śląskie': 'śląskie',
-            'slaskie': 'śląskie',
-            'sląskie': 'śląskie',
-            'świętokrzyskie': 'świętokrzyskie',
-            'swietokrzyskie': 'świętokrzyskie',
-            'świętokrzyskie': 'świętokrzyskie',
-            'warmińsko-mazurskie': 'warmińsko-mazurskie',
-            'warminsko-mazurskie': 'warmińsko-mazurskie',
-            'warmińsko mazurskie': 'warmińsko-mazurskie',
-            'wielkopolskie': 'wielkopolskie',
-            'zachodniopomorskie': 'zachodniopomorskie'
-        }
-        
-        # Grupuj dane według województw
-        for order in orders:
-            delivery_state = order.delivery_state
-            if not delivery_state:
-                continue
-                
-            # Normalizuj nazwę województwa
-            state_normalized = delivery_state.lower().strip()
-            voivodeship_key = voivodeship_mapping.get(state_normalized)
-            
-            if not voivodeship_key:
-                reports_logger.debug("Nieznane województwo", 
-                                   delivery_state=delivery_state,
-                                   user_email=user_email)
+
+        processed_orders = 0
+        for row in rows:
+            processed_orders += row.orders_count
+
+            # Wiersze bez województwa lub z nierozpoznaną nazwą (voivodeship = NULL)
+            data = voivodeships_data.get(row.voivodeship)
+            if data is None:
                 continue
-            
-            # Pobierz wartości
-            volume = float(order.total_volume or 0)
-            value_net = float(order.value_net or 0)
-            status_id = order.baselinker_status_id
-            
-            # Zwiększ licznik zamówień
-            voivodeships_data[voivodeship_key]['orders_count'] += 1
-            
-            # Klasyfikuj według statusu
-            if status_id in IN_PRODUCTION_STATUSES:
-                voivodeships_data[voivodeship_key]['production_volume'] += volume
-                voivodeships_data[voivodeship_key]['production_value_net'] += value_net
-            elif status_id in READY_STATUSES:
-                voivodeships_data[voivodeship_key]['ready_volume'] += volume
-                voivodeships_data[voivodeship_key]['ready_value_net'] += value_net
-        
-        # Oblicz łączne wartości
-        for voivodeship_key in voivodeships_data:
-            data = voivodeships_data[voivodeship_key]
-            data['total_volume'] = data['production_volume'] + data['ready_volume']
-            data['total_value_net'] = data['production_value_net'] + data['ready_value_net']
-        
-        # Mapowanie kluczy dla frontendu (z polskich do angielskich ID)
-        frontend_mapping = {
-            'dolnośląskie': 'dolnoslaskie',
-            'kujawsko-pomorskie': 'kujawsko-pomorskie', 
-            'lubelskie': 'lubelskie',
-            'lubuskie': 'lubuskie',
-            'łódzkie': 'lodzkie',
-            'małopolskie': 'malopolskie',
-            'mazowieckie': 'mazowieckie',
-            'opolskie': 'opolskie',
-            'podkarpackie': 'podkarpackie',
-            'podlaskie': 'podlaskie',
-            'pomorskie': 'pomorskie',
-            'śląskie': 'slaskie',
-            'świętokrzyskie': 'swietokrzyskie',
-            'warmińsko-mazurskie': 'warminsko-mazurskie',
-            'wielkopolskie': 'wielkopolskie',
-            'zachodniopomorskie': 'zachodniopomorskie'
-        }
-        
-        # Przekonwertuj klucze dla frontendu
-        frontend_data = {}
-        for polish_key, data in voivodeships_data.items():
-            frontend_key = frontend_mapping.get(polish_key, polish_key)
-            frontend_data[frontend_key] = data
-        
-        # Oblicz statystyki ogólne
-        total_production_volume = sum(data['production_volume'] for data in voivodeships_data.values())
-        total_ready_volume = sum(data['ready_volume'] for data in voivodeships_data.values())
-        total_volume = sum(data['total_volume'] for data in voivodeships_data.values())
-        total_orders = sum(data['orders_count'] for data in voivodeships_data.values())
-        
-        result = {
-            'status': 'success',
-            'data': frontend_data,
-            'summary': {
-                'total_production_volume': total_production_volume,
-                'total_ready_volume': total_ready_volume,
-                'total_volume': total_volume,
-                'total_orders': total_orders,
-                'processed_orders': len(orders),
-                'date_from': date_from.isoformat() if date_from else None,
-                'date_to': date_to.isoformat() if date_to else None
-            }
-        }
-        
-        reports_logger.info("Zwrócono dane mapy", 
-                          summary=result['summary'],
-                          user_email=user_email)
-        
-        return jsonify(result)
-        
-    except Exception as e:
-        reports_logger.error("Błąd API map-statistics", 
-                           error=str(e), 
-                           user_email=session.get('user_email', 'Nieznany'))
-        return jsonify({
-            'status': 'error',
-            'message': 'Błąd podczas pobierania danych mapy',
-            'error': str(e)
-        }), 500
-    """
-    API endpoint dla danych mapy województw
-    Zwraca statystyki produkcji pogrupowane według województw
-    """
-    try:
-        user_email = session.get('user_email', 'Nieznany użytkownik')
-        reports_logger.info("Żądanie danych mapy województw", user_email=user_email)
-        
-        # Pobierz filtry z URL (opcjonalnie)
-        date_from_str = request.args.get('date_from')
-        date_to_str = request.args.get('date_to')
-        
-        # Parsuj daty jeśli podane
-        date_from = None
-        date_to = None
-        
-        if date_from_str:
-            try:
-                date_from = datetime.strptime(date_from_str, '%Y-%m-%d').date()
-            except ValueError:
-                reports_logger.warning("Nieprawidłowy format date_from", 
-                                     date_from=date_from_str, user_email=user_email)
-        
-        if date_to_str:
-            try:
-                date_to = datetime.strptime(date_to_str, '%Y-%m-%d').date()
-            except ValueError:
-                reports_logger.warning("Nieprawidłowy format date_to", 
-                                     date_to=date_to_str, user_email=user_email)
-        
-        # Pobierz dane z bazy
-        query = BaselinkerReportOrder.get_filtered_orders(
-            date_from=date_from,
-            date_to=date_to
-        )
-        
-        orders = query.all()
-        
-        reports_logger.info("Pobrano zamówienia dla mapy", 
-                          count=len(orders), 
+
+            data['orders_count'] += row.orders_count
+            if row.status_bucket == 'production':
+                data['production_volume'] += float(row.volume)
+                data['production_value_net'] += float(row.value_net)
+            elif row.status_bucket == 'ready':
+                data['ready_volume'] += float(row.volume)
+                data['ready_value_net'] += float(row.value_net)
+
+        reports_logger.info("Pobrano agregaty dla mapy", 
+                          groups=len(rows),
+                          count=processed_orders, 
                           user_email=user_email,
                           date_from=date_from.isoformat() if date_from else "wszystkie",
                           date_to=date_to.isoformat() if date_to else "wszystkie")
         
-        # Statusy dla grupowania
-        IN_PRODUCTION_STATUSES = [155824, 138619, 148830, 148831, 148832]  # W produkcji
-        READY_STATUSES = [138620, 138623, 149777]  # Wyprodukowane
-        
-        # Inicjalizuj dane dla wszystkich 16 województw
-        voivodeships_data = {}
-        all_voivodeships = [
-            'dolnośląskie', 'kujawsko-pomorskie', 'lubelskie', 'lubuskie',
-            'łódzkie', 'małopolskie', 'mazowieckie', 'opolskie',
-            'podkarpackie', 'podlaskie', 'pomorskie', 'śląskie',
-            'świętokrzyskie', 'warmińsko-mazurskie', 'wielkopolskie',
-            'zachodniopomorskie'
-        ]
-        
-        # Inicjalizuj wszystkie województwa z zerami
-        for voivodeship in all_voivodeships:
-            voivodeships_data[voivodeship] = {
-                'production_volume': 0.0,
-                'ready_volume': 0.0,
-                'total_volume': 0.0,
-                'production_value_net': 0.0,
-                'ready_value_net': 0.0,
-                'total_value_net': 0.0,
-                'orders_count': 0
-            }
-        
-        # Mapowanie nazw województw do kluczy (normalizacja)
-        voivodeship_mapping = {
-            'dolnośląskie': 'dolnośląskie',
-            'dolnoslaskie': 'dolnośląskie',
-            'kujawsko-pomorskie': 'kujawsko-pomorskie',
-            'kujawsko pomorskie': 'kujawsko-pomorskie',
-            'lubelskie': 'lubelskie',
-            'lubuskie': 'lubuskie', 
-            'łódzkie': 'łódzkie',
-            'lódzkie': 'łódzkie',
-            'lodzkie': 'łódzkie',
-            'małopolskie': 'małopolskie',
-            'malopolskie': 'małopolskie',
-            'mazowieckie': 'mazowieckie',
-            'opolskie': 'opolskie',
-            'podkarpackie': 'podkarpackie',
-            'podlaskie': 'podlaskie',
-            'pomorskie': 'pomorskie',
-            'śląskie': 'śląskie',
-            'slaskie': 'śląskie',
-            'sląskie': 'śląskie',
-            'świętokrzyskie': 'świętokrzyskie',
-            'swietokrzyskie': 'świętokrzyskie',
-            'świętokrzyskie': 'świętokrzyskie',
-            'warmińsko-mazurskie': 'warmińsko-mazurskie',
-            'warminsko-mazurskie': 'warmińsko-mazurskie',
-            'warmińsko mazurskie': 'warmińsko-mazurskie',
-            'wielkopolskie': 'wielkopolskie',
-            'zachodniopomorskie': 'zachodniopomorskie'
-        }
-        
-        # Grupuj dane według województw
-        for order in orders:
-            delivery_state = order.delivery_state
-            if not delivery_state:
-                continue
-                
-            # Normalizuj nazwę województwa
-            state_normalized = delivery_state.lower().strip()
-            voivodeship_key = voivodeship_mapping.get(state_normalized)
-            
-            if not voivodeship_key:
-                reports_logger.debug("Nieznane województwo", 
-                                   delivery_state=delivery_state,
-                                   user_email=user_email)
-                continue
-            
-            # Pobierz wartości
-            volume = float(order.total_volume or 0)
-            value_net = float(order.value_net or 0)
-            status_id = order.baselinker_status_id
-            
-            # Zwiększ licznik zamówień
-            voivodeships_data[voivodeship_key]['orders_count'] += 1
-            
-            # Klasyfikuj według statusu
-            if status_id in IN_PRODUCTION_STATUSES:
-                voivodeships_data[voivodeship_key]['production_volume'] += volume
-                voivodeships_data[voivodeship_key]['production_value_net'] += value_net
-            elif status_id in READY_STATUSES:
-                voivodeships_data[voivodeship_key]['ready_volume'] += volume
-                voivodeships_data[voivodeship_key]['ready_value_net'] += value_net
-        
         # Oblicz łączne wartości
-        for voivodeship_key in voivodeships_data:
-            data = voivodeships_data[voivodeship_key]
+        for data in voivodeships_data.values():
             data['total_volume'] = data['production_volume'] + data['ready_volume']
             data['total_value_net'] = data['production_value_net'] + data['ready_value_net']
         
         # Mapowanie kluczy dla frontendu (z polskich do angielskich ID)
         frontend_mapping = {
             'dolnośląskie': 'dolnoslaskie',
-            'kujawsko-pomorskie': 'kujawsko-pomorskie', 
-            'lubelskie': 'lubelskie',
-            'lubuskie': 'lubuskie',
             'łódzkie': 'lodzkie',
             'małopolskie': 'malopolskie',
-            'mazowieckie': 'mazowieckie',
-            'opolskie': 'opolskie',
-            'podkarpackie': 'podkarpackie',
-            'podlaskie': 'podlaskie',
-            'pomorskie': 'pomorskie',
             'śląskie': 'slaskie',
             'świętokrzyskie': 'swietokrzyskie',
-            'warmińsko-mazurskie': 'warminsko-mazurskie',
-            'wielkopolskie': 'wielkopolskie',
-            'zachodniopomorskie': 'zachodniopomorskie'
+            'warmińsko-mazurskie': 'warminsko-mazurskie'
         }
         
         # Przekonwertuj klucze dla frontendu
@@ -4238,7 +3912,7 @@ def api_map_statistics():
                 'total_ready_volume': total_ready_volume,
                 'total_volume': total_volume,
                 'total_orders': total_orders,
-                'processed_orders': len(orders),
+                'processed_orders': processed_orders,
                 'date_from': date_from.isoformat() if date_from else None,
                 'date_to': date_to.isoformat() if date_to else None
             }
@@ -4258,4 +3932,4 @@ def api_map_statistics():
             'status': 'error',
             'message': 'Błąd podczas pobierania danych mapy',
             'error': str(e)
-        }), 500
\ No newline at end of file
+        }), 500
@@ -0,0 +1,141 @@
+# modules/reports/selection_cache.py
+"""
+Cache zamówień pobranych w modalach wyboru zamówień
+
+Krok podglądu (reports: fetch-orders-for-selection, production:
+fetch_orders_preview) pobiera zamówienia z Baselinker i zapisuje je pod
+tokenem wyboru. Krok zapisu przekazuje token i korzysta z zapisanych
+zamówień zamiast ponownie odpytywać API - z API pobierane są tylko
+zamówienia, których w cache nie ma (np. po wygaśnięciu TTL).
+
+Wpisy trzymane są w plikach (gzip JSON) w katalogu tmp aplikacji, więc są
+widoczne dla wszystkich procesów Passengera na serwerze.
+"""
+
+import gzip
+import json
+import os
+import re
+import secrets
+import time
+
+from flask import current_app
+
+from modules.logging import get_structured_logger
+
+cache_logger = get_structured_logger('reports.selection_cache')
+
+_TOKEN_PATTERN = re.compile(r'^[A-Za-z0-9_-]{16,64}$')
+
+
+class OrderSelectionCache:
+    """Zamówienia podglądu pod tokenem wyboru (TTL, per użytkownik)"""
+
+    DEFAULT_TTL = 1800  # sekundy
+
+    @staticmethod
+    def _directory():
+        directory = current_app.config.get('ORDER_SELECTION_CACHE_DIR') or os.path.join(
+            current_app.root_path, 'tmp', 'order_selection')
+        os.makedirs(directory, exist_ok=True)
+        return directory
+
+    @staticmethod
+    def _ttl():
+        return int(current_app.config.get('ORDER_SELECTION_CACHE_TTL', OrderSelectionCache.DEFAULT_TTL))
+
+    @classmethod
+    def _path(cls, token):
+        if not token or not _TOKEN_PATTERN.match(token):
+            return None
+        return os.path.join(cls._directory(), f'{token}.json.gz')
+
+    @classmethod
+    def put(cls, orders, user_id=None, scope='reports'):
+        """
+        Zapisuje zamówienia (surowe dane z Baselinker) i zwraca token wyboru
+
+        Returns:
+            str: token lub None, jeśli zapis się nie powiódł
+        """
+        token = secrets.token_urlsafe(24)
+        path = cls._path(token)
+        payload = {
+            'user_id': user_id,
+            'scope': scope,
+            'created_at': time.time(),
+            'orders': orders
+        }
+        try:
+            temp_path = f'{path}.{os.getpid()}.tmp'
+            with gzip.open(temp_path, 'wt', encoding='utf-8') as f:
+                json.dump(payload, f, ensure_ascii=False, default=str)
+            os.replace(temp_path, path)
+        except OSError as e:
+            cache_logger.error("Nie udało się zapisać cache wyboru zamówień", error=str(e))
+            return None
+
+        cls._cleanup()
+        cache_logger.info("Zapisano cache wyboru zamówień", scope=scope, orders=len(orders), user_id=user_id)
+        return token
+
+    @classmethod
+    def get(cls, token, user_id=None, scope='reports'):
+        """
+        Returns:
+            dict: {order_id (int): zamówienie} lub None (brak, wygasł, inny użytkownik)
+        """
+        path = cls._path(token)
+        if not path or not os.path.exists(path):
+            return None
+        if os.path.getmtime(path) < time.time() - cls._ttl():
+            cls.discard(token)
+            return None
+
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                payload = json.load(f)
+        except (OSError, ValueError) as e:
+            cache_logger.warning("Uszkodzony wpis cache wyboru zamówień", error=str(e))
+            cls.discard(token)
+            return None
+
+        if payload.get('scope') != scope or (user_id is not None and payload.get('user_id') != user_id):
+            return None
+        return {int(order['order_id']): order for order in payload.get('orders', []) if order.get('order_id')}
+
+    @classmethod
+    def take(cls, token, order_ids, user_id=None, scope='reports'):
+        """
+        Zamówienia o podanych ID z cache.
+
+        Returns:
+            tuple: (lista zamówień znalezionych w cache, lista ID do pobrania z API)
+        """
+        cached = cls.get(token, user_id=user_id, scope=scope) or {}
+        found = [cached[order_id] for order_id in order_ids if order_id in cached]
+        missing = [order_id for order_id in order_ids if order_id not in cached]
+        cache_logger.info("Odczyt cache wyboru zamówień", scope=scope, hits=len(found), misses=len(missing))
+        return found, missing
+
+    @classmethod
+    def discard(cls, token):
+        path = cls._path(token)
+        if path:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    @classmethod
+    def _cleanup(cls):
+        """Usuwa wygasłe wpisy (wywoływane przy zapisie)"""
+        cutoff = time.time() - cls._ttl()
+        directory = cls._directory()
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                continue
@@ -6,14 +6,17 @@ Serwis do komunikacji z Baselinker API dla modułu Reports
 import requests
 import json
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional, Tuple
 from datetime import datetime, timedelta, date
 from flask import current_app
 from extensions import db
-from .models import BaselinkerReportOrder, ReportsSyncLog
+from .models import BaselinkerReportOrder, ReportsSyncLog, ReportsDropdownValue
 from .utils import PostcodeToStateMapper
 from .parser import ProductNameParser
 from modules.logging import get_structured_logger
+from modules.baselinker.dictionaries import BaselinkerDictionaries, STATUS_NAMES
 from decimal import Decimal
 
 # Inicjalizacja loggera
@@ -31,27 +34,10 @@ class BaselinkerReportsService:
         self.logger = get_structured_logger('reports.service')
         self.parser = ProductNameParser()
         
-        # Mapowanie statusów Baselinker
-        self.status_map = {
-            155824: "Nowe - opłacone",
-            105112: "Nowe - nieopłacone",
-            138619: "W produkcji - surowe",
-            148830: "W produkcji - lakierowanie",
-            148831: "W produkcji - bejcowanie", 
-            148832: "W produkcji - olejowanie",
-            332355: "W produkcji - suszenie usługowe",
-            138620: "Produkcja zakończona",
-            138623: "Zamówienie spakowane",
-            105113: "Paczka zgłoszona do wysyłki", 
-            105114: "Wysłane - kurier",
-            138624: "Dostarczona - kurier",
-            149763: "Wysłane - transport WoodPower",
-            149777: "Czeka na odbiór osobisty",
-            149778: "Dostarczona - trans. WoodPower",
-            149779: "Odebrane",
-            316636: "Reklamacja",
-            138625: "Zamówienie anulowane"
-        }
+        # Mapowanie statusów Baselinker - nazwy zapisywane w current_status muszą
+        # zgadzać się z listami wykluczeń (EXCLUDED_STATUSES), więc znane statusy
+        # mają nazwy kanoniczne; nowe statusy z baselinker_config uzupełniają słownik
+        self.status_map = {**BaselinkerDictionaries.status_names(), **STATUS_NAMES}
 
         # NOWE właściwości dla obsługi objętości
         self.volume_fixes = {}  # {product_key: {'volume': X, 'wood_species': Y, ...}}
@@ -1253,6 +1239,9 @@ class BaselinkerReportsService:
             )
             db.session.add(sync_log)
             db.session.commit()
+
+            if added_count or updated_count:
+                ReportsDropdownValue.refresh_safely()
         
             self.logger.info("Synchronizacja zakończona pomyślnie",
                            orders_processed=len(orders),
@@ -1959,44 +1948,7 @@ class BaselinkerReportsService:
             )
         
             if orders and len(orders) > 0:
-                order = orders[0]
-            
-                # Sprawdź czy zamówienie nie ma wykluczanego statusu (dodatkowa walidacja)
-                if not include_excluded_statuses:
-                    status_id = order.get('order_status_id')
-                    if status_id in [105112, 138625]:  # Nowe - nieopłacone, Anulowane
-                        self.logger.info("Zamówienie wykluczono ze względu na status",
-                                       order_id=order_id,
-                                       status_id=status_id,
-                                       status_name=self.status_map.get(status_id, f'Status {status_id}'))
-                        return None
-            
-                # NOWE: Przetwórz ceny produktów w pojedynczym zamówieniu
-                custom_fields = order.get('custom_extra_fields', {})
-                price_type_from_api = custom_fields.get('106169', '').strip()
-            
-                # Jeśli zamówienie ma produkty, przetworz ich ceny
-                if 'products' in order and order['products']:
-                    for product in order['products']:
-                        original_price = float(product.get('price_brutto', 0))
-                    
-                        # Utwórz tymczasowy rekord do przetworzenia
-                        temp_record = BaselinkerReportOrder()
-                        processed_price, _ = temp_record.process_baselinker_amount(
-                            original_price, price_type_from_api
-                        )
-                    
-                        # Zaktualizuj cenę w produkcie
-                        product['price_brutto'] = processed_price
-                    
-                        self.logger.debug("Przetworzono cenę produktu w get_order_details",
-                                        order_id=order.get('order_id'),
-                                        product_name=product.get('name'),
-                                        original_price=original_price,
-                                        processed_price=processed_price,
-                                        price_type=price_type_from_api)
-            
-                return order
+                return self.prepare_order_details(orders[0], include_excluded_statuses)
         
             return None
         
@@ -2006,6 +1958,50 @@ class BaselinkerReportsService:
                              include_excluded_statuses=include_excluded_statuses,
                              error=str(e))
             return None
+
+    def prepare_order_details(self, order: Dict, include_excluded_statuses: bool = False) -> Optional[Dict]:
+        """
+        Przygotowuje surowe zamówienie z Baselinker do synchronizacji (jak get_order_details):
+        odrzuca wykluczane statusy i przelicza ceny produktów wg typu ceny (pole 106169).
+        Używane także dla zamówień z cache wyboru (OrderSelectionCache).
+        """
+        order_id = order.get('order_id')
+
+        # Sprawdź czy zamówienie nie ma wykluczanego statusu (dodatkowa walidacja)
+        if not include_excluded_statuses:
+            status_id = order.get('order_status_id')
+            if status_id in [105112, 138625]:  # Nowe - nieopłacone, Anulowane
+                self.logger.info("Zamówienie wykluczono ze względu na status",
+                               order_id=order_id,
+                               status_id=status_id,
+                               status_name=self.status_map.get(status_id, f'Status {status_id}'))
+                return None
+
+        # Przetwórz ceny produktów w pojedynczym zamówieniu
+        custom_fields = order.get('custom_extra_fields', {})
+        price_type_from_api = custom_fields.get('106169', '').strip()
+
+        if 'products' in order and order['products']:
+            for product in order['products']:
+                original_price = float(product.get('price_brutto', 0))
+
+                # Utwórz tymczasowy rekord do przetworzenia
+                temp_record = BaselinkerReportOrder()
+                processed_price, _ = temp_record.process_baselinker_amount(
+                    original_price, price_type_from_api
+                )
+
+                # Zaktualizuj cenę w produkcie
+                product['price_brutto'] = processed_price
+
+                self.logger.debug("Przetworzono cenę produktu w get_order_details",
+                                order_id=order_id,
+                                product_name=product.get('name'),
+                                original_price=original_price,
+                                processed_price=processed_price,
+                                price_type=price_type_from_api)
+
+        return order
         
     def check_for_new_orders(self, hours_back: int = 24) -> Tuple[bool, int]:
         """
@@ -2051,9 +2047,105 @@ class BaselinkerReportsService:
                              hours_back=hours_back)
             return False, 0
 
+    # Równoległe pobieranie zakresu dat: zakres dzielony jest na okna (pełne dni),
+    # każde okno stronicowane jest osobno kursorem date_from = ostatnie date_add + 1
+    DATE_RANGE_MAX_WORKERS = 4
+    DATE_RANGE_MAX_PAGES_PER_WINDOW = 10
+
+    @classmethod
+    def _split_date_range(cls, date_from_timestamp: int, date_to_timestamp: int) -> List[Tuple[int, int]]:
+        """Dzieli zakres [from, to] na maks. DATE_RANGE_MAX_WORKERS okien wyrównanych do pełnych dni"""
+        day = 86400
+        days = max(1, (date_to_timestamp - date_from_timestamp + 1 + day - 1) // day)
+        windows_count = min(cls.DATE_RANGE_MAX_WORKERS, days)
+        days_per_window = -(-days // windows_count)
+
+        windows = []
+        window_from = date_from_timestamp
+        while window_from <= date_to_timestamp:
+            window_to = min(window_from + days_per_window * day - 1, date_to_timestamp)
+            windows.append((window_from, window_to))
+            window_from = window_to + 1
+        return windows
+
+    def _fetch_date_window(self, window_from: int, window_to: int, base_parameters: Dict, headers: Dict) -> Dict:
+        """
+        Pobiera wszystkie strony jednego okna dat (wywoływane w wątku - tylko HTTP, bez bazy).
+
+        Returns:
+            Dict: orders, pages, error
+        """
+        orders = []
+        pages = 0
+        cursor = window_from
+        page_size = min(int(base_parameters.get('limit', 100)), 100)
+
+        with requests.Session() as http:
+            while pages < self.DATE_RANGE_MAX_PAGES_PER_WINDOW and cursor <= window_to:
+                pages += 1
+                parameters = dict(base_parameters, date_from=cursor, date_to=window_to)
+                data = {
+                    'method': 'getOrders',
+                    'parameters': json.dumps(parameters)
+                }
+
+                try:
+                    response = http.post(self.endpoint, headers=headers, data=data, timeout=30)
+                    response.raise_for_status()
+                    result = response.json()
+                except requests.exceptions.Timeout:
+                    self.logger.error("Timeout przy pobieraniu partii zakresu dat",
+                                      page=pages, window_from=window_from)
+                    continue
+                except requests.exceptions.RequestException as e:
+                    self.logger.error("Błąd połączenia podczas pobierania zakresu dat",
+                                      page=pages, window_from=window_from, error=str(e))
+                    continue
+
+                if result.get('status') != 'SUCCESS':
+                    error_msg = result.get('error_message', 'Nieznany błąd API')
+                    error_code = result.get('error_code', 'Brak kodu błędu')
+                    self.logger.error("Błąd API Baselinker podczas pobierania zakresu dat",
+                                      page=pages, error_message=error_msg, error_code=error_code)
+                    return {'orders': orders, 'pages': pages,
+                            'error': f'Błąd API: {error_msg} (kod: {error_code})'}
+
+                batch_orders = result.get('orders', [])
+                latest_date_add = None
+                for order in batch_orders:
+                    try:
+                        order_date_add = int(order.get('date_add'))
+                    except (TypeError, ValueError):
+                        self.logger.debug("Pomijam zamówienie bez poprawnego date_add",
+                                          order_id=order.get('order_id'))
+                        continue
+
+                    if latest_date_add is None or order_date_add > latest_date_add:
+                        latest_date_add = order_date_add
+                    # Dodatkowe zabezpieczenie: odrzuć zamówienia spoza okna na podstawie date_add
+                    if window_from <= order_date_add <= window_to:
+                        orders.append(order)
+
+                self.logger.debug("Przetworzona partia dla zakresu dat",
+                                  page=pages,
+                                  window_from=window_from,
+                                  batch_total=len(batch_orders),
+                                  total_collected=len(orders))
+
+                # Mniej niż pełna strona albo brak postępu kursora - koniec okna
+                if len(batch_orders) < page_size or latest_date_add is None or latest_date_add < cursor:
+                    break
+                cursor = latest_date_add + 1
+
+        return {'orders': orders, 'pages': pages, 'error': None}
+
     def fetch_orders_from_date_range(self, date_from: datetime, date_to: datetime, get_all_statuses: bool = False, limit_per_page: int = 100) -> Dict[str, any]:
         """
-        NOWA METODA: Pobiera zamówienia z Baselinker dla konkretnego zakresu dat.
+        Pobiera zamówienia z Baselinker dla konkretnego zakresu dat.
+
+        Zakres dzielony jest na okna dni pobierane równolegle (ThreadPoolExecutor,
+        maks. DATE_RANGE_MAX_WORKERS zapytań naraz), a wyniki są scalane bez
+        duplikatów i sortowane po date_add.
 
         Args:
             date_from (datetime): Data początkowa zakresu.
@@ -2073,152 +2165,78 @@ class BaselinkerReportsService:
             if limit_per_page_int > 200:
                 limit_per_page_int = 200
 
-            self.logger.info("Pobieranie zamówień dla zakresu dat",
-                            date_from=date_from.isoformat(),
-                            date_to=date_to.isoformat(),
-                            get_all_statuses=get_all_statuses,
-                            limit_per_page=limit_per_page_int)
-
             headers = {
                 'X-BLToken': self.api_key,
                 'Content-Type': 'application/x-www-form-urlencoded'
             }
 
-            all_orders = []
-            seen_order_ids = set()
-            page = 0
-            max_pages = 10  # Bezpiecznik - maksymalnie 10 stron dla zakresu dat
-        
             # Konwertuj daty na timestampy
             date_from_timestamp = int(date_from.timestamp())
             date_to_timestamp = int(date_to.timestamp()) + 86399  # Dodaj 23:59:59 do daty końcowej
 
-            self.logger.info("Konwersja dat na timestampy",
-                            date_from_timestamp=date_from_timestamp,
-                            date_to_timestamp=date_to_timestamp)
-
-            while page < max_pages:
-                page += 1
-            
-                # Parametry zapytania zgodne z API Baselinker
-                parameters = {
-                    "include_custom_extra_fields": True,
-                    "get_unconfirmed_orders": True,
-                    # Filtrowanie po dacie złożenia zamówienia (date_add)
-                    "date_from": date_from_timestamp,
-                    "date_to": date_to_timestamp,
-                    "limit": limit_per_page_int
-                }
+            base_parameters = {
+                "include_custom_extra_fields": True,
+                "get_unconfirmed_orders": True,
+                "limit": limit_per_page_int
+            }
+            # Domyślnie wykluczamy anulowane i nieopłacone (chyba że explicite żądamy wszystkich)
+            if not get_all_statuses:
+                base_parameters["filter_order_status_id"] = "!105112,!138625"
 
-                # POPRAWKA: Domyślnie wykluczamy anulowane i nieopłacone (chyba że explicite żądamy wszystkich)
-                if not get_all_statuses:
-                    parameters["filter_order_status_id"] = "!105112,!138625"  # Wykluczamy nieopłacone i anulowane
+            windows = self._split_date_range(date_from_timestamp, date_to_timestamp)
 
-                self.logger.debug("Pobieranie partii zamówień dla zakresu dat",
-                                page=page,
-                                parameters=parameters,
-                                filtered_excluded_statuses=not get_all_statuses)
+            self.logger.info("Pobieranie zamówień dla zakresu dat",
+                            date_from=date_from.isoformat(),
+                            date_to=date_to.isoformat(),
+                            get_all_statuses=get_all_statuses,
+                            limit_per_page=limit_per_page_int,
+                            windows=len(windows))
 
-                data = {
-                    'method': 'getOrders',
-                    'parameters': json.dumps(parameters)
+            started = time.perf_counter()
+            if len(windows) == 1:
+                results = [self._fetch_date_window(windows[0][0], windows[0][1], base_parameters, headers)]
+            else:
+                with ThreadPoolExecutor(max_workers=len(windows)) as executor:
+                    results = list(executor.map(
+                        lambda window: self._fetch_date_window(window[0], window[1], base_parameters, headers),
+                        windows
+                    ))
+
+            pages_processed = sum(result['pages'] for result in results)
+            errors = [result['error'] for result in results if result['error']]
+            if errors:
+                return {
+                    'success': False,
+                    'orders': [],
+                    'error': errors[0],
+                    'pages_processed': pages_processed
                 }
 
-                try:
-                    response = requests.post(self.endpoint, headers=headers, data=data, timeout=30)
-                    response.raise_for_status()
-                    result = response.json()
-
-                    if result.get('status') == 'SUCCESS':
-                        batch_orders = result.get('orders', [])
-
-                        # Dodatkowe zabezpieczenie: odrzuć zamówienia spoza zakresu dat na podstawie date_add
-                        filtered_batch = []
-                        for order in batch_orders:
-                            order_date_add = order.get('date_add')
-                            if order_date_add is None:
-                                self.logger.debug("Pomijam zamówienie bez date_add",
-                                                  order_id=order.get('order_id'))
-                                continue
-                            try:
-                                order_date_add = int(order_date_add)
-                            except (TypeError, ValueError):
-                                self.logger.debug("Nieprawidłowe date_add",
-                                                  order_id=order.get('order_id'),
-                                                  date_add=order_date_add)
-                                continue
-
-                            if date_from_timestamp <= order_date_add <= date_to_timestamp:
-                                filtered_batch.append(order)
-                            else:
-                                self.logger.debug("Zamówienie poza zakresem date_add",
-                                                  order_id=order.get('order_id'),
-                                                  date_add=order_date_add)
-
-                        batch_orders = filtered_batch
-
-                        if not batch_orders:
-                            self.logger.info("Brak więcej zamówień - kończę pobieranie",
-                                        page=page, total_collected=len(all_orders))
-                            break
-
-                        # Filtruj duplikaty
-                        new_orders_in_batch = 0
-                        for order in batch_orders:
-                            order_id_val = order.get('order_id')
-                        
-                            if order_id_val not in seen_order_ids:
-                                all_orders.append(order)
-                                seen_order_ids.add(order_id_val)
-                                new_orders_in_batch += 1
-
-                        self.logger.debug("Przetworzona partia dla zakresu dat",
-                                        page=page,
-                                        batch_total=len(batch_orders),
-                                        new_orders=new_orders_in_batch,
-                                        duplicates=len(batch_orders) - new_orders_in_batch,
-                                        total_collected=len(all_orders))
-
-                        # Jeśli mamy mniej niż 100 zamówień w partii, prawdopodobnie to koniec
-                        if len(batch_orders) < 100:
-                            self.logger.info("Partia zawiera mniej niż 100 zamówień - kończę pobieranie zakresu",
-                                           page=page, batch_size=len(batch_orders))
-                            break
-
-                    else:
-                        error_msg = result.get('error_message', 'Nieznany błąd API')
-                        error_code = result.get('error_code', 'Brak kodu błędu')
-                        self.logger.error("Błąd API Baselinker podczas pobierania zakresu dat",
-                                         page=page, error_message=error_msg, error_code=error_code)
-                        return {
-                            'success': False,
-                            'orders': [],
-                            'error': f'Błąd API: {error_msg} (kod: {error_code})',
-                            'pages_processed': page
-                        }
-
-                except requests.exceptions.Timeout:
-                    self.logger.error("Timeout przy pobieraniu partii zakresu dat", page=page)
-                    continue
-                
-                except requests.exceptions.RequestException as e:
-                    self.logger.error("Błąd połączenia podczas pobierania zakresu dat", page=page, error=str(e))
-                    continue
+            # Scal okna bez duplikatów
+            all_orders = []
+            seen_order_ids = set()
+            for result in results:
+                for order in result['orders']:
+                    order_id_val = order.get('order_id')
+                    if order_id_val not in seen_order_ids:
+                        seen_order_ids.add(order_id_val)
+                        all_orders.append(order)
+            all_orders.sort(key=lambda order: int(order.get('date_add') or 0))
 
             self.logger.info("Zakończono pobieranie zamówień dla zakresu dat",
                             total_orders=len(all_orders),
-                            pages_processed=page,
+                            pages_processed=pages_processed,
+                            windows=len(windows),
+                            duration_ms=round((time.perf_counter() - started) * 1000, 1),
                             date_from=date_from.isoformat(),
                             date_to=date_to.isoformat(),
-                            unique_orders=len(seen_order_ids),
-                            get_all_statuses=get_all_statuses,
-                            filtered_excluded_statuses=not get_all_statuses)
+                            get_all_statuses=get_all_statuses)
 
             return {
                 'success': True,
                 'orders': all_orders,
                 'error': None,
-                'pages_processed': page
+                'pages_processed': pages_processed
             }
 
         except Exception as e:
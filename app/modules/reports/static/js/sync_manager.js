@@ -186,6 +186,7 @@ class SyncManager {
         this.dateFrom = null;
         this.dateTo = null;
         this.fetchedOrders = [];
+        this.selectionToken = null;
         this.selectedOrderIds = new Set();
         this.isProcessing = false;
 
@@ -883,6 +884,8 @@ class SyncManager {
                 this.updateProgressiveLoading('Analizowanie produktów...', 3);
 
                 this.fetchedOrders = result.orders || [];
+                // Token cache wyboru - zapis użyje pobranych już danych zamiast ponownie pytać Baselinker
+                this.selectionToken = result.selection_token || null;
                 console.log('[SyncManager] ✅ Pobrano zamówienia z analizą objętości:', this.fetchedOrders.length);
 
                 // *** NOWY KOD: Obsługa komunikatu z API ***
@@ -1720,6 +1723,7 @@ class SyncManager {
     // NOWA metoda: czyści dane po zakończeniu procesu
     clearSyncData() {
         this.fetchedOrders = [];
+        this.selectionToken = null;
         this.selectedOrderIds.clear();
         this.productsNeedingVolume = [];
         this.isProcessing = false;
@@ -2482,7 +2486,8 @@ class SyncManager {
                 },
                 body: JSON.stringify({
                     order_ids: orderIds,                    // tablica ID zamówień
-                    dimension_fixes: this.dimensionFixes || {}   // poprawki wymiarów (może być puste)
+                    dimension_fixes: this.dimensionFixes || {},  // poprawki wymiarów (może być puste)
+                    selection_token: this.selectionToken         // token cache wyboru
                 })
             });
 
@@ -2579,7 +2584,8 @@ class SyncManager {
         try {
             const requestData = {
                 order_ids: orderIds,
-                dimension_fixes: dimensionFixes
+                dimension_fixes: dimensionFixes,
+                selection_token: this.selectionToken
             };
 
             console.log('[SyncManager] 📤 Wysyłanie zamówień do zapisania:', requestData);
@@ -3492,7 +3498,8 @@ class SyncManager {
                 order_ids: selectedOrdersList,
                 date_from: this.dateFrom,
                 date_to: this.dateTo,
-                volume_overrides: volumeOverrides || {}
+                volume_overrides: volumeOverrides || {},
+                selection_token: this.selectionToken
             };
 
             console.log('[SyncManager] 📤 Wysyłanie zamówień do zapisania:', requestData);
@@ -3567,6 +3574,7 @@ class SyncManager {
         this.dateFrom = null;
         this.dateTo = null;
         this.fetchedOrders = [];
+        this.selectionToken = null;
         this.selectedOrderIds.clear();
         this.ordersWithDimensionIssues.clear();
         this.isProcessing = false;
@@ -1,10 +1,12 @@
 # modules/reports/utils.py
 """
 Narzędzia pomocnicze dla modułu Reports
-Zawiera mapowanie kodów pocztowych na województwa
+Zawiera mapowanie kodów pocztowych na województwa i parser adresów dostawy
 """
 
 import re
+import unicodedata
+from functools import lru_cache
 from typing import Optional
 from modules.logging import get_structured_logger
 # Inicjalizacja loggera
@@ -70,6 +72,9 @@ class PostcodeToStateMapper:
         'zachodniopomorskie': [(70, 79)]
     }
     
+    # Złożone (bez polskich znaków) nazwy -> klucze POSTCODE_RANGES, budowane przy pierwszym użyciu
+    _folded_keys = None
+
     # Mapowanie nazw województw do form kanonicznych
     STATE_NORMALIZATION = {
         'dolnoslaskie': 'Dolnośląskie',
@@ -171,6 +176,29 @@ class PostcodeToStateMapper:
         state_lower = state.strip().lower()
         return cls.STATE_NORMALIZATION.get(state_lower, state.strip().title())
     
+    @classmethod
+    def _fold(cls, value: str) -> str:
+        """Małe litery bez polskich znaków, myślniki zamiast spacji: 'Kujawsko Pomorskie' -> 'kujawsko-pomorskie'"""
+        value = value.strip().lower().replace('ł', 'l')
+        value = unicodedata.normalize('NFKD', value).encode('ascii', 'ignore').decode('ascii')
+        value = re.sub(r'^(woj\.?|wojewodztwo)\s+', '', value)
+        return re.sub(r'[\s_-]+', '-', value)
+
+    @classmethod
+    def voivodeship_key(cls, state: str) -> Optional[str]:
+        """
+        Klucz województwa (jak w POSTCODE_RANGES, np. 'dolnośląskie') dla nazwy
+        w dowolnej pisowni - wartość kolumny BaselinkerReportOrder.voivodeship
+
+        Returns:
+            Optional[str]: Klucz lub None dla nierozpoznanej nazwy
+        """
+        if not state or not state.strip():
+            return None
+        if cls._folded_keys is None:
+            cls._folded_keys = {cls._fold(key): key for key in cls.POSTCODE_RANGES}
+        return cls._folded_keys.get(cls._fold(state))
+
     @classmethod
     def auto_fill_state(cls, postcode: str, current_state: str = None) -> str:
         """
@@ -199,5 +227,179 @@ class PostcodeToStateMapper:
         return current_state or ''
 
 
+# Numer domu / mieszkania: cyfry z opcjonalnymi literami (12, 12A, 12ab)
+_NUMBER = r'\d+[A-Za-z]*'
+
+# Warianty adresu w kolejności dopasowania (jak w dawnej liście wzorców eksportu
+# Routimo): numer po nazwie ulicy, potem numer przed nazwą ulicy
+_ADDRESS_VARIANTS = (
+    # "ul. Nazwa 123/45", "ul. Nazwa 123 / 45"
+    rf'(?P<s0>.+?)\s+(?P<h0>{_NUMBER})\s*\/\s*(?P<a0>{_NUMBER})',
+    # "ul. Nazwa 123m45", "ul. Nazwa 123 m. 45"
+    rf'(?P<s1>.+?)\s+(?P<h1>{_NUMBER})\s*m\.?\s*(?P<a1>{_NUMBER})',
+    # "ul. Nazwa 123"
+    rf'(?P<s2>.+?)\s+(?P<h2>{_NUMBER})\s*',
+    # "123/45 Nazwa ulicy"
+    rf'(?P<h3>{_NUMBER})\s*\/\s*(?P<a3>{_NUMBER})\s+(?P<s3>.+)',
+    # "123m45 Nazwa ulicy"
+    rf'(?P<h4>{_NUMBER})\s*m\.?\s*(?P<a4>{_NUMBER})\s+(?P<s4>.+)',
+    # "123 Nazwa ulicy"
+    rf'(?P<h5>{_NUMBER})\s+(?P<s5>.+)',
+)
+
+
+class DeliveryAddressParser:
+    """
+    Rozbija adres dostawy na ulicę, numer domu i numer mieszkania
+
+    Wszystkie warianty są jednym skompilowanym wyrażeniem (alternatywa
+    w kolejności priorytetu), więc adres sprawdzany jest jednym przejściem
+    zamiast kolejnych re.search po liście wzorców. Wyniki są zapamiętywane
+    (lru_cache) - adresy stałych klientów powtarzają się w kolejnych zamówieniach.
+
+    Wynik zapisywany jest przy zapisie rekordu raportu (delivery_street,
+    delivery_house_number, delivery_apartment_number) i używany przez eksport Routimo.
+    """
+
+    CACHE_SIZE = 20000
+
+    _VARIANTS = [re.compile(rf'^{variant}$', re.IGNORECASE) for variant in _ADDRESS_VARIANTS]
+    _ADDRESS = re.compile(
+        '^(?:' + '|'.join(f'(?P<v{index}>{variant})' for index, variant in enumerate(_ADDRESS_VARIANTS)) + ')$',
+        re.IGNORECASE
+    )
+    _TRAILING_PUNCTUATION = re.compile(r'[,\.]+$')
+    _CITY_PREFIX = re.compile(r'^([A-ZĄĆĘŁŃÓŚŹŻ][a-ząćęłńóśźż]+)\s*,\s*(.+)$')
+    # Tylko "ul." / "ulica" - "al.", "pl.", "os." są częścią nazwy
+    _STREET_PREFIX = re.compile(r'^(?:ul|ulica)\.?\s+(.+)$', re.IGNORECASE)
+    _POSTCODE_DIGITS = re.compile(r'\D')
+
+    @classmethod
+    def parse(cls, address: str) -> tuple:
+        """
+        Args:
+            address (str): Adres z Baselinker, np. "ul. Długa 12/4"
+
+        Returns:
+            tuple: (street, house_number, apartment_number) - dla nierozpoznanego
+                   formatu ('adres', '', '')
+        """
+        if not address or not isinstance(address, str):
+            return address or '', '', ''
+        return _parse_address_cached(address.strip())
+
+    @classmethod
+    def _parse(cls, address: str) -> tuple:
+        match = cls._ADDRESS.match(address)
+        if match:
+            index = int(match.lastgroup[1:])
+            parsed = cls._from_match(match, index)
+            if parsed:
+                return parsed
+
+            # Ulica pusta po czyszczeniu (np. ", 12") - kolejne warianty po kolei
+            for next_index in range(index + 1, len(cls._VARIANTS)):
+                variant_match = cls._VARIANTS[next_index].match(address)
+                parsed = variant_match and cls._from_match(variant_match, next_index)
+                if parsed:
+                    return parsed
+
+        return address, '', ''
+
+    @classmethod
+    def _from_match(cls, match, index):
+        street = cls.clean_street(match.group(f's{index}'))
+        if not street:
+            return None
+        apartment = match.group(f'a{index}') if f'a{index}' in match.re.groupindex else ''
+        return street, match.group(f'h{index}').strip(), (apartment or '').strip()
+
+    @classmethod
+    def clean_street(cls, street: str) -> str:
+        """
+        Czyści nazwę ulicy: końcowe przecinki/kropki, miasto na początku
+        ("Warszawa, ul. Nowa") i prefiks "ul."/"ulica"
+        """
+        if not street:
+            return ''
+        street = cls._TRAILING_PUNCTUATION.sub('', street.strip()).strip()
+
+        city_match = cls._CITY_PREFIX.match(street)
+        if city_match and city_match.group(2).strip():
+            street = city_match.group(2).strip()
+
+        prefix_match = cls._STREET_PREFIX.match(street)
+        if prefix_match and prefix_match.group(1).strip():
+            street = prefix_match.group(1).strip()
+
+        return street
+
+    @classmethod
+    def normalize_postcode(cls, postcode: str) -> Optional[str]:
+        """'01001', ' 01-001 ', '01 001' -> '01-001'; inne formaty (zagraniczne) bez zmian"""
+        if not postcode or not postcode.strip():
+            return None
+        postcode = postcode.strip()
+        digits = cls._POSTCODE_DIGITS.sub('', postcode)
+        if len(digits) == 5 and len(postcode) <= 7:
+            return f'{digits[:2]}-{digits[2:]}'
+        return postcode.upper()
+
+    @classmethod
+    def clear_cache(cls):
+        _parse_address_cached.cache_clear()
+
+    @classmethod
+    def benchmark(cls, count=50000, distinct=10000):
+        """
+        Parsowanie ``count`` syntetycznych adresów (``distinct`` różnych)
+
+        Returns:
+            dict: czasy bez cache i z cache, adresy/s, trafienia cache
+        """
+        import random
+        import time
+
+        rng = random.Random(20250915)
+        streets = ['ul. Długa', 'Aleja Niepodległości', 'os. Kwiatowe', 'Warszawa, ul. Nowa',
+                   'ulica Polna', 'pl. Wolności', 'Generała Józefa Bema', 'Krótka']
+        formats = ['{street} {house}', '{street} {house}/{apartment}', '{street} {house} m. {apartment}',
+                   '{house}/{apartment} {street}', '{street} {house}A', 'Brak numeru {street}']
+        pool = [
+            rng.choice(formats).format(street=rng.choice(streets), house=rng.randint(1, 250),
+                                       apartment=rng.randint(1, 80)) + f' {index}' * (index % 2)
+            for index in range(distinct)
+        ]
+        addresses = [pool[rng.randrange(distinct)] for _ in range(count)]
+
+        started = time.perf_counter()
+        for address in addresses:
+            cls._parse(address)
+        uncached_seconds = time.perf_counter() - started
+
+        cls.clear_cache()
+        started = time.perf_counter()
+        for address in addresses:
+            cls.parse(address)
+        cached_seconds = time.perf_counter() - started
+        info = _parse_address_cached.cache_info()
+
+        return {
+            'addresses': count,
+            'distinct': distinct,
+            'uncached_seconds': round(uncached_seconds, 3),
+            'uncached_per_sec': round(count / uncached_seconds) if uncached_seconds else None,
+            'cached_seconds': round(cached_seconds, 3),
+            'cached_per_sec': round(count / cached_seconds) if cached_seconds else None,
+            'cache_hits': info.hits,
+            'cache_misses': info.misses
+        }
+
+
+@lru_cache(maxsize=DeliveryAddressParser.CACHE_SIZE)
+def _parse_address_cached(address: str) -> tuple:
+    return DeliveryAddressParser._parse(address)
+
+
 if __name__ == "__main__":
     test_postcode_mapper()
\ No newline at end of file